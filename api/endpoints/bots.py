@@ -1030,12 +1030,13 @@ def get_bot_analytics(
     page: int = 1,
     limit: int = 10,
     network_filter: Optional[str] = Query(None, description="Filter by network: 'mainnet' or 'testnet'"),
+    cursor: Optional[str] = Query(None, description="pagination.next_cursor of the previous page (keyset pagination)"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(security.get_current_active_user)
 ):
     """Get bot analytics including transactions, subscribers, and performance metrics with pagination"""
     # Allow all authenticated users to view analytics, not just the bot owner
-    return crud.get_bot_analytics(db, bot_id=bot_id, developer_id=None, days=days, page=page, limit=limit, network_filter=network_filter)
+    return crud.get_bot_analytics(db, bot_id=bot_id, developer_id=None, days=days, page=page, limit=limit, network_filter=network_filter, cursor=cursor)
 
 @router.get("/{bot_id}/subscriptions", response_model=dict)
 def get_bot_subscriptions(
@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from core.database import get_db
 from core import models, schemas, security
 from core.api_key_manager import api_key_manager
+from core.credential_cache import invalidate_credentials, PRINCIPAL
 
 logger = logging.getLogger(__name__)
 
@@ -198,10 +199,13 @@ async def delete_exchange_credentials(
             )
         
         # Delete credentials
+        principal_ids = {cred.principal_id for cred in credentials_list}
         for cred in credentials_list:
             db.delete(cred)
         
         db.commit()
+        for principal_id in principal_ids:
+            invalidate_credentials(PRINCIPAL, principal_id)
         
         return {
             "status": "success",
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from core import models, schemas
 from core.database import get_db
 from core import security
+from services.llm_quota_ledger import get_quota_ledger
 from datetime import datetime
 import logging
 import os
@@ -152,16 +153,20 @@ def get_quota_usage(
                 "can_purchase": False
             }
         
-        # Calculate remaining quota
-        remaining = user_plan.llm_quota_total - user_plan.llm_quota_used
-        percentage = (user_plan.llm_quota_used / user_plan.llm_quota_total * 100) if user_plan.llm_quota_total > 0 else 0
+        # Calculate remaining quota (ledger counts include calls not yet written back)
+        quota = get_quota_ledger().get_usage(current_user.id)
+        total = quota.total if quota else user_plan.llm_quota_total
+        used = quota.used if quota else user_plan.llm_quota_used
+        reset_at = quota.reset_at if quota else user_plan.llm_quota_reset_at
+        remaining = total - used
+        percentage = (used / total * 100) if total > 0 else 0
         
         return {
-            "total": user_plan.llm_quota_total,
-            "used": user_plan.llm_quota_used,
+            "total": total,
+            "used": used,
             "remaining": remaining,
             "percentage": round(percentage, 1),
-            "reset_at": user_plan.llm_quota_reset_at.isoformat() if user_plan.llm_quota_reset_at else None,
+            "reset_at": reset_at.isoformat() if reset_at else None,
             "plan_name": user_plan.plan_name.value,
             "can_purchase": user_plan.plan_name in [models.PlanName.PRO, models.PlanName.ULTRA]
         }
@@ -238,6 +243,7 @@ def purchase_quota_topup(
         
         # Commit changes
         db.commit()
+        get_quota_ledger().invalidate(current_user.id)
         
         logger.info(f"✅ Quota top-up purchased: User {current_user.id}, Package: {package}, Quota: +{package_info['quota']}")
         
@@ -577,6 +583,7 @@ def complete_paypal_purchase(
         
         # Commit changes
         db.commit()
+        get_quota_ledger().invalidate(current_user.id)
         
         logger.info(f"✅ Quota top-up completed: User {current_user.id}, Package: {package_key}, Quota: +{package_info['quota']}")
         
@@ -18,7 +18,6 @@ import hmac
 import time
 import requests
 import asyncio
-import redis
 import os
 from datetime import datetime
 from dataclasses import dataclass
@@ -27,6 +26,7 @@ from dataclasses import dataclass
 # from bots.bot_sdk.Action import Action
 from bots.bot_sdk import CustomBot, Action
 from services.llm_integration import create_llm_service
+from services.llm_cache import LLMCacheMixin
 from services.transaction_service import TransactionService
 from bot_files.capital_management import CapitalManagement, RiskMetrics, PositionSizeRecommendation
 from core.api_key_manager import get_bot_api_keys
@@ -577,7 +577,7 @@ class BinanceFuturesIntegration:
             logger.warning(f"⚠️ Failed to sync server time: {e}")
             self._time_offset = 0
 
-class BinanceFuturesBot(CustomBot):
+class BinanceFuturesBot(LLMCacheMixin, CustomBot):
     """Advanced Binance Futures Trading Bot with LLM Integration and Stop Loss"""
     
     def __init__(self, config: Dict[str, Any], api_keys: Dict[str, str] = None, user_principal_id: str = None, subscription_id: int = None):
@@ -610,19 +610,6 @@ class BinanceFuturesBot(CustomBot):
         self.timeframes = config.get('timeframes', ['30m', '1h', '4h'])  # Optimized 3 timeframes
         self.primary_timeframe = config.get('primary_timeframe', self.timeframes[0])  # First timeframe as primary
         
-        # 🔒 Redis client for distributed locking and caching
-        self.redis_client = None
-        try:
-            import os
-            redis_url = os.getenv('REDIS_URL', 'redis://redis_db:6379/0')
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
-            # Test connection
-            self.redis_client.ping()
-            logger.info("✅ Redis connection established for LLM locking")
-        except Exception as e:
-            logger.warning(f"⚠️ Redis connection failed: {e}. LLM calls may duplicate across workers.")
-            self.redis_client = None
-        
         # Validate timeframes
         supported_timeframes = [
             '1m', '3m', '5m', '15m', '30m',  # Minutes
@@ -778,82 +765,6 @@ class BinanceFuturesBot(CustomBot):
         logger.info(f"Primary timeframe: {self.primary_timeframe}")
         logger.info(f"Analysis method: {'LLM (' + self.llm_model + ')' if self.use_llm_analysis else 'Technical Indicators'}")
     
-    def _get_llm_cache_key(self, symbol: str, timeframes: List[str]) -> str:
-        """Generate cache key for LLM analysis"""
-        # Create unique key based on symbol and current minute (cache for 1 minute)
-        current_minute = int(time.time() // 60)
-        key_data = f"{symbol}:{':'.join(sorted(timeframes))}:{current_minute}"
-        return f"llm_analysis:{hashlib.md5(key_data.encode()).hexdigest()}"
-    
-    def _get_llm_lock_key(self, symbol: str) -> str:
-        """Generate lock key for LLM analysis"""
-        return f"llm_lock:{symbol}"
-    
-    def _acquire_llm_lock(self, symbol: str, timeout: int = 300) -> bool:
-        """
-        Acquire distributed lock for LLM analysis to prevent duplicate calls
-        Returns True if lock acquired, False if another worker is already processing
-        """
-        if not self.redis_client:
-            return True  # No Redis, proceed without locking
-            
-        lock_key = self._get_llm_lock_key(symbol)
-        worker_id = f"worker_{os.getpid()}_{int(time.time())}"
-        
-        try:
-            # Try to acquire lock with expiration
-            acquired = self.redis_client.set(lock_key, worker_id, nx=True, ex=timeout)
-            if acquired:
-                logger.info(f"🔒 LLM lock acquired by {worker_id} for {symbol}")
-                return True
-            else:
-                current_owner = self.redis_client.get(lock_key)
-                logger.info(f"⏳ LLM lock held by {current_owner} for {symbol}, skipping duplicate analysis")
-                return False
-        except Exception as e:
-            logger.warning(f"Failed to acquire LLM lock: {e}")
-            return True  # Proceed if Redis fails
-    
-    def _release_llm_lock(self, symbol: str):
-        """Release LLM analysis lock"""
-        if not self.redis_client:
-            return
-            
-        lock_key = self._get_llm_lock_key(symbol)
-        try:
-            self.redis_client.delete(lock_key)
-            logger.debug(f"🔓 LLM lock released for {symbol}")
-        except Exception as e:
-            logger.warning(f"Failed to release LLM lock: {e}")
-    
-    def _get_cached_llm_result(self, symbol: str, timeframes: List[str]) -> Optional[Dict[str, Any]]:
-        """Get cached LLM analysis result"""
-        if not self.redis_client:
-            return None
-            
-        cache_key = self._get_llm_cache_key(symbol, timeframes)
-        try:
-            cached_result = self.redis_client.get(cache_key)
-            if cached_result:
-                logger.info(f"📋 Using cached LLM analysis for {symbol}")
-                return json.loads(cached_result)
-        except Exception as e:
-            logger.warning(f"Failed to get cached LLM result: {e}")
-        return None
-    
-    def _cache_llm_result(self, symbol: str, timeframes: List[str], result: Dict[str, Any]):
-        """Cache LLM analysis result for 60 seconds"""
-        if not self.redis_client:
-            return
-            
-        cache_key = self._get_llm_cache_key(symbol, timeframes)
-        try:
-            # Cache for 60 seconds
-            self.redis_client.setex(cache_key, 60, json.dumps(result))
-            logger.debug(f"💾 Cached LLM analysis for {symbol}")
-        except Exception as e:
-            logger.warning(f"Failed to cache LLM result: {e}")
-
     def execute_algorithm(self, data: pd.DataFrame, timeframe: str, subscription_config: Dict[str, Any] = None) -> Action:
         """Execute futures trading algorithm"""
         try:
@@ -1121,8 +1032,7 @@ class BinanceFuturesBot(CustomBot):
                 # 🔒 Step 2: Try to acquire lock for LLM analysis
                 if not self._acquire_llm_lock(self.trading_pair):
                     # Another worker is processing, wait for cache or fallback
-                    time.sleep(2)  # Wait 2 seconds
-                    cached_result = self._get_cached_llm_result(self.trading_pair, self.timeframes)
+                    cached_result = self._wait_for_llm_result(self.trading_pair, self.timeframes)
                     if cached_result:
                         return Action(
                             action=cached_result.get('action', 'HOLD'),
@@ -1970,8 +1880,7 @@ class BinanceFuturesBot(CustomBot):
                 # 🔒 Step 2: Try to acquire lock for LLM analysis
                 if not self._acquire_llm_lock(self.trading_pair):
                     # Another worker is processing, wait for cache or fallback
-                    time.sleep(3)  # Wait 3 seconds for multi-timeframe
-                    cached_result = self._get_cached_llm_result(self.trading_pair, self.timeframes)
+                    cached_result = self._wait_for_llm_result(self.trading_pair, self.timeframes)
                     if cached_result:
                         return Action(
                             action=cached_result.get('action', 'HOLD'),
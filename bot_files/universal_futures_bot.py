@@ -21,10 +21,8 @@ import pandas as pd
 import numpy as np
 import logging
 import json
-import hashlib
 import time
 import asyncio
-import redis
 from datetime import datetime
 from dataclasses import dataclass
 
@@ -36,19 +34,21 @@ from services.exchange_integrations import (
     BaseFuturesExchange,
     FuturesOrderInfo,
     FuturesPosition,
-    create_futures_exchange
+    get_futures_client
 )
 
 # Services
 from services.llm_integration import create_llm_service
+from services.llm_cache import LLMCacheMixin
 from services.indicator_service import AdvancedIndicators
+from services.incremental_indicators import load_incremental_state
 from services.transaction_service import TransactionService
 from bot_files.capital_management import CapitalManagement, RiskMetrics, PositionSizeRecommendation
 from core.api_key_manager import get_bot_api_keys
 
 logger = logging.getLogger(__name__)
 
-class UniversalFuturesBot(CustomBot):
+class UniversalFuturesBot(LLMCacheMixin, CustomBot):
     """Universal Futures Trading Bot with Multi-Exchange Support"""
     
     SUPPORTED_EXCHANGES = ['BINANCE', 'BYBIT', 'OKX', 'BITGET', 'HUOBI', 'HTX', 'KRAKEN']
@@ -165,17 +165,6 @@ class UniversalFuturesBot(CustomBot):
         # Initialize Advanced Indicators service
         self.indicator_service = AdvancedIndicators()
         
-        # Redis for distributed locking
-        self.redis_client = None
-        try:
-            redis_url = os.getenv('REDIS_URL', 'redis://redis_db:6379/0')
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
-            self.redis_client.ping()
-            logger.info("✅ Redis connection established")
-        except Exception as e:
-            logger.warning(f"⚠️ Redis connection failed: {e}")
-            self.redis_client = None
-        
         # Initialize exchange client
         if not user_principal_id:
             raise ValueError("user_principal_id is required for database API key lookup")
@@ -197,9 +186,9 @@ class UniversalFuturesBot(CustomBot):
                 f"No {self.exchange_name} API credentials found in database for principal ID: {user_principal_id}"
             )
         
-        # Create exchange client using factory
+        # Pooled client: keeps its server time offset and precision cache across runs
         try:
-            self.futures_client = create_futures_exchange(
+            self.futures_client = get_futures_client(
                 exchange_name=self.exchange_name,
                 api_key=db_credentials['api_key'],
                 api_secret=db_credentials['api_secret'],
@@ -986,78 +975,6 @@ class UniversalFuturesBot(CustomBot):
             import traceback
             traceback.print_exc()
     
-    # ==================== LLM CACHING & LOCKING ====================
-    
-    def _get_llm_cache_key(self, symbol: str, timeframes: List[str]) -> str:
-        """Generate cache key for LLM analysis"""
-        current_minute = int(time.time() // 60)
-        key_data = f"{symbol}:{':'.join(sorted(timeframes))}:{current_minute}"
-        return f"llm_analysis:{hashlib.md5(key_data.encode()).hexdigest()}"
-    
-    def _get_llm_lock_key(self, symbol: str) -> str:
-        """Generate lock key for LLM analysis"""
-        return f"llm_lock:{symbol}"
-    
-    def _acquire_llm_lock(self, symbol: str, timeout: int = 300) -> bool:
-        """Acquire distributed lock for LLM analysis"""
-        if not self.redis_client:
-            return True
-        
-        lock_key = self._get_llm_lock_key(symbol)
-        worker_id = f"worker_{os.getpid()}_{int(time.time())}"
-        
-        try:
-            acquired = self.redis_client.set(lock_key, worker_id, nx=True, ex=timeout)
-            if acquired:
-                logger.info(f"🔒 LLM lock acquired by {worker_id}")
-                return True
-            else:
-                current_owner = self.redis_client.get(lock_key)
-                logger.info(f"⏳ LLM lock held by {current_owner}, skipping")
-                return False
-        except Exception as e:
-            logger.warning(f"Failed to acquire LLM lock: {e}")
-            return True
-    
-    def _release_llm_lock(self, symbol: str):
-        """Release LLM analysis lock"""
-        if not self.redis_client:
-            return
-        
-        lock_key = self._get_llm_lock_key(symbol)
-        try:
-            self.redis_client.delete(lock_key)
-            logger.debug(f"🔓 LLM lock released")
-        except Exception as e:
-            logger.warning(f"Failed to release LLM lock: {e}")
-    
-    def _get_cached_llm_result(self, symbol: str, timeframes: List[str]) -> Optional[Dict[str, Any]]:
-        """Get cached LLM analysis result"""
-        if not self.redis_client:
-            return None
-        
-        cache_key = self._get_llm_cache_key(symbol, timeframes)
-        try:
-            cached_result = self.redis_client.get(cache_key)
-            if cached_result:
-                logger.info(f"📋 Using cached LLM analysis")
-                return json.loads(cached_result)
-        except Exception as e:
-            logger.warning(f"Failed to get cached LLM result: {e}")
-        return None
-    
-    def _cache_llm_result(self, symbol: str, timeframes: List[str], result: Dict[str, Any]):
-        """Cache LLM analysis result for 60 seconds"""
-        if not self.redis_client:
-            return
-        
-        cache_key = self._get_llm_cache_key(symbol, timeframes)
-        try:
-            self.redis_client.setex(cache_key, 60, json.dumps(result))
-            logger.debug(f"💾 Cached LLM analysis")
-        except Exception as e:
-            logger.warning(f"Failed to cache LLM result: {e}")
-    
     # ==================== DATA CRAWLING ====================
     
     def crawl_data(self, subscription_config: dict = None) -> Dict[str, Any]:
@@ -1227,7 +1144,8 @@ class UniversalFuturesBot(CustomBot):
                 "timeframes": timeframes_data,
                 "crawl_timestamp": datetime.now().isoformat(),
                 "total_timeframes": len(timeframes_data),
-                "exchange": self.exchange_name
+                "exchange": self.exchange_name,
+                "symbol": actual_trading_pair
             }
             
         except Exception as e:
@@ -1242,16 +1160,28 @@ class UniversalFuturesBot(CustomBot):
     
     # ==================== ANALYSIS ====================
     
-    def _calculate_futures_analysis(self, data: pd.DataFrame, historical_data: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def _calculate_futures_analysis(self, data: pd.DataFrame, historical_data: List[Dict[str, Any]] = None,
+                                    symbol: str = None, timeframe: str = None) -> Dict[str, Any]:
         """
         Calculate technical analysis for futures trading
         Uses AdvancedIndicators service if indicators_config is available
+        
+        When symbol and timeframe are known, streaming indicator state is restored
+        from Redis and only the newly closed candles are applied
         """
         try:
             # Use AdvancedIndicators service if config is available
             if self.indicators_config and self.indicator_service:
                 logger.info("📊 Using configured indicators from AdvancedIndicators service")
-                analysis = self.indicator_service.calculate_selected_indicators(data, self.indicators_config)
+                state = None
+                if symbol and timeframe:
+                    try:
+                        state = load_incremental_state(
+                            self.exchange_name, self.testnet, symbol, timeframe, self.indicators_config, data
+                        )
+                    except Exception as state_err:
+                        logger.warning(f"⚠️ Incremental indicator state unavailable, full recompute: {state_err}")
+                analysis = self.indicator_service.calculate_selected_indicators(data, self.indicators_config, state=state)
                 
                 # Add historical data if provided
                 if historical_data:
@@ -1340,7 +1270,11 @@ class UniversalFuturesBot(CustomBot):
                     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
                     df = df.set_index('timestamp')
                     
-                    timeframe_analysis = self._calculate_futures_analysis(df, historical_data)
+                    timeframe_analysis = self._calculate_futures_analysis(
+                        df, historical_data,
+                        symbol=multi_timeframe_data.get("symbol"),
+                        timeframe=timeframe
+                    )
                     multi_analysis[timeframe] = timeframe_analysis
                     
                     logger.info(f"Analyzed {timeframe}: Price {timeframe_analysis.get('current_price', 0):.2f}")
@@ -1598,8 +1532,7 @@ class UniversalFuturesBot(CustomBot):
                 
                 # Try to acquire lock
                 if not self._acquire_llm_lock(self.trading_pair):
-                    time.sleep(3)
-                    cached_result = self._get_cached_llm_result(self.trading_pair, self.timeframes)
+                    cached_result = self._wait_for_llm_result(self.trading_pair, self.timeframes)
                     if cached_result:
                         return Action(
                             action=cached_result.get('action', 'HOLD'),
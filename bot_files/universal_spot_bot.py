@@ -21,10 +21,8 @@ import pandas as pd
 import numpy as np
 import logging
 import json
-import hashlib
 import time
 import asyncio
-import redis
 from datetime import datetime
 from dataclasses import dataclass
 
@@ -40,13 +38,14 @@ from services.exchange_integrations import (
 
 # Services
 from services.llm_integration import create_llm_service
+from services.llm_cache import LLMCacheMixin
 from services.transaction_service import TransactionService
 from bot_files.capital_management import CapitalManagement, RiskMetrics, PositionSizeRecommendation
 from core.api_key_manager import get_bot_api_keys
 
 logger = logging.getLogger(__name__)
 
-class UniversalSpotBot(CustomBot):
+class UniversalSpotBot(LLMCacheMixin, CustomBot):
     """Universal Spot Trading Bot with Multi-Exchange Support"""
     
     SUPPORTED_EXCHANGES = ['BINANCE', 'BYBIT', 'OKX', 'BITGET', 'HUOBI', 'HTX', 'KRAKEN']
@@ -165,17 +164,6 @@ class UniversalSpotBot(CustomBot):
         self.rsi_oversold = config.get('rsi_oversold', 30)
         self.rsi_overbought = config.get('rsi_overbought', 70)
         
-        # Redis for distributed locking
-        self.redis_client = None
-        try:
-            redis_url = os.getenv('REDIS_URL', 'redis://redis_db:6379/0')
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
-            self.redis_client.ping()
-            logger.info("✅ Redis connection established")
-        except Exception as e:
-            logger.warning(f"⚠️ Redis connection failed: {e}")
-            self.redis_client = None
-        
         # Initialize exchange client
         if not user_principal_id:
             raise ValueError("user_principal_id is required for database API key lookup")
@@ -414,78 +402,6 @@ class UniversalSpotBot(CustomBot):
             traceback.print_exc()
             return None
     
-    # ==================== LLM CACHING & LOCKING ====================
-    
-    def _get_llm_cache_key(self, symbol: str, timeframes: List[str]) -> str:
-        """Generate cache key for LLM analysis"""
-        current_minute = int(time.time() // 60)
-        key_data = f"{symbol}:{':'.join(sorted(timeframes))}:{current_minute}"
-        return f"llm_analysis:{hashlib.md5(key_data.encode()).hexdigest()}"
-    
-    def _get_llm_lock_key(self, symbol: str) -> str:
-        """Generate lock key for LLM analysis"""
-        return f"llm_lock:{symbol}"
-    
-    def _acquire_llm_lock(self, symbol: str, timeout: int = 300) -> bool:
-        """Acquire distributed lock for LLM analysis"""
-        if not self.redis_client:
-            return True
-        
-        lock_key = self._get_llm_lock_key(symbol)
-        worker_id = f"worker_{os.getpid()}_{int(time.time())}"
-        
-        try:
-            acquired = self.redis_client.set(lock_key, worker_id, nx=True, ex=timeout)
-            if acquired:
-                logger.info(f"🔒 LLM lock acquired by {worker_id}")
-                return True
-            else:
-                current_owner = self.redis_client.get(lock_key)
-                logger.info(f"⏳ LLM lock held by {current_owner}, skipping")
-                return False
-        except Exception as e:
-            logger.warning(f"Failed to acquire LLM lock: {e}")
-            return True
-    
-    def _release_llm_lock(self, symbol: str):
-        """Release LLM analysis lock"""
-        if not self.redis_client:
-            return
-        
-        lock_key = self._get_llm_lock_key(symbol)
-        try:
-            self.redis_client.delete(lock_key)
-            logger.debug(f"🔓 LLM lock released")
-        except Exception as e:
-            logger.warning(f"Failed to release LLM lock: {e}")
-    
-    def _get_cached_llm_result(self, symbol: str, timeframes: List[str]) -> Optional[Dict[str, Any]]:
-        """Get cached LLM analysis result"""
-        if not self.redis_client:
-            return None
-        
-        cache_key = self._get_llm_cache_key(symbol, timeframes)
-        try:
-            cached_result = self.redis_client.get(cache_key)
-            if cached_result:
-                logger.info(f"📋 Using cached LLM analysis")
-                return json.loads(cached_result)
-        except Exception as e:
-            logger.warning(f"Failed to get cached LLM result: {e}")
-        return None
-    
-    def _cache_llm_result(self, symbol: str, timeframes: List[str], result: Dict[str, Any]):
-        """Cache LLM analysis result for 60 seconds"""
-        if not self.redis_client:
-            return
-        
-        cache_key = self._get_llm_cache_key(symbol, timeframes)
-        try:
-            self.redis_client.setex(cache_key, 60, json.dumps(result))
-            logger.debug(f"💾 Cached LLM analysis")
-        except Exception as e:
-            logger.warning(f"Failed to cache LLM result: {e}")
-    
     # ==================== DATA CRAWLING ====================
     
     def crawl_data(self, subscription_config: dict = None) -> Dict[str, Any]:
@@ -770,78 +686,6 @@ class UniversalSpotBot(CustomBot):
             logger.error(f"Error analyzing multi-timeframe data: {e}")
             return {'error': f'Multi-timeframe analysis error: {e}'}
     
-    # ==================== LLM CACHING & LOCKING ====================
-    
-    def _get_llm_cache_key(self, symbol: str, timeframes: List[str]) -> str:
-        """Generate cache key for LLM analysis"""
-        current_minute = int(time.time() // 60)
-        key_data = f"{symbol}:{':'.join(sorted(timeframes))}:{current_minute}"
-        return f"llm_analysis:{hashlib.md5(key_data.encode()).hexdigest()}"
-    
-    def _get_llm_lock_key(self, symbol: str) -> str:
-        """Generate lock key for LLM analysis"""
-        return f"llm_lock:{symbol}"
-    
-    def _acquire_llm_lock(self, symbol: str, timeout: int = 300) -> bool:
-        """Acquire distributed lock for LLM analysis"""
-        if not self.redis_client:
-            return True
-        
-        lock_key = self._get_llm_lock_key(symbol)
-        worker_id = f"worker_{os.getpid()}_{int(time.time())}"
-        
-        try:
-            acquired = self.redis_client.set(lock_key, worker_id, nx=True, ex=timeout)
-            if acquired:
-                logger.info(f"🔒 LLM lock acquired by {worker_id}")
-                return True
-            else:
-                current_owner = self.redis_client.get(lock_key)
-                logger.info(f"⏳ LLM lock held by {current_owner}, skipping")
-                return False
-        except Exception as e:
-            logger.warning(f"Failed to acquire LLM lock: {e}")
-            return True
-    
-    def _release_llm_lock(self, symbol: str):
-        """Release LLM analysis lock"""
-        if not self.redis_client:
-            return
-        
-        lock_key = self._get_llm_lock_key(symbol)
-        try:
-            self.redis_client.delete(lock_key)
-            logger.debug(f"🔓 LLM lock released")
-        except Exception as e:
-            logger.warning(f"Failed to release LLM lock: {e}")
-    
-    def _get_cached_llm_result(self, symbol: str, timeframes: List[str]) -> Optional[Dict[str, Any]]:
-        """Get cached LLM analysis result"""
-        if not self.redis_client:
-            return None
-        
-        cache_key = self._get_llm_cache_key(symbol, timeframes)
-        try:
-            cached_result = self.redis_client.get(cache_key)
-            if cached_result:
-                logger.info(f"📋 Using cached LLM analysis")
-                return json.loads(cached_result)
-        except Exception as e:
-            logger.warning(f"Failed to get cached LLM result: {e}")
-        return None
-    
-    def _cache_llm_result(self, symbol: str, timeframes: List[str], result: Dict[str, Any]):
-        """Cache LLM analysis result for 60 seconds"""
-        if not self.redis_client:
-            return
-        
-        cache_key = self._get_llm_cache_key(symbol, timeframes)
-        try:
-            self.redis_client.setex(cache_key, 60, json.dumps(result))
-            logger.debug(f"💾 Cached LLM analysis")
-        except Exception as e:
-            logger.warning(f"Failed to cache LLM result: {e}")
-    
     # ==================== SIGNAL GENERATION ====================
     
     def _generate_technical_signal(self, analysis: Dict[str, Any], data: pd.DataFrame) -> Action:
@@ -1065,8 +909,7 @@ class UniversalSpotBot(CustomBot):
                 logger.info(f"🔐 Attempting to acquire LLM lock for {self.trading_pair}...")
                 if not self._acquire_llm_lock(self.trading_pair):
                     logger.info(f"⏸️  Lock not acquired, waiting 3s for cache...")
-                    time.sleep(3)
-                    cached_result = self._get_cached_llm_result(self.trading_pair, self.timeframes)
+                    cached_result = self._wait_for_llm_result(self.trading_pair, self.timeframes)
                     if cached_result:
                         logger.info(f"✅ Found cached result after wait")
                         return Action(
@@ -18,6 +18,7 @@ load_dotenv()
 
 from core import models, crud
 from core.database import get_db
+from core.credential_cache import credential_cache, invalidate_credentials, PRINCIPAL, DEVELOPER
 
 logger = logging.getLogger(__name__)
 
@@ -234,6 +235,7 @@ class APIKeyManager:
                 db.commit()
                 logger.info(f"Created new {exchange} credentials for user {user_id}")
             
+            invalidate_credentials(DEVELOPER, user_id)
             return True
             
         except Exception as e:
@@ -377,6 +379,7 @@ class APIKeyManager:
                 db.commit()
                 logger.info(f"Created new {exchange} {cred_type_upper} credentials for principal ID: {principal_id}")
             
+            invalidate_credentials(PRINCIPAL, principal_id)
             return True
             
         except Exception as e:
@@ -400,7 +403,16 @@ def get_bot_api_keys(user_principal_id: str, exchange: str = "BINANCE",
         
     Returns:
         Dict with api_key and api_secret for bot initialization
+
+    Decrypted results are cached per worker (core.credential_cache), so
+    repeated bot ticks skip the subscription/credentials queries and the
+    decryption until the TTL expires or the credentials row changes.
     """
+    cache_key = (user_principal_id, exchange, is_testnet, subscription_id)
+    cached = credential_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         # Get database session
         db = next(get_db())
@@ -488,12 +500,14 @@ def get_bot_api_keys(user_principal_id: str, exchange: str = "BINANCE",
                     if exchange == 'BITGET':
                         actual_testnet = False  # Bitget always uses mainnet
                     
-                    return {
+                    result = {
                         'api_key': decrypted_key,
                         'api_secret': decrypted_secret,
                         'passphrase': passphrase,
                         'testnet': actual_testnet
                     }
+                    credential_cache.set(cache_key, (DEVELOPER, developer_id), result)
+                    return result
                 else:
                     logger.warning(f"No developer credentials found for developer {developer_id}, exchange: {exchange}, network: {'TESTNET' if is_testnet else 'MAINNET'}")
                     # Let's also check what credentials exist for this developer
@@ -511,12 +525,14 @@ def get_bot_api_keys(user_principal_id: str, exchange: str = "BINANCE",
         )
         
         if credentials:
-            return {
+            result = {
                 'api_key': credentials['api_key'],
                 'api_secret': credentials['api_secret'],
                 'passphrase': credentials.get('passphrase', ''),  # Include passphrase for OKX, Bitget
                 'testnet': credentials['is_testnet']
             }
+            credential_cache.set(cache_key, (PRINCIPAL, user_principal_id), result)
+            return result
         
         logger.warning(f"No credentials found for principal ID: {user_principal_id}")
         return None
@@ -6,7 +6,6 @@ This module handles bot loading, validation, and execution management.
 
 import os
 import sys
-import importlib.util
 import inspect
 import ast
 import json
@@ -15,7 +14,7 @@ import shutil
 import pickle
 import joblib
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Callable
 from datetime import datetime
 import logging
 
@@ -25,6 +24,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from bots.bot_sdk import CustomBot, Action
 from core import models, schemas
 from core.database import SessionLocal
+from core.bot_module_cache import get_bot_module_cache
 from services.s3_manager import get_s3_manager
 
 logger = logging.getLogger(__name__)
@@ -163,8 +163,32 @@ class BotManager:
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
         self.loaded_bots: Dict[int, CustomBot] = {}
+        # loaded_bots key -> (resolver returning the current module, module the instance was built from)
+        self._bot_sources: Dict[Any, Tuple[Callable[[], Any], Any]] = {}
         self.model_manager = MLModelManager()
         self.s3_manager = get_s3_manager()
+    
+    def _cached_bot(self, cache_key) -> Optional[CustomBot]:
+        """Cached instance, dropped when its code changed since it was built"""
+        if cache_key not in self.loaded_bots:
+            return None
+        source = self._bot_sources.get(cache_key)
+        if source:
+            try:
+                current = source[0]()
+            except Exception as e:
+                logger.warning(f"Could not check code of cached bot {cache_key}: {e}")
+                current = None
+            if current is not source[1]:
+                logger.info(f"Bot {cache_key} code changed, reloading")
+                self.loaded_bots.pop(cache_key, None)
+                self._bot_sources.pop(cache_key, None)
+                return None
+        return self.loaded_bots[cache_key]
+    
+    def _cache_bot(self, cache_key, bot_instance: CustomBot, resolver: Callable[[], Any], module):
+        self.loaded_bots[cache_key] = bot_instance
+        self._bot_sources[cache_key] = (resolver, module)
         
     def validate_bot_code(self, code_content: str) -> Dict[str, Any]:
         """
@@ -480,9 +504,10 @@ class BotManager:
             Loaded bot instance or None if failed
         """
         try:
-            # Check if already loaded
-            if bot_id in self.loaded_bots:
-                return self.loaded_bots[bot_id]
+            # Check if already loaded (and unchanged)
+            cached_bot = self._cached_bot(bot_id)
+            if cached_bot:
+                return cached_bot
             
             # Get bot info from database
             db = SessionLocal()
@@ -496,10 +521,10 @@ class BotManager:
                     logger.error(f"Bot file not found: {bot_record.code_path}")
                     return None
                 
-                # Import module
-                spec = importlib.util.spec_from_file_location(f"bot_{bot_id}", bot_record.code_path)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
+                # Import module (compiled once per code version)
+                code_path = bot_record.code_path
+                resolve_module = lambda: get_bot_module_cache().load_file(bot_id, code_path)
+                module = resolve_module()
                 
                 # Find bot class
                 bot_class = None
@@ -517,7 +542,7 @@ class BotManager:
                 bot_instance = bot_class(bot_config, {})
                 
                 # Cache the bot
-                self.loaded_bots[bot_id] = bot_instance
+                self._cache_bot(bot_id, bot_instance, resolve_module, module)
                 
                 return bot_instance
                 
@@ -531,9 +556,10 @@ class BotManager:
     def load_bot_with_models(self, bot_id: int, user_config: Dict[str, Any] = None, user_api_keys: Dict[str, str] = None) -> Optional[CustomBot]:
         """Load bot with ML models if needed"""
         try:
-            # Check if already loaded
-            if bot_id in self.loaded_bots:
-                return self.loaded_bots[bot_id]
+            # Check if already loaded (and unchanged)
+            cached_bot = self._cached_bot(bot_id)
+            if cached_bot:
+                return cached_bot
             
             # Get bot info from database
             db = SessionLocal()
@@ -553,10 +579,10 @@ class BotManager:
                     logger.error(f"Bot code file not found for bot {bot_id}")
                     return None
                 
-                # Import bot module
-                spec = importlib.util.spec_from_file_location(f"bot_{bot_id}", code_file.file_path)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
+                # Import bot module (compiled once per code version)
+                code_path = code_file.file_path
+                resolve_module = lambda: get_bot_module_cache().load_file(bot_id, code_path)
+                module = resolve_module()
                 
                 # Find bot class
                 bot_class = None
@@ -598,7 +624,7 @@ class BotManager:
                 bot_instance = bot_class(bot_config, api_keys)
                 
                 # Cache the bot
-                self.loaded_bots[bot_id] = bot_instance
+                self._cache_bot(bot_id, bot_instance, resolve_module, module)
                 
                 return bot_instance
                 
@@ -610,9 +636,11 @@ class BotManager:
             return None
     
     def unload_bot(self, bot_id: int):
-        """Unload a bot from memory"""
-        if bot_id in self.loaded_bots:
-            del self.loaded_bots[bot_id]
+        """Unload a bot (every cached version) and its compiled code from memory"""
+        for cache_key in [key for key in self.loaded_bots if key == bot_id or str(key).startswith(f"{bot_id}_")]:
+            del self.loaded_bots[cache_key]
+            self._bot_sources.pop(cache_key, None)
+        get_bot_module_cache().evict_bot(bot_id)
     
     def test_bot(self, bot_id: int, test_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -893,8 +921,7 @@ class BotManager:
                 os.remove(file_record.file_path)
             
             # Remove from cache if loaded
-            if file_record.bot_id in self.loaded_bots:
-                del self.loaded_bots[file_record.bot_id]
+            self.unload_bot(file_record.bot_id)
             
             if file_record.bot_id in self.model_manager.loaded_models:
                 del self.model_manager.loaded_models[file_record.bot_id]
@@ -945,58 +972,45 @@ class BotManager:
                         user_api_keys: Dict[str, str] = None) -> Optional[CustomBot]:
         """Load bot from S3 with all dependencies"""
         try:
-            # Check if already loaded
+            # Check if already loaded (and unchanged in S3)
             cache_key = f"{bot_id}_{version or 'latest'}"
-            if cache_key in self.loaded_bots:
-                return self.loaded_bots[cache_key]
+            cached_bot = self._cached_bot(cache_key)
+            if cached_bot:
+                return cached_bot
             
-            # Download bot code from S3
-            code_content = self.s3_manager.download_bot_code(bot_id, version)
+            # Bot code from S3, downloaded and compiled once per code version
+            resolve_module = lambda: get_bot_module_cache().load_s3(self.s3_manager, bot_id, "code", version)
+            module = resolve_module()
             
-            # Create temporary file
-            temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False)
-            temp_file.write(code_content)
-            temp_file.close()
+            # Find bot class
+            bot_class = None
+            for name, obj in inspect.getmembers(module, inspect.isclass):
+                if issubclass(obj, CustomBot) and obj != CustomBot:
+                    bot_class = obj
+                    break
+            
+            if not bot_class:
+                logger.error(f"No CustomBot subclass found for bot {bot_id}")
+                return None
+            
+            # Prepare configuration
+            config = user_config or {}
+            
+            # Load ML models from S3 if needed
+            models_dict = self.load_models_from_s3(bot_id, version)
+            if models_dict:
+                config['models'] = models_dict
+            
+            # Create bot instance
+            api_keys = user_api_keys or {}
+            bot_instance = bot_class(config, api_keys)
+            
+            # Cache the bot
+            self._cache_bot(cache_key, bot_instance, resolve_module, module)
+            
+            logger.info(f"Bot {bot_id} loaded from S3 successfully")
+            return bot_instance
             
-            try:
-                # Import bot module
-                spec = importlib.util.spec_from_file_location(f"bot_{bot_id}", temp_file.name)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                # Find bot class
-                bot_class = None
-                for name, obj in inspect.getmembers(module, inspect.isclass):
-                    if issubclass(obj, CustomBot) and obj != CustomBot:
-                        bot_class = obj
-                        break
-                
-                if not bot_class:
-                    logger.error(f"No CustomBot subclass found for bot {bot_id}")
-                    return None
-                
-                # Prepare configuration
-                config = user_config or {}
-                
-                # Load ML models from S3 if needed
-                models_dict = self.load_models_from_s3(bot_id, version)
-                if models_dict:
-                    config['models'] = models_dict
-                
-                # Create bot instance
-                api_keys = user_api_keys or {}
-                bot_instance = bot_class(config, api_keys)
-                
-                # Cache the bot
-                self.loaded_bots[cache_key] = bot_instance
-                
-                logger.info(f"Bot {bot_id} loaded from S3 successfully")
-                return bot_instance
-                
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_file.name)
-                
         except Exception as e:
             logger.error(f"Error loading bot from S3: {e}")
             return None
@@ -0,0 +1,219 @@
+"""
+Bot Module Cache
+Compiled bot code shared by every bot run on a worker, keyed by
+(bot_id, version, content hash)
+
+Bot code used to be downloaded and exec'd (or re-imported from disk) on every
+run. Each distinct code version is now compiled and executed once per worker
+process; later runs reuse the module and only instantiate the bot class.
+
+New versions are detected cheaply: local files by (mtime, size), S3 code by
+the ETag of the latest version's object from a single listing, itself reused
+for BOT_MODULE_RECHECK_SECONDS. A changed fingerprint only costs a download
+when the content hash turns out to be already cached.
+
+Modules are evicted least recently used beyond BOT_MODULE_CACHE_MAX_MODULES
+or once their estimated size (source + bytecode) exceeds
+BOT_MODULE_CACHE_MAX_BYTES.
+"""
+
+import os
+import sys
+import time
+import types
+import marshal
+import hashlib
+import logging
+import linecache
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+BOT_MODULE_CACHE_MAX_MODULES = int(os.getenv('BOT_MODULE_CACHE_MAX_MODULES', 128))
+BOT_MODULE_CACHE_MAX_BYTES = int(os.getenv('BOT_MODULE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+BOT_MODULE_RECHECK_SECONDS = float(os.getenv('BOT_MODULE_RECHECK_SECONDS', 30))
+
+ModuleKey = Tuple[int, str, str]  # (bot_id, version, content sha256)
+
+
+class BotModuleCache:
+    """LRU of executed bot modules with fingerprint -> content hash lookups"""
+
+    def __init__(self, max_modules: int = BOT_MODULE_CACHE_MAX_MODULES,
+                 max_bytes: int = BOT_MODULE_CACHE_MAX_BYTES,
+                 recheck_seconds: float = BOT_MODULE_RECHECK_SECONDS):
+        self.max_modules = max_modules
+        self.max_bytes = max_bytes
+        self.recheck_seconds = recheck_seconds
+        self._modules: "OrderedDict[ModuleKey, Tuple[types.ModuleType, int]]" = OrderedDict()
+        self._fingerprints: Dict[Tuple[int, str, str], str] = {}
+        self._s3_heads: Dict[Tuple[int, str, Optional[str]], Tuple[float, Dict[str, Any]]] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._load_locks: Dict[int, threading.Lock] = {}
+        self.stats = {'hits': 0, 'compiles': 0, 'downloads': 0, 'evictions': 0}
+
+    def get_module(self, bot_id: int, version: str, fingerprint: str,
+                   fetch_source: Callable[[], str]) -> types.ModuleType:
+        """
+        Module for one code version, compiled on first use
+
+        fingerprint identifies the stored object (ETag, mtime/size); fetch_source
+        is only called when the fingerprint has not been seen yet.
+        """
+        module = self._lookup(bot_id, version, fingerprint)
+        if module is not None:
+            return module
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(bot_id, threading.Lock())
+        with load_lock:  # One download/compile per bot at a time
+            module = self._lookup(bot_id, version, fingerprint)
+            if module is not None:
+                return module
+
+            source = fetch_source()
+            self.stats['downloads'] += 1
+            content_hash = hashlib.sha256(source.encode('utf-8')).hexdigest()
+            key = (bot_id, version, content_hash)
+            with self._lock:
+                self._fingerprints[(bot_id, version, fingerprint)] = content_hash
+                entry = self._modules.get(key)
+                if entry:
+                    self._modules.move_to_end(key)
+                    return entry[0]
+
+            module, size = self._compile(key, source)
+            with self._lock:
+                self._modules[key] = (module, size)
+                self._bytes += size
+                self._evict()
+            return module
+
+    def _lookup(self, bot_id: int, version: str, fingerprint: str) -> Optional[types.ModuleType]:
+        with self._lock:
+            content_hash = self._fingerprints.get((bot_id, version, fingerprint))
+            entry = self._modules.get((bot_id, version, content_hash)) if content_hash else None
+            if entry is None:
+                return None
+            self._modules.move_to_end((bot_id, version, content_hash))
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def _compile(self, key: ModuleKey, source: str) -> Tuple[types.ModuleType, int]:
+        bot_id, version, content_hash = key
+        module_name = f"bot_module_{bot_id}_{content_hash[:12]}"
+        filename = f"<bot {bot_id} {version} {content_hash[:12]}>"
+
+        started = time.time()
+        code = compile(source, filename, 'exec')
+        # Keep source lines available to tracebacks (there is no file on disk)
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+        module = types.ModuleType(module_name)
+        module.__file__ = filename
+        sys.modules[module_name] = module
+        try:
+            exec(code, module.__dict__)
+        except Exception:
+            sys.modules.pop(module_name, None)
+            linecache.cache.pop(filename, None)
+            raise
+        self.stats['compiles'] += 1
+        logger.info(f"🧩 Compiled bot {bot_id} ({version}, {content_hash[:12]}) in {(time.time() - started) * 1000:.0f}ms")
+        return module, len(source) + len(marshal.dumps(code))
+
+    def _evict(self):
+        # The most recent module always stays, even if it alone exceeds max_bytes
+        while len(self._modules) > 1 and (len(self._modules) > self.max_modules or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._modules)))
+            self.stats['evictions'] += 1
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    def load_file(self, bot_id: int, path: str, preamble: Optional[Callable[[], str]] = None) -> types.ModuleType:
+        """Module of a local bot file, recompiled only when the file changes"""
+        stat = os.stat(path)
+
+        def fetch_source() -> str:
+            with open(path, 'r', encoding='utf-8') as f:
+                source = f.read()
+            return f"{preamble()}\n{source}" if preamble else source
+
+        return self.get_module(bot_id, f"file:{path}", f"{stat.st_mtime_ns}:{stat.st_size}", fetch_source)
+
+    def load_s3(self, s3_manager, bot_id: int, file_type: str = "code", version: Optional[str] = None,
+                preamble: Optional[Callable[[], str]] = None) -> types.ModuleType:
+        """
+        Module of the bot's S3 code (latest version unless given)
+
+        The version/ETag listing is reused for recheck_seconds, so warm runs
+        make no S3 request at all.
+        """
+        head_key = (bot_id, file_type, version)
+        with self._lock:
+            cached = self._s3_heads.get(head_key)
+        if cached and cached[0] > time.time():
+            head = cached[1]
+        else:
+            head = s3_manager.get_code_object_info(bot_id, file_type, version)
+            with self._lock:
+                self._s3_heads[head_key] = (time.time() + self.recheck_seconds, head)
+
+        def fetch_source() -> str:
+            source = s3_manager.download_bot_code(bot_id, head['version'], filename=head['filename'], file_type=file_type)
+            return f"{preamble()}\n{source}" if preamble else source
+
+        return self.get_module(bot_id, head['version'], head['etag'] or head['key'], fetch_source)
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def evict_bot(self, bot_id: int):
+        """Drop every cached module and S3 listing of a bot"""
+        with self._lock:
+            for key in [key for key in self._modules if key[0] == bot_id]:
+                self._remove(key)
+            for key in [key for key in self._fingerprints if key[0] == bot_id]:
+                del self._fingerprints[key]
+            for key in [key for key in self._s3_heads if key[0] == bot_id]:
+                del self._s3_heads[key]
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._modules):
+                self._remove(key)
+            self._fingerprints.clear()
+            self._s3_heads.clear()
+
+    def _remove(self, key: ModuleKey):
+        module, size = self._modules.pop(key)
+        self._bytes -= size
+        for fingerprint in [fp for fp, content_hash in self._fingerprints.items()
+                            if fp[0] == key[0] and content_hash == key[2]]:
+            del self._fingerprints[fingerprint]
+        sys.modules.pop(module.__name__, None)
+        linecache.cache.pop(module.__file__, None)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'modules': len(self._modules), 'bytes': self._bytes, **self.stats}
+
+
+_cache: Optional[BotModuleCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_bot_module_cache() -> BotModuleCache:
+    """Process-wide bot module cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = BotModuleCache()
+    return _cache
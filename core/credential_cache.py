@@ -0,0 +1,127 @@
+"""
+Per-worker cache of decrypted exchange credentials
+Kept in process memory only (never written to Redis), expires after
+CREDENTIAL_CACHE_TTL seconds and is invalidated across workers through a
+Redis pub/sub channel whenever a credentials row changes
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+CREDENTIAL_CACHE_TTL = float(os.getenv('CREDENTIAL_CACHE_TTL', 300))
+INVALIDATION_CHANNEL = 'credentials:invalidate'
+
+# Credential owners: user credentials by ICP principal, developer credentials by user id
+PRINCIPAL = 'principal'
+DEVELOPER = 'developer'
+
+
+class CredentialCache:
+    """TTL cache of decrypted credentials tagged with the owner they were read from"""
+
+    def __init__(self, ttl: float = CREDENTIAL_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Tuple[str, str], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._listener_pid = None
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        self._ensure_listener()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.stats['hits'] += 1
+                return dict(entry[2])
+            if entry:
+                del self._entries[key]
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key: Hashable, owner: Tuple[str, Any], credentials: Dict[str, Any]):
+        """Cache credentials read from `owner` = (PRINCIPAL|DEVELOPER, id)"""
+        if self.ttl <= 0 or not credentials:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, (owner[0], str(owner[1])), dict(credentials))
+
+    def invalidate_local(self, kind: str, owner_id: Any) -> int:
+        """Drop every entry read from this owner's credentials in this process"""
+        owner = (kind, str(owner_id))
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[1] == owner]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidations'] += len(stale)
+        return len(stale)
+
+    def invalidate(self, kind: str, owner_id: Any):
+        """Invalidate locally and tell every other worker through Redis"""
+        self.invalidate_local(kind, owner_id)
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        try:
+            redis_client.publish(INVALIDATION_CHANNEL, json.dumps({'kind': kind, 'owner': str(owner_id)}))
+        except Exception as e:
+            logger.warning(f"Failed to publish credential invalidation: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _ensure_listener(self):
+        # One subscriber thread per process, restarted after fork
+        if self._listener_pid == os.getpid() and self._listener and self._listener.is_alive():
+            return
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid() and self._listener and self._listener.is_alive():
+                return
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, args=(redis_client,),
+                                              name='credential-invalidation', daemon=True)
+            self._listener.start()
+
+    def _listen(self, redis_client):
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything cached before the subscription may have missed a message
+                self.clear()
+                while True:
+                    # Polling keeps the shared client's socket_timeout from breaking a blocking listen()
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message or message.get('type') != 'message':
+                        continue
+                    try:
+                        payload = json.loads(message['data'])
+                        self.invalidate_local(payload['kind'], payload['owner'])
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(f"Ignoring malformed credential invalidation: {message.get('data')}")
+            except Exception as e:
+                logger.warning(f"Credential invalidation listener error: {e}, resubscribing")
+                self.clear()
+                time.sleep(5)
+
+
+credential_cache = CredentialCache()
+
+
+def invalidate_credentials(kind: str, owner_id: Any):
+    """Invalidate cached credentials of a principal (PRINCIPAL) or developer user (DEVELOPER)"""
+    if owner_id is None:
+        return
+    credential_cache.invalidate(kind, owner_id)
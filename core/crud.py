@@ -19,6 +19,7 @@ logger = logging.getLogger(__name__)
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core import models, schemas, security
+from core.credential_cache import invalidate_credentials, DEVELOPER
 
 # Lazy initialization - only create when needed
 _s3_manager = None
@@ -320,8 +321,93 @@ def get_approved_bots(db: Session, skip: int = 0, limit: int = 100):
         models.Bot.status == models.BotStatus.APPROVED
     ).offset(skip).limit(limit).all()
 
+MARKETPLACE_METRIC_NETWORKS = ('mainnet', 'testnet')
+
+def refresh_bot_marketplace_metrics(db: Session, bot_ids: Optional[List[int]] = None) -> int:
+    """
+    Recompute the materialized marketplace metrics of the given bots (all bots if None)
+    
+    One grouped aggregate over the bots' transactions (joined through their
+    subscriptions) per call; rows are replaced for 'mainnet', 'testnet' and
+    'all'. Called when a position closes and by the periodic rebuild task.
+    Returns the number of bots refreshed.
+    """
+    from sqlalchemy import case
+    
+    if bot_ids is not None and not bot_ids:
+        return 0
+    
+    network = case((models.Subscription.is_testnet == True, 'testnet'), else_='mainnet')
+    closed = and_(models.Transaction.status == 'CLOSED', models.Transaction.realized_pnl != 0)
+    is_open = and_(models.Transaction.status == 'OPEN', models.Transaction.unrealized_pnl != 0)
+    
+    query = db.query(
+        models.Subscription.bot_id,
+        network.label('network'),
+        func.count(models.Transaction.id),
+        func.sum(case((closed, models.Transaction.realized_pnl), else_=0)),
+        func.sum(case((is_open, models.Transaction.unrealized_pnl), else_=0)),
+        func.sum(case((closed, 1), else_=0)),
+        func.sum(case((and_(closed, models.Transaction.realized_pnl > 0), 1), else_=0)),
+    ).join(
+        models.Transaction, models.Transaction.subscription_id == models.Subscription.id
+    ).group_by(models.Subscription.bot_id, network)
+    
+    full_rebuild = bot_ids is None
+    if full_rebuild:
+        bot_ids = [bot_id for (bot_id,) in db.query(models.Bot.id).all()]
+    else:
+        bot_ids = list(set(bot_ids))
+        query = query.filter(models.Subscription.bot_id.in_(bot_ids))
+    
+    empty = {'total_trades': 0, 'realized_pnl': 0.0, 'unrealized_pnl': 0.0, 'closed_trades': 0, 'winning_trades': 0}
+    metrics = {
+        (bot_id, scope): dict(empty)
+        for bot_id in bot_ids for scope in MARKETPLACE_METRIC_NETWORKS + ('all',)
+    }
+    for bot_id, scope, total_trades, realized, unrealized, closed_trades, winning in query.all():
+        for key in ((bot_id, scope), (bot_id, 'all')):
+            row = metrics.setdefault(key, dict(empty))
+            row['total_trades'] += int(total_trades or 0)
+            row['realized_pnl'] += float(realized or 0)
+            row['unrealized_pnl'] += float(unrealized or 0)
+            row['closed_trades'] += int(closed_trades or 0)
+            row['winning_trades'] += int(winning or 0)
+    
+    rows = []
+    for (bot_id, scope), row in metrics.items():
+        closed_trades = row['closed_trades']
+        rows.append({
+            'bot_id': bot_id,
+            'network': scope,
+            'total_pnl': row['realized_pnl'] + row['unrealized_pnl'],
+            'win_rate': (row['winning_trades'] / closed_trades * 100) if closed_trades > 0 else 0.0,
+            **row
+        })
+    
+    if full_rebuild:
+        db.query(models.BotMarketplaceMetrics).delete(synchronize_session=False)
+    else:
+        for i in range(0, len(bot_ids), 1000):
+            db.query(models.BotMarketplaceMetrics).filter(
+                models.BotMarketplaceMetrics.bot_id.in_(bot_ids[i:i + 1000])
+            ).delete(synchronize_session=False)
+    if rows:
+        db.bulk_insert_mappings(models.BotMarketplaceMetrics, rows)
+    db.commit()
+    return len(bot_ids)
+
 def get_public_bots(db: Session, skip: int = 0, limit: int = 50, category_id: Optional[int] = None, search: Optional[str] = None, sort_by: str = "created_at", order: str = "desc", network_filter: Optional[str] = None):
-    from sqlalchemy import func, case
+    """
+    Approved bots for the marketplace with their performance metrics
+    
+    Metrics come from the materialized bot_marketplace_metrics table, so
+    filtering, sorting (including by performance) and pagination are one query.
+    """
+    from sqlalchemy import func
+    
+    scope = network_filter if network_filter in MARKETPLACE_METRIC_NETWORKS else 'all'
+    metrics = models.BotMarketplaceMetrics
     
     query = db.query(models.Bot).filter(models.Bot.status == schemas.BotStatus.APPROVED)
     
@@ -337,106 +423,27 @@ def get_public_bots(db: Session, skip: int = 0, limit: int = 50, category_id: Op
             )
         )
     
-    # Apply sorting for database-backed fields only
+    total = query.count()
+    
+    query = query.outerjoin(
+        metrics, and_(metrics.bot_id == models.Bot.id, metrics.network == scope)
+    ).add_columns(metrics)
+    
+    direction = desc if order == "desc" else asc
     if sort_by == "created_at":
-        query = query.order_by(desc(models.Bot.created_at) if order == "desc" else asc(models.Bot.created_at))
+        query = query.order_by(direction(models.Bot.created_at))
     elif sort_by == "rating":
-        query = query.order_by(desc(models.Bot.average_rating) if order == "desc" else asc(models.Bot.average_rating))
+        query = query.order_by(direction(models.Bot.average_rating))
     elif sort_by == "price":
-        query = query.order_by(desc(models.Bot.price_per_month) if order == "desc" else asc(models.Bot.price_per_month))
-    # For performance/total_pnl, we'll sort AFTER calculating metrics (below)
+        query = query.order_by(direction(models.Bot.price_per_month))
+    elif sort_by == "performance" or sort_by == "total_pnl":
+        query = query.order_by(direction(func.coalesce(metrics.total_pnl, 0)), models.Bot.id)
     
-    total = query.count()
-    
-    # For performance sorting, get ALL bots first (no pagination yet)
-    if sort_by == "performance" or sort_by == "total_pnl":
-        bots = query.all()  # Get all bots without pagination
-    else:
-        bots = query.offset(skip).limit(limit).all()  # Apply pagination for other sorts
-    
-    # Calculate performance metrics for each bot
-    for bot in bots:
-        # Get all subscriptions for this bot
-        subscriptions = db.query(models.Subscription).filter(
-            models.Subscription.bot_id == bot.id
-        ).all()
-        
-        if not subscriptions:
-            bot.total_pnl = 0.0
-            bot.win_rate = 0.0
-            bot.total_trades = 0
-            bot.winning_trades = 0
-            continue
-        
-        # Get all transactions for all subscriptions of this bot
-        subscription_ids = [sub.id for sub in subscriptions]
-        
-        # Apply network filter if specified
-        if network_filter == "mainnet":
-            filtered_sub_ids = [sub.id for sub in subscriptions if not sub.is_testnet]
-            if not filtered_sub_ids:
-                # No mainnet subscriptions, skip this bot
-                bot.total_pnl = 0.0
-                bot.win_rate = 0.0
-                bot.total_trades = 0
-                bot.winning_trades = 0
-                continue
-            subscription_ids = filtered_sub_ids
-        elif network_filter == "testnet":
-            filtered_sub_ids = [sub.id for sub in subscriptions if sub.is_testnet]
-            if not filtered_sub_ids:
-                # No testnet subscriptions, skip this bot
-                bot.total_pnl = 0.0
-                bot.win_rate = 0.0
-                bot.total_trades = 0
-                bot.winning_trades = 0
-                continue
-            subscription_ids = filtered_sub_ids
-        
-        transactions = db.query(models.Transaction).filter(
-            models.Transaction.subscription_id.in_(subscription_ids)
-        ).all()
-        
-        if not transactions:
-            bot.total_pnl = 0.0
-            bot.win_rate = 0.0
-            bot.total_trades = 0
-            bot.winning_trades = 0
-            continue
-        
-        # Calculate metrics
-        total_pnl = 0.0
-        closed_positions = 0
-        winning_trades = 0
-        
-        for tx in transactions:
-            if tx.status == 'CLOSED' and tx.realized_pnl:
-                realized = float(tx.realized_pnl)
-                total_pnl += realized
-                closed_positions += 1
-                if realized > 0:
-                    winning_trades += 1
-            elif tx.status == 'OPEN' and tx.unrealized_pnl:
-                unrealized = float(tx.unrealized_pnl)
-                total_pnl += unrealized
-        
-        win_rate = (winning_trades / closed_positions * 100) if closed_positions > 0 else 0
-        
-        # Update bot with calculated metrics
-        bot.total_pnl = round(total_pnl, 2)
-        bot.win_rate = round(win_rate, 2)
-        bot.total_trades = len(transactions)
-        bot.winning_trades = winning_trades
-    
-    # Sort by performance if requested (after calculating metrics)
-    if sort_by == "performance" or sort_by == "total_pnl":
-        bots.sort(key=lambda b: float(b.total_pnl), reverse=(order == "desc"))
-        # Apply pagination AFTER sorting
-        bots = bots[skip:skip + limit]
+    rows = query.offset(skip).limit(limit).all()
     
     # Convert ORM objects to dicts to include computed fields
     bot_dicts = []
-    for bot in bots:
+    for bot, bot_metrics in rows:
         bot_dict = {
             'id': bot.id,
             'name': bot.name,
@@ -455,11 +462,11 @@ def get_public_bots(db: Session, skip: int = 0, limit: int = 50, category_id: Op
             'default_config': bot.default_config,
             'created_at': bot.created_at,
             'status': bot.status,
-            # Performance metrics (computed)
-            'total_pnl': float(bot.total_pnl) if hasattr(bot, 'total_pnl') else 0.0,
-            'win_rate': float(bot.win_rate) if hasattr(bot, 'win_rate') else 0.0,
-            'total_trades': int(bot.total_trades) if hasattr(bot, 'total_trades') else 0,
-            'winning_trades': int(bot.winning_trades) if hasattr(bot, 'winning_trades') else 0,
+            # Performance metrics (materialized)
+            'total_pnl': round(float(bot_metrics.total_pnl or 0), 2) if bot_metrics else 0.0,
+            'win_rate': round(float(bot_metrics.win_rate or 0), 2) if bot_metrics else 0.0,
+            'total_trades': int(bot_metrics.total_trades or 0) if bot_metrics else 0,
+            'winning_trades': int(bot_metrics.winning_trades or 0) if bot_metrics else 0,
         }
         bot_dicts.append(bot_dict)
     
@@ -492,230 +499,247 @@ def get_bots_by_developer(db: Session, developer_id: int):
     
     return bots
 
-def get_bot_analytics(db: Session, bot_id: int, developer_id: Optional[int] = None, days: int = 30, page: int = 1, limit: int = 10, network_filter: Optional[str] = None):
-    """Get comprehensive analytics for a bot with paginated recent transactions"""
-    from sqlalchemy import func, and_, case
-    from datetime import datetime, timedelta
+BOT_ANALYTICS_CACHE_TTL = int(os.getenv('BOT_ANALYTICS_CACHE_TTL', 30))
+BOT_ANALYTICS_CACHE_MIN_TRANSACTIONS = int(os.getenv('BOT_ANALYTICS_CACHE_MIN_TRANSACTIONS', 10000))
+
+_analytics_cache: Dict[str, Tuple[float, str]] = {}
+
+def _bot_analytics_cache_key(bot_id: int, developer_id, days: int, page: int, limit: int, network_filter, cursor) -> str:
+    return f"bot_analytics:{bot_id}:{developer_id}:{days}:{page}:{limit}:{network_filter}:{cursor}"
+
+def _load_cached_bot_analytics(key: str) -> Optional[Dict[str, Any]]:
+    if BOT_ANALYTICS_CACHE_TTL <= 0:
+        return None
+    from utils.redis_client import get_redis_client
+    payload = None
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            payload = redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Bot analytics cache read failed: {e}")
+    if payload is None:
+        entry = _analytics_cache.get(key)
+        if entry and entry[0] > datetime.now().timestamp():
+            payload = entry[1]
+        elif entry:
+            _analytics_cache.pop(key, None)
+    return json.loads(payload) if payload else None
+
+def _store_cached_bot_analytics(key: str, result: Dict[str, Any]):
+    from utils.redis_client import get_redis_client
+    payload = json.dumps(result)
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            redis_client.setex(key, BOT_ANALYTICS_CACHE_TTL, payload)
+            return
+        except Exception as e:
+            logger.warning(f"Bot analytics cache write failed: {e}")
+    now = datetime.now().timestamp()
+    for stale_key in [k for k, (expires_at, _) in _analytics_cache.items() if expires_at <= now]:
+        _analytics_cache.pop(stale_key, None)
+    _analytics_cache[key] = (now + BOT_ANALYTICS_CACHE_TTL, payload)
+
+def _encode_transaction_cursor(tx) -> Optional[str]:
+    if tx.created_at is None:
+        return None
+    return f"{tx.created_at.isoformat()}_{tx.id}"
+
+def _decode_transaction_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, tx_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(tx_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def get_bot_analytics(db: Session, bot_id: int, developer_id: Optional[int] = None, days: int = 30, page: int = 1, limit: int = 10, network_filter: Optional[str] = None, cursor: Optional[str] = None):
+    """
+    Get comprehensive analytics for a bot with paginated recent transactions
+    
+    Summary, daily chart and per-network split all come from one grouped
+    aggregate over (day, network), so the period's transactions are never
+    loaded into Python. Recent transactions are keyset-paginated when a
+    cursor (pagination.next_cursor of the previous page) is given; page is
+    kept for offset pagination. Results for bots with at least
+    BOT_ANALYTICS_CACHE_MIN_TRANSACTIONS transactions are cached for
+    BOT_ANALYTICS_CACHE_TTL seconds.
+    """
+    from sqlalchemy import case
+    
+    cache_key = _bot_analytics_cache_key(bot_id, developer_id, days, page, limit, network_filter, cursor)
+    cached = _load_cached_bot_analytics(cache_key)
+    if cached is not None:
+        return cached
     
     # Verify bot exists (and optionally belongs to developer)
+    bot_query = db.query(models.Bot.id, models.Bot.name).filter(models.Bot.id == bot_id)
     if developer_id is not None:
-        # Check ownership if developer_id provided
-        bot = db.query(models.Bot).filter(
-            models.Bot.id == bot_id,
-            models.Bot.developer_id == developer_id
-        ).first()
-    else:
-        # Just check bot exists if no developer_id (public view)
-        bot = db.query(models.Bot).filter(
-            models.Bot.id == bot_id
-        ).first()
+        bot_query = bot_query.filter(models.Bot.developer_id == developer_id)
+    bot = bot_query.first()
     
     if not bot:
         raise HTTPException(status_code=404, detail="Bot not found")
     
-    # Calculate date range
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    # Get subscription stats (apply network filter)
-    total_sub_query = db.query(func.count(models.Subscription.id)).filter(
-        models.Subscription.bot_id == bot_id
-    )
-    if network_filter == "mainnet":
-        total_sub_query = total_sub_query.filter(models.Subscription.is_testnet == False)
-    elif network_filter == "testnet":
-        total_sub_query = total_sub_query.filter(models.Subscription.is_testnet == True)
-    total_subscriptions = total_sub_query.scalar() or 0
+    start_date = datetime.now() - timedelta(days=days)
     
-    active_sub_query = db.query(func.count(models.Subscription.id)).filter(
-        models.Subscription.bot_id == bot_id,
-        models.Subscription.status == models.SubscriptionStatus.ACTIVE
-    )
-    if network_filter == "mainnet":
-        active_sub_query = active_sub_query.filter(models.Subscription.is_testnet == False)
-    elif network_filter == "testnet":
-        active_sub_query = active_sub_query.filter(models.Subscription.is_testnet == True)
-    active_subscriptions = active_sub_query.scalar() or 0
-    
-    # Get transaction stats (apply network filter)
-    transactions_query = db.query(models.Transaction).join(
-        models.Subscription,
-        models.Subscription.id == models.Transaction.subscription_id
+    def apply_network_filter(query):
+        if network_filter == "mainnet":
+            return query.filter(models.Subscription.is_testnet == False)
+        if network_filter == "testnet":
+            return query.filter(models.Subscription.is_testnet == True)
+        return query
+    
+    # Subscription stats in one pass
+    total_subscriptions, active_subscriptions = apply_network_filter(db.query(
+        func.count(models.Subscription.id),
+        func.sum(case((models.Subscription.status == models.SubscriptionStatus.ACTIVE, 1), else_=0))
     ).filter(
         models.Subscription.bot_id == bot_id
+    )).one()
+    
+    # Transaction stats grouped by (day, network)
+    tx = models.Transaction
+    closed = tx.status == 'CLOSED'
+    day = func.date(tx.created_at)
+    network = case(
+        (models.Subscription.is_testnet == True, 'testnet'),
+        (models.Subscription.is_testnet == False, 'mainnet'),
+        else_='unspecified'
     )
-    if network_filter == "mainnet":
-        transactions_query = transactions_query.filter(models.Subscription.is_testnet == False)
-    elif network_filter == "testnet":
-        transactions_query = transactions_query.filter(models.Subscription.is_testnet == True)
-    
-    # Get ALL transactions in period (OPEN + CLOSED)
-    all_transactions_in_period = transactions_query.filter(
-        models.Transaction.created_at >= start_date
-    ).all()
-    
-    total_transactions = len(all_transactions_in_period)
-    
-    # Calculate P&L (realized + unrealized) and win rate
-    total_pnl = 0.0
-    total_realized_pnl = 0.0
-    total_unrealized_pnl = 0.0
-    winning_trades = 0
-    losing_trades = 0
-    open_positions = 0
-    closed_positions = 0
-    
-    for tx in all_transactions_in_period:
-        if tx.status == 'CLOSED':
-            closed_positions += 1
-            realized = float(tx.realized_pnl or 0)
-            total_realized_pnl += realized
-            total_pnl += realized
-            if realized > 0:
-                winning_trades += 1
-            elif realized < 0:
-                losing_trades += 1
-        else:  # OPEN
-            open_positions += 1
-            unrealized = float(tx.unrealized_pnl or 0)
-            total_unrealized_pnl += unrealized
-            total_pnl += unrealized  # Include unrealized in total P&L
-    
-    # Win rate only from CLOSED trades (can't determine if OPEN will win/lose)
-    win_rate = (winning_trades / closed_positions * 100) if closed_positions > 0 else 0
-    
-    # Get transactions grouped by date for chart (ALL transactions - OPEN + CLOSED)
-    # Use CASE statement to sum realized_pnl for CLOSED and unrealized_pnl for OPEN
-    daily_stats_query = db.query(
-        func.date(models.Transaction.created_at).label('date'),
-        func.count(models.Transaction.id).label('count'),
-        func.sum(
-            case(
-                (models.Transaction.status == 'CLOSED', models.Transaction.realized_pnl),
-                else_=models.Transaction.unrealized_pnl
-            )
-        ).label('pnl'),
-        func.sum(
-            case(
-                (models.Transaction.status == 'CLOSED', models.Transaction.realized_pnl),
-                else_=0
-            )
-        ).label('realized_pnl'),
-        func.sum(
-            case(
-                (models.Transaction.status == 'OPEN', models.Transaction.unrealized_pnl),
-                else_=0
-            )
-        ).label('unrealized_pnl')
+    buckets = apply_network_filter(db.query(
+        day.label('date'),
+        network.label('network'),
+        func.count(tx.id).label('count'),
+        func.sum(case((closed, 1), else_=0)).label('closed'),
+        func.sum(case((and_(closed, tx.realized_pnl > 0), 1), else_=0)).label('wins'),
+        func.sum(case((and_(closed, tx.realized_pnl < 0), 1), else_=0)).label('losses'),
+        func.sum(case((closed, tx.realized_pnl), else_=0)).label('realized_pnl'),
+        # Non-closed rows count as open in the summary, the chart only plots OPEN ones
+        func.sum(case((closed, 0), else_=tx.unrealized_pnl)).label('open_pnl'),
+        func.sum(case((tx.status == 'OPEN', tx.unrealized_pnl), else_=0)).label('unrealized_pnl')
     ).join(
         models.Subscription,
-        models.Subscription.id == models.Transaction.subscription_id
+        models.Subscription.id == tx.subscription_id
     ).filter(
         models.Subscription.bot_id == bot_id,
-        models.Transaction.created_at >= start_date
-    )
-    # Apply network filter
-    if network_filter == "mainnet":
-        daily_stats_query = daily_stats_query.filter(models.Subscription.is_testnet == False)
-    elif network_filter == "testnet":
-        daily_stats_query = daily_stats_query.filter(models.Subscription.is_testnet == True)
-    
-    daily_stats = daily_stats_query.group_by(
-        func.date(models.Transaction.created_at)
-    ).order_by(
-        func.date(models.Transaction.created_at)
-    ).all()
+        tx.created_at >= start_date
+    )).group_by(day, network).order_by(day).all()
+    
+    def empty_totals():
+        return {'transactions': 0, 'closed': 0, 'wins': 0, 'losses': 0, 'realized_pnl': 0.0, 'open_pnl': 0.0, 'unrealized_pnl': 0.0}
+    
+    totals = empty_totals()
+    daily: Dict[Any, Dict[str, Any]] = {}
+    by_network: Dict[str, Dict[str, Any]] = {}
+    for bucket in buckets:
+        for target in (totals, daily.setdefault(bucket.date, empty_totals()), by_network.setdefault(bucket.network, empty_totals())):
+            target['transactions'] += bucket.count
+            target['closed'] += int(bucket.closed or 0)
+            target['wins'] += int(bucket.wins or 0)
+            target['losses'] += int(bucket.losses or 0)
+            target['realized_pnl'] += float(bucket.realized_pnl or 0)
+            target['open_pnl'] += float(bucket.open_pnl or 0)
+            target['unrealized_pnl'] += float(bucket.unrealized_pnl or 0)
     
-    # Format daily stats for chart
-    chart_data = []
-    for stat in daily_stats:
-        chart_data.append({
-            'date': stat.date.isoformat() if stat.date else None,
-            'transactions': stat.count,
-            'pnl': float(stat.pnl) if stat.pnl else 0,
-            'realized_pnl': float(stat.realized_pnl) if stat.realized_pnl else 0,
-            'unrealized_pnl': float(stat.unrealized_pnl) if stat.unrealized_pnl else 0
-        })
-    
-    # Get total count of transactions for pagination (apply network filter)
-    total_count_query = db.query(func.count(models.Transaction.id)).join(
+    # Win rate only from CLOSED trades (can't determine if OPEN will win/lose)
+    def win_rate(stats):
+        return round(stats['wins'] / stats['closed'] * 100, 2) if stats['closed'] else 0
+    
+    chart_data = [{
+        'date': (date.isoformat() if hasattr(date, 'isoformat') else str(date)) if date else None,
+        'transactions': stats['transactions'],
+        'pnl': stats['realized_pnl'] + stats['open_pnl'],
+        'realized_pnl': stats['realized_pnl'],
+        'unrealized_pnl': stats['unrealized_pnl'],
+        'winning_trades': stats['wins'],
+        'losing_trades': stats['losses']
+    } for date, stats in daily.items()]
+    
+    network_breakdown = {name: {
+        'total_transactions': stats['transactions'],
+        'closed_positions': stats['closed'],
+        'winning_trades': stats['wins'],
+        'losing_trades': stats['losses'],
+        'win_rate': win_rate(stats),
+        'total_pnl': round(stats['realized_pnl'] + stats['open_pnl'], 2),
+        'realized_pnl': round(stats['realized_pnl'], 2)
+    } for name, stats in sorted(by_network.items())}
+    
+    # Get total count of transactions for pagination
+    total_transactions_count = apply_network_filter(db.query(func.count(tx.id)).join(
         models.Subscription,
-        models.Subscription.id == models.Transaction.subscription_id
+        models.Subscription.id == tx.subscription_id
     ).filter(
         models.Subscription.bot_id == bot_id
-    )
-    if network_filter == "mainnet":
-        total_count_query = total_count_query.filter(models.Subscription.is_testnet == False)
-    elif network_filter == "testnet":
-        total_count_query = total_count_query.filter(models.Subscription.is_testnet == True)
-    total_transactions_count = total_count_query.scalar() or 0
+    )).scalar() or 0
     
-    # Calculate pagination offset
-    offset = (page - 1) * limit
-    
-    # Get recent transactions with pagination (show both OPEN and CLOSED, apply network filter)
-    recent_tx_query = db.query(
-        models.Transaction
-    ).join(
+    # Recent transactions: keyset on (created_at, id) when a cursor is given, offset otherwise
+    recent_tx_query = apply_network_filter(db.query(tx).join(
         models.Subscription,
-        models.Subscription.id == models.Transaction.subscription_id
+        models.Subscription.id == tx.subscription_id
     ).filter(
         models.Subscription.bot_id == bot_id
-    )
-    if network_filter == "mainnet":
-        recent_tx_query = recent_tx_query.filter(models.Subscription.is_testnet == False)
-    elif network_filter == "testnet":
-        recent_tx_query = recent_tx_query.filter(models.Subscription.is_testnet == True)
-    
-    recent_transactions = recent_tx_query.order_by(
-        models.Transaction.created_at.desc()
-    ).offset(offset).limit(limit).all()
+    )).order_by(tx.created_at.desc(), tx.id.desc())
+    if cursor:
+        cursor_created_at, cursor_id = _decode_transaction_cursor(cursor)
+        recent_tx_query = recent_tx_query.filter(or_(
+            tx.created_at < cursor_created_at,
+            and_(tx.created_at == cursor_created_at, tx.id < cursor_id)
+        ))
+    else:
+        recent_tx_query = recent_tx_query.offset((page - 1) * limit)
+    recent_transactions = recent_tx_query.limit(limit).all()
     
     # Format recent transactions (include both OPEN and CLOSED)
     recent_txs = []
-    for tx in recent_transactions:
+    for recent in recent_transactions:
         # Determine P&L based on status
-        if tx.status == 'CLOSED':
-            pnl = float(tx.realized_pnl) if tx.realized_pnl is not None else 0
+        if recent.status == 'CLOSED':
+            pnl = float(recent.realized_pnl) if recent.realized_pnl is not None else 0
         else:  # OPEN
-            pnl = float(tx.unrealized_pnl) if tx.unrealized_pnl is not None else 0
+            pnl = float(recent.unrealized_pnl) if recent.unrealized_pnl is not None else 0
             
         recent_txs.append({
-            'id': tx.id,
-            'subscription_id': tx.subscription_id,  # NEW: Include subscription ID
-            'trading_pair': tx.symbol,  # Transaction model uses 'symbol' field
-            'action': tx.action,
-            'quantity': float(tx.quantity) if tx.quantity else 0,
-            'entry_price': float(tx.entry_price) if tx.entry_price else 0,
-            'exit_price': float(tx.exit_price) if tx.exit_price else 0,
+            'id': recent.id,
+            'subscription_id': recent.subscription_id,
+            'trading_pair': recent.symbol,  # Transaction model uses 'symbol' field
+            'action': recent.action,
+            'quantity': float(recent.quantity) if recent.quantity else 0,
+            'entry_price': float(recent.entry_price) if recent.entry_price else 0,
+            'exit_price': float(recent.exit_price) if recent.exit_price else 0,
             'realized_pnl': pnl,  # Use realized_pnl for CLOSED, unrealized_pnl for OPEN
-            'status': tx.status,  # NEW: Include status (OPEN/CLOSED)
-            'unrealized_pnl': float(tx.unrealized_pnl) if tx.unrealized_pnl is not None else 0,  # NEW
-            'last_updated_price': float(tx.last_updated_price) if tx.last_updated_price else 0,  # NEW
-            'created_at': tx.created_at.isoformat() if tx.created_at else None,
-            'closed_at': tx.exit_time.isoformat() if tx.exit_time else None  # Use exit_time instead of closed_at
+            'status': recent.status,
+            'unrealized_pnl': float(recent.unrealized_pnl) if recent.unrealized_pnl is not None else 0,
+            'last_updated_price': float(recent.last_updated_price) if recent.last_updated_price else 0,
+            'created_at': recent.created_at.isoformat() if recent.created_at else None,
+            'closed_at': recent.exit_time.isoformat() if recent.exit_time else None  # Use exit_time instead of closed_at
         })
     
     # Calculate total pages
     total_pages = (total_transactions_count + limit - 1) // limit if limit > 0 else 0
+    next_cursor = None
+    if len(recent_transactions) == limit and recent_transactions:
+        next_cursor = _encode_transaction_cursor(recent_transactions[-1])
     
-    return {
+    result = {
         'bot_id': bot_id,
         'bot_name': bot.name,
         'period_days': days,
         'summary': {
-            'total_subscriptions': total_subscriptions,
-            'active_subscriptions': active_subscriptions,
-            'total_transactions': total_transactions,
-            'open_positions': open_positions,
-            'closed_positions': closed_positions,
-            'winning_trades': winning_trades,
-            'losing_trades': losing_trades,
-            'win_rate': round(win_rate, 2),
-            'total_pnl': round(total_pnl, 2),
-            'realized_pnl': round(total_realized_pnl, 2),
-            'unrealized_pnl': round(total_unrealized_pnl, 2)
+            'total_subscriptions': total_subscriptions or 0,
+            'active_subscriptions': int(active_subscriptions or 0),
+            'total_transactions': totals['transactions'],
+            'open_positions': totals['transactions'] - totals['closed'],
+            'closed_positions': totals['closed'],
+            'winning_trades': totals['wins'],
+            'losing_trades': totals['losses'],
+            'win_rate': win_rate(totals),
+            'total_pnl': round(totals['realized_pnl'] + totals['open_pnl'], 2),
+            'realized_pnl': round(totals['realized_pnl'], 2),
+            'unrealized_pnl': round(totals['open_pnl'], 2)
         },
+        'network_breakdown': network_breakdown,
         'chart_data': chart_data,
         'recent_transactions': recent_txs,
         'pagination': {
@@ -723,10 +747,15 @@ def get_bot_analytics(db: Session, bot_id: int, developer_id: Optional[int] = No
             'total_pages': total_pages,
             'total_items': total_transactions_count,
             'items_per_page': limit,
-            'has_next': page < total_pages,
-            'has_prev': page > 1
+            'has_next': next_cursor is not None if cursor else page < total_pages,
+            'has_prev': bool(cursor) or page > 1,
+            'next_cursor': next_cursor
         }
     }
+    
+    if BOT_ANALYTICS_CACHE_TTL > 0 and total_transactions_count >= BOT_ANALYTICS_CACHE_MIN_TRANSACTIONS:
+        _store_cached_bot_analytics(cache_key, result)
+    return result
 
 def get_bot_subscriptions(
     db: Session,
@@ -1376,6 +1405,7 @@ def create_exchange_credentials(db: Session, credentials: schemas.ExchangeCreden
     db.add(db_credentials)
     db.commit()
     db.refresh(db_credentials)
+    invalidate_credentials(DEVELOPER, user_id)
     return db_credentials
 
 def get_user_exchange_credentials(db: Session, user_id: int, exchange: str = None, is_testnet: bool = None, credential_type: str = None):
@@ -1434,6 +1464,7 @@ def update_exchange_credentials(db: Session, credentials_id: int, user_id: int,
     
     db.commit()
     db.refresh(db_credentials)
+    invalidate_credentials(DEVELOPER, user_id)
     return db_credentials
 
 def delete_exchange_credentials(db: Session, credentials_id: int, user_id: int):
@@ -1444,6 +1475,7 @@ def delete_exchange_credentials(db: Session, credentials_id: int, user_id: int):
     
     db.delete(db_credentials)
     db.commit()
+    invalidate_credentials(DEVELOPER, user_id)
     return True
 
 def update_credentials_validation(db: Session, credentials_id: int, is_valid: bool, message: str):
@@ -1595,6 +1627,43 @@ def get_active_subscriptions(db: Session):
         models.Subscription.status == models.SubscriptionStatus.ACTIVE
     ).all()
 
+def get_due_subscriptions(db: Session, now: Optional[datetime] = None,
+                          shard_index: int = 0, shard_count: int = 1,
+                          limit: Optional[int] = None):
+    """
+    Get active subscriptions that are due to run, for the scheduler
+
+    Due-ness (next_run_at NULL or passed, started, not expired) is filtered in
+    SQL using idx_subscriptions_status_next_run, and only the bot fields the
+    scheduler routes on are eager-loaded. With shard_count > 1 only
+    subscriptions with id % shard_count == shard_index are returned, so several
+    beat-driven schedulers can split the work.
+    """
+    now = now or datetime.utcnow()
+    query = db.query(models.Subscription).options(
+        joinedload(models.Subscription.bot).load_only(
+            models.Bot.id,
+            models.Bot.name,
+            models.Bot.bot_type,
+            models.Bot.bot_mode,
+            models.Bot.exchange_type,
+            models.Bot.trading_pair,
+            models.Bot.timeframe,
+            models.Bot.timeframes
+        )
+    ).filter(
+        models.Subscription.status == models.SubscriptionStatus.ACTIVE,
+        or_(models.Subscription.next_run_at.is_(None), models.Subscription.next_run_at <= now),
+        or_(models.Subscription.started_at.is_(None), models.Subscription.started_at <= now),
+        or_(models.Subscription.expires_at.is_(None), models.Subscription.expires_at >= now)
+    )
+    if shard_count > 1:
+        query = query.filter(models.Subscription.id % shard_count == shard_index)
+    query = query.order_by(models.Subscription.next_run_at.asc(), models.Subscription.id.asc())
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
 def get_bot_signal_subscriptions(db: Session, user_principal_id: int):
     return db.query(models.Subscription).filter(
         models.Subscription.user_principal_id == user_principal_id,
@@ -2884,6 +2953,7 @@ def create_developer_exchange_credentials(db: Session, credentials: schemas.Deve
     db.add(db_credentials)
     db.commit()
     db.refresh(db_credentials)
+    invalidate_credentials(DEVELOPER, user_id)
     return db_credentials
 
 def get_user_developer_credentials(db: Session, user_id: int, skip: int = 0, limit: int = 100):
@@ -2954,6 +3024,7 @@ def update_developer_exchange_credentials(db: Session, credentials_id: int, user
     
     db.commit()
     db.refresh(db_credentials)
+    invalidate_credentials(DEVELOPER, user_id)
     return db_credentials
 
 def delete_developer_exchange_credentials(db: Session, credentials_id: int, user_id: int):
@@ -2971,6 +3042,7 @@ def delete_developer_exchange_credentials(db: Session, credentials_id: int, user
     
     db_credentials.is_active = False
     db.commit()
+    invalidate_credentials(DEVELOPER, user_id)
     return db_credentials
 
 def update_developer_credentials_last_used(db: Session, credentials_id: int, user_id: int):
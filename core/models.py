@@ -460,6 +460,11 @@ class Subscription(Base):
     performance_logs = relationship("PerformanceLog", back_populates="subscription")
     invoices = relationship("SubscriptionInvoice", back_populates="subscription")
 
+    __table_args__ = (
+        # Scheduler due-subscription scan (crud.get_due_subscriptions)
+        Index('idx_subscriptions_status_next_run', 'status', 'next_run_at'),
+    )
+
 class Trade(Base):
     """Table to track individual trades"""
     __tablename__ = "trades"
@@ -530,6 +535,62 @@ class BotPerformance(Base):
     # Relationships
     bot = relationship("Bot", back_populates="performance_metrics")
 
+class BotMarketplaceMetrics(Base):
+    """
+    Materialized marketplace listing metrics, one row per bot and network scope
+    ('all', 'mainnet', 'testnet'), maintained by crud.refresh_bot_marketplace_metrics
+    """
+    __tablename__ = "bot_marketplace_metrics"
+    bot_id = Column(Integer, ForeignKey("bots.id"), primary_key=True)
+    network = Column(String(10), primary_key=True)
+    
+    total_pnl = Column(Float, default=0.0)  # Realized (closed) + unrealized (open)
+    realized_pnl = Column(Float, default=0.0)
+    unrealized_pnl = Column(Float, default=0.0)
+    total_trades = Column(Integer, default=0)
+    closed_trades = Column(Integer, default=0)
+    winning_trades = Column(Integer, default=0)
+    win_rate = Column(Float, default=0.0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        # Marketplace sort by performance within a network scope
+        Index('idx_bot_marketplace_metrics_network_pnl', 'network', 'total_pnl'),
+    )
+
+class PerformanceAggregate(Base):
+    """
+    Running performance aggregates over closed trades, one row per scope
+    ('bot' or 'prompt') and scope id, maintained by services.performance_aggregates
+    """
+    __tablename__ = "performance_aggregates"
+    scope = Column(String(10), primary_key=True)
+    scope_id = Column(Integer, primary_key=True)
+    
+    total_trades = Column(Integer, default=0)
+    winning_trades = Column(Integer, default=0)
+    pnl_sum = Column(Float, default=0.0)
+    pnl_sq_sum = Column(Float, default=0.0)  # For P&L standard deviation
+    win_pnl_sum = Column(Float, default=0.0)
+    loss_pnl_sum = Column(Float, default=0.0)
+    
+    # Drawdown state on the cumulative closed P&L curve (in close order)
+    equity = Column(Float, default=0.0)
+    equity_peak = Column(Float, default=0.0)
+    max_drawdown = Column(Float, default=0.0)
+    
+    # Risk management
+    tp_hits = Column(Integer, default=0)
+    sl_hits = Column(Integer, default=0)
+    manual_exits = Column(Integer, default=0)
+    planned_rr_sum = Column(Float, default=0.0)
+    actual_rr_sum = Column(Float, default=0.0)
+    slippage_trades = Column(Integer, default=0)
+    slippage_sum = Column(Float, default=0.0)
+    
+    rebuilt_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
 class PerformanceLog(Base):
     """Individual performance logs for subscription tracking"""
     __tablename__ = "performance_logs"
@@ -977,6 +1038,7 @@ class Transaction(Base):
     
     # Monitoring
     last_updated_price = Column(Float, nullable=True)  # Last known market price for open positions
+    metrics_applied_at = Column(DateTime, nullable=True)  # When the close was folded into performance_aggregates
     
     # Order details
     order_id = Column(String(100), nullable=True)
@@ -1010,6 +1072,7 @@ class Transaction(Base):
         Index('idx_transactions_is_winning', 'is_winning'),
         Index('idx_transactions_bot_status', 'bot_id', 'status'),
         Index('idx_transactions_created_at', 'created_at'),
+        Index('idx_transactions_subscription_created', 'subscription_id', 'created_at'),
     )
 
 class ExecutionLog(Base):
@@ -24,6 +24,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.celery_app import app
 from sqlalchemy.orm import Session
+from core.bot_module_cache import get_bot_module_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -176,8 +177,6 @@ def queue_discord_dm(user_id, message):
 def initialize_bot_from_local_file(subscription, local_file_path, db):
     """📂 Load bot from local file system (for template bots)"""
     try:
-        import importlib.util
-        
         bot_id = subscription.bot.id
         
         # Handle bot_type - can be enum or string
@@ -194,12 +193,8 @@ def initialize_bot_from_local_file(subscription, local_file_path, db):
         
         logger.info(f"📂 Loading bot from local file: {local_file_path}")
         
-        # Load module from file
-        module_name = f"bot_module_{bot_id}_{int(time.time())}"  # Unique name to avoid cache
-        spec = importlib.util.spec_from_file_location(module_name, local_file_path)
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[module_name] = module
-        spec.loader.exec_module(module)
+        # Compiled once per worker, recompiled when the file changes
+        module = get_bot_module_cache().load_file(bot_id, local_file_path)
         
         # Find bot class by looking for classes with execute_algorithm method
         bot_class = None
@@ -303,45 +298,16 @@ def initialize_bot(subscription):
         s3_manager = S3Manager()
         logger.info(f"☁️ [S3] Loading bot {bot_id} from S3...")
         
-        # Get latest version from S3
-        try:
-            latest_version = s3_manager.get_latest_version(bot_id, "code")
-            logger.info(f"Using latest version: {latest_version}")
-        except Exception as e:
-            logger.error(f"Could not get latest version for bot {bot_id}: {e}")
-            return None
-        
-        # Download bot code from S3
+        # Latest version (base classes from bot_sdk + bot code), compiled once per
+        # code version on this worker; the S3 listing is only repeated every
+        # BOT_MODULE_RECHECK_SECONDS
         try:
-            code_content = s3_manager.download_bot_code(bot_id, latest_version)
-            logger.info(f"Downloaded bot code from S3: {len(code_content)} characters")
+            bot_module = get_bot_module_cache().load_s3(s3_manager, bot_id, "code", preamble=get_base_classes)
         except Exception as e:
-            logger.error(f"Failed to download bot code from S3: {e}")
+            logger.error(f"Failed to load bot {bot_id} code from S3: {e}")
             return None
         
-        # Create temporary file to execute the code
-        # (tempfile and os already imported globally)
-        
-        # Load base classes from bot_sdk folder
-        base_classes = get_base_classes()
-        
-        # Combine base classes with downloaded bot code
-        full_code = base_classes + "\n" + code_content
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(full_code)
-            temp_file_path = f.name
-        
         try:
-            # Load bot module from temporary file
-            spec = importlib.util.spec_from_file_location("bot_module", temp_file_path)
-            if not spec or not spec.loader:
-                logger.error("Could not create module spec")
-                return None
-            
-            bot_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(bot_module)
-            
             # Find bot class in the module
             bot_class = None
             for attr_name in dir(bot_module):
@@ -551,12 +517,10 @@ def initialize_bot(subscription):
             
             return bot_instance
             
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+        except Exception:
+            # Recompiled on the next run instead of reusing a module that failed
+            get_bot_module_cache().evict_bot(bot_id)
+            raise
         
     except Exception as e:
         logger.error(f"Error initializing bot: {e}")
@@ -580,51 +544,28 @@ def initialize_bot_rpa_v1(subscription):
         bot_id = subscription.bot.id
         logger.info(f"Initializing bot {bot_id} from S3...")
         
-        # Get latest version from S3
+        # Bot code (base classes from bot_sdk + bot code) compiled once per code
+        # version on this worker
         try:
-            latest_version = s3_manager.get_latest_version(bot_id, "code")
-            latest_version_rpa = s3_manager.get_latest_version(bot_id, "rpa")
-            logger.info(f"Using latest version: {latest_version}, RPA version: {latest_version_rpa}")
+            bot_module = get_bot_module_cache().load_s3(s3_manager, bot_id, "code", preamble=get_base_classes)
         except Exception as e:
-            logger.error(f"Could not get latest version for bot {bot_id}: {e}")
+            logger.error(f"Failed to load bot {bot_id} code from S3: {e}")
             return None
         
-        # Download bot code from S3
+        # Download robot file from S3
         try:
-            code_content = s3_manager.download_bot_code(bot_id, latest_version, file_type="code")
+            latest_version_rpa = s3_manager.get_latest_version(bot_id, "rpa")
             rpa_code_content = s3_manager.download_bot_code(bot_id, latest_version_rpa, file_type="rpa")
-            logger.info(f"Downloaded bot code from S3: {len(code_content)} characters")
+            logger.info(f"Using RPA version: {latest_version_rpa}")
         except Exception as e:
-            logger.error(f"Failed to download bot code from S3: {e}")
+            logger.error(f"Failed to download robot file from S3: {e}")
             return None
         
-        # Create temporary file to execute the code
-        # (tempfile and os already imported globally)
-        
-        # Load base classes from bot_sdk folder
-        base_classes = get_base_classes()
-        
-        # Combine base classes with downloaded bot code
-        full_code = base_classes + "\n" + code_content
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(full_code)
-            temp_file_path = f.name
-
         with tempfile.NamedTemporaryFile(mode='w', suffix='.robot', delete=False) as rf:
             rf.write(rpa_code_content)
             robot_file_path = rf.name
         
         try:
-            # Load bot module from temporary file
-            spec = importlib.util.spec_from_file_location("bot_module", temp_file_path)
-            if not spec or not spec.loader:
-                logger.error("Could not create module spec")
-                return None
-            
-            bot_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(bot_module)
-            
             # Find bot class in the module
             bot_class = None
             for attr_name in dir(bot_module):
@@ -817,12 +758,10 @@ def initialize_bot_rpa_v1(subscription):
             
             return bot_instance
             
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+        except Exception:
+            # Recompiled on the next run instead of reusing a module that failed
+            get_bot_module_cache().evict_bot(bot_id)
+            raise
         
     except Exception as e:
         logger.error(f"Error initializing bot: {e}")
@@ -1021,6 +960,10 @@ def execute_trade_action(db, subscription, exchange, action, current_price):
         logger.error(traceback.format_exc())
         return False
 
+# Upper bound of subscriptions dispatched per scheduler tick and shard (0 = no limit);
+# the rest are picked up on the next tick, oldest next_run_at first
+SCHEDULER_MAX_DUE_PER_TICK = int(os.getenv('SCHEDULER_MAX_DUE_PER_TICK', 0))
+
 def _calculate_next_run(timeframe: str) -> 'datetime':
     """Helper function to calculate next run time based on timeframe"""
     from datetime import datetime, timedelta
@@ -1042,9 +985,14 @@ def _calculate_next_run(timeframe: str) -> 'datetime':
 
 
 @app.task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 60})
-def run_bot_logic(self, subscription_id: int):
+def run_bot_logic(self, subscription_id: int, market_key: Optional[str] = None):
     """
     Main task to run bot logic with duplicate execution prevention
+    
+    Args:
+        market_key: Set when dispatched by build_market_snapshot; the advanced
+                    workflow then reuses the shared market snapshot instead of
+                    crawling and analyzing again
     """
     # 🔒 LOCK: Prevent duplicate execution by multiple workers
     lock_key = f"bot_execution_lock_{subscription_id}"
@@ -1245,7 +1193,8 @@ def run_bot_logic(self, subscription_id: int):
                 'trading_pair': trading_pair,
                 'is_testnet': use_testnet,
                 'exchange_type': exchange_type.value,
-                'user_id': subscription.user_id or 0  # 0 for marketplace users
+                'user_id': subscription.user_id or 0,  # 0 for marketplace users
+                'market_key': market_key
                 }
 
                 # Execute bot prediction - Advanced workflow for Futures, Spot, and Signals bots
@@ -2292,78 +2241,176 @@ def run_bot_signal_logic(self, bot_id: int, subscription_id: int):
         except Exception as e:
             logger.warning(f"Failed to release Redis lock: {e}")
 
+@app.task(bind=True)
+def build_market_snapshot(self, market_key: str, subscription_ids: list, waiting_since: Optional[float] = None):
+    """
+    Stage 1 of the market fan-out: crawl and analyze one market once, then
+    dispatch the cheap per-subscription run_bot_logic tasks
+    
+    Subscriptions are always dispatched, even when the snapshot fails; they
+    then fall back to crawling and analyzing on their own. When another task
+    is building the same market, they are re-queued (waiting_since set) and
+    dispatched with that task's snapshot once it is stored.
+    """
+    from services import market_snapshot
+    
+    if waiting_since is not None:
+        snapshot = market_snapshot.load_snapshot(market_key)
+        if snapshot and snapshot.get('created_at', 0) >= waiting_since:
+            logger.info(f"♻️ Market snapshot {market_key} built by another task, dispatching {len(subscription_ids)} subscriptions")
+            for subscription_id in subscription_ids:
+                run_bot_logic.delay(subscription_id, market_key=market_key)
+            return {"status": "success", "subscriptions": len(subscription_ids), "snapshot": "shared"}
+    
+    lock_key = f"market_snapshot_lock:{market_key}"
+    redis_client = None
+    try:
+        from utils.redis_client import get_redis_client
+        redis_client = get_redis_client()
+        if redis_client and not redis_client.set(lock_key, "locked", nx=True, ex=300):
+            waiting_since = waiting_since or time.time()
+            if time.time() - waiting_since < market_snapshot.SNAPSHOT_LOCK_WAIT:
+                logger.info(f"🔒 Market snapshot {market_key} already being built, re-queueing {len(subscription_ids)} subscriptions")
+                build_market_snapshot.apply_async(
+                    args=[market_key, subscription_ids],
+                    kwargs={'waiting_since': waiting_since},
+                    countdown=market_snapshot.SNAPSHOT_LOCK_POLL
+                )
+                return {"status": "requeued", "subscriptions": len(subscription_ids)}
+            
+            logger.warning(f"⚠️ Market snapshot {market_key} still locked, subscriptions will crawl individually")
+            for subscription_id in subscription_ids:
+                run_bot_logic.delay(subscription_id)
+            return {"status": "fallback", "subscriptions": len(subscription_ids)}
+    except Exception as e:
+        logger.warning(f"Failed to acquire market snapshot lock, proceeding without lock: {e}")
+        redis_client = None
+    
+    built = False
+    try:
+        from core import crud
+        from core.database import SessionLocal
+        
+        db = SessionLocal()
+        try:
+            subscription = crud.get_subscription_by_id(db, subscription_ids[0])
+            bot = initialize_bot(subscription) if subscription else None
+            if bot and hasattr(bot, 'crawl_data') and hasattr(bot, 'analyze_data'):
+                market = market_snapshot.subscription_market(subscription)
+                snapshot_config = dict(market, subscription_id=subscription.id)
+                
+                logger.info(f"📸 Building market snapshot {market_key} for {len(subscription_ids)} subscriptions")
+                data = bot.crawl_data(subscription_config=snapshot_config)
+                if data.get("timeframes"):
+                    analysis = bot.analyze_data(data)
+                    if 'error' not in analysis:
+                        market_snapshot.store_snapshot(market_key, data, analysis)
+                        built = True
+                        logger.info(f"✅ Market snapshot {market_key} stored")
+            if not built:
+                logger.warning(f"⚠️ Market snapshot {market_key} not built, subscriptions will crawl individually")
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"Error building market snapshot {market_key}: {e}")
+        logger.error(traceback.format_exc())
+    finally:
+        market_snapshot.record_metrics(
+            snapshots_built=1 if built else 0,
+            snapshot_failures=0 if built else 1
+        )
+        try:
+            if redis_client:
+                redis_client.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Failed to release market snapshot lock: {e}")
+    
+    # Stage 2: per-subscription risk/capital management and execution
+    for subscription_id in subscription_ids:
+        run_bot_logic.delay(subscription_id, market_key=market_key if built else None)
+    
+    return {"status": "success" if built else "fallback", "subscriptions": len(subscription_ids)}
+
 @app.task
-def schedule_active_bots():
-    """Schedule active bots for execution"""
+def schedule_active_bots(shard_index: int = 0, shard_count: int = 1):
+    """
+    Schedule active bots for execution
+    
+    Due subscriptions come from one indexed query (crud.get_due_subscriptions);
+    with shard_count > 1 each beat entry only handles subscription ids where
+    id % shard_count == shard_index.
+    
+    Due FUTURES/SPOT/SIGNALS_FUTURES subscriptions are grouped by market: a
+    market shared by several subscriptions gets one build_market_snapshot task
+    that crawls and analyzes once and then fans out to run_bot_logic.
+    """
     try:
         from core.database import SessionLocal
         from core import crud
-        from core import models
         
         db = SessionLocal()
         
         try:
-            # Get all active subscriptions
-            active_subscriptions = crud.get_active_subscriptions(db)
+            # Get due subscriptions (time range and next_run_at filtered in SQL)
+            tick_started = time.time()
+            due_subscriptions = crud.get_due_subscriptions(
+                db,
+                now=datetime.utcnow(),
+                shard_index=shard_index,
+                shard_count=shard_count,
+                limit=SCHEDULER_MAX_DUE_PER_TICK or None
+            )
+            logger.info(f"⏱️ Scheduler shard {shard_index + 1}/{shard_count}: {len(due_subscriptions)} due subscriptions "
+                        f"loaded in {(time.time() - tick_started) * 1000:.1f}ms")
+            market_subscriptions = []
             
-            for subscription in active_subscriptions:
-                # Check subscription time range first
-                now = datetime.utcnow()
+            for subscription in due_subscriptions:
+                if not subscription.next_run_at:
+                    logger.info(f"Subscription {subscription.id} has no next_run_at, scheduling immediately")
                 
-                # Skip if subscription has expired
-                if subscription.expires_at and subscription.expires_at < now:
-                    logger.debug(f"Subscription {subscription.id} has expired (ended at {subscription.expires_at}), skipping")
-                    continue
+                logger.info(f"Scheduling bot execution for subscription {subscription.id}")
                 
-                # Skip if subscription hasn't started yet
-                if subscription.started_at and subscription.started_at > now:
-                    logger.debug(f"Subscription {subscription.id} hasn't started yet (starts at {subscription.started_at}), skipping")
-                    continue
+                # Convert bot_type enum to string for comparison
+                bot_type_str = str(subscription.bot.bot_type).upper().strip() if subscription.bot.bot_type else None
+                bot_mode_str = str(subscription.bot.bot_mode).upper().strip() if subscription.bot.bot_mode else "ACTIVE"
                 
-                # Check if it's time to run this bot
-                should_run = False
+                # Remove "BotType." prefix if present
+                if bot_type_str and "." in bot_type_str:
+                    bot_type_str = bot_type_str.split(".")[-1]
                 
-                if subscription.next_run_at:
-                    # If next_run_at is set, check if it's time to run
-                    should_run = subscription.next_run_at <= now
-                else:
-                    # If next_run_at is NULL, run immediately
-                    should_run = True
-                    logger.info(f"Subscription {subscription.id} has no next_run_at, scheduling immediately")
+                logger.info(f"📊 Routing bot: subscription={subscription.id}, bot_type={bot_type_str}, bot_mode={bot_mode_str}")
                 
-                if should_run:
-                    logger.info(f"Scheduling bot execution for subscription {subscription.id}")
-                    
-                    # Convert bot_type enum to string for comparison
-                    bot_type_str = str(subscription.bot.bot_type).upper().strip() if subscription.bot.bot_type else None
-                    bot_mode_str = str(subscription.bot.bot_mode).upper().strip() if subscription.bot.bot_mode else "ACTIVE"
-                    
-                    # Remove "BotType." prefix if present
-                    if bot_type_str and "." in bot_type_str:
-                        bot_type_str = bot_type_str.split(".")[-1]
-                    
-                    logger.info(f"📊 Routing bot: subscription={subscription.id}, bot_type={bot_type_str}, bot_mode={bot_mode_str}")
-                    
-                    # Handle SIGNALS_FUTURES type (signals-only futures bot using bot template)
-                    if bot_type_str == "SIGNALS_FUTURES":
-                        run_bot_logic.delay(subscription.id)
-                        logger.info(f"✅ Triggered run_bot_logic for SIGNALS_FUTURES bot (subscription {subscription.id})")
-                    elif bot_mode_str != "PASSIVE" and bot_type_str in ["FUTURES", "SPOT"]:
-                        # Active FUTURES and SPOT bots use run_bot_logic
-                        run_bot_logic.delay(subscription.id)
-                        logger.info(f"✅ Triggered run_bot_logic for {bot_type_str} bot (subscription {subscription.id})")
-                    elif bot_type_str == "FUTURES_RPA":
-                        run_bot_rpa_logic.delay(subscription.id)
-                        logger.info(f"✅ Triggered run_bot_rpa_logic for RPA bot (subscription {subscription.id})")
-                    else:
-                        # Handle PASSIVE bots (legacy signal-only using Robot Framework)
-                        run_bot_signal_logic.delay(subscription.bot.id, subscription.id)
-                        logger.info(f"✅ Triggered run_bot_signal_logic for PASSIVE bot (subscription {subscription.id})")
-
-                    # ✅ NOTE: next_run_at is now updated by the task itself after completion
-                    # This ensures accurate scheduling based on actual execution time
+                # Handle SIGNALS_FUTURES type (signals-only futures bot using bot template)
+                if bot_type_str == "SIGNALS_FUTURES" or (bot_mode_str != "PASSIVE" and bot_type_str in ["FUTURES", "SPOT"]):
+                    # SIGNALS_FUTURES and active FUTURES/SPOT bots use run_bot_logic,
+                    # dispatched per market below
+                    market_subscriptions.append(subscription)
+                elif bot_type_str == "FUTURES_RPA":
+                    run_bot_rpa_logic.delay(subscription.id)
+                    logger.info(f"✅ Triggered run_bot_rpa_logic for RPA bot (subscription {subscription.id})")
                 else:
-                    logger.debug(f"Subscription {subscription.id} not ready to run yet. Next run: {subscription.next_run_at}")
+                    # Handle PASSIVE bots (legacy signal-only using Robot Framework)
+                    run_bot_signal_logic.delay(subscription.bot.id, subscription.id)
+                    logger.info(f"✅ Triggered run_bot_signal_logic for PASSIVE bot (subscription {subscription.id})")
+
+                # ✅ NOTE: next_run_at is now updated by the task itself after completion
+                # This ensures accurate scheduling based on actual execution time
+            
+            # Fan out by market: one snapshot per shared market, direct dispatch otherwise
+            if market_subscriptions:
+                from services import market_snapshot
+                groups = market_snapshot.group_by_market(market_subscriptions)
+                for market_key, subscription_ids in groups.items():
+                    if len(subscription_ids) > 1:
+                        build_market_snapshot.delay(market_key, subscription_ids)
+                        logger.info(f"✅ Triggered build_market_snapshot for {market_key} ({len(subscription_ids)} subscriptions)")
+                    else:
+                        run_bot_logic.delay(subscription_ids[0])
+                        logger.info(f"✅ Triggered run_bot_logic (subscription {subscription_ids[0]})")
+                
+                market_snapshot.record_fanout(groups)
+                logger.info(f"📡 Fan-out: {len(market_subscriptions)} subscriptions across {len(groups)} markets "
+                            f"({len(market_subscriptions) - len(groups)} duplicate crawl/analysis runs avoided)")
                     
         finally:
             db.close()
@@ -3215,22 +3262,47 @@ async def run_advanced_futures_workflow(bot, subscription_id: int, subscription_
                     reason="Failed to check account status"
                 ), None, None
         
-        # 2. Crawl multi-timeframe data (instead of single timeframe)
-        logger.info("📊 Step 2: Crawling multi-timeframe data...")
-        logger.info(f"📊 Crawling with subscription_config: trading_pair={selected_trading_pair}, timeframes={subscription_config.get('timeframes')}")
-        # Pass subscription_config to avoid race conditions with shared bot instance
-        multi_timeframe_data = bot.crawl_data(subscription_config=subscription_config)
-        if not multi_timeframe_data.get("timeframes"):
-            logger.error("❌ Failed to crawl multi-timeframe data")
-            from bots.bot_sdk.Action import Action
-            return Action(action="HOLD", value=0.0, reason="Multi-timeframe data crawl failed"), account_status, None
-        
-        timeframes_crawled = list(multi_timeframe_data['timeframes'].keys())
-        logger.info(f"✅ Crawled {len(timeframes_crawled)} timeframes: {timeframes_crawled}")
+        # 2-3. Reuse the shared market snapshot when dispatched by build_market_snapshot
+        snapshot = None
+        if subscription_config.get('market_key'):
+            from services import market_snapshot
+            expected_key = market_snapshot.market_key(
+                subscription.bot_id,
+                subscription_config.get('exchange_type'),
+                subscription_config.get('is_testnet', True),
+                selected_trading_pair,
+                subscription_config.get('timeframes') or []
+            )
+            # A secondary pair was selected -> snapshot is for another market
+            if expected_key == subscription_config['market_key']:
+                snapshot = market_snapshot.load_snapshot(expected_key)
+            market_snapshot.record_metrics(
+                snapshot_hits=1 if snapshot else 0,
+                snapshot_misses=0 if snapshot else 1
+            )
         
-        # 3. Analyze all timeframes (instead of single timeframe)
-        logger.info("🔍 Step 3: Analyzing multi-timeframe data...")
-        analysis = bot.analyze_data(multi_timeframe_data)
+        if snapshot:
+            multi_timeframe_data = snapshot['data']
+            analysis = snapshot['analysis']
+            logger.info(f"♻️ Steps 2-3: Reusing market snapshot {subscription_config['market_key']} "
+                        f"(age {time.time() - snapshot['created_at']:.1f}s) - skipping crawl and analysis")
+        else:
+            # 2. Crawl multi-timeframe data (instead of single timeframe)
+            logger.info("📊 Step 2: Crawling multi-timeframe data...")
+            logger.info(f"📊 Crawling with subscription_config: trading_pair={selected_trading_pair}, timeframes={subscription_config.get('timeframes')}")
+            # Pass subscription_config to avoid race conditions with shared bot instance
+            multi_timeframe_data = bot.crawl_data(subscription_config=subscription_config)
+            if not multi_timeframe_data.get("timeframes"):
+                logger.error("❌ Failed to crawl multi-timeframe data")
+                from bots.bot_sdk.Action import Action
+                return Action(action="HOLD", value=0.0, reason="Multi-timeframe data crawl failed"), account_status, None
+            
+            timeframes_crawled = list(multi_timeframe_data['timeframes'].keys())
+            logger.info(f"✅ Crawled {len(timeframes_crawled)} timeframes: {timeframes_crawled}")
+            
+            # 3. Analyze all timeframes (instead of single timeframe)
+            logger.info("🔍 Step 3: Analyzing multi-timeframe data...")
+            analysis = bot.analyze_data(multi_timeframe_data)
         if 'error' in analysis:
             logger.error(f"❌ Multi-timeframe analysis error: {analysis['error']}")
             from bots.bot_sdk.Action import Action
@@ -3928,7 +4000,7 @@ def monitor_open_positions_task(self):
 
 
 @app.task(bind=True)
-def update_bot_performance_metrics(self, bot_id: int):
+def update_bot_performance_metrics(self, bot_id: int, transaction_id: Optional[int] = None):
     """
     Calculate and update performance metrics for a bot
     - Win rate
@@ -3936,42 +4008,45 @@ def update_bot_performance_metrics(self, bot_id: int):
     - Risk-reward achievement
     - Total trades
     
-    Triggered when a position closes
+    Triggered when a position closes. The closed trade (or, without
+    transaction_id, any closed trade of the bot not applied yet) is folded
+    into the running aggregates in services.performance_aggregates, so the
+    cost does not grow with the bot's history.
     """
     try:
         from core.database import SessionLocal
         from core import models
-        from sqlalchemy import func
+        from services import performance_aggregates
         
         logger.info(f"📈 Calculating performance metrics for bot {bot_id}...")
         
         db = SessionLocal()
         
         try:
-            # Get all closed transactions for this bot
-            transactions = db.query(models.Transaction).filter(
-                models.Transaction.bot_id == bot_id,
-                models.Transaction.status == 'CLOSED'
-            ).all()
+            # Marketplace listing metrics (materialized per bot)
+            try:
+                from core import crud
+                crud.refresh_bot_marketplace_metrics(db, [bot_id])
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Failed to refresh marketplace metrics for bot {bot_id}: {e}")
             
-            if not transactions:
+            if transaction_id is not None:
+                pending = [transaction_id]
+            else:
+                pending = [row[0] for row in db.query(models.Transaction.id).filter(
+                    models.Transaction.bot_id == bot_id,
+                    models.Transaction.status == 'CLOSED',
+                    models.Transaction.metrics_applied_at.is_(None)
+                ).all()]
+            for pending_id in pending:
+                performance_aggregates.apply_closed_trade(db, pending_id)
+            
+            aggregate = performance_aggregates.get_aggregate(db, performance_aggregates.BOT, bot_id)
+            if aggregate is None:
                 logger.info(f"No closed transactions for bot {bot_id}")
                 return {"status": "no_data"}
-            
-            # Calculate metrics
-            total_trades = len(transactions)
-            winning_trades = len([t for t in transactions if t.is_winning])
-            losing_trades = total_trades - winning_trades
-            
-            win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-            
-            total_pnl = sum([float(t.pnl_usd or 0) for t in transactions])
-            avg_pnl = total_pnl / total_trades if total_trades > 0 else 0
-            
-            avg_win = sum([float(t.pnl_usd or 0) for t in transactions if t.is_winning]) / winning_trades if winning_trades > 0 else 0
-            avg_loss = sum([float(t.pnl_usd or 0) for t in transactions if not t.is_winning]) / losing_trades if losing_trades > 0 else 0
-            
-            profit_factor = abs(avg_win * winning_trades / (avg_loss * losing_trades)) if losing_trades > 0 and avg_loss != 0 else 0
+            performance = performance_aggregates.trade_metrics(aggregate)
             
             # Update bot metadata with performance stats
             bot = db.query(models.Bot).filter(models.Bot.id == bot_id).first()
@@ -3982,15 +4057,7 @@ def update_bot_performance_metrics(self, bot_id: int):
                 
                 metadata_dict = dict(bot.bot_metadata) if bot.bot_metadata else {}
                 metadata_dict['performance'] = {
-                    'total_trades': total_trades,
-                    'winning_trades': winning_trades,
-                    'losing_trades': losing_trades,
-                    'win_rate': round(win_rate, 2),
-                    'total_pnl': round(total_pnl, 2),
-                    'avg_pnl': round(avg_pnl, 2),
-                    'avg_win': round(avg_win, 2),
-                    'avg_loss': round(avg_loss, 2),
-                    'profit_factor': round(profit_factor, 2),
+                    **performance,
                     'last_updated': datetime.now().isoformat()
                 }
                 bot.bot_metadata = metadata_dict
@@ -4000,10 +4067,10 @@ def update_bot_performance_metrics(self, bot_id: int):
             
             metrics = {
                 'bot_id': bot_id,
-                'total_trades': total_trades,
-                'win_rate': round(win_rate, 2),
-                'total_pnl': round(total_pnl, 2),
-                'profit_factor': round(profit_factor, 2)
+                'total_trades': performance['total_trades'],
+                'win_rate': performance['win_rate'],
+                'total_pnl': performance['total_pnl'],
+                'profit_factor': performance['profit_factor']
             }
             
             logger.info(f"✅ Bot {bot_id} performance updated: {metrics}")
@@ -4026,52 +4093,29 @@ def update_prompt_performance_metrics(self, prompt_id: int):
     - Average P&L
     - Total trades
     
-    Triggered when a position closes
+    Reads the running 'prompt' aggregate, which every close updates
     """
     try:
         from core.database import SessionLocal
-        from core import models
+        from services import performance_aggregates
         
         logger.info(f"📈 Calculating performance metrics for prompt {prompt_id}...")
         
         db = SessionLocal()
         
         try:
-            # Get all closed transactions using this prompt
-            transactions = db.query(models.Transaction).filter(
-                models.Transaction.prompt_id == prompt_id,
-                models.Transaction.status == 'CLOSED'
-            ).all()
-            
-            if not transactions:
+            aggregate = performance_aggregates.get_aggregate(db, performance_aggregates.PROMPT, prompt_id)
+            if aggregate is None:
                 logger.info(f"No closed transactions for prompt {prompt_id}")
                 return {"status": "no_data"}
-            
-            # Calculate metrics
-            total_trades = len(transactions)
-            winning_trades = len([t for t in transactions if t.is_winning])
-            
-            win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-            total_pnl = sum([float(t.pnl_usd or 0) for t in transactions])
-            avg_pnl = total_pnl / total_trades if total_trades > 0 else 0
-            
-            # Update prompt usage stats
-            usage_stat = db.query(models.PromptUsageStats).filter(
-                models.PromptUsageStats.prompt_id == prompt_id
-            ).first()
-            
-            if usage_stat:
-                usage_stat.success_count = winning_trades
-                usage_stat.total_uses = total_trades
-                usage_stat.updated_at = datetime.now()
-                db.commit()
+            performance = performance_aggregates.trade_metrics(aggregate)
             
             metrics = {
                 'prompt_id': prompt_id,
-                'total_trades': total_trades,
-                'win_rate': round(win_rate, 2),
-                'total_pnl': round(total_pnl, 2),
-                'avg_pnl': round(avg_pnl, 2)
+                'total_trades': performance['total_trades'],
+                'win_rate': performance['win_rate'],
+                'total_pnl': performance['total_pnl'],
+                'avg_pnl': performance['avg_pnl']
             }
             
             logger.info(f"✅ Prompt {prompt_id} performance updated: {metrics}")
@@ -4094,51 +4138,24 @@ def update_risk_management_performance(self, bot_id: int):
     - Average RR achievement
     - Slippage analysis
     
-    Triggered when a position closes
+    Reads the running 'bot' aggregate, which every close updates
     """
     try:
         from core.database import SessionLocal
-        from core import models
+        from services import performance_aggregates
         
         logger.info(f"📊 Analyzing risk management for bot {bot_id}...")
         
         db = SessionLocal()
         
         try:
-            # Get all closed transactions
-            transactions = db.query(models.Transaction).filter(
-                models.Transaction.bot_id == bot_id,
-                models.Transaction.status == 'CLOSED'
-            ).all()
-            
-            if not transactions:
+            aggregate = performance_aggregates.get_aggregate(db, performance_aggregates.BOT, bot_id)
+            if aggregate is None:
                 return {"status": "no_data"}
             
-            # Analyze exit reasons
-            tp_hits = len([t for t in transactions if t.exit_reason == 'TP_HIT'])
-            sl_hits = len([t for t in transactions if t.exit_reason == 'SL_HIT'])
-            manual_exits = len([t for t in transactions if t.exit_reason == 'MANUAL'])
-            
-            # Calculate RR achievement
-            avg_planned_rr = sum([float(t.risk_reward_ratio or 0) for t in transactions]) / len(transactions)
-            avg_actual_rr = sum([float(t.actual_rr_ratio or 0) for t in transactions]) / len(transactions)
-            
-            rr_achievement_rate = (avg_actual_rr / avg_planned_rr * 100) if avg_planned_rr > 0 else 0
-            
-            # Analyze slippage
-            transactions_with_slippage = [t for t in transactions if t.slippage]
-            avg_slippage = sum([float(t.slippage) for t in transactions_with_slippage]) / len(transactions_with_slippage) if transactions_with_slippage else 0
-            
             risk_metrics = {
                 'bot_id': bot_id,
-                'total_trades': len(transactions),
-                'tp_hit_rate': round(tp_hits / len(transactions) * 100, 2),
-                'sl_hit_rate': round(sl_hits / len(transactions) * 100, 2),
-                'manual_exit_rate': round(manual_exits / len(transactions) * 100, 2),
-                'avg_planned_rr': round(avg_planned_rr, 2),
-                'avg_actual_rr': round(avg_actual_rr, 2),
-                'rr_achievement_rate': round(rr_achievement_rate, 2),
-                'avg_slippage': round(avg_slippage, 4)
+                **performance_aggregates.risk_metrics(aggregate)
             }
             
             logger.info(f"✅ Risk management analysis for bot {bot_id}: {risk_metrics}")
@@ -4206,4 +4223,93 @@ def sync_open_positions_realtime(self):
         logger.error(f"❌ Position sync task failed: {e}")
         logger.error(traceback.format_exc())
         # Retry with backoff (30 seconds)
-        raise self.retry(exc=e, countdown=30)
\ No newline at end of file
+        raise self.retry(exc=e, countdown=30)
+
+@app.task
+def refresh_symbol_registry():
+    """
+    Reload lot size / tick size / min notional of every exchange instrument
+    into the shared symbol registry (Redis or local disk) before it expires
+    """
+    try:
+        from services.exchange_integrations.symbol_registry import refresh_exchange_symbols
+        
+        results = refresh_exchange_symbols()
+        failed = {label: result for label, result in results.items() if isinstance(result, str)}
+        logger.info(f"📐 Symbol registry refreshed: {len(results) - len(failed)} ok, {len(failed)} failed")
+        for label, error in failed.items():
+            logger.warning(f"   {label}: {error}")
+        return results
+    except Exception as e:
+        logger.error(f"❌ Symbol registry refresh failed: {e}")
+        return {"status": "error", "message": str(e)}
+
+
+@app.task
+def rebuild_marketplace_metrics():
+    """
+    Rebuild bot_marketplace_metrics for every bot
+    
+    Closing a position refreshes its bot immediately; this periodic rebuild
+    picks up unrealized P&L of open positions and corrects any missed update.
+    """
+    from core.database import SessionLocal
+    from core import crud
+    
+    db = SessionLocal()
+    try:
+        started = time.time()
+        count = crud.refresh_bot_marketplace_metrics(db)
+        logger.info(f"📊 Marketplace metrics rebuilt for {count} bots in {time.time() - started:.2f}s")
+        return {"status": "success", "bots": count}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Marketplace metrics rebuild failed: {e}")
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+
+@app.task
+def rebuild_performance_aggregates():
+    """
+    Rebuild every bot and prompt performance aggregate from the trade history
+    
+    Closes update the aggregates incrementally; this periodic rebuild corrects
+    drift (edited or deleted trades, P&L fixed after the close).
+    """
+    from core.database import SessionLocal
+    from services import performance_aggregates
+    
+    db = SessionLocal()
+    try:
+        started = time.time()
+        rebuilt = performance_aggregates.rebuild_all(db)
+        logger.info(f"📈 Performance aggregates rebuilt ({rebuilt}) in {time.time() - started:.2f}s")
+        return {"status": "success", **rebuilt}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Performance aggregates rebuild failed: {e}")
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+
+@app.task
+def flush_llm_quota_ledger():
+    """
+    Write LLM calls counted in the quota ledger back to UserPlan.llm_quota_used
+    
+    Workers flush their own reservations in the background; this also covers
+    calls left unflushed by a worker that stopped without flushing.
+    """
+    from services.llm_quota_ledger import get_quota_ledger
+    
+    try:
+        written = get_quota_ledger().flush()
+        if written:
+            logger.info(f"🧮 LLM quota usage written back for {written} developers")
+        return {"status": "success", "developers": written}
+    except Exception as e:
+        logger.error(f"❌ LLM quota ledger flush failed: {e}")
+        return {"status": "error", "message": str(e)}
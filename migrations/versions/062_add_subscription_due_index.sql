@@ -0,0 +1,8 @@
+-- Migration: Index for scheduler due-subscription scan
+-- Description: schedule_active_bots filters subscriptions by (status, next_run_at)
+--              in SQL (crud.get_due_subscriptions); this composite index keeps the
+--              per-tick query a range scan instead of a full table scan
+
+USE bot_marketplace;
+
+CREATE INDEX idx_subscriptions_status_next_run ON subscriptions (status, next_run_at);
@@ -0,0 +1,67 @@
+-- Migration: Materialized marketplace metrics per bot
+-- Description: crud.get_public_bots used to aggregate every bot's transactions
+--              in Python on each listing request. Metrics are now kept in
+--              bot_marketplace_metrics (one row per bot and network scope),
+--              refreshed when a position closes and rebuilt periodically, so the
+--              listing is a single indexed join. The backfill below mirrors
+--              crud.refresh_bot_marketplace_metrics.
+
+USE bot_marketplace;
+
+CREATE TABLE IF NOT EXISTS bot_marketplace_metrics (
+    bot_id INT NOT NULL,
+    network VARCHAR(10) NOT NULL,
+    total_pnl DOUBLE DEFAULT 0,
+    realized_pnl DOUBLE DEFAULT 0,
+    unrealized_pnl DOUBLE DEFAULT 0,
+    total_trades INT DEFAULT 0,
+    closed_trades INT DEFAULT 0,
+    winning_trades INT DEFAULT 0,
+    win_rate DOUBLE DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (bot_id, network),
+    INDEX idx_bot_marketplace_metrics_network_pnl (network, total_pnl),
+    FOREIGN KEY (bot_id) REFERENCES bots(id) ON DELETE CASCADE
+);
+
+-- Per network scope
+INSERT INTO bot_marketplace_metrics
+    (bot_id, network, total_pnl, realized_pnl, unrealized_pnl, total_trades, closed_trades, winning_trades, win_rate)
+SELECT
+    agg.bot_id, agg.network,
+    agg.realized_pnl + agg.unrealized_pnl, agg.realized_pnl, agg.unrealized_pnl,
+    agg.total_trades, agg.closed_trades, agg.winning_trades,
+    IF(agg.closed_trades > 0, agg.winning_trades / agg.closed_trades * 100, 0)
+FROM (
+    SELECT
+        s.bot_id,
+        IF(s.is_testnet = 1, 'testnet', 'mainnet') AS network,
+        COALESCE(SUM(CASE WHEN t.status = 'CLOSED' AND t.realized_pnl <> 0 THEN t.realized_pnl ELSE 0 END), 0) AS realized_pnl,
+        COALESCE(SUM(CASE WHEN t.status = 'OPEN' AND t.unrealized_pnl <> 0 THEN t.unrealized_pnl ELSE 0 END), 0) AS unrealized_pnl,
+        COUNT(*) AS total_trades,
+        SUM(CASE WHEN t.status = 'CLOSED' AND t.realized_pnl <> 0 THEN 1 ELSE 0 END) AS closed_trades,
+        SUM(CASE WHEN t.status = 'CLOSED' AND t.realized_pnl > 0 THEN 1 ELSE 0 END) AS winning_trades
+    FROM transactions t
+    JOIN subscriptions s ON s.id = t.subscription_id
+    GROUP BY s.bot_id, network
+) agg
+ON DUPLICATE KEY UPDATE
+    total_pnl = VALUES(total_pnl), realized_pnl = VALUES(realized_pnl), unrealized_pnl = VALUES(unrealized_pnl),
+    total_trades = VALUES(total_trades), closed_trades = VALUES(closed_trades),
+    winning_trades = VALUES(winning_trades), win_rate = VALUES(win_rate);
+
+-- All networks combined
+INSERT INTO bot_marketplace_metrics
+    (bot_id, network, total_pnl, realized_pnl, unrealized_pnl, total_trades, closed_trades, winning_trades, win_rate)
+SELECT
+    m.bot_id, 'all',
+    SUM(m.total_pnl), SUM(m.realized_pnl), SUM(m.unrealized_pnl),
+    SUM(m.total_trades), SUM(m.closed_trades), SUM(m.winning_trades),
+    IF(SUM(m.closed_trades) > 0, SUM(m.winning_trades) / SUM(m.closed_trades) * 100, 0)
+FROM bot_marketplace_metrics m
+WHERE m.network IN ('mainnet', 'testnet')
+GROUP BY m.bot_id
+ON DUPLICATE KEY UPDATE
+    total_pnl = VALUES(total_pnl), realized_pnl = VALUES(realized_pnl), unrealized_pnl = VALUES(unrealized_pnl),
+    total_trades = VALUES(total_trades), closed_trades = VALUES(closed_trades),
+    winning_trades = VALUES(winning_trades), win_rate = VALUES(win_rate);
@@ -0,0 +1,10 @@
+-- Migration: Index for bot analytics aggregates and keyset pagination
+-- Description: crud.get_bot_analytics aggregates a bot's transactions per
+--              (day, network) over the period and pages recent transactions
+--              by (created_at, id); both reach transactions through the bot's
+--              subscriptions, so (subscription_id, created_at) turns each
+--              subscription's slice into a range scan
+
+USE bot_marketplace;
+
+CREATE INDEX idx_transactions_subscription_created ON transactions (subscription_id, created_at);
@@ -0,0 +1,35 @@
+-- Migration: Running performance aggregates per bot and prompt
+-- Description: update_bot_performance_metrics used to reload every closed trade
+--              of the bot on each close. Closes are now folded into
+--              performance_aggregates (services/performance_aggregates.py) and
+--              flagged with transactions.metrics_applied_at so they are counted
+--              once. Rows are built lazily on first access and rebuilt
+--              periodically by the rebuild_performance_aggregates task.
+
+USE bot_marketplace;
+
+CREATE TABLE IF NOT EXISTS performance_aggregates (
+    scope VARCHAR(10) NOT NULL,
+    scope_id INT NOT NULL,
+    total_trades INT DEFAULT 0,
+    winning_trades INT DEFAULT 0,
+    pnl_sum DOUBLE DEFAULT 0,
+    pnl_sq_sum DOUBLE DEFAULT 0,
+    win_pnl_sum DOUBLE DEFAULT 0,
+    loss_pnl_sum DOUBLE DEFAULT 0,
+    equity DOUBLE DEFAULT 0,
+    equity_peak DOUBLE DEFAULT 0,
+    max_drawdown DOUBLE DEFAULT 0,
+    tp_hits INT DEFAULT 0,
+    sl_hits INT DEFAULT 0,
+    manual_exits INT DEFAULT 0,
+    planned_rr_sum DOUBLE DEFAULT 0,
+    actual_rr_sum DOUBLE DEFAULT 0,
+    slippage_trades INT DEFAULT 0,
+    slippage_sum DOUBLE DEFAULT 0,
+    rebuilt_at DATETIME NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (scope, scope_id)
+);
+
+ALTER TABLE transactions ADD COLUMN metrics_applied_at DATETIME NULL;
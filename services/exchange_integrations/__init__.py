@@ -11,6 +11,16 @@ from .exchange_factory import create_futures_exchange
 from .base_spot_exchange import BaseSpotExchange, SpotOrderInfo, SpotBalance
 from .exchange_factory import create_spot_exchange
 
+# Shared market data
+from .kline_cache import KlineCache, get_kline_cache
+from .symbol_registry import SymbolRegistry, get_symbol_registry
+
+# Pooled HTTP transport
+from .http_transport import ExchangeHttpTransport, get_transport, get_transport_stats
+
+# Pooled exchange clients
+from .client_pool import ExchangeClientPool, get_client_pool, get_futures_client
+
 __all__ = [
     # Futures
     'BaseFuturesExchange',
@@ -21,6 +31,19 @@ __all__ = [
     'BaseSpotExchange',
     'SpotOrderInfo',
     'SpotBalance',
-    'create_spot_exchange'
+    'create_spot_exchange',
+    # Shared market data
+    'KlineCache',
+    'get_kline_cache',
+    'SymbolRegistry',
+    'get_symbol_registry',
+    # Pooled HTTP transport
+    'ExchangeHttpTransport',
+    'get_transport',
+    'get_transport_stats',
+    # Pooled exchange clients
+    'ExchangeClientPool',
+    'get_client_pool',
+    'get_futures_client'
 ]
 
@@ -9,6 +9,10 @@ from dataclasses import dataclass
 import pandas as pd
 import logging
 
+from .kline_cache import get_kline_cache
+from .http_transport import get_transport, ExchangeHttpTransport
+from .symbol_registry import get_symbol_registry
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -47,7 +51,6 @@ class BaseFuturesExchange(ABC):
         self.api_secret = api_secret
         self.testnet = testnet
         self._time_offset = 0
-        self._symbol_info_cache = {}
         
         logger.info(f"Initialized {self.__class__.__name__} {'TESTNET' if testnet else 'PRODUCTION'}")
     
@@ -57,6 +60,61 @@ class BaseFuturesExchange(ABC):
         """Return exchange name (e.g., 'BINANCE', 'BYBIT')"""
         pass
     
+    @property
+    def http(self) -> ExchangeHttpTransport:
+        """Pooled keep-alive transport shared by every client of this exchange"""
+        return get_transport(self.exchange_name)
+    
+    def _make_request(self, method: str, endpoint: str, params: dict = None,
+                      signed: bool = False, **options):
+        """Make (signed) request to the exchange API, blocking wrapper around the pooled transport"""
+        for attempt in range(2):
+            request_params = dict(params or {})
+            try:
+                request = self._prepare_request(method, endpoint, request_params, signed, **options)
+                response = self.http.request(**request)
+                return self._parse_response(response, method, endpoint, request_params)
+            except Exception as e:
+                if attempt == 0 and self._should_retry(e, method, endpoint, request_params):
+                    continue
+                raise self._request_error(e, method, endpoint, request_params)
+    
+    async def _amake_request(self, method: str, endpoint: str, params: dict = None,
+                             signed: bool = False, **options):
+        """Async _make_request: same signing and parsing, non-blocking I/O"""
+        for attempt in range(2):
+            request_params = dict(params or {})
+            try:
+                request = self._prepare_request(method, endpoint, request_params, signed, **options)
+                response = await self.http.arequest(**request)
+                return self._parse_response(response, method, endpoint, request_params)
+            except Exception as e:
+                if attempt == 0 and self._should_retry(e, method, endpoint, request_params):
+                    continue
+                raise self._request_error(e, method, endpoint, request_params)
+    
+    @abstractmethod
+    def _prepare_request(self, method: str, endpoint: str, params: dict, signed: bool,
+                         **options) -> Dict[str, Any]:
+        """
+        Sign the request and return the transport arguments
+        (method, url, headers and params/data/json). `params` may be mutated.
+        """
+        pass
+    
+    @abstractmethod
+    def _parse_response(self, response, method: str, endpoint: str, params: dict) -> Any:
+        """Check the HTTP/API status of a response and return its payload"""
+        pass
+    
+    def _should_retry(self, error: Exception, method: str, endpoint: str, params: dict) -> bool:
+        """Return True to re-sign and resend once (e.g. after a timestamp error)"""
+        return False
+    
+    def _request_error(self, error: Exception, method: str, endpoint: str, params: dict) -> Exception:
+        """Exception raised to the caller for a failed request"""
+        return error
+    
     @abstractmethod
     def test_connectivity(self) -> bool:
         """Test API connectivity"""
@@ -87,6 +145,19 @@ class BaseFuturesExchange(ABC):
         """Get quantity and price precision for symbol"""
         pass
     
+    def _load_symbol_precisions(self) -> Optional[Dict[str, dict]]:
+        """
+        Fetch precision info of every instrument with one request (symbol registry loader)
+        
+        None means the exchange has no bulk loader; get_symbol_precision then
+        keeps its per-symbol request.
+        """
+        return None
+    
+    def _registry_precision(self, symbol: str) -> Optional[dict]:
+        """Precision info from the shared symbol registry, None if the symbol is unknown"""
+        return get_symbol_registry().get(self.exchange_name, self.testnet, symbol, self._load_symbol_precisions)
+    
     @abstractmethod
     def round_quantity(self, quantity: float, symbol: str) -> str:
         """Round quantity to proper precision"""
@@ -124,10 +195,29 @@ class BaseFuturesExchange(ABC):
         """Cancel all open orders for symbol"""
         pass
     
-    @abstractmethod
     def get_klines(self, symbol: str, interval: str, limit: int = 100, 
                    start_time: int = None, end_time: int = None) -> pd.DataFrame:
-        """Get futures kline/candlestick data"""
+        """
+        Get futures kline/candlestick data
+        Closed candles are served from the shared kline cache, only missing ones hit the exchange
+        """
+        return get_kline_cache().get_klines(
+            exchange=self.exchange_name,
+            market='futures',
+            testnet=self.testnet,
+            symbol=symbol,
+            interval=interval,
+            limit=limit,
+            start_time=start_time,
+            end_time=end_time,
+            fetch=self._fetch_klines,
+            time_offset=self._time_offset
+        )
+    
+    @abstractmethod
+    def _fetch_klines(self, symbol: str, interval: str, limit: int = 100, 
+                      start_time: int = None, end_time: int = None) -> pd.DataFrame:
+        """Fetch futures kline/candlestick data from the exchange"""
         pass
     
     def get_positions(self):
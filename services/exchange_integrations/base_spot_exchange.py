@@ -8,6 +8,8 @@ from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
+from .kline_cache import get_kline_cache
+
 
 @dataclass
 class SpotOrderInfo:
@@ -184,18 +186,47 @@ class BaseSpotExchange(ABC):
         """
         pass
     
-    @abstractmethod
-    def get_klines(self, symbol: str, timeframe: str, limit: int = 100):
+    def get_klines(self, symbol: str, timeframe: str, limit: int = 100, start_time=None, end_time=None):
         """
         Get historical candlestick data
+        Closed candles are served from the shared kline cache, only missing ones hit the exchange
+        
+        Args:
+            symbol: Trading pair (e.g., 'BTCUSDT')
+            timeframe: Timeframe (e.g., '1h', '4h', '1d')
+            limit: Number of candles to fetch
+            start_time: Optional window start (ms)
+            end_time: Optional window end (ms)
+            
+        Returns:
+            DataFrame of OHLCV data
+        """
+        return get_kline_cache().get_klines(
+            exchange=self.exchange_name,
+            market='spot',
+            testnet=self.testnet,
+            symbol=symbol,
+            interval=timeframe,
+            limit=limit,
+            start_time=start_time,
+            end_time=end_time,
+            fetch=self._fetch_klines
+        )
+    
+    @abstractmethod
+    def _fetch_klines(self, symbol: str, timeframe: str, limit: int = 100, start_time=None, end_time=None):
+        """
+        Fetch historical candlestick data from the exchange
         
         Args:
             symbol: Trading pair (e.g., 'BTCUSDT')
             timeframe: Timeframe (e.g., '1h', '4h', '1d')
             limit: Number of candles to fetch
+            start_time: Optional window start (ms)
+            end_time: Optional window end (ms)
             
         Returns:
-            List of OHLCV data
+            DataFrame of OHLCV data
         """
         pass
     
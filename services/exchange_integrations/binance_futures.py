@@ -39,11 +39,11 @@ class BinanceFuturesIntegration(BaseFuturesExchange):
             hashlib.sha256
         ).hexdigest()
     
-    def _make_request(self, method: str, endpoint: str, params: dict = None, 
-                     signed: bool = False, recv_window: int = 50000):
-        """Make authenticated request to Binance Futures API"""
-        if params is None:
-            params = {}
+    def _prepare_request(self, method: str, endpoint: str, params: dict, signed: bool,
+                         recv_window: int = 50000) -> Dict[str, Any]:
+        """Sign a Binance Futures API request"""
+        if method not in ("GET", "POST", "DELETE"):
+            raise ValueError(f"Unsupported method: {method}")
         
         url = f"{self.base_url}{endpoint}"
         headers = {"X-MBX-APIKEY": self.api_key}
@@ -56,48 +56,60 @@ class BinanceFuturesIntegration(BaseFuturesExchange):
             params['timestamp'] = int(time.time() * 1000) + self._time_offset
             params['signature'] = self._generate_signature(params)
         
+        if method == "POST":
+            return {"method": method, "url": url, "headers": headers, "data": params, "timeout": 10}
+        return {"method": method, "url": url, "headers": headers, "params": params, "timeout": 10}
+    
+    def _parse_response(self, response, method: str, endpoint: str, params: dict) -> Any:
+        response.raise_for_status()
+        return response.json()
+    
+    @staticmethod
+    def _error_payload(error: Exception) -> Optional[dict]:
+        """Binance {code, msg} body of a failed request, None if missing or not JSON"""
+        response = getattr(error, "response", None)
+        if not isinstance(error, requests.exceptions.RequestException) or response is None:
+            return None
         try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, data=params, timeout=10)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers, params=params, timeout=10)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            response.raise_for_status()
-            return response.json()
+            data = response.json()
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    
+    def _should_retry(self, error: Exception, method: str, endpoint: str, params: dict) -> bool:
+        data = self._error_payload(error)
+        if data and data.get("code") == -1021:
+            logger.warning("⏱️ Timestamp error (-1021), resyncing...")
+            self._sync_server_time()
+            return True
+        return False
+    
+    def _request_error(self, error: Exception, method: str, endpoint: str, params: dict) -> Exception:
+        if not isinstance(error, requests.exceptions.RequestException):
+            return error
+        
+        data = self._error_payload(error)
+        if data is not None:
+            error_code = data.get("code")
+            error_msg = data.get("msg", "Unknown error")
             
-        except requests.exceptions.RequestException as e:
-            if hasattr(e, "response") and e.response is not None:
-                try:
-                    data = e.response.json()
-                    error_code = data.get("code")
-                    error_msg = data.get("msg", "Unknown error")
-                    
-                    # Log detailed error
-                    logger.error(f"❌ Binance API Error:")
-                    logger.error(f"   Code: {error_code}")
-                    logger.error(f"   Message: {error_msg}")
-                    logger.error(f"   Endpoint: {endpoint}")
-                    logger.error(f"   Method: {method}")
-                    logger.error(f"   Params: {params}")
-                    
-                    if error_code == -1021:
-                        logger.warning("⏱️ Timestamp error (-1021), resyncing...")
-                        self._sync_server_time()
-                        return self._make_request(method, endpoint, params, signed, recv_window)
-                    
-                    # Raise with detailed error message
-                    raise Exception(f"Binance API error {error_code}: {error_msg}")
-                except ValueError:
-                    # Response is not JSON
-                    logger.error(f"Binance API error (non-JSON): {e.response.text[:200]}")
-                    pass
+            # Log detailed error
+            logger.error(f"❌ Binance API Error:")
+            logger.error(f"   Code: {error_code}")
+            logger.error(f"   Message: {error_msg}")
+            logger.error(f"   Endpoint: {endpoint}")
+            logger.error(f"   Method: {method}")
+            logger.error(f"   Params: {params}")
             
-            logger.error(f"Binance API request failed: {e}")
-            raise Exception(f"Binance API request failed: {e}")
+            # Raise with detailed error message
+            return Exception(f"Binance API error {error_code}: {error_msg}")
+        
+        if getattr(error, "response", None) is not None:
+            # Response is not JSON
+            logger.error(f"Binance API error (non-JSON): {error.response.text[:200]}")
+        
+        logger.error(f"Binance API request failed: {error}")
+        return Exception(f"Binance API request failed: {error}")
     
     def test_connectivity(self) -> bool:
         """Test Binance Futures API connectivity"""
@@ -164,64 +176,52 @@ class BinanceFuturesIntegration(BaseFuturesExchange):
             logger.error(f"Failed to set leverage: {e}")
             return False
     
-    def get_symbol_precision(self, symbol: str) -> dict:
-        """Get quantity and price precision for a symbol including minimum quantities"""
-        if symbol in self._symbol_info_cache:
-            return self._symbol_info_cache[symbol]
+    def _load_symbol_precisions(self) -> Dict[str, dict]:
+        """Precision info of every symbol from one exchangeInfo call"""
+        response = self._make_request("GET", "/fapi/v1/exchangeInfo", signed=False)
         
-        try:
-            response = self._make_request("GET", "/fapi/v1/exchangeInfo", signed=False)
-            
-            for sym_info in response.get('symbols', []):
-                if sym_info['symbol'] == symbol:
-                    precision_info = {
-                        'quantityPrecision': sym_info['quantityPrecision'],
-                        'pricePrecision': sym_info['pricePrecision'],
-                        'stepSize': '0.01',
-                        'tickSize': '0.01',
-                        'minQty': 0.001,
-                        'maxQty': 1000,
-                        'minNotional': 5
-                    }
-                    
-                    # Extract filter information
-                    for filter_item in sym_info.get('filters', []):
-                        if filter_item['filterType'] == 'LOT_SIZE':
-                            precision_info['stepSize'] = filter_item['stepSize']
-                            precision_info['minQty'] = float(filter_item.get('minQty', '0.001'))
-                            precision_info['maxQty'] = float(filter_item.get('maxQty', '1000'))
-                        elif filter_item['filterType'] == 'PRICE_FILTER':
-                            precision_info['tickSize'] = filter_item['tickSize']
-                        elif filter_item['filterType'] == 'MIN_NOTIONAL':
-                            precision_info['minNotional'] = float(filter_item.get('notional', '5'))
-                    
-                    logger.info(f"📐 {symbol} Binance precision: minQty={precision_info['minQty']}, step={precision_info['stepSize']}, minNotional=${precision_info['minNotional']}")
-                    
-                    self._symbol_info_cache[symbol] = precision_info
-                    return precision_info
-            
-            logger.warning(f"Symbol {symbol} not found, using defaults")
-            return {
-                'quantityPrecision': 3, 
-                'pricePrecision': 2, 
-                'stepSize': '0.001', 
+        symbols = {}
+        for sym_info in response.get('symbols', []):
+            precision_info = {
+                'quantityPrecision': sym_info['quantityPrecision'],
+                'pricePrecision': sym_info['pricePrecision'],
+                'stepSize': '0.01',
                 'tickSize': '0.01',
                 'minQty': 0.001,
                 'maxQty': 1000,
                 'minNotional': 5
             }
             
-        except Exception as e:
-            logger.error(f"Failed to get symbol precision: {e}")
-            return {
-                'quantityPrecision': 3, 
-                'pricePrecision': 2, 
-                'stepSize': '0.001', 
-                'tickSize': '0.01',
-                'minQty': 0.001,
-                'maxQty': 1000,
-                'minNotional': 5
-            }
+            # Extract filter information
+            for filter_item in sym_info.get('filters', []):
+                if filter_item['filterType'] == 'LOT_SIZE':
+                    precision_info['stepSize'] = filter_item['stepSize']
+                    precision_info['minQty'] = float(filter_item.get('minQty', '0.001'))
+                    precision_info['maxQty'] = float(filter_item.get('maxQty', '1000'))
+                elif filter_item['filterType'] == 'PRICE_FILTER':
+                    precision_info['tickSize'] = filter_item['tickSize']
+                elif filter_item['filterType'] == 'MIN_NOTIONAL':
+                    precision_info['minNotional'] = float(filter_item.get('notional', '5'))
+            
+            symbols[sym_info['symbol']] = precision_info
+        return symbols
+    
+    def get_symbol_precision(self, symbol: str) -> dict:
+        """Get quantity and price precision for a symbol including minimum quantities"""
+        precision_info = self._registry_precision(symbol)
+        if precision_info:
+            return precision_info
+        
+        logger.warning(f"Symbol {symbol} not found, using defaults")
+        return {
+            'quantityPrecision': 3, 
+            'pricePrecision': 2, 
+            'stepSize': '0.001', 
+            'tickSize': '0.01',
+            'minQty': 0.001,
+            'maxQty': 1000,
+            'minNotional': 5
+        }
     
     def round_quantity(self, quantity: float, symbol: str) -> str:
         """Round quantity to proper precision"""
@@ -362,8 +362,8 @@ class BinanceFuturesIntegration(BaseFuturesExchange):
             logger.error(f"Failed to cancel all orders: {e}")
             return False
     
-    def get_klines(self, symbol: str, interval: str, limit: int = 100, 
-                   start_time: int = None, end_time: int = None) -> pd.DataFrame:
+    def _fetch_klines(self, symbol: str, interval: str, limit: int = 100, 
+                      start_time: int = None, end_time: int = None) -> pd.DataFrame:
         """Get Binance futures kline data"""
         try:
             params = {
@@ -397,7 +397,7 @@ class BinanceFuturesIntegration(BaseFuturesExchange):
     def _sync_server_time(self):
         """Sync local offset with Binance server time"""
         try:
-            r = requests.get(f"{self.base_url}/fapi/v1/time", timeout=5)
+            r = self.http.request("GET", f"{self.base_url}/fapi/v1/time", timeout=5)
             r.raise_for_status()
             server_time = int(r.json()["serverTime"])
             local_time = int(time.time() * 1000)
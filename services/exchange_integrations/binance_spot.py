@@ -206,7 +206,7 @@ class BinanceSpotExchange(BaseSpotExchange):
             logger.error(f"Error getting Binance spot balance for {asset}: {e}")
             raise
     
-    def get_klines(self, symbol: str, timeframe: str, limit: int = 100, start_time=None, end_time=None):
+    def _fetch_klines(self, symbol: str, timeframe: str, limit: int = 100, start_time=None, end_time=None):
         """Get historical candlestick data"""
         try:
             import pandas as pd
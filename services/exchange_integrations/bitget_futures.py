@@ -4,6 +4,7 @@ Bitget Futures Exchange Integration
 
 import hashlib
 import hmac
+import json
 import time
 import base64
 import requests
@@ -47,10 +48,10 @@ class BitgetFuturesIntegration(BaseFuturesExchange):
         )
         return base64.b64encode(mac.digest()).decode()
     
-    def _make_request(self, method: str, endpoint: str, params: dict = None, signed: bool = False):
-        """Make authenticated request to Bitget API"""
-        if params is None:
-            params = {}
+    def _prepare_request(self, method: str, endpoint: str, params: dict, signed: bool) -> Dict[str, Any]:
+        """Sign a Bitget API request"""
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
         
         url = f"{self.base_url}{endpoint}"
         timestamp = str(int(time.time() * 1000))
@@ -67,7 +68,6 @@ class BitgetFuturesIntegration(BaseFuturesExchange):
         body = ""
         if signed:
             if method == "POST":
-                import json
                 body = json.dumps(params) if params else ""
             
             request_path = endpoint
@@ -78,51 +78,48 @@ class BitgetFuturesIntegration(BaseFuturesExchange):
             signature = self._generate_signature(timestamp, method, request_path, body)
             headers["ACCESS-SIGN"] = signature
         
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, json=params, timeout=10)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            # Log response for debugging
-            logger.info(f"🔍 Bitget API Response Status: {response.status_code}")
-            
-            # Check HTTP status first
-            if response.status_code != 200:
-                # Log response body for debugging
-                try:
-                    error_body = response.json()
-                    logger.error(f"❌ Bitget API Error Response: {error_body}")
-                except:
-                    logger.error(f"❌ Bitget API Error Text: {response.text}")
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            # Log successful response structure
-            logger.debug(f"📦 Bitget API Response: {data}")
-            
-            if data.get('code') != '00000':
-                error_code = data.get('code')
-                error_msg = data.get('msg', 'Unknown error')
-                logger.error(f"❌ Bitget API Error [{error_code}]: {error_msg}")
-                raise Exception(f"Bitget API error [{error_code}]: {error_msg}")
-            
-            return data.get('data', {})
-            
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"❌ Bitget HTTP Error: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"❌ Bitget API request failed: {e}")
-            raise
+        if method == "POST":
+            return {"method": method, "url": url, "headers": headers, "json": params, "timeout": 10}
+        return {"method": method, "url": url, "headers": headers, "params": params, "timeout": 10}
+    
+    def _parse_response(self, response, method: str, endpoint: str, params: dict) -> Any:
+        # Log response for debugging
+        logger.info(f"🔍 Bitget API Response Status: {response.status_code}")
+        
+        # Check HTTP status first
+        if response.status_code != 200:
+            # Log response body for debugging
+            try:
+                error_body = response.json()
+                logger.error(f"❌ Bitget API Error Response: {error_body}")
+            except:
+                logger.error(f"❌ Bitget API Error Text: {response.text}")
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        # Log successful response structure
+        logger.debug(f"📦 Bitget API Response: {data}")
+        
+        if data.get('code') != '00000':
+            error_code = data.get('code')
+            error_msg = data.get('msg', 'Unknown error')
+            logger.error(f"❌ Bitget API Error [{error_code}]: {error_msg}")
+            raise Exception(f"Bitget API error [{error_code}]: {error_msg}")
+        
+        return data.get('data', {})
+    
+    def _request_error(self, error: Exception, method: str, endpoint: str, params: dict) -> Exception:
+        if isinstance(error, requests.exceptions.HTTPError):
+            logger.error(f"❌ Bitget HTTP Error: {error}")
+        else:
+            logger.error(f"❌ Bitget API request failed: {error}")
+        return error
     
     def test_connectivity(self) -> bool:
         """Test Bitget API connectivity"""
         try:
-            response = requests.get(f"{self.base_url}/api/v2/public/time", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/api/v2/public/time", timeout=5)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Bitget connectivity test failed: {e}")
@@ -249,56 +246,40 @@ class BitgetFuturesIntegration(BaseFuturesExchange):
             logger.error(f"Failed to set leverage: {e}")
             return False
     
+    def _load_symbol_precisions(self) -> Dict[str, dict]:
+        """Precision info of every USDT-M contract from one contracts call"""
+        params = {'productType': 'USDT-FUTURES'}
+        result = self._make_request("GET", "/api/v2/mix/market/contracts", params)
+        
+        symbols = {}
+        for contract in result or []:
+            symbols[contract['symbol']] = {
+                'quantityPrecision': int(contract.get('volumePlace', 3)),
+                'pricePrecision': int(contract.get('pricePlace', 2)),
+                'stepSize': contract.get('sizeMultiplier', '1'),
+                'tickSize': contract.get('priceEndStep', '0.01'),
+                'minQty': float(contract.get('minTradeNum', '0.001')),
+                'maxQty': float(contract.get('maxTradeNum', '1000')),
+                'minNotional': 5  # Bitget default minimum notional
+            }
+        return symbols
+    
     def get_symbol_precision(self, symbol: str) -> dict:
         """Get symbol precision including minimum quantities"""
-        if symbol in self._symbol_info_cache:
-            return self._symbol_info_cache[symbol]
+        precision_info = self._registry_precision(symbol)
+        if precision_info:
+            return precision_info
         
-        try:
-            params = {'productType': 'USDT-FUTURES'}
-            result = self._make_request("GET", "/api/v2/mix/market/contracts", params)
-            
-            for contract in result:
-                if contract['symbol'] == symbol:
-                    # Extract minimum order quantity
-                    min_trade_num = float(contract.get('minTradeNum', '0.001'))
-                    size_multiplier = contract.get('sizeMultiplier', '1')
-                    
-                    precision_info = {
-                        'quantityPrecision': int(contract.get('volumePlace', 3)),
-                        'pricePrecision': int(contract.get('pricePlace', 2)),
-                        'stepSize': size_multiplier,
-                        'tickSize': contract.get('priceEndStep', '0.01'),
-                        'minQty': min_trade_num,
-                        'maxQty': float(contract.get('maxTradeNum', '1000')),
-                        'minNotional': 5  # Bitget default minimum notional
-                    }
-                    
-                    logger.info(f"📐 {symbol} Bitget precision: minQty={min_trade_num}, step={size_multiplier}, minNotional=${precision_info['minNotional']}")
-                    
-                    self._symbol_info_cache[symbol] = precision_info
-                    return precision_info
-            
-            return {
-                'quantityPrecision': 3, 
-                'pricePrecision': 2, 
-                'stepSize': '1', 
-                'tickSize': '0.01',
-                'minQty': 0.001,
-                'maxQty': 1000,
-                'minNotional': 5
-            }
-        except Exception as e:
-            logger.error(f"Failed to get symbol precision: {e}")
-            return {
-                'quantityPrecision': 3, 
-                'pricePrecision': 2, 
-                'stepSize': '1', 
-                'tickSize': '0.01',
-                'minQty': 0.001,
-                'maxQty': 1000,
-                'minNotional': 5
-            }
+        logger.warning(f"Symbol {symbol} not found, using defaults")
+        return {
+            'quantityPrecision': 3, 
+            'pricePrecision': 2, 
+            'stepSize': '1', 
+            'tickSize': '0.01',
+            'minQty': 0.001,
+            'maxQty': 1000,
+            'minNotional': 5
+        }
     
     def round_quantity(self, quantity: float, symbol: str) -> str:
         """Round quantity to proper precision"""
@@ -435,8 +416,8 @@ class BitgetFuturesIntegration(BaseFuturesExchange):
             logger.error(f"Failed to cancel all orders: {e}")
             return False
     
-    def get_klines(self, symbol: str, interval: str, limit: int = 100, 
-                   start_time: int = None, end_time: int = None) -> pd.DataFrame:
+    def _fetch_klines(self, symbol: str, interval: str, limit: int = 100, 
+                      start_time: int = None, end_time: int = None) -> pd.DataFrame:
         """Get Bitget kline data"""
         try:
             # Convert interval format
@@ -489,7 +470,7 @@ class BitgetFuturesIntegration(BaseFuturesExchange):
     def _sync_server_time(self):
         """Sync with Bitget server time"""
         try:
-            response = requests.get(f"{self.base_url}/api/v2/public/time", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/api/v2/public/time", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('code') == '00000':
@@ -46,7 +46,7 @@ class BitgetSpotExchange(BaseSpotExchange):
         return SpotBalance(asset=asset, free=float(balance['free'].get(asset, 0)), locked=float(balance['used'].get(asset, 0)), total=float(balance['total'].get(asset, 0)))
     
     
-    def get_klines(self, symbol: str, timeframe: str, limit: int = 100, start_time=None, end_time=None):
+    def _fetch_klines(self, symbol: str, timeframe: str, limit: int = 100, start_time=None, end_time=None):
         """Get historical candlestick data"""
         try:
             import pandas as pd
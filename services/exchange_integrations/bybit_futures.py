@@ -4,8 +4,8 @@ Bybit Futures Exchange Integration
 
 import hashlib
 import hmac
+import json
 import time
-import requests
 import pandas as pd
 import logging
 from typing import Dict, Any, List, Optional
@@ -39,10 +39,10 @@ class BybitFuturesIntegration(BaseFuturesExchange):
             hashlib.sha256
         ).hexdigest()
     
-    def _make_request(self, method: str, endpoint: str, params: dict = None, signed: bool = False):
-        """Make authenticated request to Bybit V5 API"""
-        if params is None:
-            params = {}
+    def _prepare_request(self, method: str, endpoint: str, params: dict, signed: bool) -> Dict[str, Any]:
+        """Sign a Bybit V5 API request"""
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
         
         url = f"{self.base_url}{endpoint}"
         timestamp = str(int(time.time() * 1000))
@@ -56,7 +56,6 @@ class BybitFuturesIntegration(BaseFuturesExchange):
         
         if signed:
             if method == "POST":
-                import json
                 param_str = json.dumps(params)
             else:
                 param_str = "&".join([f"{k}={v}" for k, v in sorted(params.items())])
@@ -64,39 +63,35 @@ class BybitFuturesIntegration(BaseFuturesExchange):
             signature = self._generate_signature(param_str, timestamp)
             headers["X-BAPI-SIGN"] = signature
         
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-            elif method == "POST":
-                import json
-                response = requests.post(url, headers=headers, json=params, timeout=10)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('retCode') != 0:
-                # Enhanced error logging
-                error_msg = data.get('retMsg', 'Unknown error')
-                error_code = data.get('retCode', 'N/A')
-                logger.error(f"❌ Bybit API Error:")
-                logger.error(f"   Code: {error_code}")
-                logger.error(f"   Message: {error_msg}")
-                logger.error(f"   Full Response: {data}")
-                logger.error(f"   Request Params: {params}")
-                raise Exception(f"Bybit API error: {error_msg}")
-            
-            return data.get('result', {})
-            
-        except Exception as e:
-            logger.error(f"Bybit API request failed: {e}")
-            raise Exception(f"Bybit API request failed: {e}")
+        if method == "POST":
+            return {"method": method, "url": url, "headers": headers, "json": params, "timeout": 10}
+        return {"method": method, "url": url, "headers": headers, "params": params, "timeout": 10}
+    
+    def _parse_response(self, response, method: str, endpoint: str, params: dict) -> Any:
+        response.raise_for_status()
+        data = response.json()
+        
+        if data.get('retCode') != 0:
+            # Enhanced error logging
+            error_msg = data.get('retMsg', 'Unknown error')
+            error_code = data.get('retCode', 'N/A')
+            logger.error(f"❌ Bybit API Error:")
+            logger.error(f"   Code: {error_code}")
+            logger.error(f"   Message: {error_msg}")
+            logger.error(f"   Full Response: {data}")
+            logger.error(f"   Request Params: {params}")
+            raise Exception(f"Bybit API error: {error_msg}")
+        
+        return data.get('result', {})
+    
+    def _request_error(self, error: Exception, method: str, endpoint: str, params: dict) -> Exception:
+        logger.error(f"Bybit API request failed: {error}")
+        return Exception(f"Bybit API request failed: {error}")
     
     def test_connectivity(self) -> bool:
         """Test Bybit API connectivity"""
         try:
-            response = requests.get(f"{self.base_url}/v5/market/time", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/v5/market/time", timeout=5)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Bybit connectivity test failed: {e}")
@@ -126,19 +121,42 @@ class BybitFuturesIntegration(BaseFuturesExchange):
             raise
     
     def get_position_info(self, symbol: str = None) -> List[FuturesPosition]:
-        """Get Bybit position information"""
+        """
+        Get Bybit position information
+        
+        position/list is paginated by cursor; every page is read, so a
+        position missing from the result is really closed. Raises instead of
+        returning a partial list.
+        """
         try:
-            params = {
-                'category': 'linear',  # Linear futures
-                'settleCoin': 'USDT'
-            }
-            if symbol:
-                params['symbol'] = symbol
-            
-            result = self._make_request("GET", "/v5/position/list", params, signed=True)
+            rows = []
+            seen_cursors = set()
+            cursor = None
+            while True:
+                params = {
+                    'category': 'linear',  # Linear futures
+                    'settleCoin': 'USDT',
+                    'limit': 200
+                }
+                if symbol:
+                    params['symbol'] = symbol
+                if cursor:
+                    params['cursor'] = cursor
+                
+                result = self._make_request("GET", "/v5/position/list", params, signed=True)
+                if result is None:
+                    raise Exception("Empty response for position list page")
+                rows.extend(result.get('list', []))
+                
+                cursor = result.get('nextPageCursor')
+                if not cursor:
+                    break
+                if cursor in seen_cursors:
+                    raise Exception(f"Position list pagination repeated cursor {cursor}")
+                seen_cursors.add(cursor)
             
             positions = []
-            for pos in result.get('list', []):
+            for pos in rows:
                 size = float(pos.get('size', 0))
                 if size != 0:
                     positions.append(FuturesPosition(
@@ -195,17 +213,17 @@ class BybitFuturesIntegration(BaseFuturesExchange):
             logger.error(f"❌ Failed to set leverage: {e}")
             return False
     
-    def get_symbol_precision(self, symbol: str) -> dict:
-        """Get quantity and price precision for symbol including minimum quantities"""
-        if symbol in self._symbol_info_cache:
-            return self._symbol_info_cache[symbol]
-        
-        try:
-            params = {'category': 'linear', 'symbol': symbol}
-            result = self._make_request("GET", "/v5/market/instruments-info", params)
-            
-            if result and 'list' in result and len(result['list']) > 0:
-                info = result['list'][0]
+    def _load_symbol_precisions(self) -> Dict[str, dict]:
+        """Precision info of every linear instrument (instruments-info, paginated by cursor)"""
+        symbols = {}
+        cursor = None
+        while True:
+            params = {'category': 'linear', 'limit': 1000}
+            if cursor:
+                params['cursor'] = cursor
+            result = self._make_request("GET", "/v5/market/instruments-info", params) or {}
+            
+            for info in result.get('list', []):
                 lot_filter = info.get('lotSizeFilter', {})
                 price_filter = info.get('priceFilter', {})
                 
@@ -214,7 +232,7 @@ class BybitFuturesIntegration(BaseFuturesExchange):
                 max_order_qty = float(lot_filter.get('maxOrderQty', '1000'))
                 qty_step = float(lot_filter.get('qtyStep', '0.001'))
                 
-                precision_info = {
+                symbols[info['symbol']] = {
                     'quantityPrecision': len(str(qty_step).split('.')[-1]),
                     'pricePrecision': len(str(float(price_filter.get('tickSize', '0.01'))).split('.')[-1]),
                     'stepSize': str(qty_step),
@@ -223,32 +241,27 @@ class BybitFuturesIntegration(BaseFuturesExchange):
                     'maxQty': max_order_qty,
                     'minNotional': float(lot_filter.get('minNotionalValue', '5'))  # Minimum order value in USDT
                 }
-                
-                logger.info(f"📐 {symbol} Bybit precision: minQty={min_order_qty}, step={qty_step}, minNotional=${precision_info['minNotional']}")
-                
-                self._symbol_info_cache[symbol] = precision_info
-                return precision_info
-            
-            return {
-                'quantityPrecision': 3, 
-                'pricePrecision': 2, 
-                'stepSize': '0.001', 
-                'tickSize': '0.01',
-                'minQty': 0.001,
-                'maxQty': 1000,
-                'minNotional': 5
-            }
-        except Exception as e:
-            logger.error(f"Failed to get symbol precision: {e}")
-            return {
-                'quantityPrecision': 3, 
-                'pricePrecision': 2, 
-                'stepSize': '0.001', 
-                'tickSize': '0.01',
-                'minQty': 0.001,
-                'maxQty': 1000,
-                'minNotional': 5
-            }
+            
+            cursor = result.get('nextPageCursor')
+            if not cursor:
+                return symbols
+    
+    def get_symbol_precision(self, symbol: str) -> dict:
+        """Get quantity and price precision for symbol including minimum quantities"""
+        precision_info = self._registry_precision(symbol)
+        if precision_info:
+            return precision_info
+        
+        logger.warning(f"Symbol {symbol} not found, using defaults")
+        return {
+            'quantityPrecision': 3, 
+            'pricePrecision': 2, 
+            'stepSize': '0.001', 
+            'tickSize': '0.01',
+            'minQty': 0.001,
+            'maxQty': 1000,
+            'minNotional': 5
+        }
     
     def round_quantity(self, quantity: float, symbol: str) -> str:
         """Round quantity to proper precision"""
@@ -569,8 +582,8 @@ class BybitFuturesIntegration(BaseFuturesExchange):
             logger.error(f"Failed to cancel all orders: {e}")
             return False
     
-    def get_klines(self, symbol: str, interval: str, limit: int = 100, 
-                   start_time: int = None, end_time: int = None) -> pd.DataFrame:
+    def _fetch_klines(self, symbol: str, interval: str, limit: int = 100, 
+                      start_time: int = None, end_time: int = None) -> pd.DataFrame:
         """Get Bybit kline data"""
         try:
             # Convert interval format (1h -> 60, 4h -> 240)
@@ -624,7 +637,7 @@ class BybitFuturesIntegration(BaseFuturesExchange):
     def _sync_server_time(self):
         """Sync with Bybit server time"""
         try:
-            response = requests.get(f"{self.base_url}/v5/market/time", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/v5/market/time", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 server_time = int(data['result']['timeSecond']) * 1000
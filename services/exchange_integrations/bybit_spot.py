@@ -222,7 +222,7 @@ class BybitSpotExchange(BaseSpotExchange):
 
     
     
-    def get_klines(self, symbol: str, timeframe: str, limit: int = 100, start_time=None, end_time=None):
+    def _fetch_klines(self, symbol: str, timeframe: str, limit: int = 100, start_time=None, end_time=None):
         """Get historical candlestick data"""
         try:
             import pandas as pd
@@ -0,0 +1,140 @@
+"""
+Process-wide pool of futures exchange clients
+Bot runs with the same credentials and network get the same client back, so
+its server time offset and symbol precision cache stay warm across runs
+instead of being rebuilt (2-3 HTTP calls) on every tick
+
+- Keyed by (exchange, network, fingerprint of the credentials); the raw keys
+  are never used as dictionary keys or logged
+- Clients idle for EXCHANGE_CLIENT_IDLE_TTL seconds are evicted, and at most
+  EXCHANGE_CLIENT_POOL_SIZE clients are kept (least recently used go first)
+- A pooled client is health-checked with test_connectivity() at most every
+  EXCHANGE_CLIENT_HEALTH_INTERVAL seconds on checkout; failing clients are
+  replaced by a fresh instance
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from .base_futures_exchange import BaseFuturesExchange
+from .exchange_factory import create_futures_exchange
+
+logger = logging.getLogger(__name__)
+
+IDLE_TTL = float(os.getenv('EXCHANGE_CLIENT_IDLE_TTL', 1800))
+HEALTH_INTERVAL = float(os.getenv('EXCHANGE_CLIENT_HEALTH_INTERVAL', 300))
+POOL_SIZE = int(os.getenv('EXCHANGE_CLIENT_POOL_SIZE', 256))
+
+
+@dataclass
+class _PooledClient:
+    client: BaseFuturesExchange
+    last_used: float
+    last_checked: float
+
+
+class ExchangeClientPool:
+    """LRU pool of exchange clients with idle eviction and periodic health checks"""
+
+    def __init__(self, idle_ttl: float = IDLE_TTL, health_interval: float = HEALTH_INTERVAL,
+                 max_size: int = POOL_SIZE):
+        self.idle_ttl = idle_ttl
+        self.health_interval = health_interval
+        self.max_size = max_size
+        self._clients: "OrderedDict[Tuple, _PooledClient]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'health_failures': 0}
+
+    @staticmethod
+    def pool_key(exchange_name: str, api_key: str, api_secret: str, passphrase: str, testnet: bool) -> Tuple:
+        fingerprint = hashlib.sha256(f"{api_key}\0{api_secret}\0{passphrase or ''}".encode()).hexdigest()[:32]
+        return (exchange_name.upper().strip(), bool(testnet), fingerprint)
+
+    def get_client(self, exchange_name: str, api_key: str, api_secret: str,
+                   passphrase: str = "", testnet: bool = True) -> BaseFuturesExchange:
+        """Pooled client for these credentials, created through create_futures_exchange on a miss"""
+        key = self.pool_key(exchange_name, api_key, api_secret, passphrase, testnet)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry:
+                self._clients.move_to_end(key)
+                entry.last_used = now
+                needs_check = now - entry.last_checked >= self.health_interval
+                if needs_check:
+                    entry.last_checked = now  # One checker at a time
+            else:
+                needs_check = False
+
+        if entry and needs_check and not self._is_healthy(entry.client):
+            with self._lock:
+                self.stats['health_failures'] += 1
+                if self._clients.get(key) is entry:
+                    del self._clients[key]
+            logger.warning(f"♻️ Replacing unhealthy {key[0]} client ({'testnet' if key[1] else 'mainnet'})")
+            entry = None
+
+        if entry:
+            with self._lock:
+                self.stats['hits'] += 1
+            return entry.client
+
+        client = create_futures_exchange(exchange_name, api_key, api_secret, passphrase, testnet)
+        with self._lock:
+            self.stats['misses'] += 1
+            existing = self._clients.get(key)
+            if existing:  # Another thread created it meanwhile
+                return existing.client
+            self._clients[key] = _PooledClient(client, now, now)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.stats['evictions'] += 1
+        return client
+
+    def _evict_idle(self, now: float):
+        stale = [key for key, entry in self._clients.items() if now - entry.last_used > self.idle_ttl]
+        for key in stale:
+            del self._clients[key]
+        self.stats['evictions'] += len(stale)
+
+    @staticmethod
+    def _is_healthy(client: BaseFuturesExchange) -> bool:
+        try:
+            return bool(client.test_connectivity())
+        except Exception as e:
+            logger.warning(f"Exchange client health check failed: {e}")
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'size': len(self._clients)}
+
+
+_pool = ExchangeClientPool()
+_pool_pid = os.getpid()
+
+
+def get_client_pool() -> ExchangeClientPool:
+    """Pool of the current process (recreated after fork)"""
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        _pool, _pool_pid = ExchangeClientPool(), os.getpid()
+    return _pool
+
+
+def get_futures_client(exchange_name: str, api_key: str, api_secret: str,
+                       passphrase: str = "", testnet: bool = True) -> BaseFuturesExchange:
+    """Pooled equivalent of create_futures_exchange"""
+    return get_client_pool().get_client(exchange_name, api_key, api_secret, passphrase, testnet)
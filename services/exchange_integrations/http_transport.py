@@ -0,0 +1,350 @@
+"""
+Pooled HTTP Transport for Exchange Integrations
+One keep-alive connection pool per exchange, shared by every client in the process
+
+- Async core: one aiohttp ClientSession per exchange on a background event loop
+  owned by the transport, so sessions are never bound to a caller's loop
+- `arequest` awaits from any event loop, `request` is the blocking wrapper used
+  by the sync exchange API
+- Falls back to a pooled requests.Session when aiohttp is not installed
+- Responses and errors are requests-compatible (raise_for_status raises
+  requests.exceptions.HTTPError, network failures raise ConnectionError /
+  Timeout) so existing exchange error handling keeps working
+- Per-exchange connection and latency stats
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+    import yarl
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+    logging.warning("aiohttp not available, exchange requests use a pooled requests.Session. "
+                    "Install with: pip install aiohttp")
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv('EXCHANGE_HTTP_POOL_SIZE', 50))
+KEEPALIVE_SECONDS = float(os.getenv('EXCHANGE_HTTP_KEEPALIVE', 30))
+DEFAULT_TIMEOUT = 10
+LATENCY_SAMPLES = 512
+
+
+class HttpResponse:
+    """Minimal requests.Response lookalike for responses read by the async transport"""
+
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str], url: str,
+                 reason: str = '', encoding: Optional[str] = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+        self.reason = reason
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self) -> Any:
+        try:
+            return json.loads(self.content)
+        except ValueError as e:
+            raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}", response=self
+            )
+
+
+def _encode_pairs(values: Dict[str, Any]) -> str:
+    """Form/query encoding identical to requests (None values dropped)"""
+    return urlencode([(k, v) for k, v in values.items() if v is not None], doseq=True)
+
+
+def _prepare(url: str, params: Optional[Dict[str, Any]], data: Any, json_body: Any,
+             headers: Optional[Dict[str, str]]) -> Tuple[str, Optional[bytes], Dict[str, str]]:
+    """
+    Encode query and body up front
+
+    Exchanges sign the exact query/body string, so both clients send bytes
+    encoded the way requests would have encoded them.
+    """
+    headers = dict(headers or {})
+    header_names = {name.lower() for name in headers}
+    if params:
+        query = _encode_pairs(params)
+        if query:
+            url = f"{url}{'&' if '?' in url else '?'}{query}"
+
+    body = None
+    if json_body is not None:
+        body = json.dumps(json_body, allow_nan=False).encode('utf-8')
+        if 'content-type' not in header_names:
+            headers['Content-Type'] = 'application/json'
+    elif isinstance(data, dict):
+        body = _encode_pairs(data).encode('utf-8') if data else None
+        if body is not None and 'content-type' not in header_names:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    elif data is not None:
+        body = data.encode('utf-8') if isinstance(data, str) else data
+    return url, body, headers
+
+
+class _TransportLoop:
+    """Background event loop hosting the aiohttp sessions of this process"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name='exchange-http', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+_loop_lock = threading.Lock()
+_transport_loop: Optional[_TransportLoop] = None
+
+
+def _get_loop() -> _TransportLoop:
+    """Transport loop of this process (recreated after fork: Celery prefork workers)"""
+    global _transport_loop
+    with _loop_lock:
+        if _transport_loop is None or _transport_loop.pid != os.getpid():
+            _transport_loop = _TransportLoop()
+        return _transport_loop
+
+
+class ExchangeHttpTransport:
+    """Pooled keep-alive HTTP client for one exchange"""
+
+    def __init__(self, exchange: str, pool_size: int = POOL_SIZE, keepalive: float = KEEPALIVE_SECONDS):
+        self.exchange = exchange
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self._session = None
+        self._session_loop = None
+        self._sync_session: Optional[requests.Session] = None
+        self._stats_lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = {
+            'requests': 0, 'errors': 0, 'http_errors': 0, 'timeouts': 0,
+            'connections_opened': 0, 'connections_reused': 0, 'in_flight': 0
+        }
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def request(self, method: str, url: str, params: Dict[str, Any] = None, data: Any = None,
+                json: Any = None, headers: Dict[str, str] = None, timeout: float = DEFAULT_TIMEOUT):
+        """Blocking request (sync exchange API)"""
+        if not AIOHTTP_AVAILABLE:
+            return self._request_sync(method, url, params, data, json, headers, timeout)
+        transport_loop = _get_loop()
+        if threading.current_thread() is transport_loop.thread:
+            raise RuntimeError("Blocking exchange request issued from the transport loop, use arequest")
+        future = asyncio.run_coroutine_threadsafe(
+            self._send(method, url, params, data, json, headers, timeout), transport_loop.loop
+        )
+        return future.result()
+
+    async def arequest(self, method: str, url: str, params: Dict[str, Any] = None, data: Any = None,
+                       json: Any = None, headers: Dict[str, str] = None, timeout: float = DEFAULT_TIMEOUT):
+        """Non-blocking request, awaitable from any event loop"""
+        if not AIOHTTP_AVAILABLE:
+            return await asyncio.to_thread(self._request_sync, method, url, params, data, json, headers, timeout)
+        transport_loop = _get_loop()
+        coro = self._send(method, url, params, data, json, headers, timeout)
+        if asyncio.get_running_loop() is transport_loop.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, transport_loop.loop))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request, connection and latency counters of this exchange"""
+        with self._stats_lock:
+            stats = dict(self._counters)
+            latencies = sorted(self._latencies)
+        stats['exchange'] = self.exchange
+        stats['client'] = 'aiohttp' if AIOHTTP_AVAILABLE else 'requests'
+        if latencies:
+            stats['latency_avg_ms'] = round(sum(latencies) / len(latencies), 2)
+            stats['latency_p50_ms'] = round(latencies[len(latencies) // 2], 2)
+            stats['latency_p95_ms'] = round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 2)
+            stats['latency_max_ms'] = round(latencies[-1], 2)
+        opened = stats['connections_opened']
+        stats['connection_reuse_rate'] = (
+            round(stats['connections_reused'] / (opened + stats['connections_reused']), 4)
+            if opened + stats['connections_reused'] else 0.0
+        )
+        return stats
+
+    # ------------------------------------------------------------------
+    # aiohttp client
+    # ------------------------------------------------------------------
+
+    async def _get_session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_created)
+            trace.on_connection_reuseconn.append(self._on_connection_reused)
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size, keepalive_timeout=self.keepalive, ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+            self._session_loop = loop
+        return self._session
+
+    async def _on_connection_created(self, session, context, params):
+        self._count(connections_opened=1)
+
+    async def _on_connection_reused(self, session, context, params):
+        self._count(connections_reused=1)
+
+    async def _send(self, method, url, params, data, json_body, headers, timeout) -> HttpResponse:
+        full_url, body, headers = _prepare(url, params, data, json_body, headers)
+        session = await self._get_session()
+        self._count(requests=1, in_flight=1)
+        started = time.perf_counter()
+        try:
+            async with session.request(
+                method, yarl.URL(full_url, encoded=True), data=body, headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                content = await response.read()
+                result = HttpResponse(
+                    response.status, content, dict(response.headers), full_url,
+                    reason=response.reason or '', encoding=response.charset
+                )
+        except asyncio.TimeoutError as e:
+            self._count(errors=1, timeouts=1)
+            raise requests.exceptions.Timeout(f"{self.exchange} {method} {url} timed out after {timeout}s") from e
+        except aiohttp.ClientError as e:
+            self._count(errors=1)
+            raise requests.exceptions.ConnectionError(f"{self.exchange} {method} {url} failed: {e}") from e
+        finally:
+            self._finish(started)
+        if result.status_code >= 400:
+            self._count(http_errors=1)
+        return result
+
+    # ------------------------------------------------------------------
+    # requests fallback
+    # ------------------------------------------------------------------
+
+    def _request_sync(self, method, url, params, data, json_body, headers, timeout):
+        if self._sync_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._sync_session = session
+        full_url, body, headers = _prepare(url, params, data, json_body, headers)
+        self._count(requests=1, in_flight=1)
+        started = time.perf_counter()
+        try:
+            response = self._sync_session.request(method, full_url, data=body, headers=headers, timeout=timeout)
+        except requests.exceptions.Timeout:
+            self._count(errors=1, timeouts=1)
+            raise
+        except requests.exceptions.RequestException:
+            self._count(errors=1)
+            raise
+        finally:
+            self._finish(started)
+        if response.status_code >= 400:
+            self._count(http_errors=1)
+        return response
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def _count(self, **deltas: int):
+        with self._stats_lock:
+            for name, value in deltas.items():
+                self._counters[name] += value
+
+    def _finish(self, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._counters['in_flight'] -= 1
+            self._latencies.append(elapsed_ms)
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._sync_session is not None:
+            self._sync_session.close()
+            self._sync_session = None
+
+
+_transports: Dict[str, ExchangeHttpTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(exchange: str) -> ExchangeHttpTransport:
+    """Shared transport of an exchange (one connection pool per exchange and process)"""
+    name = (exchange or 'DEFAULT').upper()
+    with _transports_lock:
+        transport = _transports.get(name)
+        if transport is None:
+            transport = _transports[name] = ExchangeHttpTransport(name)
+        return transport
+
+
+def get_transport_stats() -> Dict[str, Dict[str, Any]]:
+    """{exchange: stats} for every exchange used by this process"""
+    with _transports_lock:
+        transports = list(_transports.values())
+    return {transport.exchange: transport.get_stats() for transport in transports}
+
+
+def close_transports():
+    """Close all pooled connections and stop the transport loop"""
+    global _transport_loop
+    with _transports_lock:
+        transports = list(_transports.values())
+        _transports.clear()
+    with _loop_lock:
+        transport_loop, _transport_loop = _transport_loop, None
+    if transport_loop is not None and transport_loop.pid == os.getpid():
+        for transport in transports:
+            try:
+                asyncio.run_coroutine_threadsafe(transport.aclose(), transport_loop.loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"Failed to close {transport.exchange} HTTP session: {e}")
+        transport_loop.stop()
+    else:
+        for transport in transports:
+            if transport._sync_session is not None:
+                transport._sync_session.close()
@@ -7,7 +7,6 @@ import hashlib
 import hmac
 import base64
 import time
-import requests
 import pandas as pd
 import logging
 from typing import Dict, Any, List
@@ -49,10 +48,10 @@ class HuobiFuturesIntegration(BaseFuturesExchange):
         
         return base64.b64encode(signature).decode()
     
-    def _make_request(self, method: str, endpoint: str, params: dict = None, signed: bool = False):
-        """Make authenticated request to Huobi API"""
-        if params is None:
-            params = {}
+    def _prepare_request(self, method: str, endpoint: str, params: dict, signed: bool) -> Dict[str, Any]:
+        """Sign a Huobi API request"""
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
         
         url = f"{self.base_url}{endpoint}"
         host = "api.hbdm.com"
@@ -70,30 +69,27 @@ class HuobiFuturesIntegration(BaseFuturesExchange):
             signature = self._generate_signature(method, host, endpoint, params)
             params['Signature'] = signature
         
-        try:
-            if method == "GET":
-                response = requests.get(url, params=params, timeout=10)
-            elif method == "POST":
-                response = requests.post(url, json=params, timeout=10)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('status') != 'ok':
-                raise Exception(f"Huobi API error: {data.get('err_msg', 'Unknown error')}")
-            
-            return data.get('data', {})
-            
-        except Exception as e:
-            logger.error(f"Huobi API request failed: {e}")
-            raise
+        if method == "POST":
+            return {"method": method, "url": url, "json": params, "timeout": 10}
+        return {"method": method, "url": url, "params": params, "timeout": 10}
+    
+    def _parse_response(self, response, method: str, endpoint: str, params: dict) -> Any:
+        response.raise_for_status()
+        data = response.json()
+        
+        if data.get('status') != 'ok':
+            raise Exception(f"Huobi API error: {data.get('err_msg', 'Unknown error')}")
+        
+        return data.get('data', {})
+    
+    def _request_error(self, error: Exception, method: str, endpoint: str, params: dict) -> Exception:
+        logger.error(f"Huobi API request failed: {error}")
+        return error
     
     def test_connectivity(self) -> bool:
         """Test Huobi API connectivity"""
         try:
-            response = requests.get(f"{self.base_url}/api/v1/timestamp", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/api/v1/timestamp", timeout=5)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Huobi connectivity test failed: {e}")
@@ -256,8 +252,8 @@ class HuobiFuturesIntegration(BaseFuturesExchange):
             logger.error(f"Failed to cancel all orders: {e}")
             return False
     
-    def get_klines(self, symbol: str, interval: str, limit: int = 100, 
-                   start_time: int = None, end_time: int = None) -> pd.DataFrame:
+    def _fetch_klines(self, symbol: str, interval: str, limit: int = 100, 
+                      start_time: int = None, end_time: int = None) -> pd.DataFrame:
         """Get Huobi kline data"""
         try:
             # Convert interval format
@@ -304,7 +300,7 @@ class HuobiFuturesIntegration(BaseFuturesExchange):
     def _sync_server_time(self):
         """Sync with Huobi server time"""
         try:
-            response = requests.get(f"{self.base_url}/api/v1/timestamp", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/api/v1/timestamp", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('status') == 'ok':
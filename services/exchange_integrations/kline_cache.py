@@ -0,0 +1,325 @@
+"""
+Shared Kline Cache for Exchange Integrations
+Serves closed OHLCV candles to every bot from one store keyed by
+(exchange, market, symbol, interval, network)
+
+Tier 1 is a process-local ring buffer per key, tier 2 is Redis so that all
+Celery workers share the same candles. Closed candles never change, so each
+one is fetched from the exchange once and later requests only fetch the
+candles that closed since the last call.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable, Tuple
+
+import pandas as pd
+
+from utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+KLINE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 3 * 60_000, "5m": 5 * 60_000, "15m": 15 * 60_000,
+    "30m": 30 * 60_000, "1h": 60 * 60_000, "2h": 2 * 60 * 60_000, "4h": 4 * 60 * 60_000,
+    "6h": 6 * 60 * 60_000, "8h": 8 * 60 * 60_000, "12h": 12 * 60 * 60_000,
+    "1d": 24 * 60 * 60_000, "3d": 3 * 24 * 60 * 60_000, "1w": 7 * 24 * 60 * 60_000,
+}
+
+
+def _timestamps_to_ms(series: pd.Series) -> pd.Series:
+    """Convert a timestamp column (datetime or epoch ms) to int64 milliseconds"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Series(series.values.astype('datetime64[ms]').astype('int64'), index=series.index)
+    return pd.to_numeric(series).astype('int64')
+
+
+class _KlineSeries:
+    """Closed candles for one key plus the open-time range known to be complete"""
+
+    def __init__(self, frame: pd.DataFrame, covered_from: int, covered_to: int, ts_as_datetime: bool):
+        self.frame = frame  # columns: ts (int ms) + KLINE_COLUMNS[1:]
+        self.covered_from = covered_from
+        self.covered_to = covered_to
+        self.ts_as_datetime = ts_as_datetime
+
+    def covers(self, start_open: int, end_open: int) -> bool:
+        return self.covered_from <= start_open and self.covered_to >= end_open
+
+    def to_payload(self) -> str:
+        return json.dumps({
+            'covered_from': self.covered_from,
+            'covered_to': self.covered_to,
+            'ts_as_datetime': self.ts_as_datetime,
+            'rows': self.frame[['ts', 'open', 'high', 'low', 'close', 'volume']].values.tolist()
+        })
+
+    @classmethod
+    def from_payload(cls, payload: str) -> '_KlineSeries':
+        data = json.loads(payload)
+        frame = pd.DataFrame(data['rows'], columns=['ts', 'open', 'high', 'low', 'close', 'volume'])
+        frame['ts'] = frame['ts'].astype('int64')
+        return cls(frame, int(data['covered_from']), int(data['covered_to']), bool(data['ts_as_datetime']))
+
+
+class KlineCache:
+    """
+    Multi-subscriber candle store
+
+    Only windows that end on an already closed candle are cached. Requests
+    without an end_time (which include the still-forming candle) or with an
+    unknown interval bypass the cache and go straight to the exchange.
+    """
+
+    def __init__(self, max_candles: int = 1500, redis_ttl: int = 86400, enabled: bool = True):
+        self.max_candles = max_candles
+        self.redis_ttl = redis_ttl
+        self.enabled = enabled
+        self._series: Dict[Tuple, _KlineSeries] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'redis_hits': 0,
+            'incremental': 0,
+            'misses': 0,
+            'bypass': 0,
+            'incomplete': 0,
+            'candles_fetched': 0,
+            'candles_served': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get_klines(self, exchange: str, market: str, testnet: bool, symbol: str, interval: str,
+                   limit: int, start_time: Optional[int], end_time: Optional[int],
+                   fetch: Callable, time_offset: int = 0) -> pd.DataFrame:
+        """
+        Return klines for the requested window, fetching from the exchange only
+        the candles that are not cached yet
+
+        Args:
+            exchange: Exchange name (e.g., 'BINANCE')
+            market: 'futures' or 'spot'
+            testnet: Network the client is connected to
+            symbol, interval, limit, start_time, end_time: Same as exchange get_klines
+            fetch: Exchange fetcher called as fetch(symbol, interval, limit, start_time, end_time)
+            time_offset: Client clock offset vs exchange server in ms
+        """
+        interval_ms = INTERVAL_MS.get(interval)
+        if not self.enabled or interval_ms is None or end_time is None:
+            self._count('bypass')
+            return fetch(symbol, interval, limit, start_time, end_time)
+
+        now_ms = int(time.time() * 1000) + int(time_offset or 0)
+        last_closed_open = (now_ms // interval_ms) * interval_ms - interval_ms
+        end_open = (int(end_time) // interval_ms) * interval_ms
+        if end_open > last_closed_open:
+            # Window includes the forming candle - never cache it
+            self._count('bypass')
+            return fetch(symbol, interval, limit, start_time, end_time)
+
+        if start_time is None:
+            start_open = end_open - (max(int(limit), 1) - 1) * interval_ms
+        else:
+            start_open = -(-int(start_time) // interval_ms) * interval_ms
+            end_open = min(end_open, start_open + (max(int(limit), 1) - 1) * interval_ms)
+        if start_open > end_open:
+            self._count('bypass')
+            return fetch(symbol, interval, limit, start_time, end_time)
+
+        key = (exchange.upper(), market, symbol.replace('/', '').upper(), interval,
+               'testnet' if testnet else 'mainnet')
+
+        with self._get_key_lock(key):
+            series = self._series.get(key)
+            if series is None or not series.covers(start_open, end_open):
+                redis_series = self._load_from_redis(key)
+                if redis_series is not None and (series is None or redis_series.covered_to >= series.covered_to):
+                    series = redis_series
+                    self._series[key] = series
+                    if series.covers(start_open, end_open):
+                        self._count('redis_hits')
+                        return self._serve(series, start_open, end_open)
+            elif series.covers(start_open, end_open):
+                self._count('hits')
+                return self._serve(series, start_open, end_open)
+
+            if series is not None and series.covered_from <= start_open <= series.covered_to + interval_ms:
+                # Only the candles closed since the last fetch are missing
+                fetch_from = series.covered_to + interval_ms
+                count = (end_open - fetch_from) // interval_ms + 1
+                self._count('incremental')
+
+                fetched = fetch(symbol, interval, int(count), fetch_from, end_open + interval_ms - 1)
+                merged = self._merge(key, series, fetched, fetch_from, end_open)
+                if merged is not None:
+                    self._save_to_redis(key, merged)
+                    return self._serve(merged, start_open, end_open)
+                # The exchange did not return the requested range (some fetchers
+                # ignore start/end and return the latest candles): refetch in full
+                self._count('incomplete')
+            else:
+                self._count('misses')
+
+            count = (end_open - start_open) // interval_ms + 1
+            fetched = fetch(symbol, interval, int(count), start_open, end_open + interval_ms - 1)
+            usable = series if series is not None and series.covered_from <= start_open else None
+            merged = self._merge(key, usable, fetched, start_open, end_open)
+            if merged is None:
+                # Not the complete window: serve what the exchange returned, uncached
+                self._count('incomplete')
+                return fetched
+            self._save_to_redis(key, merged)
+            return self._serve(merged, start_open, end_open)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['keys'] = len(self._series)
+        lookups = stats['hits'] + stats['redis_hits'] + stats['incremental'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['redis_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop all process-local candles and reset counters"""
+        with self._lock:
+            self._series.clear()
+            self._key_locks.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _get_key_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _merge(self, key: Tuple, series: Optional[_KlineSeries], fetched: Optional[pd.DataFrame],
+               fetch_from: int, end_open: int) -> Optional[_KlineSeries]:
+        """
+        Append freshly fetched closed candles and trim the ring buffer
+
+        Returns None, leaving the cached series untouched, unless the fetched
+        rows are contiguous up to end_open and start at fetch_from (or, with a
+        series, anywhere up to the candle after its covered_to): coverage is
+        only ever extended over candles actually received.
+        """
+        if fetched is None or len(fetched) == 0:
+            return None
+        interval_ms = INTERVAL_MS[key[3]]
+        ts_as_datetime = pd.api.types.is_datetime64_any_dtype(fetched['timestamp'])
+        new_frame = pd.DataFrame({
+            'ts': _timestamps_to_ms(fetched['timestamp']).values,
+            'open': pd.to_numeric(fetched['open']).astype(float).values,
+            'high': pd.to_numeric(fetched['high']).astype(float).values,
+            'low': pd.to_numeric(fetched['low']).astype(float).values,
+            'close': pd.to_numeric(fetched['close']).astype(float).values,
+            'volume': pd.to_numeric(fetched['volume']).astype(float).values,
+        })
+        new_frame = new_frame[(new_frame['ts'] >= fetch_from) & (new_frame['ts'] <= end_open)]
+        new_frame = new_frame.drop_duplicates(subset='ts', keep='last')
+
+        if len(new_frame) == 0:
+            return None
+        first, last = int(new_frame['ts'].min()), int(new_frame['ts'].max())
+        required_from = fetch_from if series is None else max(fetch_from, series.covered_to + interval_ms)
+        contiguous = len(new_frame) == (last - first) // interval_ms + 1
+        if not contiguous or last != end_open or first > required_from:
+            logger.debug(f"Kline fetch for {key} returned {len(new_frame)} candles "
+                         f"not spanning {required_from}..{end_open}, not cached")
+            return None
+        self._count('candles_fetched', len(new_frame))
+
+        if series is not None:
+            frame = pd.concat([series.frame, new_frame], ignore_index=True)
+            covered_from = min(series.covered_from, first)
+        else:
+            frame = new_frame
+            covered_from = first
+        covered_to = end_open
+
+        frame = frame.drop_duplicates(subset='ts', keep='last').sort_values('ts').reset_index(drop=True)
+        if len(frame) > self.max_candles:
+            frame = frame.iloc[-self.max_candles:].reset_index(drop=True)
+            covered_from = int(frame['ts'].iloc[0])
+
+        series = _KlineSeries(frame, covered_from, covered_to, ts_as_datetime)
+        self._series[key] = series
+        return series
+
+    def _serve(self, series: _KlineSeries, start_open: int, end_open: int) -> pd.DataFrame:
+        frame = series.frame
+        window = frame[(frame['ts'] >= start_open) & (frame['ts'] <= end_open)]
+        if series.ts_as_datetime:
+            timestamps = pd.to_datetime(window['ts'].values, unit='ms')
+        else:
+            timestamps = window['ts'].values
+        df = pd.DataFrame({
+            'timestamp': timestamps,
+            'open': window['open'].values,
+            'high': window['high'].values,
+            'low': window['low'].values,
+            'close': window['close'].values,
+            'volume': window['volume'].values,
+        }, columns=KLINE_COLUMNS)
+        self._count('candles_served', len(df))
+        return df
+
+    def _redis_key(self, key: Tuple) -> str:
+        return "klines:" + ":".join(str(part) for part in key)
+
+    def _load_from_redis(self, key: Tuple) -> Optional[_KlineSeries]:
+        redis_client = get_redis_client()
+        if not redis_client:
+            return None
+        try:
+            payload = redis_client.get(self._redis_key(key))
+            return _KlineSeries.from_payload(payload) if payload else None
+        except Exception as e:
+            logger.warning(f"Kline cache Redis read failed: {e}")
+            return None
+
+    def _save_to_redis(self, key: Tuple, series: _KlineSeries):
+        redis_client = get_redis_client()
+        if not redis_client:
+            return
+        try:
+            redis_client.setex(self._redis_key(key), self.redis_ttl, series.to_payload())
+        except Exception as e:
+            logger.warning(f"Kline cache Redis write failed: {e}")
+
+
+_kline_cache: Optional[KlineCache] = None
+_kline_cache_lock = threading.Lock()
+
+
+def get_kline_cache() -> KlineCache:
+    """Get the process-wide kline cache"""
+    global _kline_cache
+    if _kline_cache is None:
+        with _kline_cache_lock:
+            if _kline_cache is None:
+                _kline_cache = KlineCache(
+                    max_candles=int(os.getenv('KLINE_CACHE_MAX_CANDLES', 1500)),
+                    redis_ttl=int(os.getenv('KLINE_CACHE_REDIS_TTL', 86400)),
+                    enabled=os.getenv('KLINE_CACHE_ENABLED', 'true').lower() == 'true'
+                )
+    return _kline_cache
@@ -6,7 +6,6 @@ import hashlib
 import hmac
 import base64
 import time
-import requests
 import pandas as pd
 import logging
 from typing import Dict, Any, List
@@ -72,10 +71,10 @@ class KrakenFuturesIntegration(BaseFuturesExchange):
         ).digest()
         return base64.b64encode(signature).decode()
     
-    def _make_request(self, method: str, endpoint: str, params: dict = None, signed: bool = False):
-        """Make authenticated request to Kraken Futures API"""
-        if params is None:
-            params = {}
+    def _prepare_request(self, method: str, endpoint: str, params: dict, signed: bool) -> Dict[str, Any]:
+        """Sign a Kraken Futures API request"""
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
         
         url = f"{self.base_url}{endpoint}"
         
@@ -93,30 +92,27 @@ class KrakenFuturesIntegration(BaseFuturesExchange):
             headers["Nonce"] = nonce
             headers["Authent"] = signature
         
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, data=params, timeout=10)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('result') != 'success' and 'error' in data:
-                raise Exception(f"Kraken API error: {data.get('error', 'Unknown error')}")
-            
-            return data
-            
-        except Exception as e:
-            logger.error(f"Kraken API request failed: {e}")
-            raise
+        if method == "POST":
+            return {"method": method, "url": url, "headers": headers, "data": params, "timeout": 10}
+        return {"method": method, "url": url, "headers": headers, "params": params, "timeout": 10}
+    
+    def _parse_response(self, response, method: str, endpoint: str, params: dict) -> Any:
+        response.raise_for_status()
+        data = response.json()
+        
+        if data.get('result') != 'success' and 'error' in data:
+            raise Exception(f"Kraken API error: {data.get('error', 'Unknown error')}")
+        
+        return data
+    
+    def _request_error(self, error: Exception, method: str, endpoint: str, params: dict) -> Exception:
+        logger.error(f"Kraken API request failed: {error}")
+        return error
     
     def test_connectivity(self) -> bool:
         """Test Kraken API connectivity"""
         try:
-            response = requests.get(f"{self.base_url}/derivatives/api/v3/instruments", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/derivatives/api/v3/instruments", timeout=5)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Kraken connectivity test failed: {e}")
@@ -199,33 +195,28 @@ class KrakenFuturesIntegration(BaseFuturesExchange):
         logger.warning("Kraken Futures has fixed leverage per contract, cannot be changed via API")
         return True
     
+    def _load_symbol_precisions(self) -> Dict[str, dict]:
+        """Precision info of every instrument, keyed by Kraken symbol"""
+        result = self._make_request("GET", "/derivatives/api/v3/instruments")
+        
+        return {
+            instrument['symbol']: {
+                'quantityPrecision': 0,
+                'pricePrecision': 1,
+                'stepSize': '1',
+                'tickSize': str(instrument.get('tickSize', 0.5))
+            }
+            for instrument in result.get('instruments', [])
+        }
+    
     def get_symbol_precision(self, symbol: str) -> dict:
         """Get symbol precision"""
         # Convert to Kraken symbol format
-        kraken_symbol = self._to_kraken_symbol(symbol)
-        
-        if kraken_symbol in self._symbol_info_cache:
-            return self._symbol_info_cache[kraken_symbol]
+        precision_info = self._registry_precision(self._to_kraken_symbol(symbol))
+        if precision_info:
+            return precision_info
         
-        try:
-            result = self._make_request("GET", "/derivatives/api/v3/instruments")
-            
-            for instrument in result.get('instruments', []):
-                if instrument['symbol'] == kraken_symbol:
-                    precision_info = {
-                        'quantityPrecision': 0,
-                        'pricePrecision': 1,
-                        'stepSize': '1',
-                        'tickSize': str(instrument.get('tickSize', 0.5))
-                    }
-                    
-                    self._symbol_info_cache[kraken_symbol] = precision_info
-                    return precision_info
-            
-            return {'quantityPrecision': 0, 'pricePrecision': 1, 'stepSize': '1', 'tickSize': '0.5'}
-        except Exception as e:
-            logger.error(f"Failed to get symbol precision: {e}")
-            return {'quantityPrecision': 0, 'pricePrecision': 1, 'stepSize': '1', 'tickSize': '0.5'}
+        return {'quantityPrecision': 0, 'pricePrecision': 1, 'stepSize': '1', 'tickSize': '0.5'}
     
     def round_quantity(self, quantity: float, symbol: str) -> str:
         """Round quantity - Kraken uses integer contracts"""
@@ -363,8 +354,8 @@ class KrakenFuturesIntegration(BaseFuturesExchange):
             logger.error(f"Failed to cancel all orders: {e}")
             return False
     
-    def get_klines(self, symbol: str, interval: str, limit: int = 100, 
-                   start_time: int = None, end_time: int = None) -> pd.DataFrame:
+    def _fetch_klines(self, symbol: str, interval: str, limit: int = 100, 
+                      start_time: int = None, end_time: int = None) -> pd.DataFrame:
         """Get Kraken kline data"""
         try:
             # Convert to Kraken symbol format
@@ -375,7 +366,7 @@ class KrakenFuturesIntegration(BaseFuturesExchange):
             url = f"{self.base_url}/api/charts/v1/trade/{kraken_symbol}/{interval}"
             
             logger.info(f"📊 Fetching Kraken klines: {url}")
-            response = requests.get(url, timeout=10)
+            response = self.http.request("GET", url, timeout=10)
             response.raise_for_status()
             result = response.json()
             
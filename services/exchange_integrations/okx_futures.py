@@ -4,6 +4,7 @@ OKX Futures Exchange Integration
 
 import hashlib
 import hmac
+import json
 import time
 import base64
 import requests
@@ -49,10 +50,10 @@ class OKXFuturesIntegration(BaseFuturesExchange):
         )
         return base64.b64encode(mac.digest()).decode()
     
-    def _make_request(self, method: str, endpoint: str, params: dict = None, signed: bool = False):
-        """Make authenticated request to OKX API"""
-        if params is None:
-            params = {}
+    def _prepare_request(self, method: str, endpoint: str, params: dict, signed: bool) -> Dict[str, Any]:
+        """Sign an OKX V5 API request"""
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
         
         url = f"{self.base_url}{endpoint}"
         
@@ -79,7 +80,6 @@ class OKXFuturesIntegration(BaseFuturesExchange):
         body = ""
         if signed:
             if method == "POST":
-                import json
                 body = json.dumps(params) if params else ""
             else:
                 body = ""
@@ -99,63 +99,60 @@ class OKXFuturesIntegration(BaseFuturesExchange):
             mode = "DEMO TRADING" if self.testnet else "LIVE"
             logger.info(f"🔑 OKX {mode} API Request: {method} {endpoint}")
         
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, json=params, timeout=10)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
+        if method == "POST":
+            return {"method": method, "url": url, "headers": headers, "json": params, "timeout": 10}
+        return {"method": method, "url": url, "headers": headers, "params": params, "timeout": 10}
+    
+    def _parse_response(self, response, method: str, endpoint: str, params: dict) -> Any:
+        # Log response for debugging
+        logger.info(f"📥 OKX Response Status: {response.status_code}")
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        if data.get('code') != '0':
+            error_msg = data.get('msg', 'Unknown error')
+            error_code = data.get('code')
             
-            # Log response for debugging
-            logger.info(f"📥 OKX Response Status: {response.status_code}")
+            # OKX often returns detailed error in 'data' field
+            detailed_errors = data.get('data', [])
             
-            response.raise_for_status()
-            data = response.json()
+            logger.error(f"❌ OKX API Error [{error_code}]: {error_msg}")
             
-            if data.get('code') != '0':
-                error_msg = data.get('msg', 'Unknown error')
-                error_code = data.get('code')
-                
-                # OKX often returns detailed error in 'data' field
-                detailed_errors = data.get('data', [])
-                
-                logger.error(f"❌ OKX API Error [{error_code}]: {error_msg}")
-                
-                # Log detailed error messages if available
-                if detailed_errors and isinstance(detailed_errors, list) and len(detailed_errors) > 0:
-                    for i, err_detail in enumerate(detailed_errors, 1):
-                        if isinstance(err_detail, dict):
-                            sub_code = err_detail.get('sCode', 'N/A')
-                            sub_msg = err_detail.get('sMsg', 'N/A')
-                            logger.error(f"   └─ Error #{i}: [{sub_code}] {sub_msg}")
-                            # Build comprehensive error message
-                            error_msg = f"{error_msg} | Detail: [{sub_code}] {sub_msg}"
-                
-                # Log full response for debugging
-                logger.error(f"   Full response: {data}")
-                
-                raise Exception(f"OKX API error [{error_code}]: {error_msg}")
+            # Log detailed error messages if available
+            if detailed_errors and isinstance(detailed_errors, list) and len(detailed_errors) > 0:
+                for i, err_detail in enumerate(detailed_errors, 1):
+                    if isinstance(err_detail, dict):
+                        sub_code = err_detail.get('sCode', 'N/A')
+                        sub_msg = err_detail.get('sMsg', 'N/A')
+                        logger.error(f"   └─ Error #{i}: [{sub_code}] {sub_msg}")
+                        # Build comprehensive error message
+                        error_msg = f"{error_msg} | Detail: [{sub_code}] {sub_msg}"
             
-            logger.info(f"✅ OKX API Success: {method} {endpoint}")
-            return data.get('data', [])
+            # Log full response for debugging
+            logger.error(f"   Full response: {data}")
             
-        except requests.exceptions.HTTPError as e:
+            raise Exception(f"OKX API error [{error_code}]: {error_msg}")
+        
+        logger.info(f"✅ OKX API Success: {method} {endpoint}")
+        return data.get('data', [])
+    
+    def _request_error(self, error: Exception, method: str, endpoint: str, params: dict) -> Exception:
+        if isinstance(error, requests.exceptions.HTTPError):
             # Log response body for 401 errors
             try:
-                error_body = e.response.json()
-                logger.error(f"❌ OKX HTTP {e.response.status_code}: {error_body}")
+                error_body = error.response.json()
+                logger.error(f"❌ OKX HTTP {error.response.status_code}: {error_body}")
             except:
-                logger.error(f"❌ OKX HTTP {e.response.status_code}: {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"❌ OKX API request failed: {e}")
-            raise
+                logger.error(f"❌ OKX HTTP {error.response.status_code}: {error.response.text}")
+        else:
+            logger.error(f"❌ OKX API request failed: {error}")
+        return error
     
     def test_connectivity(self) -> bool:
         """Test OKX API connectivity"""
         try:
-            response = requests.get(f"{self.base_url}/api/v5/public/time", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/api/v5/public/time", timeout=5)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"OKX connectivity test failed: {e}")
@@ -386,63 +383,45 @@ class OKXFuturesIntegration(BaseFuturesExchange):
         - ctVal = 0.01 (1 contract = 0.01 ETH)
         - To trade 4.218 ETH → 4.218 / 0.01 = 421.8 → 422 contracts
         """
-        if symbol in self._symbol_info_cache:
-            return self._symbol_info_cache[symbol]
-        
-        try:
-            params = {'instType': 'SWAP', 'instId': self._to_okx_symbol(symbol)}
-            result = self._make_request("GET", "/api/v5/public/instruments", params)
-            
-            if result and len(result) > 0:
-                info = result[0]
-                
-                # OKX contract info
-                ct_val = float(info.get('ctVal', '0.01'))  # Contract value (crypto per contract)
-                lot_sz = float(info.get('lotSz', '1'))     # Minimum lot size
-                tick_sz = float(info.get('tickSz', '0.01'))  # Price tick size
-                
-                precision_info = {
-                    'quantityPrecision': 0,  # Contracts are integers
-                    'pricePrecision': len(str(tick_sz).split('.')[-1]) if '.' in str(tick_sz) else 0,
-                    'stepSize': str(lot_sz),
-                    'tickSize': str(tick_sz),
-                    'contractValue': ct_val,  # How much crypto per contract
-                    'minQty': lot_sz,  # Minimum order size in contracts
-                    'maxQty': 10000,  # OKX default max
-                    'minNotional': 5  # Minimum order value
-                }
-                
-                logger.info(f"📐 {symbol} precision info:")
-                logger.info(f"   Contract Value: {ct_val} (crypto per contract)")
-                logger.info(f"   Lot Size: {lot_sz} contracts")
-                logger.info(f"   Tick Size: {tick_sz}")
-                
-                self._symbol_info_cache[symbol] = precision_info
-                return precision_info
-            
-            # Default fallback
-            return {
-                'quantityPrecision': 0, 
-                'pricePrecision': 2, 
-                'stepSize': '1', 
-                'tickSize': '0.01',
-                'contractValue': 0.01,
-                'minQty': 1,
-                'maxQty': 10000,
-                'minNotional': 5
-            }
-        except Exception as e:
-            logger.error(f"Failed to get symbol precision: {e}")
-            return {
-                'quantityPrecision': 0, 
-                'pricePrecision': 2, 
-                'stepSize': '1', 
-                'tickSize': '0.01',
-                'contractValue': 0.01,
-                'minQty': 1,
-                'maxQty': 10000,
-                'minNotional': 5
+        precision_info = self._registry_precision(self._to_okx_symbol(symbol))
+        if precision_info:
+            return precision_info
+        
+        # Default fallback
+        logger.warning(f"Symbol {symbol} not found, using defaults")
+        return {
+            'quantityPrecision': 0, 
+            'pricePrecision': 2, 
+            'stepSize': '1', 
+            'tickSize': '0.01',
+            'contractValue': 0.01,
+            'minQty': 1,
+            'maxQty': 10000,
+            'minNotional': 5
+        }
+    
+    def _load_symbol_precisions(self) -> Dict[str, dict]:
+        """Contract info of every SWAP instrument, keyed by instId"""
+        result = self._make_request("GET", "/api/v5/public/instruments", {'instType': 'SWAP'})
+        
+        symbols = {}
+        for info in result or []:
+            # OKX contract info
+            ct_val = float(info.get('ctVal') or '0.01')  # Contract value (crypto per contract)
+            lot_sz = float(info.get('lotSz') or '1')     # Minimum lot size
+            tick_sz = float(info.get('tickSz') or '0.01')  # Price tick size
+            
+            symbols[info['instId']] = {
+                'quantityPrecision': 0,  # Contracts are integers
+                'pricePrecision': len(str(tick_sz).split('.')[-1]) if '.' in str(tick_sz) else 0,
+                'stepSize': str(lot_sz),
+                'tickSize': str(tick_sz),
+                'contractValue': ct_val,  # How much crypto per contract
+                'minQty': lot_sz,  # Minimum order size in contracts
+                'maxQty': 10000,  # OKX default max
+                'minNotional': 5  # Minimum order value
             }
+        return symbols
     
     def quantity_to_contracts(self, quantity: float, symbol: str) -> float:
         """
@@ -743,8 +722,8 @@ class OKXFuturesIntegration(BaseFuturesExchange):
             logger.error(f"Failed to cancel all orders: {e}")
             return False
     
-    def get_klines(self, symbol: str, interval: str, limit: int = 100, 
-                   start_time: int = None, end_time: int = None) -> pd.DataFrame:
+    def _fetch_klines(self, symbol: str, interval: str, limit: int = 100, 
+                      start_time: int = None, end_time: int = None) -> pd.DataFrame:
         """
         Get OKX kline data
         
@@ -825,7 +804,7 @@ class OKXFuturesIntegration(BaseFuturesExchange):
     def _sync_server_time(self):
         """Sync with OKX server time"""
         try:
-            response = requests.get(f"{self.base_url}/api/v5/public/time", timeout=5)
+            response = self.http.request("GET", f"{self.base_url}/api/v5/public/time", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('code') == '0' and data.get('data'):
@@ -0,0 +1,218 @@
+"""
+Shared Symbol Metadata Registry for Exchange Integrations
+Lot size, tick size and min notional of every instrument, loaded in bulk
+once per (exchange, network) and shared by all clients and workers
+
+Tier 1 is a process-local dict per (exchange, network), so lookups are O(1)
+dict hits. Tier 2 is Redis when available, else a JSON file per exchange
+under SYMBOL_REGISTRY_DIR. Both expire after SYMBOL_REGISTRY_TTL seconds;
+the refresh_symbol_registry task reloads them before that happens.
+
+Each integration supplies a loader (_load_symbol_precisions) that fetches the
+full instrument list with one request and returns {symbol: precision_info}
+in the same shape get_symbol_precision always returned. A loader returning
+None marks an exchange without a bulk loader; it is skipped from then on.
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+SYMBOL_REGISTRY_TTL = int(os.getenv('SYMBOL_REGISTRY_TTL', 6 * 3600))
+SYMBOL_REGISTRY_DIR = os.getenv('SYMBOL_REGISTRY_DIR', os.path.join(tempfile.gettempdir(), 'symbol_registry'))
+FAILED_LOAD_RETRY = 30  # Seconds before a failed bulk load is retried
+
+Loader = Callable[[], Optional[Dict[str, Dict[str, Any]]]]
+
+
+class SymbolRegistry:
+    """Bulk-loaded {symbol: precision_info} per (exchange, network)"""
+
+    def __init__(self, ttl: int = SYMBOL_REGISTRY_TTL, cache_dir: str = SYMBOL_REGISTRY_DIR):
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self._tables: Dict[Tuple[str, str], Tuple[float, Dict[str, Dict[str, Any]]]] = {}
+        self._failed_until: Dict[Tuple[str, str], float] = {}
+        self._no_loader: set = set()  # (exchange, network) whose loader returned None
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'loads': 0, 'shared_loads': 0, 'failed_loads': 0}
+
+    @staticmethod
+    def _key(exchange: str, testnet: bool) -> Tuple[str, str]:
+        return (exchange.upper(), 'testnet' if testnet else 'mainnet')
+
+    def get(self, exchange: str, testnet: bool, symbol: str, loader: Loader) -> Optional[Dict[str, Any]]:
+        """Precision info of one symbol, None if unknown or the exchange could not be loaded"""
+        table = self.get_table(exchange, testnet, loader)
+        info = table.get(symbol) if table else None
+        return dict(info) if info else None
+
+    def get_table(self, exchange: str, testnet: bool, loader: Loader) -> Optional[Dict[str, Dict[str, Any]]]:
+        key = self._key(exchange, testnet)
+        if key in self._no_loader:
+            return None
+        entry = self._tables.get(key)
+        if entry and entry[0] > time.time():
+            self.stats['hits'] += 1
+            return entry[1]
+
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:  # One bulk load per exchange at a time
+            entry = self._tables.get(key)
+            if entry and entry[0] > time.time():
+                return entry[1]
+
+            shared = self._read_shared(key)
+            if shared:
+                self.stats['shared_loads'] += 1
+                self._tables[key] = shared
+                return shared[1]
+
+            if self._failed_until.get(key, 0) > time.time():
+                return entry[1] if entry else None
+            return self._load(key, loader, stale=entry)
+
+    def refresh(self, exchange: str, testnet: bool, loader: Loader) -> Optional[int]:
+        """Reload from the exchange regardless of TTL, returns the number of symbols (None: no bulk loader)"""
+        key = self._key(exchange, testnet)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            table = self._load(key, loader, stale=self._tables.get(key), raise_errors=True)
+        if key in self._no_loader:
+            return None
+        return len(table or {})
+
+    def _load(self, key, loader: Loader, stale=None, raise_errors: bool = False):
+        try:
+            table = loader()
+        except Exception as e:
+            self.stats['failed_loads'] += 1
+            self._failed_until[key] = time.time() + FAILED_LOAD_RETRY
+            logger.error(f"Failed to load {key[0]} ({key[1]}) instruments: {e}")
+            if raise_errors:
+                raise
+            # Keep serving expired metadata rather than nothing
+            return stale[1] if stale else None
+
+        if table is None:
+            self._no_loader.add(key)
+            logger.debug(f"{key[0]} has no bulk instrument loader")
+            return None
+
+        self.stats['loads'] += 1
+        self._failed_until.pop(key, None)
+        expires_at = time.time() + self.ttl
+        self._tables[key] = (expires_at, table)
+        self._write_shared(key, expires_at, table)
+        logger.info(f"📐 Loaded {len(table)} {key[0]} ({key[1]}) instruments")
+        return table
+
+    # ------------------------------------------------------------------
+    # Tier 2: Redis or local disk
+    # ------------------------------------------------------------------
+
+    def _redis_key(self, key) -> str:
+        return f"symbols:{key[0]}:{key[1]}"
+
+    def _file_path(self, key) -> str:
+        return os.path.join(self.cache_dir, f"{key[0].lower()}_{key[1]}.json")
+
+    def _read_shared(self, key):
+        try:
+            redis_client = get_redis_client()
+            if redis_client is not None:
+                payload = redis_client.get(self._redis_key(key))
+            else:
+                with open(self._file_path(key)) as f:
+                    payload = f.read()
+            if not payload:
+                return None
+            data = json.loads(payload)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Symbol registry read failed for {key[0]}: {e}")
+            return None
+
+        if data['expires_at'] <= time.time():
+            return None
+        return data['expires_at'], data['symbols']
+
+    def _write_shared(self, key, expires_at: float, table: Dict[str, Dict[str, Any]]):
+        payload = json.dumps({'expires_at': expires_at, 'symbols': table})
+        try:
+            redis_client = get_redis_client()
+            if redis_client is not None:
+                redis_client.setex(self._redis_key(key), self.ttl, payload)
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._file_path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._file_path(key))
+        except Exception as e:
+            logger.warning(f"Symbol registry write failed for {key[0]}: {e}")
+
+    def clear(self):
+        """Drop the process-local tables (shared tier is left alone)"""
+        with self._lock:
+            self._tables.clear()
+            self._failed_until.clear()
+            self._no_loader.clear()
+
+
+_registry: Optional[SymbolRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_symbol_registry() -> SymbolRegistry:
+    """Process-wide symbol registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SymbolRegistry()
+    return _registry
+
+
+def refresh_exchange_symbols(exchanges=None, networks=(False, True)) -> Dict[str, Any]:
+    """
+    Reload the instrument lists of every exchange that has a bulk loader
+
+    Used by the refresh_symbol_registry task so lookups never wait on an
+    expired table. Returns {"EXCHANGE:network": symbol count or error};
+    exchanges without a bulk loader are left out.
+    """
+    from .exchange_factory import EXCHANGE_REGISTRY, create_futures_exchange
+
+    registry = get_symbol_registry()
+    results = {}
+    seen = set()
+    for name, exchange_class in EXCHANGE_REGISTRY.items():
+        if exchanges and name not in exchanges:
+            continue
+        if exchange_class in seen:
+            continue
+        seen.add(exchange_class)
+        for testnet in networks:
+            label = f"{name}:{'testnet' if testnet else 'mainnet'}"
+            try:
+                client = create_futures_exchange(name, "", "", "", testnet)  # Public endpoints only
+                count = registry.refresh(client.exchange_name, testnet, client._load_symbol_precisions)
+            except Exception as e:
+                results[label] = f"error: {e}"
+                continue
+            if count is not None:
+                results[label] = count
+    return results
@@ -0,0 +1,623 @@
+"""
+Incremental (Streaming) Indicator Engine
+Updates EMA, SMA, RSI (Wilder), MACD, ATR, ADX and Bollinger Bands in O(1)
+per closed candle instead of recomputing them over the whole DataFrame
+
+One IncrementalIndicatorState exists per (exchange, network, symbol, timeframe,
+parameters). It is persisted to Redis between Celery task runs (process-local
+dict when Redis is unavailable), so each bot run only feeds the candles that
+closed since the previous run.
+
+Replaying a window candle by candle gives the same values as the
+AdvancedIndicators batch functions over that window. After further updates the
+values follow the full history seen by the state, not a re-computation over
+the latest sliding window. A new state is built from a whole window with
+vectorized passes (rebuild_from_frame) instead of a per-candle replay.
+
+OBV is not streamed: it is a running sum whose level depends on where the
+history starts, so a long-lived state would never match OBV over the window
+sent to the LLM. calculate_selected_indicators computes it from the window.
+"""
+
+import os
+import json
+import math
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+
+def _div(numerator: float, denominator: float) -> float:
+    """Division with NumPy semantics (x/0 -> +-inf, 0/0 -> nan)"""
+    if denominator == 0:
+        if numerator == 0 or math.isnan(numerator):
+            return NAN
+        return math.copysign(math.inf, numerator)
+    return numerator / denominator
+
+
+class _RollingWindow:
+    """Fixed-size window with running sums (re-summed every `period` updates to avoid drift)"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nan_count = 0
+        self.since_resum = 0
+
+    def update(self, value: float):
+        if len(self.values) == self.period:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+                self.total_sq -= old * old
+        self.values.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+        else:
+            self.total += value
+            self.total_sq += value * value
+
+        self.since_resum += 1
+        if self.since_resum >= self.period:
+            finite = [v for v in self.values if not math.isnan(v)]
+            self.total = math.fsum(finite)
+            self.total_sq = math.fsum(v * v for v in finite)
+            self.since_resum = 0
+
+    @property
+    def ready(self) -> bool:
+        return len(self.values) == self.period and self.nan_count == 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.period if self.ready else NAN
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1), like pandas rolling std"""
+        if not self.ready or self.period < 2:
+            return NAN
+        variance = (self.total_sq - self.total * self.total / self.period) / (self.period - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'period': self.period,
+            'values': list(self.values),
+            'since_resum': self.since_resum
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> '_RollingWindow':
+        window = cls(int(data['period']))
+        for value in data['values']:
+            window.update(float(value))
+        window.since_resum = int(data['since_resum'])
+        return window
+
+
+class _Ema:
+    """EMA with adjust=False seeded on the first value (pandas ewm semantics)"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.value = NAN
+        self.count = 0
+
+    def update(self, x: float):
+        if self.count == 0:
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1 - self.alpha) * self.value
+        self.count += 1
+
+    @property
+    def output(self) -> float:
+        return self.value if self.count >= self.period else NAN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'period': self.period, 'value': self.value, 'count': self.count}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> '_Ema':
+        ema = cls(int(data['period']))
+        ema.value = float(data['value'])
+        ema.count = int(data['count'])
+        return ema
+
+
+class IncrementalIndicatorState:
+    """
+    Streaming indicator state for one market and timeframe
+
+    Feed closed candles in order with update(); values are available from
+    snapshot(). Candles at or before last_timestamp are ignored, so feeding an
+    overlapping window is safe.
+    """
+
+    def __init__(self, symbol: str, timeframe: str,
+                 sma_periods: Optional[List[int]] = None,
+                 ema_periods: Optional[List[int]] = None,
+                 rsi_period: int = 14,
+                 macd_fast: int = 12, macd_slow: int = 26, macd_signal: int = 9,
+                 atr_period: int = 14,
+                 adx_period: int = 14,
+                 bollinger_period: int = 20, bollinger_std: float = 2.0):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.params = {
+            'sma_periods': sorted(int(p) for p in (sma_periods or [])),
+            'ema_periods': sorted(int(p) for p in (ema_periods or [])),
+            'rsi_period': int(rsi_period),
+            'macd_fast': int(macd_fast),
+            'macd_slow': int(macd_slow),
+            'macd_signal': int(macd_signal),
+            'atr_period': int(atr_period),
+            'adx_period': int(adx_period),
+            'bollinger_period': int(bollinger_period),
+            'bollinger_std': float(bollinger_std),
+        }
+        self.last_timestamp: Optional[int] = None
+        self.count = 0
+        self.prev_high = NAN
+        self.prev_low = NAN
+        self.prev_close = NAN
+
+        self.sma = {p: _RollingWindow(p) for p in self.params['sma_periods']}
+        self.ema = {p: _Ema(p) for p in self.params['ema_periods']}
+
+        # RSI (Wilder): simple average of the first `period` gains/losses, then smoothing
+        self.rsi_avg_gain = 0.0
+        self.rsi_avg_loss = 0.0
+
+        self.macd_fast_ema = _Ema(self.params['macd_fast'])
+        self.macd_slow_ema = _Ema(self.params['macd_slow'])
+        self.macd_signal_ema = _Ema(self.params['macd_signal'])
+        self.macd_value = NAN
+
+        self.atr_window = _RollingWindow(self.params['atr_period'])
+
+        self.adx_tr = _RollingWindow(self.params['adx_period'])
+        self.adx_plus_dm = _RollingWindow(self.params['adx_period'])
+        self.adx_minus_dm = _RollingWindow(self.params['adx_period'])
+        self.adx_dx = _RollingWindow(self.params['adx_period'])
+        self.plus_di = NAN
+        self.minus_di = NAN
+
+        self.bollinger = _RollingWindow(self.params['bollinger_period'])
+
+    @classmethod
+    def from_config(cls, symbol: str, timeframe: str, config: Dict[str, Any]) -> 'IncrementalIndicatorState':
+        """Build a state matching an indicators_config used by calculate_selected_indicators"""
+        enabled = config.get('enabled_indicators', {}) or {}
+        periods = config.get('indicator_periods', {}) or {}
+        return cls(
+            symbol=symbol,
+            timeframe=timeframe,
+            sma_periods=enabled['sma'] if isinstance(enabled.get('sma'), list) else [],
+            ema_periods=enabled['ema'] if isinstance(enabled.get('ema'), list) else [],
+            rsi_period=periods.get('rsi_period', 14),
+            macd_fast=periods.get('macd_fast', 12),
+            macd_slow=periods.get('macd_slow', 26),
+            macd_signal=periods.get('macd_signal', 9),
+            atr_period=periods.get('atr_period', 14),
+            bollinger_period=periods.get('bollinger_period', 20),
+            bollinger_std=periods.get('bollinger_std', 2.0),
+        )
+
+    @property
+    def params_digest(self) -> str:
+        return hashlib.md5(json.dumps(self.params, sort_keys=True).encode()).hexdigest()[:12]
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def update(self, timestamp: int, open_: float, high: float, low: float,
+               close: float, volume: float) -> bool:
+        """
+        Apply one closed candle
+
+        Returns:
+            True if applied, False if the candle is not newer than last_timestamp
+        """
+        timestamp = int(timestamp)
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return False
+
+        high, low, close = float(high), float(low), float(close)
+        first = self.count == 0
+        prev_close = self.prev_close
+
+        for window in self.sma.values():
+            window.update(close)
+        for ema in self.ema.values():
+            ema.update(close)
+
+        # RSI (Wilder)
+        rsi_period = self.params['rsi_period']
+        delta = NAN if first else close - prev_close
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if self.count < rsi_period:
+            self.rsi_avg_gain += gain
+            self.rsi_avg_loss += loss
+            if self.count == rsi_period - 1:
+                self.rsi_avg_gain /= rsi_period
+                self.rsi_avg_loss /= rsi_period
+        else:
+            self.rsi_avg_gain = (self.rsi_avg_gain * (rsi_period - 1) + gain) / rsi_period
+            self.rsi_avg_loss = (self.rsi_avg_loss * (rsi_period - 1) + loss) / rsi_period
+
+        # MACD
+        self.macd_fast_ema.update(close)
+        self.macd_slow_ema.update(close)
+        fast_value = self.macd_fast_ema.output
+        slow_value = self.macd_slow_ema.output
+        self.macd_value = fast_value - slow_value
+        if not math.isnan(self.macd_value):
+            self.macd_signal_ema.update(self.macd_value)
+
+        # True range (first bar: high - low)
+        if first:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        self.atr_window.update(true_range)
+
+        # ADX
+        up_move = NAN if first else high - self.prev_high
+        down_move = NAN if first else self.prev_low - low
+        plus_dm = up_move if (up_move > down_move and up_move > 0) else 0.0
+        minus_dm = down_move if (down_move > up_move and down_move > 0) else 0.0
+        self.adx_tr.update(true_range)
+        self.adx_plus_dm.update(plus_dm)
+        self.adx_minus_dm.update(minus_dm)
+        tr_mean = self.adx_tr.mean
+        self.plus_di = 100 * _div(self.adx_plus_dm.mean, tr_mean)
+        self.minus_di = 100 * _div(self.adx_minus_dm.mean, tr_mean)
+        dx = 100 * _div(abs(self.plus_di - self.minus_di), self.plus_di + self.minus_di)
+        self.adx_dx.update(dx)
+
+        self.bollinger.update(close)
+
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        self.last_timestamp = timestamp
+        self.count += 1
+        return True
+
+    def update_from_frame(self, data: pd.DataFrame) -> int:
+        """
+        Feed every candle of an OHLCV frame newer than last_timestamp
+
+        Returns:
+            Number of candles applied
+        """
+        timestamps = frame_timestamps_ms(data)
+        applied = 0
+        rows = zip(timestamps, data['open'].tolist(), data['high'].tolist(), data['low'].tolist(),
+                   data['close'].tolist(), data['volume'].tolist())
+        for ts, o, h, l, c, v in rows:
+            if self.update(ts, o, h, l, c, v):
+                applied += 1
+        return applied
+
+    def rebuild_from_frame(self, data: pd.DataFrame) -> int:
+        """
+        Bring a new state to the end of an OHLCV frame with vectorized passes
+
+        Equivalent to update_from_frame on an empty state (same candles
+        skipped, same values up to float rounding); a state that already holds
+        candles is updated candle by candle.
+
+        Returns:
+            Number of candles applied
+        """
+        if self.count:
+            return self.update_from_frame(data)
+
+        timestamps = np.asarray(frame_timestamps_ms(data), dtype='int64')
+        if len(timestamps) == 0:
+            return 0
+        # Like update(): a candle not newer than every earlier one is skipped
+        keep = np.ones(len(timestamps), dtype=bool)
+        keep[1:] = timestamps[1:] > np.maximum.accumulate(timestamps)[:-1]
+        high, low, close = (data[column].to_numpy(dtype=float)[keep] for column in ('high', 'low', 'close'))
+        n = len(close)
+
+        for period, window in list(self.sma.items()):
+            self.sma[period] = self._window_tail(close, period)
+        for ema in self.ema.values():
+            ema.value, ema.count = self._ema_series(close, ema.alpha)[-1], n
+
+        # RSI (Wilder): first delta counts as no move
+        rsi_period = self.params['rsi_period']
+        delta = np.zeros(n)
+        delta[1:] = np.diff(close)
+        gains, losses = np.where(delta > 0, delta, 0.0), np.where(delta < 0, -delta, 0.0)
+        if n < rsi_period:
+            self.rsi_avg_gain, self.rsi_avg_loss = float(gains.sum()), float(losses.sum())
+        else:
+            self.rsi_avg_gain, self.rsi_avg_loss = (
+                self._ema_series(np.concatenate(([values[:rsi_period].sum() / rsi_period], values[rsi_period:])),
+                                 1.0 / rsi_period)[-1]
+                for values in (gains, losses)
+            )
+
+        # MACD: the signal EMA only sees values once both EMAs are warm
+        fast, slow = self.params['macd_fast'], self.params['macd_slow']
+        fast_values = self._ema_series(close, self.macd_fast_ema.alpha)
+        slow_values = self._ema_series(close, self.macd_slow_ema.alpha)
+        macd = fast_values - slow_values
+        macd[:max(fast, slow) - 1] = NAN
+        self.macd_fast_ema.value, self.macd_fast_ema.count = fast_values[-1], n
+        self.macd_slow_ema.value, self.macd_slow_ema.count = slow_values[-1], n
+        self.macd_value = float(macd[-1])
+        valid_macd = macd[~np.isnan(macd)]
+        if len(valid_macd):
+            self.macd_signal_ema.value = self._ema_series(valid_macd, self.macd_signal_ema.alpha)[-1]
+            self.macd_signal_ema.count = len(valid_macd)
+
+        # True range (first bar: high - low)
+        true_range = high - low
+        if n > 1:
+            prev_close = close[:-1]
+            true_range[1:] = np.maximum(true_range[1:], np.maximum(np.abs(high[1:] - prev_close),
+                                                                   np.abs(low[1:] - prev_close)))
+        self.atr_window = self._window_tail(true_range, self.params['atr_period'])
+
+        # ADX
+        adx_period = self.params['adx_period']
+        up_move = np.full(n, NAN)
+        down_move = np.full(n, NAN)
+        up_move[1:] = high[1:] - high[:-1]
+        down_move[1:] = low[:-1] - low[1:]
+        with np.errstate(invalid='ignore'):
+            plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+            minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tr_mean = self._rolling_mean(true_range, adx_period)
+            plus_di = 100 * (self._rolling_mean(plus_dm, adx_period) / tr_mean)
+            minus_di = 100 * (self._rolling_mean(minus_dm, adx_period) / tr_mean)
+            dx = 100 * (np.abs(plus_di - minus_di) / (plus_di + minus_di))
+        self.adx_tr = self._window_tail(true_range, adx_period)
+        self.adx_plus_dm = self._window_tail(plus_dm, adx_period)
+        self.adx_minus_dm = self._window_tail(minus_dm, adx_period)
+        self.adx_dx = self._window_tail(dx, adx_period)
+        self.plus_di, self.minus_di = float(plus_di[-1]), float(minus_di[-1])
+
+        self.bollinger = self._window_tail(close, self.params['bollinger_period'])
+
+        self.prev_high, self.prev_low, self.prev_close = float(high[-1]), float(low[-1]), float(close[-1])
+        self.last_timestamp = int(timestamps[keep][-1])
+        self.count = n
+        return n
+
+    @staticmethod
+    def _ema_series(values: np.ndarray, alpha: float) -> np.ndarray:
+        """EMA (adjust=False) seeded on the first value, as _Ema.update"""
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+    @staticmethod
+    def _rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+        """Mean of the last `period` values, NaN until the window is full (or holds a NaN)"""
+        return pd.Series(values).rolling(period).mean().to_numpy()
+
+    @staticmethod
+    def _window_tail(values: np.ndarray, period: int) -> _RollingWindow:
+        """Window as after feeding every value: the last `period` values"""
+        return _RollingWindow.from_dict({
+            'period': period,
+            'values': values[-period:].tolist(),
+            'since_resum': len(values) % period
+        })
+
+    # ------------------------------------------------------------------
+    # Values
+    # ------------------------------------------------------------------
+
+    @property
+    def rsi(self) -> float:
+        if self.count < self.params['rsi_period']:
+            return NAN
+        return 100 - _div(100, 1 + _div(self.rsi_avg_gain, self.rsi_avg_loss))
+
+    def snapshot(self) -> Dict[str, float]:
+        """Latest indicator values (NaN while warming up)"""
+        values = {}
+        for period, window in self.sma.items():
+            values[f'sma_{period}'] = window.mean
+        for period, ema in self.ema.items():
+            values[f'ema_{period}'] = ema.output
+
+        values['rsi'] = self.rsi
+
+        macd_signal = self.macd_signal_ema.output
+        values['macd'] = self.macd_value
+        values['macd_signal'] = macd_signal
+        values['macd_histogram'] = self.macd_value - macd_signal
+
+        values['atr'] = self.atr_window.mean
+
+        values['adx'] = self.adx_dx.mean
+        values['plus_di'] = self.plus_di
+        values['minus_di'] = self.minus_di
+
+        middle = self.bollinger.mean
+        std = self.bollinger.std
+        values['bb_middle'] = middle
+        values['bb_upper'] = middle + std * self.params['bollinger_std']
+        values['bb_lower'] = middle - std * self.params['bollinger_std']
+        return values
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'symbol': self.symbol,
+            'timeframe': self.timeframe,
+            'params': self.params,
+            'last_timestamp': self.last_timestamp,
+            'count': self.count,
+            'prev': [self.prev_high, self.prev_low, self.prev_close],
+            'sma': {str(p): w.to_dict() for p, w in self.sma.items()},
+            'ema': {str(p): e.to_dict() for p, e in self.ema.items()},
+            'rsi': [self.rsi_avg_gain, self.rsi_avg_loss],
+            'macd': {
+                'fast': self.macd_fast_ema.to_dict(),
+                'slow': self.macd_slow_ema.to_dict(),
+                'signal': self.macd_signal_ema.to_dict(),
+                'value': self.macd_value
+            },
+            'atr': self.atr_window.to_dict(),
+            'adx': {
+                'tr': self.adx_tr.to_dict(),
+                'plus_dm': self.adx_plus_dm.to_dict(),
+                'minus_dm': self.adx_minus_dm.to_dict(),
+                'dx': self.adx_dx.to_dict(),
+                'plus_di': self.plus_di,
+                'minus_di': self.minus_di
+            },
+            'bollinger': self.bollinger.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'IncrementalIndicatorState':
+        params = data['params']
+        state = cls(
+            symbol=data['symbol'],
+            timeframe=data['timeframe'],
+            sma_periods=params['sma_periods'],
+            ema_periods=params['ema_periods'],
+            rsi_period=params['rsi_period'],
+            macd_fast=params['macd_fast'],
+            macd_slow=params['macd_slow'],
+            macd_signal=params['macd_signal'],
+            atr_period=params['atr_period'],
+            adx_period=params['adx_period'],
+            bollinger_period=params['bollinger_period'],
+            bollinger_std=params['bollinger_std'],
+        )
+        state.last_timestamp = data['last_timestamp']
+        state.count = int(data['count'])
+        state.prev_high, state.prev_low, state.prev_close = (float(v) for v in data['prev'])
+        state.sma = {int(p): _RollingWindow.from_dict(w) for p, w in data['sma'].items()}
+        state.ema = {int(p): _Ema.from_dict(e) for p, e in data['ema'].items()}
+        state.rsi_avg_gain, state.rsi_avg_loss = (float(v) for v in data['rsi'])
+        state.macd_fast_ema = _Ema.from_dict(data['macd']['fast'])
+        state.macd_slow_ema = _Ema.from_dict(data['macd']['slow'])
+        state.macd_signal_ema = _Ema.from_dict(data['macd']['signal'])
+        state.macd_value = float(data['macd']['value'])
+        state.atr_window = _RollingWindow.from_dict(data['atr'])
+        state.adx_tr = _RollingWindow.from_dict(data['adx']['tr'])
+        state.adx_plus_dm = _RollingWindow.from_dict(data['adx']['plus_dm'])
+        state.adx_minus_dm = _RollingWindow.from_dict(data['adx']['minus_dm'])
+        state.adx_dx = _RollingWindow.from_dict(data['adx']['dx'])
+        state.plus_di = float(data['adx']['plus_di'])
+        state.minus_di = float(data['adx']['minus_di'])
+        state.bollinger = _RollingWindow.from_dict(data['bollinger'])
+        return state
+
+
+def frame_timestamps_ms(data: pd.DataFrame) -> List[int]:
+    """Candle open times in ms from a 'timestamp' column or a DatetimeIndex"""
+    if 'timestamp' in data.columns:
+        series = data['timestamp']
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series.values.astype('datetime64[ms]').astype('int64').tolist()
+        return pd.to_numeric(series).astype('int64').tolist()
+    if isinstance(data.index, pd.DatetimeIndex):
+        return data.index.values.astype('datetime64[ms]').astype('int64').tolist()
+    raise ValueError("Data must have a 'timestamp' column or a DatetimeIndex")
+
+
+# ======================================================================
+# Persistence between task runs
+# ======================================================================
+
+STATE_TTL = int(os.getenv('INDICATOR_STATE_TTL', 7 * 24 * 3600))
+
+_local_states: Dict[str, str] = {}
+_local_lock = threading.Lock()
+
+
+def _state_key(exchange: str, testnet: bool, state: IncrementalIndicatorState) -> str:
+    network = 'testnet' if testnet else 'mainnet'
+    symbol = state.symbol.replace('/', '').upper()
+    return f"indicator_state:{exchange.upper()}:{network}:{symbol}:{state.timeframe}:{state.params_digest}"
+
+
+def load_incremental_state(exchange: str, testnet: bool, symbol: str, timeframe: str,
+                           config: Dict[str, Any], data: pd.DataFrame) -> IncrementalIndicatorState:
+    """
+    Restore the state for a market, catch it up with `data` and persist it again
+
+    The stored state is reused when its last candle is inside `data`; only the
+    newer candles are applied. Otherwise (first run, gap, parameter change) the
+    state is rebuilt by replaying `data`.
+    """
+    fresh = IncrementalIndicatorState.from_config(symbol, timeframe, config)
+    key = _state_key(exchange, testnet, fresh)
+    timestamps = frame_timestamps_ms(data)
+
+    state = None
+    payload = None
+    redis_client = get_redis_client()
+    try:
+        payload = redis_client.get(key) if redis_client else None
+    except Exception as e:
+        logger.warning(f"Indicator state Redis read failed: {e}")
+    if payload is None:
+        with _local_lock:
+            payload = _local_states.get(key)
+    if payload:
+        try:
+            state = IncrementalIndicatorState.from_dict(json.loads(payload))
+        except Exception as e:
+            logger.warning(f"Discarding unreadable indicator state {key}: {e}")
+            state = None
+
+    if state is not None and timestamps and state.last_timestamp in timestamps:
+        applied = state.update_from_frame(data)
+        logger.debug(f"Indicator state {key}: applied {applied} new candle(s)")
+    else:
+        state = fresh
+        state.rebuild_from_frame(data)
+        logger.debug(f"Indicator state {key}: rebuilt from {len(timestamps)} candles")
+
+    save_incremental_state(exchange, testnet, state)
+    return state
+
+
+def save_incremental_state(exchange: str, testnet: bool, state: IncrementalIndicatorState):
+    """Persist state to Redis (process-local fallback)"""
+    key = _state_key(exchange, testnet, state)
+    payload = json.dumps(state.to_dict())
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            redis_client.setex(key, STATE_TTL, payload)
+            return
+        except Exception as e:
+            logger.warning(f"Indicator state Redis write failed: {e}")
+    with _local_lock:
+        _local_states[key] = payload
@@ -0,0 +1,186 @@
+"""
+Array-backed Indicator Kernels
+Recursive indicators and volume profile computed on raw NumPy buffers
+
+Supertrend and Parabolic SAR depend on their own previous value, so they
+cannot be expressed as whole-array operations. These kernels keep the
+recursion but carry state in local floats and write into preallocated
+output arrays, instead of doing per-bar pandas .iloc reads and writes.
+Outputs match the original AdvancedIndicators Series implementations.
+
+The volume profile kernel bins volume with a single np.histogram call.
+"""
+
+import numpy as np
+from typing import Dict, Any, Tuple
+
+
+def supertrend(high: np.ndarray, low: np.ndarray, close: np.ndarray, atr: np.ndarray,
+               period: int = 10, multiplier: float = 3.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Supertrend on arrays
+
+    Args:
+        high, low, close: Price arrays of equal length
+        atr: ATR array for the same bars (NaN during warm-up)
+        period: ATR period, first output bar is at index `period`
+        multiplier: ATR band multiplier
+
+    Returns:
+        supertrend: Supertrend line (NaN before `period`)
+        direction: 1.0 bullish, -1.0 bearish (NaN before `period`)
+    """
+    n = len(close)
+    supertrend_out = np.full(n, np.nan)
+    direction_out = np.full(n, np.nan)
+    if n <= period or period < 1:
+        return supertrend_out, direction_out
+
+    hl_avg = (high + low) / 2
+    upper_band = (hl_avg + multiplier * atr).tolist()
+    lower_band = (hl_avg - multiplier * atr).tolist()
+    closes = close.tolist()
+
+    final_upper_prev = upper_band[period - 1]
+    final_lower_prev = lower_band[period - 1]
+    st_prev = np.nan
+
+    for i in range(period, n):
+        upper = upper_band[i]
+        lower = lower_band[i]
+        close_prev = closes[i - 1]
+        close_i = closes[i]
+
+        if upper < final_upper_prev or close_prev > final_upper_prev:
+            final_upper = upper
+        else:
+            final_upper = final_upper_prev
+
+        if lower > final_lower_prev or close_prev < final_lower_prev:
+            final_lower = lower
+        else:
+            final_lower = final_lower_prev
+
+        st = np.nan
+        if i == period:
+            st = final_upper
+            direction_out[i] = -1.0
+        elif st_prev == final_upper_prev and close_i <= final_upper:
+            st = final_upper
+            direction_out[i] = -1.0
+        elif st_prev == final_upper_prev and close_i > final_upper:
+            st = final_lower
+            direction_out[i] = 1.0
+        elif st_prev == final_lower_prev and close_i >= final_lower:
+            st = final_lower
+            direction_out[i] = 1.0
+        elif st_prev == final_lower_prev and close_i < final_lower:
+            st = final_upper
+            direction_out[i] = -1.0
+
+        supertrend_out[i] = st
+        st_prev = st
+        final_upper_prev = final_upper
+        final_lower_prev = final_lower
+
+    return supertrend_out, direction_out
+
+
+def parabolic_sar(high: np.ndarray, low: np.ndarray,
+                  af: float = 0.02, max_af: float = 0.2) -> np.ndarray:
+    """
+    Parabolic SAR on arrays
+
+    Args:
+        high, low: Price arrays of equal length
+        af: Acceleration factor step (and initial value)
+        max_af: Maximum acceleration factor
+
+    Returns:
+        SAR array, starting in an uptrend at low[0]
+    """
+    n = len(high)
+    sar_out = np.empty(n)
+    if n == 0:
+        return sar_out
+
+    highs = high.tolist()
+    lows = low.tolist()
+
+    sar = lows[0]
+    ep = highs[0]
+    af_cur = af
+    uptrend = True
+    sar_out[0] = sar
+
+    for i in range(1, n):
+        sar = sar + af_cur * (ep - sar)
+
+        if uptrend:
+            if lows[i] < sar:
+                uptrend = False
+                sar = ep
+                ep = lows[i]
+                af_cur = af
+            elif highs[i] > ep:
+                ep = highs[i]
+                af_cur = min(af_cur + af, max_af)
+        else:
+            if highs[i] > sar:
+                uptrend = True
+                sar = ep
+                ep = highs[i]
+                af_cur = af
+            elif lows[i] < ep:
+                ep = lows[i]
+                af_cur = min(af_cur + af, max_af)
+
+        sar_out[i] = sar
+
+    return sar_out
+
+
+def volume_profile(prices: np.ndarray, volumes: np.ndarray, num_bins: int = 20,
+                   value_area_pct: float = 0.7) -> Dict[str, Any]:
+    """
+    Volume profile via np.histogram
+
+    Args:
+        prices: Price per candle (close) or per trade
+        volumes: Volume per candle or trade size
+        num_bins: Number of equal-width price bins between min and max price
+        value_area_pct: Share of total volume that defines the value area
+
+    Returns:
+        bin_edges: num_bins + 1 edges
+        bin_volumes: Volume per bin (the max price falls in the last bin)
+        poc: Mid price of the highest-volume bin (first on ties)
+        vah / val: High / low edge of the value area, built by adding bins in
+                   descending volume order until value_area_pct is reached
+    """
+    price_min = float(prices.min())
+    price_max = float(prices.max())
+
+    if price_max == price_min:
+        edges = np.full(num_bins + 1, price_min)
+        hist = np.zeros(num_bins)
+        hist[0] = float(volumes.sum())
+        return {'bin_edges': edges, 'bin_volumes': hist, 'poc': price_min, 'vah': price_min, 'val': price_min}
+
+    hist, edges = np.histogram(prices, bins=num_bins, range=(price_min, price_max), weights=volumes)
+
+    poc_index = int(np.argmax(hist))
+    poc = (edges[poc_index] + edges[poc_index + 1]) / 2
+
+    order = np.argsort(-hist, kind='stable')
+    cumulative = np.cumsum(hist[order])
+    last = int(np.searchsorted(cumulative, cumulative[-1] * value_area_pct, side='left'))
+    value_area = order[:min(last, num_bins - 1) + 1]
+
+    return {
+        'bin_edges': edges,
+        'bin_volumes': hist,
+        'poc': float(poc),
+        'vah': float(edges[value_area.max() + 1]),
+        'val': float(edges[value_area.min()])
+    }
@@ -8,11 +8,14 @@ Version: 1.0.0
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 import logging
 from dataclasses import dataclass
 from enum import Enum
 
+from services import indicator_kernels
+from services.incremental_indicators import IncrementalIndicatorState
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,6 +46,7 @@ class AdvancedIndicators:
     
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._volume_profile_cache: Dict[tuple, Dict[str, Any]] = {}
     
     # ============= TREND INDICATORS =============
     
@@ -98,59 +102,24 @@ class AdvancedIndicators:
                             period: int = 10, multiplier: float = 3.0) -> Tuple[pd.Series, pd.Series]:
         """
         Supertrend Indicator
-        ATR-based trend follower
+        ATR-based trend follower (recursion runs on NumPy buffers, see indicator_kernels)
         
         Returns:
             supertrend: Supertrend line values
             direction: 1 for bullish, -1 for bearish
         """
-        # Calculate ATR
         atr = self.calculate_atr(high, low, close, period)
-        hl_avg = (high + low) / 2
-        
-        # Basic bands
-        upper_band = hl_avg + (multiplier * atr)
-        lower_band = hl_avg - (multiplier * atr)
-        
-        # Initialize
-        final_upper = upper_band.copy()
-        final_lower = lower_band.copy()
-        supertrend = pd.Series(index=close.index, dtype=float)
-        direction = pd.Series(index=close.index, dtype=int)
-        
-        # Calculate
-        for i in range(period, len(close)):
-            # Final upper band
-            if upper_band.iloc[i] < final_upper.iloc[i-1] or close.iloc[i-1] > final_upper.iloc[i-1]:
-                final_upper.iloc[i] = upper_band.iloc[i]
-            else:
-                final_upper.iloc[i] = final_upper.iloc[i-1]
-            
-            # Final lower band
-            if lower_band.iloc[i] > final_lower.iloc[i-1] or close.iloc[i-1] < final_lower.iloc[i-1]:
-                final_lower.iloc[i] = lower_band.iloc[i]
-            else:
-                final_lower.iloc[i] = final_lower.iloc[i-1]
-            
-            # Supertrend
-            if i == period:
-                supertrend.iloc[i] = final_upper.iloc[i]
-                direction.iloc[i] = -1
-            else:
-                if supertrend.iloc[i-1] == final_upper.iloc[i-1] and close.iloc[i] <= final_upper.iloc[i]:
-                    supertrend.iloc[i] = final_upper.iloc[i]
-                    direction.iloc[i] = -1
-                elif supertrend.iloc[i-1] == final_upper.iloc[i-1] and close.iloc[i] > final_upper.iloc[i]:
-                    supertrend.iloc[i] = final_lower.iloc[i]
-                    direction.iloc[i] = 1
-                elif supertrend.iloc[i-1] == final_lower.iloc[i-1] and close.iloc[i] >= final_lower.iloc[i]:
-                    supertrend.iloc[i] = final_lower.iloc[i]
-                    direction.iloc[i] = 1
-                elif supertrend.iloc[i-1] == final_lower.iloc[i-1] and close.iloc[i] < final_lower.iloc[i]:
-                    supertrend.iloc[i] = final_upper.iloc[i]
-                    direction.iloc[i] = -1
-        
-        return supertrend, direction
+        
+        supertrend, direction = indicator_kernels.supertrend(
+            high.to_numpy(dtype=float),
+            low.to_numpy(dtype=float),
+            close.to_numpy(dtype=float),
+            atr.to_numpy(dtype=float),
+            period,
+            multiplier
+        )
+        
+        return pd.Series(supertrend, index=close.index), pd.Series(direction, index=close.index)
     
     def calculate_adx(self, high: pd.Series, low: pd.Series, close: pd.Series, 
                      period: int = 14) -> Tuple[pd.Series, pd.Series, pd.Series]:
@@ -562,58 +531,16 @@ class AdvancedIndicators:
                                af: float = 0.02, max_af: float = 0.2) -> pd.Series:
         """
         Parabolic SAR
-        Trailing stop and trend indicator
+        Trailing stop and trend indicator (recursion runs on NumPy buffers, see indicator_kernels)
         """
-        sar = pd.Series(index=close.index, dtype=float)
-        ep = pd.Series(index=close.index, dtype=float)  # Extreme point
-        af_series = pd.Series(index=close.index, dtype=float)
-        trend = pd.Series(index=close.index, dtype=int)  # 1 for up, -1 for down
-        
-        # Initialize
-        sar.iloc[0] = low.iloc[0]
-        ep.iloc[0] = high.iloc[0]
-        af_series.iloc[0] = af
-        trend.iloc[0] = 1
-        
-        for i in range(1, len(close)):
-            # Update SAR
-            sar.iloc[i] = sar.iloc[i-1] + af_series.iloc[i-1] * (ep.iloc[i-1] - sar.iloc[i-1])
-            
-            # Check for trend reversal
-            if trend.iloc[i-1] == 1:  # Uptrend
-                if low.iloc[i] < sar.iloc[i]:
-                    # Reversal to downtrend
-                    trend.iloc[i] = -1
-                    sar.iloc[i] = ep.iloc[i-1]
-                    ep.iloc[i] = low.iloc[i]
-                    af_series.iloc[i] = af
-                else:
-                    # Continue uptrend
-                    trend.iloc[i] = 1
-                    if high.iloc[i] > ep.iloc[i-1]:
-                        ep.iloc[i] = high.iloc[i]
-                        af_series.iloc[i] = min(af_series.iloc[i-1] + af, max_af)
-                    else:
-                        ep.iloc[i] = ep.iloc[i-1]
-                        af_series.iloc[i] = af_series.iloc[i-1]
-            else:  # Downtrend
-                if high.iloc[i] > sar.iloc[i]:
-                    # Reversal to uptrend
-                    trend.iloc[i] = 1
-                    sar.iloc[i] = ep.iloc[i-1]
-                    ep.iloc[i] = high.iloc[i]
-                    af_series.iloc[i] = af
-                else:
-                    # Continue downtrend
-                    trend.iloc[i] = -1
-                    if low.iloc[i] < ep.iloc[i-1]:
-                        ep.iloc[i] = low.iloc[i]
-                        af_series.iloc[i] = min(af_series.iloc[i-1] + af, max_af)
-                    else:
-                        ep.iloc[i] = ep.iloc[i-1]
-                        af_series.iloc[i] = af_series.iloc[i-1]
+        sar = indicator_kernels.parabolic_sar(
+            high.to_numpy(dtype=float),
+            low.to_numpy(dtype=float),
+            af,
+            max_af
+        )
         
-        return sar
+        return pd.Series(sar, index=close.index)
     
     # ============= ADVANCED ANALYSIS =============
     
@@ -662,62 +589,74 @@ class AdvancedIndicators:
             return TrendStrength.VERY_STRONG
     
     def calculate_volume_profile(self, close: pd.Series, volume: pd.Series,
-                                 num_bins: int = 20) -> Dict[str, Any]:
+                                 num_bins: int = 20,
+                                 window: Optional[Union[int, str]] = None,
+                                 cache_key: Optional[str] = None,
+                                 last_timestamp: Any = None) -> Dict[str, Any]:
         """
         Volume Profile Analysis
         Shows volume distribution at different price levels
+        
+        Works for candles (close, volume) as well as trades (price, size).
+        
+        Args:
+            num_bins: Number of equal-width price bins
+            window: Only use the last N rows (int) or the last time span (e.g. '4h',
+                    requires a DatetimeIndex) - rolling intraday profile
+            cache_key: Optional key such as 'BTCUSDT:1h'; the distribution is cached
+                       per key and last candle so repeated calls on the same tick are free
+            last_timestamp: Open time of the last candle (e.g. data['timestamp'].iloc[-1]);
+                            defaults to the last label of a DatetimeIndex. Without a
+                            candle time the result is not cached
+        
+        Returns:
+            poc, vah, val, bin_edges (num_bins + 1 floats), bin_volumes (num_bins floats)
         """
-        price_min = close.min()
-        price_max = close.max()
-        price_range = price_max - price_min
-        bin_size = price_range / num_bins
-        
-        # Create price bins
-        bins = [price_min + i * bin_size for i in range(num_bins + 1)]
-        volume_at_price = {f"{bins[i]:.2f}-{bins[i+1]:.2f}": 0 for i in range(num_bins)}
-        
-        # Accumulate volume in each bin
-        for i in range(len(close)):
-            price = close.iloc[i]
-            vol = volume.iloc[i]
-            
-            for j in range(num_bins):
-                if bins[j] <= price < bins[j+1]:
-                    key = f"{bins[j]:.2f}-{bins[j+1]:.2f}"
-                    volume_at_price[key] += vol
-                    break
-        
-        # Find POC (Point of Control) - price level with highest volume
-        poc_bin = max(volume_at_price, key=volume_at_price.get)
-        poc_price = (float(poc_bin.split('-')[0]) + float(poc_bin.split('-')[1])) / 2
-        
-        # Find Value Area (70% of volume)
-        sorted_bins = sorted(volume_at_price.items(), key=lambda x: x[1], reverse=True)
-        total_volume = sum(volume_at_price.values())
-        value_area_volume = 0
-        value_area_bins = []
-        
-        for bin_name, bin_vol in sorted_bins:
-            value_area_bins.append(bin_name)
-            value_area_volume += bin_vol
-            if value_area_volume >= total_volume * 0.7:
-                break
-        
-        # Extract value area high and low
-        value_area_prices = []
-        for bin_name in value_area_bins:
-            low, high = bin_name.split('-')
-            value_area_prices.extend([float(low), float(high)])
-        
-        vah = max(value_area_prices)  # Value Area High
-        val = min(value_area_prices)  # Value Area Low
+        if window is not None:
+            if isinstance(window, str):
+                cutoff = close.index[-1] - pd.Timedelta(window)
+                mask = close.index > cutoff
+                close, volume = close[mask], volume[mask]
+            else:
+                close, volume = close.iloc[-window:], volume.iloc[-window:]
+        
+        cache_id = None
+        if last_timestamp is None and isinstance(close.index, pd.DatetimeIndex):
+            last_timestamp = close.index[-1]
+        if cache_key is not None and last_timestamp is not None:
+            # The last close/volume change while that candle is still forming
+            cache_id = (cache_key, num_bins, window, len(close), last_timestamp,
+                        float(close.iloc[-1]), float(volume.iloc[-1]))
+            cached = self._volume_profile_cache.get(cache_id)
+            if cached is not None:
+                return self._copy_volume_profile(cached)
+        
+        profile = indicator_kernels.volume_profile(
+            close.to_numpy(dtype=float),
+            volume.to_numpy(dtype=float),
+            num_bins
+        )
         
-        return {
-            'poc': poc_price,
-            'vah': vah,
-            'val': val,
-            'volume_distribution': volume_at_price
+        result = {
+            'poc': profile['poc'],
+            'vah': profile['vah'],
+            'val': profile['val'],
+            'bin_edges': profile['bin_edges'].tolist(),
+            'bin_volumes': profile['bin_volumes'].tolist()
         }
+        
+        if cache_id is not None:
+            # Keep only the latest distribution per key
+            for key in [k for k in self._volume_profile_cache if k[0] == cache_key]:
+                del self._volume_profile_cache[key]
+            self._volume_profile_cache[cache_id] = self._copy_volume_profile(result)
+        
+        return result
+    
+    @staticmethod
+    def _copy_volume_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+        # Callers may modify their result; the cached distribution must not change
+        return {**profile, 'bin_edges': list(profile['bin_edges']), 'bin_volumes': list(profile['bin_volumes'])}
     
     # ============= COMPREHENSIVE ANALYSIS =============
     
@@ -1191,18 +1130,23 @@ class AdvancedIndicators:
         return signals
     
     def calculate_selected_indicators(self, data: pd.DataFrame, 
-                                      config: Dict[str, Any]) -> Dict[str, Any]:
+                                      config: Dict[str, Any],
+                                      state: Optional[IncrementalIndicatorState] = None) -> Dict[str, Any]:
         """
         Calculate only selected indicators based on config
         
         Args:
             data: DataFrame with OHLCV columns
             config: Indicator configuration dict with enabled_categories and enabled_indicators
+            state: Optional streaming state already caught up with `data`; SMA, EMA, RSI,
+                   MACD, ATR, ADX and Bollinger values are then read from it in O(1)
             
         Returns:
             Dictionary with only enabled indicators
         """
         try:
+            streamed = state.snapshot() if state is not None else {}
+            
             required_cols = ['open', 'high', 'low', 'close', 'volume']
             if not all(col in data.columns for col in required_cols):
                 raise ValueError(f"Data must contain: {required_cols}")
@@ -1232,21 +1176,32 @@ class AdvancedIndicators:
                     sma_periods = enabled_indicators['sma'] if isinstance(enabled_indicators['sma'], list) else []
                     for period in sma_periods:
                         if len(data) >= period:
-                            sma = self.calculate_sma(data['close'], period)
-                            result['trend'][f'sma_{period}'] = float(sma.iloc[-1]) if not pd.isna(sma.iloc[-1]) else None
+                            if f'sma_{period}' in streamed:
+                                sma_val = streamed[f'sma_{period}']
+                            else:
+                                sma_val = self.calculate_sma(data['close'], period).iloc[-1]
+                            result['trend'][f'sma_{period}'] = float(sma_val) if not pd.isna(sma_val) else None
                 
                 # EMA
                 if 'ema' in enabled_indicators and enabled_indicators['ema']:
                     ema_periods = enabled_indicators['ema'] if isinstance(enabled_indicators['ema'], list) else []
                     for period in ema_periods:
                         if len(data) >= period:
-                            ema = self.calculate_ema(data['close'], period)
-                            result['trend'][f'ema_{period}'] = float(ema.iloc[-1]) if not pd.isna(ema.iloc[-1]) else None
+                            if f'ema_{period}' in streamed:
+                                ema_val = streamed[f'ema_{period}']
+                            else:
+                                ema_val = self.calculate_ema(data['close'], period).iloc[-1]
+                            result['trend'][f'ema_{period}'] = float(ema_val) if not pd.isna(ema_val) else None
                 
                 # ADX
                 if enabled_indicators.get('adx', False):
                     if len(data) >= 14:
-                        adx, plus_di, minus_di = self.calculate_adx(data['high'], data['low'], data['close'])
+                        if 'adx' in streamed:
+                            adx = pd.Series([streamed['adx']])
+                            plus_di = pd.Series([streamed['plus_di']])
+                            minus_di = pd.Series([streamed['minus_di']])
+                        else:
+                            adx, plus_di, minus_di = self.calculate_adx(data['high'], data['low'], data['close'])
                         adx_val = float(adx.iloc[-1]) if not pd.isna(adx.iloc[-1]) else 0
                         result['trend']['adx'] = {
                             'value': adx_val,
@@ -1274,8 +1229,11 @@ class AdvancedIndicators:
                 if enabled_indicators.get('rsi', False):
                     rsi_period = indicator_periods.get('rsi_period', 14)
                     if len(data) >= rsi_period:
-                        rsi = self.calculate_rsi_wilder(data['close'], rsi_period)
-                        rsi_val = float(rsi.iloc[-1]) if not pd.isna(rsi.iloc[-1]) else 50
+                        if 'rsi' in streamed:
+                            rsi_last = streamed['rsi']
+                        else:
+                            rsi_last = self.calculate_rsi_wilder(data['close'], rsi_period).iloc[-1]
+                        rsi_val = float(rsi_last) if not pd.isna(rsi_last) else 50
                         
                         result['momentum']['rsi'] = {
                             'value': rsi_val,
@@ -1291,14 +1249,20 @@ class AdvancedIndicators:
                     macd_signal_period = indicator_periods.get('macd_signal', 9)
                     
                     if len(data) >= macd_slow:
-                        macd, signal, hist = self.calculate_macd(data['close'], fast=macd_fast, slow=macd_slow, signal=macd_signal_period)
-                        macd_val = float(macd.iloc[-1]) if not pd.isna(macd.iloc[-1]) else 0
-                        signal_val = float(signal.iloc[-1]) if not pd.isna(signal.iloc[-1]) else 0
+                        if 'macd' in streamed:
+                            macd_last = streamed['macd']
+                            signal_last = streamed['macd_signal']
+                            hist_last = streamed['macd_histogram']
+                        else:
+                            macd, signal, hist = self.calculate_macd(data['close'], fast=macd_fast, slow=macd_slow, signal=macd_signal_period)
+                            macd_last, signal_last, hist_last = macd.iloc[-1], signal.iloc[-1], hist.iloc[-1]
+                        macd_val = float(macd_last) if not pd.isna(macd_last) else 0
+                        signal_val = float(signal_last) if not pd.isna(signal_last) else 0
                         
                         result['momentum']['macd'] = {
                             'macd': macd_val,
                             'signal': signal_val,
-                            'histogram': float(hist.iloc[-1]) if not pd.isna(hist.iloc[-1]) else 0,
+                            'histogram': float(hist_last) if not pd.isna(hist_last) else 0,
                             'bullish': macd_val > signal_val
                         }
             
@@ -1310,8 +1274,11 @@ class AdvancedIndicators:
                 if enabled_indicators.get('atr', False):
                     atr_period = indicator_periods.get('atr_period', 14)
                     if len(data) >= atr_period:
-                        atr = self.calculate_atr(data['high'], data['low'], data['close'], atr_period)
-                        atr_val = float(atr.iloc[-1]) if not pd.isna(atr.iloc[-1]) else 0
+                        if 'atr' in streamed:
+                            atr_last = streamed['atr']
+                        else:
+                            atr_last = self.calculate_atr(data['high'], data['low'], data['close'], atr_period).iloc[-1]
+                        atr_val = float(atr_last) if not pd.isna(atr_last) else 0
                         atr_percent = (atr_val / data['close'].iloc[-1]) * 100
                         
                         result['volatility']['atr'] = {
@@ -1326,13 +1293,18 @@ class AdvancedIndicators:
                     bb_std = indicator_periods.get('bollinger_std', 2.0)
                     
                     if len(data) >= bb_period:
-                        bb_upper, bb_middle, bb_lower = self.calculate_bollinger_bands(data['close'], period=bb_period, std_dev=bb_std)
-                        current_price = data['close'].iloc[-1]
+                        if 'bb_middle' in streamed:
+                            bb_upper_last = streamed['bb_upper']
+                            bb_middle_last = streamed['bb_middle']
+                            bb_lower_last = streamed['bb_lower']
+                        else:
+                            bb_upper, bb_middle, bb_lower = self.calculate_bollinger_bands(data['close'], period=bb_period, std_dev=bb_std)
+                            bb_upper_last, bb_middle_last, bb_lower_last = bb_upper.iloc[-1], bb_middle.iloc[-1], bb_lower.iloc[-1]
                         
                         result['volatility']['bollinger_bands'] = {
-                            'upper': float(bb_upper.iloc[-1]),
-                            'middle': float(bb_middle.iloc[-1]),
-                            'lower': float(bb_lower.iloc[-1]),
+                            'upper': float(bb_upper_last),
+                            'middle': float(bb_middle_last),
+                            'lower': float(bb_lower_last),
                         }
             
             # ===== VOLUME INDICATORS =====
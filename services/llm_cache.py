@@ -0,0 +1,521 @@
+"""
+Shared LLM Response Cache
+One cache for LLM results used by LLMIntegrationService and every bot template
+
+- Process-local LRU (OrderedDict, O(1) eviction) in front of Redis, which is
+  shared by all Celery workers
+- TTLs follow the candle close of the shortest timeframe: a result computed
+  during the forming 1h candle expires when that candle closes
+- Single-flight: one worker computes a key, the others wait for its result
+  (Redis SET NX lock; per-key lock in the process when Redis is unavailable)
+- Hit-rate and cost-saved metrics, aggregated across workers in a Redis hash
+- Market-state keys built from the last closed candle of each timeframe, so
+  building a key never serializes the OHLCV window
+"""
+
+import os
+import json
+import time
+import hashlib
+import uuid
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from collections import OrderedDict, Counter
+from typing import Dict, Any, List, Optional, Callable, Iterable, Awaitable
+
+from utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAME_SECONDS = {
+    '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800, '12h': 43200,
+    '1d': 86400, '3d': 259200, '1w': 604800
+}
+
+# Unix epoch is a Thursday, exchanges open weekly candles on Monday
+_WEEK_OFFSET = 4 * 86400
+
+# Bump when the built-in analysis prompt or response format changes so cached
+# results produced by the previous prompt are not served
+PROMPT_VERSION = os.getenv('LLM_PROMPT_VERSION', '1')
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def candle_open_time(timeframes: Iterable[str], now: Optional[float] = None) -> Optional[int]:
+    """Open time (unix seconds) of the forming candle of the shortest known timeframe"""
+    seconds = [TIMEFRAME_SECONDS[tf] for tf in timeframes or [] if tf in TIMEFRAME_SECONDS]
+    if not seconds:
+        return None
+    interval = min(seconds)
+    now = time.time() if now is None else now
+    offset = _WEEK_OFFSET if interval == TIMEFRAME_SECONDS['1w'] else 0
+    return int((now - offset) // interval * interval + offset)
+
+
+def seconds_until_candle_close(timeframes: Iterable[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds until the forming candle of the shortest known timeframe closes"""
+    now = time.time() if now is None else now
+    open_time = candle_open_time(timeframes, now)
+    if open_time is None:
+        return None
+    interval = min(TIMEFRAME_SECONDS[tf] for tf in timeframes if tf in TIMEFRAME_SECONDS)
+    return open_time + interval - now
+
+
+def timestamp_ms(value: Any) -> Optional[int]:
+    """Candle timestamp as epoch milliseconds (int/float seconds or ms, datetime, ISO string)"""
+    if value is None:
+        return None
+    if hasattr(value, 'timestamp'):
+        return int(value.timestamp() * 1000)
+    if isinstance(value, (int, float)):
+        return int(value) if value > 1e12 else int(value * 1000)
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp() * 1000)
+    except ValueError:
+        return None
+
+
+def last_closed_candle(records: List[Dict[str, Any]], timeframe: str,
+                       now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Newest candle of the window that has closed at `now`
+
+    Only the tail is inspected: at most the forming candle is skipped. Unknown
+    timeframes or timestamps fall back to the newest record.
+    """
+    if not records:
+        return None
+    newest = records[-1]
+    interval = TIMEFRAME_SECONDS.get(timeframe)
+    ts = timestamp_ms(newest.get('timestamp'))
+    if not interval or ts is None:
+        return newest
+    now_ms = (time.time() if now is None else now) * 1000
+    if ts + interval * 1000 <= now_ms:
+        return newest
+    return records[-2] if len(records) > 1 else None
+
+
+def market_state_key(symbol: str, timeframes_data: Dict[str, List[Dict[str, Any]]], model: str,
+                     bot_id: Optional[int] = None, prompt_version: str = PROMPT_VERSION,
+                     digest: bool = True, now: Optional[float] = None) -> str:
+    """
+    Cache key of an LLM analysis for one market state
+
+    The state is the last closed candle of every timeframe: windows of a
+    different length or with a different forming candle map to the same key.
+    `digest` adds a short hash of those candles' OHLCV values so a revised
+    candle (exchange correction, backfill) does not reuse a stale answer.
+    Indicators are derived from the same candles and the bot's config, which
+    bot_id already selects.
+    """
+    parts = []
+    closed = []
+    for timeframe, records in timeframes_data.items():
+        candle = last_closed_candle(records, timeframe, now)
+        ts = timestamp_ms(candle.get('timestamp')) if candle else None
+        parts.append(f"{timeframe}={ts if ts is not None else '-'}")
+        if candle:
+            closed.append(tuple(candle.get(field) for field in ('open', 'high', 'low', 'close', 'volume')))
+
+    key = (f"analysis:{bot_id or 'shared'}:{model}:v{prompt_version}:"
+           f"{(symbol or '').replace('/', '').upper()}:{','.join(parts)}")
+    if digest:
+        key += ':' + hashlib.blake2b(repr(closed).encode(), digest_size=6).hexdigest()
+    return key
+
+
+class LLMResponseCache:
+    """
+    Two-tier (local LRU + Redis) cache for JSON-serializable LLM results
+
+    Values are stored with the USD cost of the request that produced them so
+    every hit can be credited as cost saved.
+    """
+
+    def __init__(self, max_entries: int = 512, default_ttl: int = 300, min_ttl: int = 5,
+                 max_ttl: int = 86400, lock_timeout: int = 120, namespace: str = 'llm_cache'):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.lock_timeout = lock_timeout
+        self.namespace = namespace
+
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._local_locks: Dict[str, str] = {}
+        self._stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # TTL
+    # ------------------------------------------------------------------
+
+    def ttl_for(self, timeframes: Optional[Iterable[str]] = None, now: Optional[float] = None) -> int:
+        """TTL in seconds: until the shortest timeframe's candle closes, else default_ttl"""
+        remaining = seconds_until_candle_close(timeframes, now) if timeframes else None
+        if remaining is None:
+            return self.default_ttl
+        return int(min(max(remaining, self.min_ttl), self.max_ttl))
+
+    # ------------------------------------------------------------------
+    # Get / set
+    # ------------------------------------------------------------------
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Envelope {'value', 'cost', 'expires_at'} from the local LRU or Redis"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry['expires_at'] > now:
+                    self._entries.move_to_end(key)
+                    return dict(entry, tier='local')
+                del self._entries[key]
+
+        redis_client = get_redis_client()
+        if not redis_client:
+            return None
+        try:
+            payload = redis_client.get(self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"LLM cache Redis read failed: {e}")
+            return None
+        if not payload:
+            return None
+        try:
+            entry = json.loads(payload)
+        except ValueError:
+            return None
+        if entry.get('expires_at', 0) <= now:
+            return None
+        self._store_local(key, entry)
+        return dict(entry, tier='redis')
+
+    def _store_local(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value or None; counts a hit or a miss"""
+        if not key:
+            return None
+        entry = self._lookup(key)
+        if entry is None:
+            self._record(misses=1)
+            return None
+        self._record(**{'hits': 1, f"{entry['tier']}_hits": 1, 'cost_saved_usd': entry.get('cost', 0.0)})
+        return entry['value']
+
+    def set(self, key: str, value: Any, timeframes: Optional[Iterable[str]] = None,
+            ttl: Optional[int] = None, cost: float = 0.0):
+        """Store a value until the candle closes (or for `ttl` seconds)"""
+        if not key:
+            return
+        ttl = int(ttl) if ttl is not None else self.ttl_for(timeframes)
+        if ttl <= 0:
+            return
+        entry = {'value': value, 'cost': float(cost or 0.0), 'expires_at': time.time() + ttl}
+        self._store_local(key, entry)
+        self._record(sets=1)
+
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                redis_client.setex(self._redis_key(key), ttl, json.dumps(entry, default=str))
+            except Exception as e:
+                logger.warning(f"LLM cache Redis write failed: {e}")
+
+    def invalidate(self, key: str):
+        """Drop a key from both tiers"""
+        with self._lock:
+            self._entries.pop(key, None)
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                redis_client.delete(self._redis_key(key))
+            except Exception as e:
+                logger.warning(f"LLM cache Redis delete failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Single-flight
+    # ------------------------------------------------------------------
+
+    def acquire(self, key: str) -> Optional[str]:
+        """Try to become the single computer of `key`; returns a token or None if held elsewhere"""
+        token = f"{os.getpid()}:{uuid.uuid4().hex}"
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                if redis_client.set(f"{self.namespace}_lock:{key}", token, nx=True, ex=self.lock_timeout):
+                    return token
+                return None
+            except Exception as e:
+                logger.warning(f"LLM cache lock failed, computing without lock: {e}")
+                return token
+
+        with self._lock:
+            if key in self._local_locks:
+                return None
+            self._local_locks[key] = token
+            return token
+
+    def release(self, key: str, token: Optional[str]):
+        """Release a lock taken with acquire() (only if still owned)"""
+        if not token:
+            return
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                redis_client.eval(_RELEASE_SCRIPT, 1, f"{self.namespace}_lock:{key}", token)
+            except Exception as e:
+                logger.warning(f"LLM cache lock release failed: {e}")
+        with self._lock:
+            if self._local_locks.get(key) == token:
+                del self._local_locks[key]
+
+    def _poll_delays(self, timeout: float):
+        delay, waited = 0.05, 0.0
+        while waited < timeout:
+            step = min(delay, timeout - waited)
+            yield step
+            waited += step
+            delay = min(delay * 2, 1.0)
+
+    def wait_for(self, key: str, timeout: float = 30.0) -> Optional[Any]:
+        """Wait for another worker to publish `key`"""
+        self._record(single_flight_waits=1)
+        for delay in self._poll_delays(timeout):
+            time.sleep(delay)
+            entry = self._lookup(key)
+            if entry is not None:
+                self._record(single_flight_hits=1, cost_saved_usd=entry.get('cost', 0.0))
+                return entry['value']
+        return None
+
+    async def await_for(self, key: str, timeout: float = 30.0) -> Optional[Any]:
+        """Async wait_for"""
+        self._record(single_flight_waits=1)
+        for delay in self._poll_delays(timeout):
+            await asyncio.sleep(delay)
+            entry = self._lookup(key)
+            if entry is not None:
+                self._record(single_flight_hits=1, cost_saved_usd=entry.get('cost', 0.0))
+                return entry['value']
+        return None
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       timeframes: Optional[Iterable[str]] = None, ttl: Optional[int] = None,
+                       wait_timeout: float = 30.0, cost_of: Optional[Callable[[Any], float]] = None,
+                       should_cache: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Cached value, or compute it once across all workers
+
+        Returns None when another worker holds the lock and does not publish a
+        result within `wait_timeout` (the caller decides the fallback).
+        Results are cached unless should_cache(result) is False; None is never cached.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        token = self.acquire(key)
+        if token is None:
+            return self.wait_for(key, wait_timeout)
+
+        try:
+            # Another worker may have finished between get() and acquire()
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry['value']
+            self._record(computes=1)
+            result = compute()
+            if result is not None and (should_cache is None or should_cache(result)):
+                self.set(key, result, timeframes=timeframes, ttl=ttl,
+                         cost=cost_of(result) if cost_of else 0.0)
+            return result
+        finally:
+            self.release(key, token)
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                              timeframes: Optional[Iterable[str]] = None, ttl: Optional[int] = None,
+                              wait_timeout: float = 30.0, cost_of: Optional[Callable[[Any], float]] = None,
+                              should_cache: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """Async get_or_compute for coroutine producers"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        token = self.acquire(key)
+        if token is None:
+            return await self.await_for(key, wait_timeout)
+
+        try:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry['value']
+            self._record(computes=1)
+            result = await compute()
+            if result is not None and (should_cache is None or should_cache(result)):
+                self.set(key, result, timeframes=timeframes, ttl=ttl,
+                         cost=cost_of(result) if cost_of else 0.0)
+            return result
+        finally:
+            self.release(key, token)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _record(self, **counts):
+        counts = {name: value for name, value in counts.items() if value}
+        if not counts:
+            return
+        with self._lock:
+            self._stats.update(counts)
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                pipe = redis_client.pipeline()
+                for name, value in counts.items():
+                    if isinstance(value, float):
+                        pipe.hincrbyfloat(f"{self.namespace}:metrics", name, value)
+                    else:
+                        pipe.hincrby(f"{self.namespace}:metrics", name, value)
+                pipe.execute()
+            except Exception as e:
+                logger.debug(f"LLM cache metrics write failed: {e}")
+
+    def get_stats(self, shared: bool = True) -> Dict[str, Any]:
+        """
+        Cache counters: hits (local_hits + redis_hits), misses, single-flight
+        waits/hits, computes, sets and cost_saved_usd
+
+        shared=True reads the counters of all workers from Redis when available.
+        """
+        stats: Dict[str, float] = {}
+        redis_client = get_redis_client() if shared else None
+        if redis_client:
+            try:
+                stats = {name: float(value) for name, value in
+                         redis_client.hgetall(f"{self.namespace}:metrics").items()}
+            except Exception as e:
+                logger.warning(f"LLM cache metrics read failed: {e}")
+        if not stats:
+            with self._lock:
+                stats = dict(self._stats)
+
+        result: Dict[str, Any] = {
+            name: int(stats.get(name, 0))
+            for name in ('hits', 'local_hits', 'redis_hits', 'misses', 'sets', 'computes',
+                         'single_flight_waits', 'single_flight_hits')
+        }
+        result['cost_saved_usd'] = round(float(stats.get('cost_saved_usd', 0.0)), 6)
+        served = result['hits'] + result['single_flight_hits']
+        lookups = result['hits'] + result['misses']
+        result['hit_rate'] = round(served / lookups, 4) if lookups else 0.0
+        with self._lock:
+            result['local_entries'] = len(self._entries)
+        return result
+
+    def clear(self):
+        """Drop local entries, locks and counters"""
+        with self._lock:
+            self._entries.clear()
+            self._local_locks.clear()
+            self._stats.clear()
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide LLM cache (LLM_CACHE_MAX_ENTRIES, LLM_CACHE_DEFAULT_TTL, LLM_CACHE_LOCK_TIMEOUT)"""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache(
+                    max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 512)),
+                    default_ttl=int(os.getenv('LLM_CACHE_DEFAULT_TTL', 300)),
+                    lock_timeout=int(os.getenv('LLM_CACHE_LOCK_TIMEOUT', 120))
+                )
+    return _llm_cache
+
+
+class LLMCacheMixin:
+    """
+    LLM signal caching and single-flight locking for bot templates
+
+    Expects the bot to define trading_pair/timeframes and optionally bot_id,
+    llm_model and llm_service. Results are scoped per bot and model (the bot
+    selects the strategy prompt) and expire when the shortest timeframe's
+    candle closes.
+    """
+
+    LLM_WAIT_TIMEOUT = 30.0
+
+    def _get_llm_cache_key(self, symbol: str, timeframes: List[str]) -> str:
+        """Cache key for the LLM signal of the forming candle"""
+        symbol = (symbol or '').replace('/', '').upper()
+        candle = candle_open_time(timeframes)
+        return (f"signal:{getattr(self, 'bot_id', None) or 'shared'}:{getattr(self, 'llm_model', None)}:"
+                f"{symbol}:{','.join(sorted(timeframes or []))}:{candle}")
+
+    def _acquire_llm_lock(self, symbol: str, timeframes: Optional[List[str]] = None) -> bool:
+        """Become the single worker computing this signal; False if another worker holds it"""
+        key = self._get_llm_cache_key(symbol, timeframes or self.timeframes)
+        token = get_llm_cache().acquire(key)
+        if token is None:
+            logger.info(f"⏳ LLM signal {key} is being computed by another worker")
+            return False
+        if not hasattr(self, '_llm_lock_tokens'):
+            self._llm_lock_tokens = {}
+        # Remember the key: the candle may close before the lock is released
+        self._llm_lock_tokens[symbol] = (key, token)
+        logger.info(f"🔒 LLM lock acquired for {key}")
+        return True
+
+    def _release_llm_lock(self, symbol: str):
+        """Release the lock taken by _acquire_llm_lock"""
+        held = getattr(self, '_llm_lock_tokens', {}).pop(symbol, None)
+        if held:
+            get_llm_cache().release(*held)
+
+    def _get_cached_llm_result(self, symbol: str, timeframes: List[str]) -> Optional[Dict[str, Any]]:
+        """Cached LLM signal for the forming candle"""
+        cached_result = get_llm_cache().get(self._get_llm_cache_key(symbol, timeframes))
+        if cached_result:
+            logger.info(f"📋 Using cached LLM analysis")
+        return cached_result
+
+    def _wait_for_llm_result(self, symbol: str, timeframes: List[str]) -> Optional[Dict[str, Any]]:
+        """Wait for the worker holding the lock to publish its signal"""
+        return get_llm_cache().wait_for(self._get_llm_cache_key(symbol, timeframes), self.LLM_WAIT_TIMEOUT)
+
+    def _cache_llm_result(self, symbol: str, timeframes: List[str], result: Dict[str, Any]):
+        """Cache the LLM signal until the candle closes, crediting the request cost"""
+        llm_service = getattr(self, 'llm_service', None)
+        cost = getattr(llm_service, 'last_request_cost_usd', 0.0) or 0.0
+        # Store under the key the lock was taken for (the candle the signal was computed on)
+        held = getattr(self, '_llm_lock_tokens', {}).get(symbol)
+        key = held[0] if held else self._get_llm_cache_key(symbol, timeframes)
+        get_llm_cache().set(key, result, timeframes=timeframes, cost=cost)
+        logger.debug(f"💾 Cached LLM analysis")
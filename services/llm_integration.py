@@ -8,12 +8,24 @@ import json
 import logging
 import asyncio
 import time
-import hashlib
-from typing import Dict, Any, List, Optional, Union
+import threading
+import contextvars
+from typing import Dict, Any, List, Optional, Union, Tuple
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 import pandas as pd
 import numpy as np
 
+from services.llm_cache import PROMPT_VERSION, get_llm_cache, market_state_key
+from services.llm_prompt_builder import (
+    LLM_COMPACT_PROMPT, LLM_PROMPT_CACHE_TTL, encode_market_data, get_prompt_cache, indicator_signature, section_tokens
+)
+from services.llm_provider_selector import get_latency_tracker
+from services.llm_request_coalescer import LLM_COALESCE_REQUESTS, analysis_request_key, get_request_coalescer
+from services.llm_response_parser import (
+    LLM_STREAM_RESPONSES, TradingDecision, CapitalManagementAdvice, parse_json_response, read_decision_stream
+)
+
 # LLM Client Imports
 try:
     import openai
@@ -38,6 +50,19 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Hedged requests: when the primary provider has not answered within its
+# LLM_HEDGE_PERCENTILE latency, a backup provider is raced and the first
+# valid decision wins (the other request is cancelled)
+LLM_HEDGE_REQUESTS = os.getenv('LLM_HEDGE_REQUESTS', 'true').lower() == 'true'
+LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', 0.9))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', 8.0))  # Until enough samples
+LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', 1.0))
+LLM_HEDGE_MAX_DELAY = float(os.getenv('LLM_HEDGE_MAX_DELAY', 20.0))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20))
+
+# Set in a hedged request's task; streaming reads stop when the request lost the race
+_request_cancelled: contextvars.ContextVar = contextvars.ContextVar('llm_request_cancelled', default=None)
+
 class QuotaExceededException(Exception):
     """Raised when user exceeds LLM quota"""
     pass
@@ -69,6 +94,9 @@ class LLMIntegrationService:
         
         # Try to load developer's LLM provider configuration first (BYOK - Priority!)
         provider_config = None
+        # Provider hedged requests may race the primary with (see _hedge_candidates)
+        self._backup_provider = None
+        self._backup_config = None
         if developer_id and db:
             try:
                 from services.llm_provider_selector import LLMProviderSelector
@@ -85,25 +113,15 @@ class LLMIntegrationService:
                     logger.info(f"✅ Using {source_type} LLM provider: {provider_config['provider']} ({provider_config['model']})")
                     
                     # Override config with provider (developer's or platform's)
-                    # Extract the enum value and convert to uppercase for comparison
-                    provider_enum = provider_config['provider']
-                    provider_type = str(provider_enum.value).upper() if hasattr(provider_enum, 'value') else str(provider_enum).upper()
+                    primary = self._apply_provider_config(provider_config)
                     
-                    if provider_type == 'OPENAI':
-                        self.config['openai_api_key'] = provider_config['api_key']
-                        self.config['openai_model'] = provider_config['model']
-                    elif provider_type in ['ANTHROPIC', 'CLAUDE']:
-                        self.config['claude_api_key'] = provider_config['api_key']
-                        self.config['claude_model'] = provider_config['model']
-                    elif provider_type == 'GEMINI':
-                        self.config['gemini_api_key'] = provider_config['api_key']
-                        self.config['gemini_model'] = provider_config['model']
-                    elif provider_type == 'GROQ':
-                        self.config['groq_api_key'] = provider_config['api_key']
-                        self.config['groq_model'] = provider_config['model']
-                    elif provider_type == 'COHERE':
-                        self.config['cohere_api_key'] = provider_config['api_key']
-                        self.config['cohere_model'] = provider_config['model']
+                    # Backup provider for hedged requests, with its own credentials
+                    if self.config.get('hedge_requests', LLM_HEDGE_REQUESTS) and primary:
+                        backup_config = selector.get_backup_provider(developer_id, exclude=[primary])
+                        backup = self._apply_provider_config(backup_config) if backup_config else None
+                        if backup and backup != primary:
+                            self._backup_provider = backup
+                            self._backup_config = backup_config
                     
                     # Store for usage logging later
                     self._provider_config = provider_config
@@ -137,9 +155,13 @@ class LLMIntegrationService:
         self.retry_delay = self.config.get('retry_delay', 1.0)  # seconds
         self.timeout = self.config.get('timeout', 30)  # seconds
         self.enable_caching = self.config.get('enable_caching', True)
+        self.hedge_requests = self.config.get('hedge_requests', LLM_HEDGE_REQUESTS)
+        self.coalesce_requests = self.config.get('coalesce_requests', LLM_COALESCE_REQUESTS)
         
-        # Cache for analysis results (simple in-memory cache)
-        self._analysis_cache = {} if self.enable_caching else None
+        # Shared analysis cache (local LRU + Redis, single-flight across workers)
+        self._analysis_cache = get_llm_cache() if self.enable_caching else None
+        self.last_request_cost_usd = 0.0
+        self.last_prompt_tokens: Dict[str, int] = {}  # Estimated input tokens per section of the last prompt
         
         # Initialize clients
         self._initialize_clients()
@@ -153,56 +175,27 @@ class LLMIntegrationService:
         else:
             logger.info("ℹ️  LLM Integration initialized with environment variables")
     
-    def _generate_cache_key(self, symbol: str, timeframes_data: Dict[str, List[Dict]], model: str) -> str:
-        """Generate cache key for analysis results"""
-        if not self.enable_caching:
-            return None
-        
-        # Create a hash of the input data
-        data_str = json.dumps({
-            'symbol': symbol,
-            'timeframes': timeframes_data,
-            'model': model
-        }, sort_keys=True)
-        
-        return hashlib.md5(data_str.encode()).hexdigest()
+    def _apply_provider_config(self, provider_config: Dict[str, Any]) -> Optional[str]:
+        """Set API key and model of a selected provider, returns its service name ("openai", ...)"""
+        # Extract the enum value and convert to uppercase for comparison
+        provider_enum = provider_config['provider']
+        provider_type = str(provider_enum.value).upper() if hasattr(provider_enum, 'value') else str(provider_enum).upper()
+        
+        name = {'OPENAI': 'openai', 'ANTHROPIC': 'claude', 'CLAUDE': 'claude', 'GEMINI': 'gemini',
+                'GROQ': 'groq', 'COHERE': 'cohere'}.get(provider_type)
+        if name:
+            self.config[f'{name}_api_key'] = provider_config['api_key']
+            self.config[f'{name}_model'] = provider_config['model']
+        return name if name in ('openai', 'claude', 'gemini') else None
     
-    def _get_cached_analysis(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """Get cached analysis result"""
-        if not self.enable_caching or not cache_key or not self._analysis_cache:
+    def _generate_cache_key(self, symbol: str, timeframes_data: Dict[str, List[Dict]], model: str,
+                            bot_id: int = None) -> str:
+        """Generate cache key for analysis results (last closed candle per timeframe, no payload hashing)"""
+        if not self.enable_caching:
             return None
         
-        cached_result = self._analysis_cache.get(cache_key)
-        if cached_result:
-            # Check if cache is still valid (5 minutes)
-            cache_time = cached_result.get('cache_timestamp', 0)
-            if time.time() - cache_time < 300:  # 5 minutes
-                logger.info("Using cached analysis result")
-                return cached_result.get('analysis')
-            else:
-                # Remove expired cache
-                del self._analysis_cache[cache_key]
-        
-        return None
-    
-    def _cache_analysis(self, cache_key: str, analysis: Dict[str, Any]) -> None:
-        """Cache analysis result"""
-        if not self.enable_caching or not cache_key:
-            return
-        
-        if not self._analysis_cache:
-            self._analysis_cache = {}
-        
-        self._analysis_cache[cache_key] = {
-            'analysis': analysis,
-            'cache_timestamp': time.time()
-        }
-        
-        # Limit cache size (keep only last 50 entries)
-        if len(self._analysis_cache) > 50:
-            oldest_key = min(self._analysis_cache.keys(), 
-                           key=lambda k: self._analysis_cache[k]['cache_timestamp'])
-            del self._analysis_cache[oldest_key]
+        # bot_id selects the strategy prompt and indicator config
+        return market_state_key(symbol, timeframes_data, model, bot_id)
     
     async def _retry_with_backoff(self, func, *args, **kwargs):
         """Retry function with exponential backoff"""
@@ -249,6 +242,104 @@ class LLMIntegrationService:
             self.gemini_client = None
             logger.warning("Gemini client not available")
     
+    @staticmethod
+    def estimate_cost_usd(provider: str, model: str, input_tokens: int, output_tokens: int) -> float:
+        """Estimated USD cost of one request from token counts"""
+        # Calculate cost based on LATEST VERIFIED pricing (per 1M tokens)
+        # Source: Official provider pricing pages (verified October 2024)
+        # Note: LLM providers do NOT return cost in API response, only token counts
+        cost_usd = 0.0
+        model_lower = model.lower()
+
+        if provider.upper() == 'OPENAI':
+            # OpenAI pricing (verified October 2024: openai.com/pricing)
+            # Order matters: check specific models before generic ones
+            if 'o1-mini' in model_lower:
+                # o1-mini: $3.00/1M input, $12.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 3.00) + (output_tokens / 1_000_000 * 12.00)
+            elif 'o1-preview' in model_lower or model_lower == 'o1':
+                # o1-preview or o1: $15.00/1M input, $60.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 15.00) + (output_tokens / 1_000_000 * 60.00)
+            elif 'gpt-4o-mini' in model_lower:
+                # gpt-4o-mini: $0.150/1M input, $0.600/1M output
+                cost_usd = (input_tokens / 1_000_000 * 0.150) + (output_tokens / 1_000_000 * 0.600)
+            elif 'gpt-4o' in model_lower:
+                # gpt-4o: $2.50/1M input, $10.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 2.50) + (output_tokens / 1_000_000 * 10.00)
+            elif 'gpt-4-turbo' in model_lower or 'gpt-4-1106' in model_lower:
+                # gpt-4-turbo: $10.00/1M input, $30.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 10.00) + (output_tokens / 1_000_000 * 30.00)
+            elif 'gpt-4' in model_lower:
+                # gpt-4 (8K context): $30.00/1M input, $60.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 30.00) + (output_tokens / 1_000_000 * 60.00)
+            elif 'gpt-3.5-turbo' in model_lower:
+                # gpt-3.5-turbo: $0.50/1M input, $1.50/1M output
+                cost_usd = (input_tokens / 1_000_000 * 0.50) + (output_tokens / 1_000_000 * 1.50)
+            else:
+                # Default to gpt-4o-mini pricing (most cost-effective)
+                cost_usd = (input_tokens / 1_000_000 * 0.150) + (output_tokens / 1_000_000 * 0.600)
+
+        elif provider.upper() in ['CLAUDE', 'ANTHROPIC']:
+            # Claude pricing (verified October 2024: docs.anthropic.com/pricing)
+            # Order matters: check specific versions before generic names
+            if 'opus' in model_lower:
+                # claude-3-opus-20240229: $15.00/1M input, $75.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 15.00) + (output_tokens / 1_000_000 * 75.00)
+            elif ('3-7-sonnet' in model_lower or '3.7-sonnet' in model_lower or 
+                  '3-5-sonnet' in model_lower or '3.5-sonnet' in model_lower or 
+                  'sonnet' in model_lower):
+                # claude-3-7-sonnet-latest, claude-3-5-sonnet-*: $3.00/1M input, $15.00/1M output
+                # Note: >200K context has higher rates ($6/$22.50) but we use base rate
+                cost_usd = (input_tokens / 1_000_000 * 3.00) + (output_tokens / 1_000_000 * 15.00)
+            elif ('3-5-haiku' in model_lower or '3.5-haiku' in model_lower):
+                # claude-3-5-haiku-20241022: $0.80/1M input, $4.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 0.80) + (output_tokens / 1_000_000 * 4.00)
+            elif 'haiku' in model_lower:
+                # claude-3-haiku-20240307: $0.25/1M input, $1.25/1M output
+                cost_usd = (input_tokens / 1_000_000 * 0.25) + (output_tokens / 1_000_000 * 1.25)
+            else:
+                # Default to Sonnet pricing
+                cost_usd = (input_tokens / 1_000_000 * 3.00) + (output_tokens / 1_000_000 * 15.00)
+
+        elif provider.upper() == 'GEMINI':
+            # Gemini pricing (verified October 2024: ai.google.dev/pricing)
+            # Order matters: check specific versions before generic names
+            if '2.5' in model_lower and 'pro' in model_lower:
+                # gemini-2.5-pro: $1.25/1M input, $5.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 1.25) + (output_tokens / 1_000_000 * 5.00)
+            elif '2.5' in model_lower and 'flash-lite' in model_lower:
+                # gemini-2.5-flash-lite: $0.038/1M input, $0.15/1M output
+                cost_usd = (input_tokens / 1_000_000 * 0.038) + (output_tokens / 1_000_000 * 0.15)
+            elif '2.5' in model_lower and 'flash' in model_lower:
+                # gemini-2.5-flash: $0.075/1M input, $0.30/1M output
+                cost_usd = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
+            elif '2.0' in model_lower and 'flash' in model_lower:
+                # gemini-2.0-flash-001: FREE during experimental phase
+                cost_usd = 0.0
+            elif '1.5' in model_lower and 'pro' in model_lower:
+                # gemini-1.5-pro: $1.25/1M input, $5.00/1M output
+                cost_usd = (input_tokens / 1_000_000 * 1.25) + (output_tokens / 1_000_000 * 5.00)
+            elif '1.5' in model_lower and 'flash' in model_lower:
+                # gemini-1.5-flash-002: $0.075/1M input, $0.30/1M output
+                cost_usd = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
+            elif '1.0' in model_lower and 'pro' in model_lower:
+                # gemini-1.0-pro: $0.50/1M input, $1.50/1M output
+                cost_usd = (input_tokens / 1_000_000 * 0.50) + (output_tokens / 1_000_000 * 1.50)
+            elif 'flash-lite' in model_lower:
+                # Default Flash Lite pricing (2.5 Flash Lite)
+                cost_usd = (input_tokens / 1_000_000 * 0.038) + (output_tokens / 1_000_000 * 0.15)
+            elif 'flash' in model_lower:
+                # Default Flash pricing (2.5 Flash)
+                cost_usd = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
+            elif 'pro' in model_lower:
+                # Default Pro pricing (2.5 Pro)
+                cost_usd = (input_tokens / 1_000_000 * 1.25) + (output_tokens / 1_000_000 * 5.00)
+            else:
+                # Default to Flash pricing (most cost-effective non-free option)
+                cost_usd = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
+        
+        return cost_usd
+
     def _log_llm_usage(
         self,
         provider: str,
@@ -273,6 +364,11 @@ class LLMIntegrationService:
             error_message: Error message if failed
             request_duration_ms: Request duration in milliseconds
         """
+        # Calculate cost based on LATEST VERIFIED pricing (per 1M tokens)
+        cost_usd = self.estimate_cost_usd(provider, model, input_tokens, output_tokens)
+        if success:
+            self.last_request_cost_usd = cost_usd
+        
         if not self.developer_id or not self.db:
             logger.debug("Skipping usage logging - no developer_id or db session")
             return
@@ -287,101 +383,10 @@ class LLMIntegrationService:
                 return
             
             provider_config = self._provider_config
+            if self._backup_provider and provider.lower() == self._backup_provider:
+                provider_config = self._backup_config  # Hedged request sent with the backup's credentials
             selector = self._provider_selector
             
-            # Calculate cost based on LATEST VERIFIED pricing (per 1M tokens)
-            # Source: Official provider pricing pages (verified October 2024)
-            # Note: LLM providers do NOT return cost in API response, only token counts
-            cost_usd = 0.0
-            model_lower = model.lower()
-            
-            if provider.upper() == 'OPENAI':
-                # OpenAI pricing (verified October 2024: openai.com/pricing)
-                # Order matters: check specific models before generic ones
-                if 'o1-mini' in model_lower:
-                    # o1-mini: $3.00/1M input, $12.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 3.00) + (output_tokens / 1_000_000 * 12.00)
-                elif 'o1-preview' in model_lower or model_lower == 'o1':
-                    # o1-preview or o1: $15.00/1M input, $60.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 15.00) + (output_tokens / 1_000_000 * 60.00)
-                elif 'gpt-4o-mini' in model_lower:
-                    # gpt-4o-mini: $0.150/1M input, $0.600/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 0.150) + (output_tokens / 1_000_000 * 0.600)
-                elif 'gpt-4o' in model_lower:
-                    # gpt-4o: $2.50/1M input, $10.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 2.50) + (output_tokens / 1_000_000 * 10.00)
-                elif 'gpt-4-turbo' in model_lower or 'gpt-4-1106' in model_lower:
-                    # gpt-4-turbo: $10.00/1M input, $30.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 10.00) + (output_tokens / 1_000_000 * 30.00)
-                elif 'gpt-4' in model_lower:
-                    # gpt-4 (8K context): $30.00/1M input, $60.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 30.00) + (output_tokens / 1_000_000 * 60.00)
-                elif 'gpt-3.5-turbo' in model_lower:
-                    # gpt-3.5-turbo: $0.50/1M input, $1.50/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 0.50) + (output_tokens / 1_000_000 * 1.50)
-                else:
-                    # Default to gpt-4o-mini pricing (most cost-effective)
-                    cost_usd = (input_tokens / 1_000_000 * 0.150) + (output_tokens / 1_000_000 * 0.600)
-                    
-            elif provider.upper() in ['CLAUDE', 'ANTHROPIC']:
-                # Claude pricing (verified October 2024: docs.anthropic.com/pricing)
-                # Order matters: check specific versions before generic names
-                if 'opus' in model_lower:
-                    # claude-3-opus-20240229: $15.00/1M input, $75.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 15.00) + (output_tokens / 1_000_000 * 75.00)
-                elif ('3-7-sonnet' in model_lower or '3.7-sonnet' in model_lower or 
-                      '3-5-sonnet' in model_lower or '3.5-sonnet' in model_lower or 
-                      'sonnet' in model_lower):
-                    # claude-3-7-sonnet-latest, claude-3-5-sonnet-*: $3.00/1M input, $15.00/1M output
-                    # Note: >200K context has higher rates ($6/$22.50) but we use base rate
-                    cost_usd = (input_tokens / 1_000_000 * 3.00) + (output_tokens / 1_000_000 * 15.00)
-                elif ('3-5-haiku' in model_lower or '3.5-haiku' in model_lower):
-                    # claude-3-5-haiku-20241022: $0.80/1M input, $4.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 0.80) + (output_tokens / 1_000_000 * 4.00)
-                elif 'haiku' in model_lower:
-                    # claude-3-haiku-20240307: $0.25/1M input, $1.25/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 0.25) + (output_tokens / 1_000_000 * 1.25)
-                else:
-                    # Default to Sonnet pricing
-                    cost_usd = (input_tokens / 1_000_000 * 3.00) + (output_tokens / 1_000_000 * 15.00)
-                    
-            elif provider.upper() == 'GEMINI':
-                # Gemini pricing (verified October 2024: ai.google.dev/pricing)
-                # Order matters: check specific versions before generic names
-                if '2.5' in model_lower and 'pro' in model_lower:
-                    # gemini-2.5-pro: $1.25/1M input, $5.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 1.25) + (output_tokens / 1_000_000 * 5.00)
-                elif '2.5' in model_lower and 'flash-lite' in model_lower:
-                    # gemini-2.5-flash-lite: $0.038/1M input, $0.15/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 0.038) + (output_tokens / 1_000_000 * 0.15)
-                elif '2.5' in model_lower and 'flash' in model_lower:
-                    # gemini-2.5-flash: $0.075/1M input, $0.30/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
-                elif '2.0' in model_lower and 'flash' in model_lower:
-                    # gemini-2.0-flash-001: FREE during experimental phase
-                    cost_usd = 0.0
-                elif '1.5' in model_lower and 'pro' in model_lower:
-                    # gemini-1.5-pro: $1.25/1M input, $5.00/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 1.25) + (output_tokens / 1_000_000 * 5.00)
-                elif '1.5' in model_lower and 'flash' in model_lower:
-                    # gemini-1.5-flash-002: $0.075/1M input, $0.30/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
-                elif '1.0' in model_lower and 'pro' in model_lower:
-                    # gemini-1.0-pro: $0.50/1M input, $1.50/1M output
-                    cost_usd = (input_tokens / 1_000_000 * 0.50) + (output_tokens / 1_000_000 * 1.50)
-                elif 'flash-lite' in model_lower:
-                    # Default Flash Lite pricing (2.5 Flash Lite)
-                    cost_usd = (input_tokens / 1_000_000 * 0.038) + (output_tokens / 1_000_000 * 0.15)
-                elif 'flash' in model_lower:
-                    # Default Flash pricing (2.5 Flash)
-                    cost_usd = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
-                elif 'pro' in model_lower:
-                    # Default Pro pricing (2.5 Pro)
-                    cost_usd = (input_tokens / 1_000_000 * 1.25) + (output_tokens / 1_000_000 * 5.00)
-                else:
-                    # Default to Flash pricing (most cost-effective non-free option)
-                    cost_usd = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
-            
             # Log usage
             selector.log_usage(
                 developer_id=self.developer_id,
@@ -420,42 +425,53 @@ class LLMIntegrationService:
         is_signals_futures = False
         if bot_id:
             try:
-                from core.database import get_db
-                from core import crud
-                
-                db = next(get_db())
-                bot = crud.get_bot_by_id(db, bot_id)
-                bot_type_str = str(bot.bot_type).upper().strip() if bot and bot.bot_type else None
-                if bot_type_str and "." in bot_type_str:
-                    bot_type_str = bot_type_str.split(".")[-1]
-                
-                is_signals_futures = (bot_type_str == "SIGNALS_FUTURES")
+                is_signals_futures = (self._bot_prompt_source(bot_id)['bot_type'] == "SIGNALS_FUTURES")
             except Exception as e:
                 logger.warning(f"Could not determine bot_type for bot {bot_id}: {e}")
         
-        # Base prompt with market data
-        prompt = f"""{strategy_prompt}
+        has_historical_data = bool(historical_transactions)
+        
+        # Market data changes every run; the compact form writes candles as tables
+        if LLM_COMPACT_PROMPT:
+            market_section = encode_market_data(market_data)
+        else:
+            market_section = json.dumps(market_data, indent=2)
+        
+        sections = {
+            'strategy': strategy_prompt,
+            'market_data': f"""
 
 ╔══════════════════════════════════════════════════════════════════╗
 ║ 📈 MARKET DATA TO ANALYZE                                        ║
 ╚══════════════════════════════════════════════════════════════════╝
 
-{json.dumps(market_data, indent=2)}
-"""
+{market_section}
+""",
+            # Add historical transactions section if available
+            'historical': "\n" + self._format_historical_section(historical_transactions) if has_historical_data else "",
+            'instructions': get_prompt_cache().get_or_build(
+                ('instructions', PROMPT_VERSION, has_historical_data, is_signals_futures),
+                lambda: self._build_prompt_instructions(has_historical_data, is_signals_futures)
+            ),
+        }
         
-        # Add historical transactions section if available
-        if historical_transactions and len(historical_transactions) > 0:
-            historical_section = self._format_historical_section(historical_transactions)
-            prompt += "\n" + historical_section
+        tokens = section_tokens(sections)
+        self.last_prompt_tokens = tokens
+        logger.info(f"🧮 Prompt ~{tokens['total']} tokens: " +
+                    ", ".join(f"{name}={count}" for name, count in tokens.items() if name != 'total'))
         
+        return "".join(sections.values())
+    
+    def _build_prompt_instructions(self, has_historical_data: bool, is_signals_futures: bool) -> str:
+        """Instructions recap and OUTPUT FORMAT closing every analysis prompt"""
         # Add instructions recap
-        prompt += """
+        prompt = """
 ═══════════════════════════════════════════════════════════════════
 ⚡ INSTRUCTIONS RECAP:
 1. Extract indicators from data["indicators"][timeframe] (use directly)
 2. Analyze OHLCV patterns from data["timeframes"][timeframe]"""
         
-        if historical_transactions and len(historical_transactions) > 0:
+        if has_historical_data:
             prompt += "\n3. LEARN from historical_transactions (validate similar patterns)"
             prompt += "\n4. Apply YOUR STRATEGY rules above"
             prompt += "\n5. Return STRICT JSON format below"
@@ -610,11 +626,23 @@ OUTPUT RULES:
         """
         Generate dynamic data structure guide based on available indicators and historical transactions
         
+        The guide only depends on the timeframes, the indicator names and whether
+        history is present, so it is built once per combination and cached.
+        
         Args:
             timeframes: List of timeframes
             indicators_analysis: Indicators data to detect available indicators
             has_historical_data: Whether historical transactions are available
         """
+        key = ('guide', PROMPT_VERSION, tuple(timeframes), indicator_signature(indicators_analysis),
+               bool(has_historical_data), LLM_COMPACT_PROMPT)
+        return get_prompt_cache().get_or_build(
+            key, lambda: self._build_data_structure_guide(timeframes, indicators_analysis, has_historical_data)
+        )
+    
+    def _build_data_structure_guide(self, timeframes: list, indicators_analysis: Dict[str, Dict[str, Any]] = None, 
+                                    has_historical_data: bool = False) -> str:
+        """Uncached _generate_data_structure_guide"""
         formatted_timeframes = ", ".join([tf.upper() for tf in timeframes])
         
         # Detect available indicators DYNAMICALLY from actual data
@@ -768,13 +796,19 @@ STEP 4: LEARN FROM HISTORICAL TRANSACTIONS (if provided)
    
             step_adjust = " + Historical Learning"
         
+        if LLM_COMPACT_PROMPT:
+            candles_format = ("One table per timeframe: header row (time,open,high,low,close,volume), "
+                              "then one row per candle, oldest first")
+        else:
+            candles_format = "Raw candlestick data: open, high, low, close, volume, timestamp"
+        
         guide = f"""
 ╔══════════════════════════════════════════════════════════════════╗
 ║ 📊 DATA STRUCTURE GUIDE                                          ║
 ╚══════════════════════════════════════════════════════════════════╝
 
 1. **OHLCV HISTORICAL DATA** (timeframes: {formatted_timeframes})
-   - Raw candlestick data: open, high, low, close, volume, timestamp
+   - {candles_format}
    - Use for: Price patterns, trends, support/resistance levels, candlestick patterns
    
 2. **PRE-CALCULATED TECHNICAL INDICATORS**{":" if available_indicators else " (if available):"}
@@ -858,63 +892,41 @@ STEP 3: COMBINE BOTH DATA SOURCES FOR BETTER DECISIONS
         # If bot_id is provided, try to get prompt from bot's attached prompt
         if bot_id:
             try:
-                from core.database import get_db
-                from core import crud, models
-                from sqlalchemy.orm import Session
-                
-                # Get database session
-                db = next(get_db())
-                
-                # Get bot to check bot_type for SIGNALS_FUTURES
-                bot = crud.get_bot_by_id(db, bot_id)
-                bot_type_str = str(bot.bot_type).upper().strip() if bot and bot.bot_type else None
-                if bot_type_str and "." in bot_type_str:
-                    bot_type_str = bot_type_str.split(".")[-1]
-                
-                is_signals_futures = (bot_type_str == "SIGNALS_FUTURES")
+                source = self._bot_prompt_source(bot_id)
+                bot_type_str = source['bot_type']
+                prompt_template = source['template']
                 
-                # Get bot's attached prompt
-                bot_prompts = crud.get_bot_prompts(db, bot_id)
-                logger.info(f"📋 Found {len(bot_prompts) if bot_prompts else 0} bot prompts for bot {bot_id}")
-                if bot_prompts:
-                    # Get the active prompt (highest priority)
-                    active_prompt = max(bot_prompts, key=lambda x: x.priority)
-                    # Use relationship instead of separate query
-                    prompt_template = active_prompt.llm_prompt_template
+                if prompt_template:
+                    # Use bot's custom prompt with variable injection
+                    bot_prompt = prompt_template['content']
                     
-                    if prompt_template and prompt_template.content:
-                        logger.info(f"✅ Using custom prompt template: {prompt_template.name} (ID: {prompt_template.id})")
-                        logger.info(f"📝 Prompt content preview: {prompt_template.content[:100]}...")
-                        # Use bot's custom prompt with variable injection
-                        bot_prompt = prompt_template.content
-                        
-                        # Inject variables into the prompt
-                        variables = {
-                            'formatted_timeframes': formatted_timeframes,
-                            'current_price': '{current_price}',  # Will be replaced by actual price
-                            'symbol': '{symbol}',  # Will be replaced by actual symbol
-                            'exchange': '{exchange}',  # Will be replaced by actual exchange
-                            'timeframe': '{timeframe}',  # Will be replaced by primary timeframe
-                            'timestamp': '{timestamp}',  # Will be replaced by current timestamp
-                            'user_id': '{user_id}',  # Will be replaced by actual user ID
-                            'bot_id': str(bot_id)
-                        }
-                        
-                        # Replace variables in the prompt
-                        for key, value in variables.items():
-                            bot_prompt = bot_prompt.replace(f'{{{key}}}', value)
-                        
-                        # Prepend data structure guide and add clear strategy header
-                        strategy_header = """
+                    # Inject variables into the prompt
+                    variables = {
+                        'formatted_timeframes': formatted_timeframes,
+                        'current_price': '{current_price}',  # Will be replaced by actual price
+                        'symbol': '{symbol}',  # Will be replaced by actual symbol
+                        'exchange': '{exchange}',  # Will be replaced by actual exchange
+                        'timeframe': '{timeframe}',  # Will be replaced by primary timeframe
+                        'timestamp': '{timestamp}',  # Will be replaced by current timestamp
+                        'user_id': '{user_id}',  # Will be replaced by actual user ID
+                        'bot_id': str(bot_id)
+                    }
+                    
+                    # Replace variables in the prompt
+                    for key, value in variables.items():
+                        bot_prompt = bot_prompt.replace(f'{{{key}}}', value)
+                    
+                    # Prepend data structure guide and add clear strategy header
+                    strategy_header = """
 ╔══════════════════════════════════════════════════════════════════╗
 ║ 🎯 YOUR TRADING STRATEGY                                         ║
 ╚══════════════════════════════════════════════════════════════════╝
 """
-                        bot_prompt = data_guide + "\n" + strategy_header + "\n" + bot_prompt
-                        
-                        logger.info(f"Using dynamic prompt from bot {bot_id} (bot_type={bot_type_str}) - OUTPUT FORMAT will be added by _format_final_prompt")
-                        logger.info(f"📄 Strategy prompt length: {len(bot_prompt)} chars")
-                        return bot_prompt
+                    bot_prompt = data_guide + "\n" + strategy_header + "\n" + bot_prompt
+                    
+                    logger.info(f"Using dynamic prompt from bot {bot_id} (bot_type={bot_type_str}) - OUTPUT FORMAT will be added by _format_final_prompt")
+                    logger.info(f"📄 Strategy prompt length: {len(bot_prompt)} chars")
+                    return bot_prompt
                         
             except Exception as e:
                 logger.error(f"❌ Failed to get bot prompt for bot {bot_id}: {e}")
@@ -927,6 +939,45 @@ STEP 3: COMBINE BOTH DATA SOURCES FOR BETTER DECISIONS
         # Default prompt already has data guide built-in
         return self._get_default_analysis_prompt(timeframes)
     
+    def _bot_prompt_source(self, bot_id: int) -> Dict[str, Any]:
+        """
+        Bot type and active prompt template of a bot
+        
+        Read from the database at most once per LLM_PROMPT_CACHE_TTL seconds per
+        process instead of on every prompt build.
+        """
+        def load():
+            from core.database import get_db
+            from core import crud
+            
+            sessions = get_db()
+            db = next(sessions)
+            try:
+                bot = crud.get_bot_by_id(db, bot_id)
+                bot_type_str = str(bot.bot_type).upper().strip() if bot and bot.bot_type else None
+                if bot_type_str and "." in bot_type_str:
+                    bot_type_str = bot_type_str.split(".")[-1]
+                
+                template = None
+                bot_prompts = crud.get_bot_prompts(db, bot_id)
+                logger.info(f"📋 Found {len(bot_prompts) if bot_prompts else 0} bot prompts for bot {bot_id}")
+                if bot_prompts:
+                    # Get the active prompt (highest priority)
+                    active_prompt = max(bot_prompts, key=lambda x: x.priority)
+                    prompt_template = active_prompt.llm_prompt_template
+                    if prompt_template and prompt_template.content:
+                        logger.info(f"✅ Using custom prompt template: {prompt_template.name} (ID: {prompt_template.id})")
+                        template = {
+                            'id': prompt_template.id,
+                            'name': prompt_template.name,
+                            'content': prompt_template.content
+                        }
+                return {'bot_type': bot_type_str, 'template': template}
+            finally:
+                sessions.close()
+        
+        return get_prompt_cache().get_or_build(('bot', bot_id), load, ttl=LLM_PROMPT_CACHE_TTL)
+    
     def _get_default_analysis_prompt(self, timeframes: list) -> str:
         """Get the default high-quality trading analysis prompt"""
         # Format timeframes for display
@@ -1239,7 +1290,11 @@ Please respond in JSON format:
     
     def _check_quota(self, developer_id: int) -> bool:
         """
-        Check if user has remaining LLM quota
+        Reserve one LLM call from the user's quota
+        
+        The reservation is made atomically in the quota ledger (no UserPlan
+        query on the hot path); _decrement_quota confirms it after a successful
+        call and _release_quota gives it back when the call fails.
         
         Args:
             developer_id: Developer ID to check quota for
@@ -1256,40 +1311,33 @@ Please respond in JSON format:
         
         try:
             from core import models
+            from services.llm_quota_ledger import get_quota_ledger
             
-            # Get user's plan
-            user_plan = self.db.query(models.UserPlan).filter(
-                models.UserPlan.user_id == developer_id,
-                models.UserPlan.status == models.PlanStatus.ACTIVE
-            ).first()
-            
-            if not user_plan:
+            quota = get_quota_ledger().reserve(self.db, developer_id)
+            if not quota.tracked:
                 logger.warning(f"⚠️ No active plan found for developer {developer_id}")
                 return True  # Allow if no plan found
             
-            # Check if quota has expired (reset period)
-            if user_plan.llm_quota_reset_at and user_plan.llm_quota_reset_at < datetime.now():
-                logger.info(f"🔄 Quota expired for developer {developer_id}, resetting...")
-                # Reset quota
-                user_plan.llm_quota_used = 0
-                user_plan.llm_quota_reset_at = datetime.now() + timedelta(days=30)
-                self.db.commit()
-                logger.info(f"✅ Quota reset for developer {developer_id}")
-            
-            # Check remaining quota
-            remaining = user_plan.llm_quota_total - user_plan.llm_quota_used
-            if remaining <= 0:
-                logger.warning(f"❌ Quota exceeded for developer {developer_id}: {user_plan.llm_quota_used}/{user_plan.llm_quota_total}")
+            if not quota.allowed:
+                logger.warning(f"❌ Quota exceeded for developer {developer_id}: {quota.used}/{quota.total}")
                 
-                # Send notification to developer
-                self._send_quota_exhausted_notification(developer_id, user_plan)
+                # Send notification to developer (ledger counts, plan name from the plan row)
+                user_plan = self.db.query(models.UserPlan).filter(
+                    models.UserPlan.user_id == developer_id,
+                    models.UserPlan.status == models.PlanStatus.ACTIVE
+                ).first()
+                if user_plan:
+                    self._send_quota_exhausted_notification(developer_id, SimpleNamespace(
+                        llm_quota_used=quota.used, llm_quota_total=quota.total,
+                        llm_quota_reset_at=quota.reset_at, plan_name=user_plan.plan_name
+                    ))
                 
                 raise QuotaExceededException(
-                    f"LLM quota exceeded. Used: {user_plan.llm_quota_used}/{user_plan.llm_quota_total}. "
+                    f"LLM quota exceeded. Used: {quota.used}/{quota.total}. "
                     f"Please upgrade your plan or purchase additional quota."
                 )
             
-            logger.info(f"✅ Quota check passed for developer {developer_id}: {remaining} calls remaining")
+            logger.info(f"✅ Quota check passed for developer {developer_id}: {quota.remaining} calls remaining")
             return True
             
         except QuotaExceededException:
@@ -1478,7 +1526,10 @@ Need help? Contact support or upgrade your plan.
     
     def _decrement_quota(self, developer_id: int):
         """
-        Decrement user's LLM quota by 1 after successful API call
+        Confirm the call reserved by _check_quota after a successful API call
+        
+        The ledger already counted it; UserPlan.llm_quota_used is updated by
+        its batched write-back.
         
         Args:
             developer_id: Developer ID to decrement quota for
@@ -1488,31 +1539,111 @@ Need help? Contact support or upgrade your plan.
             return
         
         try:
-            from core import models
-            
-            # Get user's plan
-            user_plan = self.db.query(models.UserPlan).filter(
-                models.UserPlan.user_id == developer_id,
-                models.UserPlan.status == models.PlanStatus.ACTIVE
-            ).first()
+            from services.llm_quota_ledger import get_quota_ledger
             
-            if user_plan:
-                user_plan.llm_quota_used += 1
-                self.db.commit()
-                remaining = user_plan.llm_quota_total - user_plan.llm_quota_used
-                logger.info(f"📉 Quota decremented for developer {developer_id}: {user_plan.llm_quota_used}/{user_plan.llm_quota_total} ({remaining} remaining)")
+            quota = get_quota_ledger().get_usage(developer_id)
+            if quota:
+                logger.info(f"📉 Quota decremented for developer {developer_id}: {quota.used}/{quota.total} ({quota.remaining} remaining)")
                 
                 # Send warning notifications at certain thresholds
-                if remaining <= 50 and remaining > 0:
-                    logger.warning(f"⚠️ Low quota warning for developer {developer_id}: {remaining} calls remaining")
-                elif remaining == 0:
+                if quota.remaining <= 50 and quota.remaining > 0:
+                    logger.warning(f"⚠️ Low quota warning for developer {developer_id}: {quota.remaining} calls remaining")
+                elif quota.remaining == 0:
                     logger.warning(f"🚨 Quota exhausted for developer {developer_id}")
-            else:
-                logger.warning(f"⚠️ No active plan found for developer {developer_id} to decrement quota")
                 
         except Exception as e:
             logger.error(f"❌ Error decrementing quota for developer {developer_id}: {e}")
     
+    def _release_quota(self, developer_id: int):
+        """Give back the call reserved by _check_quota when the API call failed"""
+        if not self.db or not developer_id:
+            return
+        
+        try:
+            from services.llm_quota_ledger import get_quota_ledger
+            get_quota_ledger().release(developer_id)
+        except Exception as e:
+            logger.error(f"❌ Error releasing quota for developer {developer_id}: {e}")
+    
+    def _stream_decision(self, provider: str, prompt: str, system_prompt: str = None) -> Tuple[Dict[str, Any], int, int]:
+        """
+        Stream a market analysis and stop at the first complete, valid decision
+        
+        Blocking (run via asyncio.to_thread). Closing the stream cancels the
+        rest of the generation. Providers only report usage at the end of a
+        stream, so the token counts of a stopped stream are estimated from
+        text length (~4 characters per token).
+        
+        Returns:
+            (parsed response, input tokens, output tokens)
+        """
+        usage = {}
+        if provider == 'OPENAI':
+            messages = [{"role": "user", "content": prompt}]
+            if system_prompt:
+                messages.insert(0, {"role": "system", "content": system_prompt})
+            stream = self.openai_client.chat.completions.create(
+                model=self.openai_model,
+                messages=messages,
+                temperature=0.2,
+                max_tokens=2000,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            
+            def chunks():
+                for chunk in stream:
+                    if getattr(chunk, 'usage', None):
+                        usage['input'], usage['output'] = chunk.usage.prompt_tokens, chunk.usage.completion_tokens
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        elif provider == 'CLAUDE':
+            stream = self.claude_client.messages.create(
+                model=self.claude_model,
+                max_tokens=2000,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True
+            )
+            
+            def chunks():
+                for event in stream:
+                    if event.type == 'message_start':
+                        usage['input'] = event.message.usage.input_tokens
+                    elif event.type == 'content_block_delta' and getattr(event.delta, 'text', None):
+                        yield event.delta.text
+                    elif event.type == 'message_delta' and getattr(event, 'usage', None):
+                        usage['output'] = event.usage.output_tokens
+        else:
+            stream = self.gemini_client.generate_content(prompt, stream=True)
+            
+            def chunks():
+                for chunk in stream:
+                    metadata = getattr(chunk, 'usage_metadata', None)
+                    if metadata:
+                        usage['input'] = metadata.prompt_token_count
+                        usage['output'] = metadata.candidates_token_count
+                    try:
+                        yield chunk.text
+                    except ValueError:
+                        continue  # Chunk without text parts
+        
+        cancelled = _request_cancelled.get()
+        result = read_decision_stream(chunks(), TradingDecision, close=getattr(stream, 'close', None),
+                                      cancelled=cancelled.is_set if cancelled else None)
+        if result.parsed is not None:
+            analysis = result.parsed
+            analysis["parsed"] = True
+            analysis["raw_response"] = result.text
+        else:
+            logger.error(f"Error parsing LLM response: {result.error}")
+            analysis = {"raw_response": result.text, "parsed": False, "error": result.error}
+        
+        if result.stopped_early:
+            logger.info(f"⚡ {provider} decision complete after {len(result.text)} chars, stream closed")
+        input_tokens = usage.get('input') or len(prompt) // 4
+        output_tokens = usage.get('output') or len(result.text) // 4
+        return analysis, input_tokens, output_tokens
+    
     async def analyze_with_openai(self, market_data: Dict[str, Any], bot_id: int = None,
                                   historical_transactions: List[Dict] = None) -> Dict[str, Any]:
         """Analyze market data using OpenAI with optional historical learning"""
@@ -1528,6 +1659,7 @@ Need help? Contact support or upgrade your plan.
                 return {"error": "quota_exceeded", "message": str(e)}
         
         start_time = time.time()
+        quota_used = False
         try:
             # Extract timeframes and indicators from market_data
             timeframes = list(market_data.get("timeframes", {}).keys())
@@ -1539,21 +1671,28 @@ Need help? Contact support or upgrade your plan.
             # Format final prompt with clear sections and historical context
             prompt = self._format_final_prompt(strategy_prompt, market_data, historical_transactions, bot_id)
             
-            response = await asyncio.to_thread(
-                self.openai_client.chat.completions.create,
-                model=self.openai_model,
-                messages=[
-                    {"role": "system", "content": f"You are a professional trading engine. Analyze OHLCV data for timeframes: {', '.join(timeframes)}. Focus on volume confirmation and quality entry points. Return ONLY valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                max_tokens=2000
-            )
+            system_prompt = f"You are a professional trading engine. Analyze OHLCV data for timeframes: {', '.join(timeframes)}. Focus on volume confirmation and quality entry points. Return ONLY valid JSON."
+            if LLM_STREAM_RESPONSES:
+                analysis, input_tokens, output_tokens = await asyncio.to_thread(
+                    self._stream_decision, 'OPENAI', prompt, system_prompt
+                )
+            else:
+                response = await asyncio.to_thread(
+                    self.openai_client.chat.completions.create,
+                    model=self.openai_model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.2,
+                    max_tokens=2000
+                )
+                analysis = self._parse_llm_response(response.choices[0].message.content, TradingDecision)
+                input_tokens = response.usage.prompt_tokens if hasattr(response, 'usage') else 0
+                output_tokens = response.usage.completion_tokens if hasattr(response, 'usage') else 0
             
             # Log usage
             duration_ms = int((time.time() - start_time) * 1000)
-            input_tokens = response.usage.prompt_tokens if hasattr(response, 'usage') else 0
-            output_tokens = response.usage.completion_tokens if hasattr(response, 'usage') else 0
             
             self._log_llm_usage(
                 provider='OPENAI',
@@ -1566,12 +1705,17 @@ Need help? Contact support or upgrade your plan.
             )
             
             # Decrement quota after successful API call
+            quota_used = True
             if self.developer_id:
                 self._decrement_quota(self.developer_id)
             
-            content = response.choices[0].message.content
-            return self._parse_llm_response(content)
+            return analysis
             
+        except asyncio.CancelledError:
+            # Lost a hedged race before the provider answered: give the reserved call back
+            if self.developer_id and not quota_used:
+                self._release_quota(self.developer_id)
+            raise
         except Exception as e:
             # Log failed request
             duration_ms = int((time.time() - start_time) * 1000)
@@ -1587,6 +1731,10 @@ Need help? Contact support or upgrade your plan.
             )
             
             logger.error(f"OpenAI analysis error: {e}")
+            
+            # Failed before the provider answered: give the reserved call back
+            if self.developer_id and not quota_used:
+                self._release_quota(self.developer_id)
             return {"error": f"OpenAI analysis failed: {str(e)}"}
     
     async def analyze_with_claude(self, market_data: Dict[str, Any], bot_id: int = None,
@@ -1604,6 +1752,7 @@ Need help? Contact support or upgrade your plan.
                 return {"error": "quota_exceeded", "message": str(e)}
         
         start_time = time.time()
+        quota_used = False
         try:
             # Extract timeframes and indicators from market_data
             timeframes = list(market_data.get("timeframes", {}).keys())
@@ -1615,19 +1764,25 @@ Need help? Contact support or upgrade your plan.
             # Format final prompt with clear sections and historical context
             prompt = self._format_final_prompt(strategy_prompt, market_data, historical_transactions, bot_id)
             
-            response = await asyncio.to_thread(
-                self.claude_client.messages.create,
-                model=self.claude_model,
-                max_tokens=2000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            if LLM_STREAM_RESPONSES:
+                analysis, input_tokens, output_tokens = await asyncio.to_thread(
+                    self._stream_decision, 'CLAUDE', prompt
+                )
+            else:
+                response = await asyncio.to_thread(
+                    self.claude_client.messages.create,
+                    model=self.claude_model,
+                    max_tokens=2000,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                )
+                analysis = self._parse_llm_response(response.content[0].text, TradingDecision)
+                input_tokens = response.usage.input_tokens if hasattr(response, 'usage') else 0
+                output_tokens = response.usage.output_tokens if hasattr(response, 'usage') else 0
             
             # Log usage
             duration_ms = int((time.time() - start_time) * 1000)
-            input_tokens = response.usage.input_tokens if hasattr(response, 'usage') else 0
-            output_tokens = response.usage.output_tokens if hasattr(response, 'usage') else 0
             
             self._log_llm_usage(
                 provider='CLAUDE',
@@ -1640,12 +1795,17 @@ Need help? Contact support or upgrade your plan.
             )
             
             # Decrement quota after successful API call
+            quota_used = True
             if self.developer_id:
                 self._decrement_quota(self.developer_id)
             
-            content = response.content[0].text
-            return self._parse_llm_response(content)
+            return analysis
             
+        except asyncio.CancelledError:
+            # Lost a hedged race before the provider answered: give the reserved call back
+            if self.developer_id and not quota_used:
+                self._release_quota(self.developer_id)
+            raise
         except Exception as e:
             # Log failed request
             duration_ms = int((time.time() - start_time) * 1000)
@@ -1661,6 +1821,10 @@ Need help? Contact support or upgrade your plan.
             )
             
             logger.error(f"Claude analysis error: {e}")
+            
+            # Failed before the provider answered: give the reserved call back
+            if self.developer_id and not quota_used:
+                self._release_quota(self.developer_id)
             return {"error": f"Claude analysis failed: {str(e)}"}
     
     async def analyze_with_gemini(self, market_data: Dict[str, Any], bot_id: int = None,
@@ -1678,6 +1842,7 @@ Need help? Contact support or upgrade your plan.
                 return {"error": "quota_exceeded", "message": str(e)}
         
         start_time = time.time()
+        quota_used = False
         try:
             # Extract timeframes and indicators from market_data
             timeframes = list(market_data.get("timeframes", {}).keys())
@@ -1689,16 +1854,22 @@ Need help? Contact support or upgrade your plan.
             # Format final prompt with clear sections and historical context
             prompt = self._format_final_prompt(strategy_prompt, market_data, historical_transactions, bot_id)
             
-            response = await asyncio.to_thread(
-                self.gemini_client.generate_content,
-                prompt
-            )
+            if LLM_STREAM_RESPONSES:
+                analysis, input_tokens, output_tokens = await asyncio.to_thread(
+                    self._stream_decision, 'GEMINI', prompt
+                )
+            else:
+                response = await asyncio.to_thread(
+                    self.gemini_client.generate_content,
+                    prompt
+                )
+                analysis = self._parse_llm_response(response.text, TradingDecision)
+                # Gemini usage metadata
+                input_tokens = response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else 0
+                output_tokens = response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else 0
             
             # Log usage
             duration_ms = int((time.time() - start_time) * 1000)
-            # Gemini usage metadata
-            input_tokens = response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else 0
-            output_tokens = response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else 0
             
             self._log_llm_usage(
                 provider='GEMINI',
@@ -1711,12 +1882,17 @@ Need help? Contact support or upgrade your plan.
             )
             
             # Decrement quota after successful API call
+            quota_used = True
             if self.developer_id:
                 self._decrement_quota(self.developer_id)
             
-            content = response.text
-            return self._parse_llm_response(content)
+            return analysis
             
+        except asyncio.CancelledError:
+            # Lost a hedged race before the provider answered: give the reserved call back
+            if self.developer_id and not quota_used:
+                self._release_quota(self.developer_id)
+            raise
         except Exception as e:
             # Log failed request
             duration_ms = int((time.time() - start_time) * 1000)
@@ -1732,28 +1908,29 @@ Need help? Contact support or upgrade your plan.
             )
             
             logger.error(f"Gemini analysis error: {e}")
+            
+            # Failed before the provider answered: give the reserved call back
+            if self.developer_id and not quota_used:
+                self._release_quota(self.developer_id)
             return {"error": f"Gemini analysis failed: {str(e)}"}
     
-    def _parse_llm_response(self, response: str) -> Dict[str, Any]:
-        """Parse LLM response to extract trading analysis"""
+    def _parse_llm_response(self, response: str, schema=None) -> Dict[str, Any]:
+        """
+        Parse LLM response to extract trading analysis
+        
+        Takes the first JSON object that parses (fenced or not, truncated or
+        with trailing commas repaired) and, when a schema is given, validates.
+        """
         try:
-            # Try to extract JSON from response
-            if "```json" in response:
-                json_start = response.find("```json") + 7
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "{" in response and "}" in response:
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                json_str = response[json_start:json_end]
-            else:
+            parsed, error = parse_json_response(response, schema)
+            if parsed is None:
+                logger.error(f"Error parsing LLM response: {error}")
                 return {
                     "raw_response": response,
                     "parsed": False,
-                    "error": "No JSON found in response"
+                    "error": error
                 }
             
-            parsed = json.loads(json_str)
             parsed["parsed"] = True
             parsed["raw_response"] = response
             return parsed
@@ -1785,12 +1962,79 @@ Need help? Contact support or upgrade your plan.
             Complete trading analysis with Fibonacci and historical learning
         """
         try:
-            # Check cache first
-            cache_key = self._generate_cache_key(symbol, timeframes_data, model)
-            cached_analysis = self._get_cached_analysis(cache_key)
-            if cached_analysis:
-                return cached_analysis
+            cache_key = self._generate_cache_key(symbol, timeframes_data, model, bot_id)
+            if not cache_key:
+                return await self._coalesced_market_analysis(
+                    symbol, timeframes_data, indicators_analysis, model, bot_id, historical_transactions
+                )
             
+            # Shared cache: one LLM call per market state across all workers,
+            # cached until the shortest timeframe's candle closes
+            self.last_request_cost_usd = 0.0
+            analysis = await self._analysis_cache.aget_or_compute(
+                cache_key,
+                lambda: self._coalesced_market_analysis(
+                    symbol, timeframes_data, indicators_analysis, model, bot_id, historical_transactions
+                ),
+                timeframes=list(timeframes_data.keys()),
+                cost_of=lambda _: self.last_request_cost_usd,
+                should_cache=lambda result: 'error' not in result
+            )
+            if analysis is None:
+                # Another worker holds the lock and did not publish in time
+                analysis = await self._coalesced_market_analysis(
+                    symbol, timeframes_data, indicators_analysis, model, bot_id, historical_transactions
+                )
+            return analysis
+            
+        except Exception as e:
+            logger.error(f"Market analysis error: {e}")
+            return {"error": f"Analysis failed: {str(e)}"}
+    
+    def _request_scope(self, bot_id: int = None) -> Tuple:
+        """
+        Who an analysis is sent for and with which credentials
+        
+        Requests are only coalesced within one scope: the bot (its prompt and
+        subscriptions), the developer whose quota is charged and the provider
+        credentials (BYOK, platform or environment keys) the request uses.
+        """
+        provider_config = self._provider_config or {}
+        credentials = (provider_config.get('source', 'ENVIRONMENT'), provider_config.get('provider_id'))
+        return (bot_id or self.bot_id, self.developer_id) + credentials + (
+            self.openai_model, self.claude_model, self.gemini_model
+        )
+    
+    async def _coalesced_market_analysis(self, symbol: str, timeframes_data: Dict[str, List[Dict]],
+                                         indicators_analysis: Dict[str, Dict[str, Any]], model: str,
+                                         bot_id: int, historical_transactions: List[Dict]) -> Dict[str, Any]:
+        """_run_market_analysis sent once for identical requests of the bot's other subscriptions"""
+        def compute():
+            return self._run_market_analysis(
+                symbol, timeframes_data, indicators_analysis, model, bot_id, historical_transactions
+            )
+        
+        if not self.coalesce_requests:
+            return await compute()
+        
+        key = analysis_request_key(symbol, timeframes_data, model, self._request_scope(bot_id),
+                                   indicators_analysis, historical_transactions)
+        analysis = await get_request_coalescer().submit(
+            key, compute,
+            timeframes=list(timeframes_data.keys()),
+            cost_of=lambda _: self.last_request_cost_usd,
+            should_cache=lambda result: 'error' not in result
+        )
+        if analysis is None:
+            # Timed out, or another worker computing it did not publish a result
+            analysis = await compute()
+        return analysis
+    
+    async def _run_market_analysis(self, symbol: str, timeframes_data: Dict[str, List[Dict]],
+                                   indicators_analysis: Dict[str, Dict[str, Any]], model: str,
+                                   bot_id: int, historical_transactions: List[Dict]) -> Dict[str, Any]:
+        """Uncached analyze_market: prepare data and call the selected LLM"""
+        try:
             # Prepare market data with indicators
             market_data = self.prepare_market_data(symbol, timeframes_data, indicators_analysis)
             
@@ -1801,14 +2045,20 @@ Need help? Contact support or upgrade your plan.
             # Support both provider type ("openai") and full model name ("gpt-4o-mini")
             model_lower = model.lower()
             if model_lower == "openai" or model_lower.startswith("gpt"):
-                analysis = await self._retry_with_backoff(self.analyze_with_openai, market_data, bot_id, historical_transactions)
+                provider = "openai"
             elif model_lower == "claude" or model_lower.startswith("claude") or model_lower == "anthropic":
-                analysis = await self._retry_with_backoff(self.analyze_with_claude, market_data, bot_id, historical_transactions)
+                provider = "claude"
             elif model_lower == "gemini" or model_lower.startswith("gemini"):
-                analysis = await self._retry_with_backoff(self.analyze_with_gemini, market_data, bot_id, historical_transactions)
+                provider = "gemini"
             else:
                 return {"error": f"Unsupported model: {model}"}
             
+            backups = self._hedge_candidates(provider) if self.hedge_requests else []
+            if backups:
+                analysis = await self._hedged_analysis(provider, backups[0], market_data, bot_id, historical_transactions)
+            else:
+                analysis = await self._retry_with_backoff(self._timed_analysis, provider, market_data, bot_id, historical_transactions)
+            
             # Add metadata
             analysis["metadata"] = {
                 "symbol": symbol,
@@ -1819,16 +2069,102 @@ Need help? Contact support or upgrade your plan.
                 "cached": False
             }
             
-            # Cache the result
-            if cache_key:
-                self._cache_analysis(cache_key, analysis)
-            
             return analysis
             
         except Exception as e:
             logger.error(f"Market analysis error: {e}")
             return {"error": f"Analysis failed: {str(e)}"}
     
+    def _hedge_candidates(self, primary: str) -> List[str]:
+        """
+        The backup provider LLMProviderSelector.get_backup_provider chose, when it has a client
+        
+        Never any other initialized client: environment keys are not hedged with,
+        and the selector already refuses backups to free plan users.
+        """
+        clients = {"openai": self.openai_client, "claude": self.claude_client, "gemini": self.gemini_client}
+        backup = self._backup_provider
+        if backup and backup != primary and clients.get(backup):
+            return [backup]
+        return []
+    
+    def _hedge_delay(self, provider: str) -> float:
+        """Seconds to wait on the primary before racing a backup: its latency percentile"""
+        tracker = get_latency_tracker()
+        if tracker.samples(provider) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        delay = tracker.percentile(provider, LLM_HEDGE_PERCENTILE)
+        return min(max(delay, LLM_HEDGE_MIN_DELAY), LLM_HEDGE_MAX_DELAY)
+    
+    async def _timed_analysis(self, provider: str, market_data: Dict[str, Any], bot_id: int = None,
+                              historical_transactions: List[Dict] = None,
+                              cancelled: threading.Event = None) -> Dict[str, Any]:
+        """Run one provider's analysis and record its latency (cancelled requests count as lower bounds)"""
+        if cancelled is not None:
+            _request_cancelled.set(cancelled)
+        analyze = {"openai": self.analyze_with_openai, "claude": self.analyze_with_claude,
+                   "gemini": self.analyze_with_gemini}[provider]
+        start_time = time.time()
+        analysis = None
+        try:
+            analysis = await analyze(market_data, bot_id, historical_transactions)
+            return analysis
+        finally:
+            if analysis is None or analysis.get("error") != "quota_exceeded":
+                get_latency_tracker().record(provider, time.time() - start_time,
+                                             success=analysis is None or self._is_valid_analysis(analysis))
+    
+    @staticmethod
+    def _is_valid_analysis(analysis: Dict[str, Any]) -> bool:
+        return "error" not in analysis and analysis.get("parsed", False)
+    
+    async def _hedged_analysis(self, primary: str, backup: str, market_data: Dict[str, Any],
+                               bot_id: int = None, historical_transactions: List[Dict] = None) -> Dict[str, Any]:
+        """
+        Race a backup provider against a slow or failing primary
+        
+        The backup starts when the primary fails or is still running after its
+        latency percentile (_hedge_delay). The first valid parsed result wins;
+        the other request is cancelled (its stream is closed and its quota
+        reservation released). Without a valid result the primary's is returned.
+        """
+        events = {primary: threading.Event(), backup: threading.Event()}
+        
+        def start(provider):
+            return asyncio.create_task(self._timed_analysis(
+                provider, market_data, bot_id, historical_transactions, cancelled=events[provider]
+            ))
+        
+        tasks = {start(primary): primary}
+        done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(primary))
+        if done:
+            analysis = next(iter(done)).result()
+            if self._is_valid_analysis(analysis) or analysis.get("error") == "quota_exceeded":
+                return analysis
+            logger.warning(f"⚠️ {primary} analysis failed ({analysis.get('error')}), hedging with {backup}")
+        else:
+            logger.info(f"🛡️ {primary} slower than its p{LLM_HEDGE_PERCENTILE * 100:.0f}, hedging with {backup}")
+        tasks[start(backup)] = backup
+        
+        results = {}
+        pending = {task for task in tasks if not task.done()}
+        for task in tasks:
+            if task.done():
+                results[tasks[task]] = task.result()
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[tasks[task]] = task.result()
+                    if self._is_valid_analysis(results[tasks[task]]):
+                        logger.info(f"🏁 Hedged analysis won by {tasks[task]}")
+                        return results[tasks[task]]
+        finally:
+            for task in pending:
+                events[tasks[task]].set()
+                task.cancel()
+        return results.get(primary) or results[backup]
+    
     async def analyze_sentiment(self, news_data: List[Dict[str, Any]], 
                                model: str = "openai") -> Dict[str, Any]:
         """
@@ -2209,7 +2545,7 @@ Please analyze this information and provide specific capital management recommen
         """Parse capital management LLM response"""
         try:
             # Try to extract JSON from response
-            parsed = self._parse_llm_response(response)
+            parsed = self._parse_llm_response(response, CapitalManagementAdvice)
             
             if parsed.get("parsed", False):
                 # Extract specific capital advice if available
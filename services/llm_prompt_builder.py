@@ -0,0 +1,245 @@
+"""
+LLM Prompt Builder
+Section cache and compact market data encoding for the analysis prompts
+
+- Static sections (data structure guide, bot strategy prompt, instructions
+  recap and output format) are built once per (bot, prompt version,
+  timeframes, indicator set) and kept in a process-local LRU; sections read
+  from the database are re-read every LLM_PROMPT_CACHE_TTL seconds
+- Candles are written as one table per timeframe (column names once, one row
+  per candle) instead of indented JSON that repeats every key on every candle;
+  numbers are trimmed to LLM_PROMPT_SIGNIFICANT_DIGITS significant digits
+- section_tokens estimates the input tokens of each prompt section, so the
+  cost of a prompt can be attributed to market data, history or boilerplate
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from collections import OrderedDict, Counter
+from typing import Dict, Any, List, Optional, Callable, Hashable, Tuple
+
+from services.llm_cache import timestamp_ms
+
+logger = logging.getLogger(__name__)
+
+LLM_COMPACT_PROMPT = os.getenv('LLM_COMPACT_PROMPT', 'true').lower() == 'true'
+LLM_PROMPT_CACHE_SIZE = int(os.getenv('LLM_PROMPT_CACHE_SIZE', '512'))
+LLM_PROMPT_CACHE_TTL = float(os.getenv('LLM_PROMPT_CACHE_TTL', '300'))
+LLM_PROMPT_SIGNIFICANT_DIGITS = int(os.getenv('LLM_PROMPT_SIGNIFICANT_DIGITS', '7'))
+
+CANDLE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+_TIMESTAMP_FIELDS = ('timestamp', 'time', 'open_time', 'datetime', 'date')
+
+# Same ratio as the streaming path's estimate when a provider reports no usage
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate input tokens of a prompt fragment"""
+    return (len(text or '') + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def section_tokens(sections: Dict[str, str]) -> Dict[str, int]:
+    """Estimated tokens per prompt section, plus 'total'"""
+    tokens = {name: estimate_tokens(text) for name, text in sections.items() if text}
+    tokens['total'] = sum(tokens.values())
+    return tokens
+
+
+# ======================================================================
+# Compact encoding
+# ======================================================================
+
+def compact_number(value: Any, digits: int = None) -> str:
+    """Shortest text of a number at `digits` significant digits (no exponent notation)"""
+    if not isinstance(value, float):
+        if hasattr(value, 'item'):
+            value = value.item()  # numpy scalar
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, int):
+            return str(value)
+    if not math.isfinite(value):
+        return 'null'
+    digits = digits or LLM_PROMPT_SIGNIFICANT_DIGITS
+    text = f"{value:.{digits}g}"
+    if 'e' not in text:
+        return text
+    decimals = max(0, digits - 1 - math.floor(math.log10(abs(value))))
+    text = f"{value:.{decimals}f}"
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text
+
+
+def compact_value(value: Any) -> Any:
+    """JSON-ready copy with floats trimmed to the significant digits"""
+    if hasattr(value, 'item') and not isinstance(value, (list, dict)):
+        try:
+            value = value.item()
+        except (TypeError, ValueError):
+            pass
+    if isinstance(value, dict):
+        return {str(k): compact_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [compact_value(v) for v in value]
+    if isinstance(value, float) and not isinstance(value, bool):
+        if not math.isfinite(value):
+            return None
+        trimmed = float(compact_number(value))
+        return int(trimmed) if trimmed.is_integer() and abs(trimmed) < 1e15 else trimmed
+    return value
+
+
+def _candle_time(value: Any) -> str:
+    ms = timestamp_ms(value)
+    if ms is None:
+        return str(value) if value is not None else ''
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None).isoformat(' ', 'minutes')
+
+
+def _cell(value: Any) -> str:
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return value.replace(',', ';')
+    if value is None:
+        return ''
+    return compact_number(value)
+
+
+def encode_candles(records: List[Dict[str, Any]]) -> str:
+    """
+    Candles as a table: header row, then one row per candle
+
+    time,open,high,low,close,volume
+    2025-01-01 00:00,42000.5,42100,41950.25,42050,1234.567
+
+    Extra numeric fields present on the first candle (quote volume, trades...)
+    become additional columns after the OHLCV ones.
+    """
+    if not records:
+        return "(no candles)"
+    first = records[0]
+    time_field = next((field for field in _TIMESTAMP_FIELDS if field in first), None)
+    columns = [column for column in CANDLE_COLUMNS if column in first]
+    columns += [key for key, value in first.items()
+                if key not in columns and key not in _TIMESTAMP_FIELDS
+                and isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+    header = (['time'] if time_field else []) + columns
+    rows = [','.join(header)]
+    for record in records:
+        row = [_candle_time(record.get(time_field))] if time_field else []
+        row += [_cell(record.get(column)) for column in columns]
+        rows.append(','.join(row))
+    return '\n'.join(rows)
+
+
+def encode_market_data(market_data: Dict[str, Any]) -> str:
+    """
+    Market data section of the analysis prompt in compact form
+
+    Keeps the data["timeframes"] / data["indicators"] names the guide refers
+    to; candles become tables and indicators compact JSON.
+    """
+    lines = []
+    for key, value in market_data.items():
+        if key in ('timeframes', 'indicators'):
+            continue
+        if isinstance(value, (dict, list)):
+            value = json.dumps(compact_value(value), separators=(',', ':'), default=str)
+        lines.append(f"{key}: {value}")
+
+    timeframes = market_data.get('timeframes') or {}
+    if timeframes:
+        lines.append('')
+        lines.append('data["timeframes"] - OHLCV candles per timeframe, oldest first, times in UTC:')
+        for timeframe, records in timeframes.items():
+            lines.append(f'[{timeframe}] {len(records or [])} candles')
+            lines.append(encode_candles(records or []))
+
+    indicators = market_data.get('indicators')
+    if indicators:
+        lines.append('')
+        lines.append('data["indicators"] - pre-calculated indicators per timeframe:')
+        lines.append(json.dumps(compact_value(indicators), separators=(',', ':'), default=str))
+
+    return '\n'.join(lines)
+
+
+def indicator_signature(indicators_analysis: Optional[Dict[str, Dict[str, Any]]]) -> Tuple:
+    """Key of the indicator set the data structure guide is built from (first timeframe's keys)"""
+    if not indicators_analysis:
+        return ()
+    first = next(iter(indicators_analysis.values()))
+    if not isinstance(first, dict):
+        return ()
+    nested = isinstance(first.get('indicators'), dict)
+    return (nested,) + tuple(first['indicators'] if nested else first)
+
+
+# ======================================================================
+# Section cache
+# ======================================================================
+
+class PromptSectionCache:
+    """
+    LRU of built prompt sections
+
+    Keys are tuples starting with the section name. Entries stored with a ttl
+    are rebuilt once it expires; a build that raises is not cached.
+    """
+
+    def __init__(self, max_entries: int = LLM_PROMPT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, Optional[float]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+
+        value = build()
+
+        with self._lock:
+            self._entries[key] = (value, now + ttl if ttl is not None else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats['misses'] += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_section_cache: Optional[PromptSectionCache] = None
+_section_cache_lock = threading.Lock()
+
+
+def get_prompt_cache() -> PromptSectionCache:
+    """Process-wide prompt section cache"""
+    global _section_cache
+    if _section_cache is None:
+        with _section_cache_lock:
+            if _section_cache is None:
+                _section_cache = PromptSectionCache()
+    return _section_cache
@@ -14,13 +14,105 @@ Date: 2025-10-19
 
 from sqlalchemy.orm import Session
 from core import models
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, List, Iterable
 import logging
+import threading
 from datetime import datetime
 import os
 
 logger = logging.getLogger(__name__)
 
+# Latency histogram bucket upper bounds (seconds); the last bucket is open-ended
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0, 34.0, 60.0, float('inf'))
+# Weight kept by older samples on every new one (~1 / (1 - decay) samples of memory)
+LLM_LATENCY_DECAY = float(os.getenv('LLM_LATENCY_DECAY', 0.98))
+
+# Service names used by LLMIntegrationService -> platform provider types
+SERVICE_PROVIDERS = {
+    'openai': models.LLMProviderType.OPENAI,
+    'claude': models.LLMProviderType.ANTHROPIC,
+    'gemini': models.LLMProviderType.GEMINI,
+}
+
+
+class ProviderLatencyTracker:
+    """
+    Per-provider LLM latency histograms (exponentially decayed, per process)
+    
+    Fed by every market analysis call; used for hedged-request delays and to
+    pick the fastest, most reliable backup provider.
+    """
+    
+    def __init__(self, decay: float = LLM_LATENCY_DECAY):
+        self.decay = decay
+        self._histograms: Dict[str, List[float]] = {}
+        self._failures: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, provider: str, seconds: float, success: bool = True):
+        with self._lock:
+            histogram = self._histograms.setdefault(provider, [0.0] * len(LATENCY_BUCKETS))
+            for index in range(len(histogram)):
+                histogram[index] *= self.decay
+            histogram[next(i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound)] += 1
+            self._failures[provider] = self._failures.get(provider, 0.0) * self.decay + (not success)
+    
+    def samples(self, provider: str) -> float:
+        with self._lock:
+            return sum(self._histograms.get(provider, ()))
+    
+    def percentile(self, provider: str, q: float) -> Optional[float]:
+        """Latency at quantile q (0-1), interpolated within its bucket; None without samples"""
+        with self._lock:
+            histogram = list(self._histograms.get(provider, ()))
+        total = sum(histogram)
+        if not total:
+            return None
+        target, cumulative, lower = q * total, 0.0, 0.0
+        for count, upper in zip(histogram, LATENCY_BUCKETS):
+            if count and cumulative + count >= target:
+                if upper == float('inf'):
+                    return lower
+                return lower + (upper - lower) * (target - cumulative) / count
+            cumulative += count
+            lower = upper
+        return lower
+    
+    def failure_rate(self, provider: str) -> float:
+        with self._lock:
+            total = sum(self._histograms.get(provider, ()))
+            return self._failures.get(provider, 0.0) / total if total else 0.0
+    
+    def rank(self, providers: Iterable[str]) -> List[str]:
+        """Providers by failure rate then median latency; unmeasured ones keep their order, last"""
+        providers = list(providers)
+        
+        def score(provider):
+            median = self.percentile(provider, 0.5)
+            if median is None:
+                return (1, 0.0, providers.index(provider))
+            return (0, round(self.failure_rate(provider), 1), median)
+        
+        return sorted(providers, key=score)
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            providers = list(self._histograms)
+        return {provider: {
+            'samples': round(self.samples(provider), 1),
+            'p50': self.percentile(provider, 0.5),
+            'p90': self.percentile(provider, 0.9),
+            'failure_rate': round(self.failure_rate(provider), 3),
+        } for provider in providers}
+
+
+_latency_tracker = ProviderLatencyTracker()
+
+
+def get_latency_tracker() -> ProviderLatencyTracker:
+    """Process-wide provider latency histograms"""
+    return _latency_tracker
+
 
 class LLMProviderSelector:
     """
@@ -102,6 +194,32 @@ class LLMProviderSelector:
             "Contact platform administrator for assistance."
         )
     
+    def get_backup_provider(self, developer_id: int, exclude: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Platform provider to hedge slow requests with: the fastest active one
+        (latency histograms) among providers not in exclude (service names)
+        
+        Free plan users are never hedged (the backup would not be free).
+        """
+        user_plan = self._get_user_plan(developer_id)
+        if user_plan and user_plan.plan_name.value == 'free':
+            return None
+        
+        excluded = {SERVICE_PROVIDERS[name] for name in exclude if name in SERVICE_PROVIDERS}
+        candidates = {}
+        for provider in self.db.query(models.PlatformLLMProvider).filter(
+            models.PlatformLLMProvider.is_active == True,
+            models.PlatformLLMProvider.provider_type.in_(list(SERVICE_PROVIDERS.values()))
+        ).order_by(models.PlatformLLMProvider.created_at.asc()).all():
+            name = next(name for name, provider_type in SERVICE_PROVIDERS.items() if provider_type == provider.provider_type)
+            if provider.provider_type not in excluded:
+                candidates.setdefault(name, provider)
+        
+        for name in get_latency_tracker().rank(candidates):
+            logger.info(f"🛡️ Backup platform provider for hedged requests: {candidates[name].provider_type}")
+            return self._format_platform_provider(candidates[name])
+        return None
+    
     def _get_platform_provider(
         self, 
         preferred_provider: Optional[str] = None
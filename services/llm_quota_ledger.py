@@ -0,0 +1,466 @@
+"""
+LLM Quota Ledger
+Per-developer LLM call quota reserved atomically in Redis (process-local dict
+when Redis is unavailable) and written back to UserPlan in batches
+
+Every LLM call used to read the developer's UserPlan row and commit an update
+of llm_quota_used. The ledger now holds (total, used, reset_at) per developer:
+
+- reserve() takes one call before the provider request in a single Lua script
+  (or under a lock), so concurrent workers can never overrun the quota;
+  release() gives it back when the request fails
+- Reserved calls accumulate in a 'pending' counter. flush() moves them to
+  UserPlan.llm_quota_used (used = used + pending) for every dirty developer
+  in one transaction, from a background thread every LLM_QUOTA_FLUSH_INTERVAL
+  seconds, the flush_llm_quota_ledger task and at exit
+- Entries are re-read from UserPlan every LLM_QUOTA_SYNC_SECONDS (top-ups,
+  plan changes, restarts); invalidate() forces it. Used never drops below
+  the database value plus unflushed calls, so a restart loses nothing
+- When reset_at has passed the period rolls over in the ledger (used = 0,
+  reset_at + 30 days) and the next flush writes the new period to UserPlan
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+LLM_QUOTA_FLUSH_INTERVAL = float(os.getenv('LLM_QUOTA_FLUSH_INTERVAL', 10))
+LLM_QUOTA_SYNC_SECONDS = float(os.getenv('LLM_QUOTA_SYNC_SECONDS', 60))
+LLM_QUOTA_LEDGER_TTL = int(os.getenv('LLM_QUOTA_LEDGER_TTL', 3600))
+LLM_QUOTA_FLUSH_BATCH = int(os.getenv('LLM_QUOTA_FLUSH_BATCH', 500))
+QUOTA_PERIOD_SECONDS = 30 * 86400
+
+# total of a developer without an active plan: not metered
+UNTRACKED = -1
+
+# KEYS: entry, dirty set  ARGV: now, sync seconds, period seconds, developer_id
+# Returns {1 allowed | 0 denied | 2 untracked | -1 reload, used, total, reset_at}
+_RESERVE_SCRIPT = """
+local state = redis.call('hmget', KEYS[1], 'total', 'used', 'reset_at', 'synced_at')
+local now = tonumber(ARGV[1])
+if not state[1] or now - tonumber(state[4]) > tonumber(ARGV[2]) then
+    return {-1, 0, 0, 0}
+end
+local total = tonumber(state[1])
+if total < 0 then
+    return {2, 0, total, 0}
+end
+local used = tonumber(state[2])
+local reset_at = tonumber(state[3])
+if reset_at > 0 and reset_at < now then
+    reset_at = math.floor(now) + tonumber(ARGV[3])
+    used = 0
+    redis.call('hset', KEYS[1], 'used', 0, 'pending', 0, 'reset_at', reset_at, 'rollover', reset_at)
+    redis.call('persist', KEYS[1])
+    redis.call('sadd', KEYS[2], ARGV[4])
+end
+if used >= total then
+    return {0, used, total, reset_at}
+end
+redis.call('hincrby', KEYS[1], 'used', 1)
+redis.call('hincrby', KEYS[1], 'pending', 1)
+redis.call('persist', KEYS[1])
+redis.call('sadd', KEYS[2], ARGV[4])
+return {1, used + 1, total, reset_at}
+"""
+
+# KEYS: entry, dirty set  ARGV: developer_id
+_RELEASE_SCRIPT = """
+local used = tonumber(redis.call('hget', KEYS[1], 'used') or '0')
+if used <= 0 then
+    return 0
+end
+redis.call('hincrby', KEYS[1], 'used', -1)
+redis.call('hincrby', KEYS[1], 'pending', -1)
+redis.call('persist', KEYS[1])
+redis.call('sadd', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS: entry  ARGV: total, database used, reset_at, plan_id, now, ttl
+_SYNC_SCRIPT = """
+local state = redis.call('hmget', KEYS[1], 'used', 'pending', 'plan_id', 'rollover', 'reset_at')
+local pending = tonumber(state[2] or '0')
+local used = tonumber(ARGV[2]) + pending
+local reset_at = ARGV[3]
+if state[4] then
+    -- Rolled over, not flushed yet: the database still holds the previous period
+    used = tonumber(state[1])
+    reset_at = state[5]
+elseif state[3] == ARGV[4] and tonumber(state[1]) > used then
+    used = tonumber(state[1])
+end
+redis.call('hset', KEYS[1], 'total', ARGV[1], 'used', used, 'pending', pending,
+           'reset_at', reset_at, 'plan_id', ARGV[4], 'synced_at', ARGV[5])
+if pending == 0 and not state[4] then
+    redis.call('expire', KEYS[1], ARGV[6])
+end
+return used
+"""
+
+# KEYS: entry  Returns {pending, rollover, reset_at} and zeroes both
+_TAKE_SCRIPT = """
+local state = redis.call('hmget', KEYS[1], 'pending', 'rollover', 'reset_at')
+local pending = tonumber(state[1] or '0')
+if pending ~= 0 then
+    redis.call('hincrby', KEYS[1], 'pending', -pending)
+end
+redis.call('hdel', KEYS[1], 'rollover')
+return {pending, tonumber(state[2] or '0'), tonumber(state[3] or '0')}
+"""
+
+# KEYS: entry, dirty set  ARGV: pending, rollover, reset_at, developer_id
+# Puts back what a failed flush took, unless the period rolled over meanwhile
+_RESTORE_SCRIPT = """
+if tonumber(redis.call('hget', KEYS[1], 'reset_at') or '-1') ~= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('hincrby', KEYS[1], 'pending', ARGV[1])
+if ARGV[2] ~= '0' then
+    redis.call('hset', KEYS[1], 'rollover', ARGV[2])
+end
+redis.call('persist', KEYS[1])
+redis.call('sadd', KEYS[2], ARGV[4])
+return 1
+"""
+
+# KEYS: entry  ARGV: ttl  Lets an entry expire once everything is written back
+_SETTLE_SCRIPT = """
+local state = redis.call('hmget', KEYS[1], 'pending', 'rollover')
+if tonumber(state[1] or '0') == 0 and not state[2] then
+    redis.call('expire', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+@dataclass
+class QuotaStatus:
+    """Outcome of a reservation (used already includes it when allowed)"""
+    allowed: bool
+    used: int = 0
+    total: int = 0
+    reset_at: Optional[datetime] = None
+    tracked: bool = True
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.used
+
+
+def _status(code: int, used, total, reset_at) -> QuotaStatus:
+    if code == 2:
+        return QuotaStatus(allowed=True, tracked=False)
+    reset_at = float(reset_at or 0)
+    return QuotaStatus(allowed=code == 1, used=int(used), total=int(total),
+                       reset_at=datetime.fromtimestamp(reset_at) if reset_at else None)
+
+
+class QuotaLedger:
+    """Atomic per-developer LLM quota counters with batched UserPlan write-back"""
+
+    def __init__(self, session_factory: Optional[Callable] = None,
+                 flush_interval: float = LLM_QUOTA_FLUSH_INTERVAL,
+                 sync_seconds: float = LLM_QUOTA_SYNC_SECONDS,
+                 ttl: int = LLM_QUOTA_LEDGER_TTL, namespace: str = 'llm_quota'):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.sync_seconds = sync_seconds
+        self.ttl = ttl
+        self.namespace = namespace
+
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self.stats = {'reserved': 0, 'denied': 0, 'released': 0, 'syncs': 0, 'flushes': 0, 'flushed': 0}
+
+    def _key(self, developer_id: int) -> str:
+        return f"{self.namespace}:{developer_id}"
+
+    @property
+    def _dirty_key(self) -> str:
+        return f"{self.namespace}:dirty"
+
+    # ------------------------------------------------------------------
+    # Reservations
+    # ------------------------------------------------------------------
+
+    def reserve(self, db, developer_id: int) -> QuotaStatus:
+        """
+        Take one LLM call from the developer's quota
+
+        Only touches the database when the entry is missing or older than
+        sync_seconds. Developers without an active plan are not metered.
+        """
+        self._ensure_flusher()
+        status = self._reserve(developer_id)
+        if status is None:
+            self.sync(db, developer_id)
+            status = self._reserve(developer_id, fresh=True)
+        self.stats['reserved' if status.allowed else 'denied'] += 1
+        return status
+
+    def _reserve(self, developer_id: int, fresh: bool = False) -> Optional[QuotaStatus]:
+        now = time.time()
+        max_age = 1e12 if fresh else self.sync_seconds
+        redis_client = get_redis_client()
+        if redis_client:
+            code, used, total, reset_at = redis_client.eval(
+                _RESERVE_SCRIPT, 2, self._key(developer_id), self._dirty_key,
+                now, max_age, QUOTA_PERIOD_SECONDS, developer_id
+            )
+            return None if code == -1 else _status(code, used, total, reset_at)
+
+        with self._lock:
+            entry = self._entries.get(developer_id)
+            if entry is None or now - entry['synced_at'] > max_age:
+                return None
+            if entry['total'] == UNTRACKED:
+                return _status(2, 0, 0, 0)
+            if entry['reset_at'] and entry['reset_at'] < now:
+                entry['reset_at'] = entry['rollover'] = int(now) + QUOTA_PERIOD_SECONDS
+                entry['used'] = entry['pending'] = 0
+                self._dirty.add(developer_id)
+            if entry['used'] >= entry['total']:
+                return _status(0, entry['used'], entry['total'], entry['reset_at'])
+            entry['used'] += 1
+            entry['pending'] += 1
+            self._dirty.add(developer_id)
+            return _status(1, entry['used'], entry['total'], entry['reset_at'])
+
+    def release(self, developer_id: int):
+        """Give back a reservation whose LLM request failed"""
+        redis_client = get_redis_client()
+        if redis_client:
+            released = redis_client.eval(_RELEASE_SCRIPT, 2, self._key(developer_id), self._dirty_key, developer_id)
+        else:
+            with self._lock:
+                entry = self._entries.get(developer_id)
+                released = bool(entry and entry['total'] != UNTRACKED and entry['used'] > 0)
+                if released:
+                    entry['used'] -= 1
+                    entry['pending'] -= 1
+                    self._dirty.add(developer_id)
+        if released:
+            self.stats['released'] += 1
+
+    def get_usage(self, developer_id: int) -> Optional[QuotaStatus]:
+        """Ledger view of a developer's quota (None if not loaded or not metered)"""
+        redis_client = get_redis_client()
+        if redis_client:
+            total, used, reset_at = redis_client.hmget(self._key(developer_id), 'total', 'used', 'reset_at')
+        else:
+            with self._lock:
+                entry = self._entries.get(developer_id) or {}
+            total, used, reset_at = entry.get('total'), entry.get('used'), entry.get('reset_at')
+        if total is None or int(total) == UNTRACKED:
+            return None
+        return _status(1, used, total, reset_at)
+
+    # ------------------------------------------------------------------
+    # Reconciliation with UserPlan
+    # ------------------------------------------------------------------
+
+    def sync(self, db, developer_id: int):
+        """
+        (Re)load a developer's entry from the active UserPlan
+
+        Unflushed calls are kept on top of the database value; for the same
+        plan, used never decreases (another worker's flush may be in flight).
+        """
+        from core import models
+
+        plan = db.query(models.UserPlan).filter(
+            models.UserPlan.user_id == developer_id,
+            models.UserPlan.status == models.PlanStatus.ACTIVE
+        ).first()
+        total = plan.llm_quota_total if plan else UNTRACKED
+        db_used = plan.llm_quota_used if plan else 0
+        reset_at = int(plan.llm_quota_reset_at.timestamp()) if plan and plan.llm_quota_reset_at else 0
+        plan_id = plan.id if plan else 0
+        self.stats['syncs'] += 1
+
+        redis_client = get_redis_client()
+        if redis_client:
+            redis_client.eval(_SYNC_SCRIPT, 1, self._key(developer_id),
+                              total, db_used, reset_at, plan_id, time.time(), self.ttl)
+            return
+
+        with self._lock:
+            entry = self._entries.setdefault(developer_id, {'used': 0, 'pending': 0, 'plan_id': None})
+            used = db_used + entry['pending']
+            if entry.get('rollover'):
+                used, reset_at = entry['used'], entry['reset_at']
+            elif entry['plan_id'] == plan_id:
+                used = max(used, entry['used'])
+            entry.update(total=total, used=used, reset_at=reset_at, plan_id=plan_id, synced_at=time.time())
+
+    def invalidate(self, developer_id: int):
+        """Re-read the developer's plan on the next reservation (after a top-up or plan change)"""
+        redis_client = get_redis_client()
+        if redis_client:
+            if redis_client.exists(self._key(developer_id)):
+                redis_client.hset(self._key(developer_id), 'synced_at', 0)
+            return
+        with self._lock:
+            entry = self._entries.get(developer_id)
+            if entry:
+                entry['synced_at'] = 0
+
+    # ------------------------------------------------------------------
+    # Write-back
+    # ------------------------------------------------------------------
+
+    def flush(self) -> int:
+        """Write pending calls of every dirty developer to UserPlan, returns developers written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                taken = self._take()
+                if not taken:
+                    break
+                if not self._write(taken):
+                    self._restore(taken)
+                    break
+                written += len(taken)
+                self._settle(taken)
+        return written
+
+    def _take(self) -> Dict[int, Tuple[int, int, int]]:
+        """Atomically move up to LLM_QUOTA_FLUSH_BATCH developers' pending counts out of the ledger"""
+        taken = {}
+        redis_client = get_redis_client()
+        if redis_client:
+            developer_ids = [int(d) for d in redis_client.spop(self._dirty_key, LLM_QUOTA_FLUSH_BATCH) or []]
+            if not developer_ids:
+                return taken
+            pipe = redis_client.pipeline(transaction=False)
+            for developer_id in developer_ids:
+                pipe.eval(_TAKE_SCRIPT, 1, self._key(developer_id))
+            for developer_id, (pending, rollover, reset_at) in zip(developer_ids, pipe.execute()):
+                if pending or rollover:
+                    taken[developer_id] = (int(pending), int(rollover), int(reset_at))
+            return taken
+
+        with self._lock:
+            for developer_id in list(self._dirty)[:LLM_QUOTA_FLUSH_BATCH]:
+                self._dirty.discard(developer_id)
+                entry = self._entries.get(developer_id)
+                if not entry or not (entry['pending'] or entry.get('rollover')):
+                    continue
+                taken[developer_id] = (entry['pending'], entry.pop('rollover', 0) or 0, entry['reset_at'])
+                entry['pending'] = 0
+        return taken
+
+    def _write(self, taken: Dict[int, Tuple[int, int, int]]) -> bool:
+        from core import models
+
+        if self.session_factory is None:
+            from core.database import SessionLocal
+            self.session_factory = SessionLocal
+
+        db = self.session_factory()
+        try:
+            plans = {plan.user_id: plan for plan in db.query(models.UserPlan).filter(
+                models.UserPlan.user_id.in_(list(taken)),
+                models.UserPlan.status == models.PlanStatus.ACTIVE
+            ).all()}
+            for developer_id, (pending, rollover, _) in taken.items():
+                plan = plans.get(developer_id)
+                if plan is None:
+                    continue
+                if rollover:
+                    plan.llm_quota_used = max(pending, 0)
+                    plan.llm_quota_reset_at = datetime.fromtimestamp(rollover)
+                elif pending:
+                    plan.llm_quota_used = models.UserPlan.llm_quota_used + pending
+            db.commit()
+            self.stats['flushes'] += 1
+            self.stats['flushed'] += sum(pending for pending, _, _ in taken.values())
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Failed to write LLM quota usage of {len(taken)} developers: {e}")
+            return False
+        finally:
+            db.close()
+
+    def _restore(self, taken: Dict[int, Tuple[int, int, int]]):
+        redis_client = get_redis_client()
+        if redis_client:
+            pipe = redis_client.pipeline(transaction=False)
+            for developer_id, (pending, rollover, reset_at) in taken.items():
+                pipe.eval(_RESTORE_SCRIPT, 2, self._key(developer_id), self._dirty_key,
+                          pending, rollover, reset_at, developer_id)
+            pipe.execute()
+            return
+
+        with self._lock:
+            for developer_id, (pending, rollover, reset_at) in taken.items():
+                entry = self._entries.get(developer_id)
+                if not entry or entry['reset_at'] != reset_at:
+                    continue  # Rolled over meanwhile, the previous period is obsolete
+                entry['pending'] += pending
+                if rollover:
+                    entry['rollover'] = rollover
+                self._dirty.add(developer_id)
+
+    def _settle(self, taken: Dict[int, Tuple[int, int, int]]):
+        redis_client = get_redis_client()
+        if redis_client:
+            pipe = redis_client.pipeline(transaction=False)
+            for developer_id in taken:
+                pipe.eval(_SETTLE_SCRIPT, 1, self._key(developer_id), self.ttl)
+            pipe.execute()
+
+    def _ensure_flusher(self):
+        # Started lazily and again after fork (Celery prefork workers)
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='llm-quota-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"LLM quota flusher error: {e}")
+
+    def clear(self):
+        """Drop local entries without writing them back (used by tests)"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty.clear()
+
+
+_ledger: Optional[QuotaLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_quota_ledger() -> QuotaLedger:
+    """Process-wide LLM quota ledger"""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = QuotaLedger()
+                atexit.register(_ledger.flush)
+    return _ledger
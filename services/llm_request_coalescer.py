@@ -0,0 +1,203 @@
+"""
+LLM Request Coalescer
+Shares one provider request among identical market analyses
+
+Subscriptions of the same bot analyze the same symbol in the same scheduler
+tick. Each used to make its own provider request; the bot-scoped cache lock
+only serialized them.
+
+- analysis_request_key identifies what the provider would be asked: model,
+  last closed candles, indicator values and history, within a request scope
+  (bot, developer and provider credentials). Requests of different bots or
+  tenants are never shared: each is charged to its own quota and keys.
+- Requests are collected for LLM_COALESCE_WINDOW seconds on a dispatcher
+  event loop (one per process). Identical requests, in the window or while
+  one is in flight, share one future; distinct ones are sent concurrently,
+  at most LLM_COALESCE_MAX_CONCURRENCY at a time.
+- Each distinct request goes through the shared LLM cache single-flight, so
+  other workers asking the same thing wait for its published result instead
+  of calling the provider.
+- Results are fanned out as copies to every waiting task (callers run their
+  own short-lived event loops in worker threads).
+"""
+
+import os
+import copy
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+import concurrent.futures
+from collections import Counter
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Iterable
+
+from services.llm_cache import PROMPT_VERSION, get_llm_cache, market_state_key
+
+logger = logging.getLogger(__name__)
+
+LLM_COALESCE_REQUESTS = os.getenv('LLM_COALESCE_REQUESTS', 'true').lower() == 'true'
+LLM_COALESCE_WINDOW = float(os.getenv('LLM_COALESCE_WINDOW', 0.1))
+LLM_COALESCE_MAX_CONCURRENCY = int(os.getenv('LLM_COALESCE_MAX_CONCURRENCY', 16))
+LLM_COALESCE_TIMEOUT = float(os.getenv('LLM_COALESCE_TIMEOUT', 90.0))
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+def analysis_request_key(symbol: str, timeframes_data: Dict[str, List[Dict[str, Any]]], model: str,
+                         scope: Any, indicators_analysis: Optional[Dict[str, Dict[str, Any]]] = None,
+                         historical_transactions: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Identity of an analyze_market request across a bot's subscriptions
+
+    scope is any JSON-serializable description of who the request is sent
+    for (bot, developer, credentials, model names); indicators are compared
+    without their historical_data series.
+    """
+    indicators = {
+        timeframe: {k: v for k, v in values.items() if k != 'historical_data'}
+        for timeframe, values in (indicators_analysis or {}).items() if isinstance(values, dict)
+    }
+    market = market_state_key(symbol, timeframes_data, model, prompt_version=PROMPT_VERSION)
+    return (f"{market.replace('analysis:shared:', 'request:', 1)}:{_digest(scope)}:"
+            f"{_digest(indicators)}:{_digest(historical_transactions or [])}")
+
+
+class RequestCoalescer:
+    """
+    Collects analysis requests per process and dispatches each distinct one once
+
+    submit() is awaited from any thread's event loop; computes run on the
+    coalescer's own loop thread, started lazily and again after fork.
+    """
+
+    def __init__(self, window: float = LLM_COALESCE_WINDOW, max_concurrency: int = LLM_COALESCE_MAX_CONCURRENCY,
+                 timeout: float = LLM_COALESCE_TIMEOUT, cache=None):
+        self.window = window
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.cache = cache
+
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []  # Requests collected in the current window
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pid = None
+        self.stats = Counter()
+
+    async def submit(self, key: str, compute: Callable[[], Awaitable[Any]],
+                     timeframes: Optional[Iterable[str]] = None,
+                     cost_of: Optional[Callable[[Any], float]] = None,
+                     should_cache: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Result of compute() for `key`, shared with identical requests
+
+        Returns None when no result arrives within `timeout` or another worker
+        computing the key did not publish one (the caller falls back).
+        """
+        loop = self._ensure_loop()
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+                self._pending.append((key, future, compute, timeframes, cost_of, should_cache))
+                self.stats['dispatched'] += 1
+                start_window = len(self._pending) == 1
+            else:
+                self.stats['coalesced'] += 1
+                start_window = False
+                logger.info(f"🔗 Coalesced LLM request {key}")
+        if start_window:
+            asyncio.run_coroutine_threadsafe(self._dispatch(), loop)
+
+        try:
+            # shield: a waiter timing out must not cancel the request for the others
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            logger.warning(f"⏱️ Coalesced LLM request {key} timed out after {self.timeout}s")
+            return None
+        return copy.deepcopy(result)
+
+    async def _dispatch(self):
+        await asyncio.sleep(self.window)
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self.stats['batches'] += 1
+        if len(batch) > 1:
+            logger.info(f"📦 Dispatching {len(batch)} distinct LLM requests concurrently")
+        await asyncio.gather(*(self._run(*request) for request in batch))
+
+    async def _run(self, key, future, compute, timeframes, cost_of, should_cache):
+        try:
+            async with self._semaphore:
+                cache = self.cache or get_llm_cache()
+                result = await cache.aget_or_compute(
+                    key, compute, timeframes=timeframes, cost_of=cost_of, should_cache=should_cache
+                )
+        except BaseException as e:
+            self._finish(key, future)
+            future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self._finish(key, future)
+            future.set_result(result)
+
+    def _finish(self, key: str, future: concurrent.futures.Future):
+        # Before the result is set: a request arriving after its waiters resume starts a new call
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # Started lazily and again after fork (Celery prefork workers)
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return self._loop
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return self._loop
+            self._pid = os.getpid()
+            self._pending, self._inflight = [], {}  # The parent's requests never complete here
+            self._loop = asyncio.new_event_loop()
+            started = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(self._loop, started),
+                                            name='llm-request-coalescer', daemon=True)
+            self._thread.start()
+            started.wait()
+            return self._loop
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop, started: threading.Event):
+        asyncio.set_event_loop(loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop.call_soon(started.set)
+        loop.run_forever()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {name: self.stats.get(name, 0) for name in ('dispatched', 'coalesced', 'batches', 'timeouts')}
+            stats['inflight'] = len(self._inflight)
+        requests = stats['dispatched'] + stats['coalesced']
+        stats['coalesce_rate'] = round(stats['coalesced'] / requests, 4) if requests else 0.0
+        return stats
+
+
+_coalescer: Optional[RequestCoalescer] = None
+_coalescer_lock = threading.Lock()
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """Process-wide request coalescer (LLM_COALESCE_WINDOW, LLM_COALESCE_MAX_CONCURRENCY, LLM_COALESCE_TIMEOUT)"""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = RequestCoalescer()
+    return _coalescer
@@ -0,0 +1,249 @@
+"""
+LLM Response Parser
+Incremental JSON extraction for LLM outputs and compiled schemas for the
+objects the services expect back
+
+- JSONObjectScanner tracks brace depth and string state across streamed
+  chunks and yields each top-level {...} object as soon as its closing brace
+  arrives, ignoring markdown fences and prose around it
+- read_decision_stream stops consuming a provider stream (and closes it, which
+  cancels generation) at the first object that validates against the schema
+- parse_json_response is the non-streaming path: fenced block, then every
+  complete object in order, then a repaired truncated or trailing-comma object
+- Schemas are pydantic models (validators compiled once at import); values are
+  checked, not converted, so callers keep receiving the raw dict
+"""
+
+import os
+import re
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Iterable, Callable, Tuple, Type, Union
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+logger = logging.getLogger(__name__)
+
+LLM_STREAM_RESPONSES = os.getenv('LLM_STREAM_RESPONSES', 'true').lower() == 'true'
+
+_FENCE = re.compile(r"```(?:json)?\s*(\{.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+ACTIONS = ('BUY', 'SELL', 'HOLD')
+
+
+# ======================================================================
+# Schemas
+# ======================================================================
+
+def _as_number(value: Any) -> Optional[float]:
+    """Numeric value of 75, '75', '75%' or '2.5 %' (None for null / 'null')"""
+    if value is None or (isinstance(value, str) and value.strip().lower() in ('', 'null', 'none', 'n/a')):
+        return None
+    if isinstance(value, bool):
+        raise ValueError('boolean is not a number')
+    return float(str(value).replace('%', '').strip())
+
+
+class Recommendation(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    action: str
+    confidence: Optional[Union[float, str]] = None
+
+    @field_validator('action', mode='before')
+    @classmethod
+    def _action(cls, value):
+        action = str(value).strip().upper()
+        if action not in ACTIONS:
+            raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+        return action
+
+    @field_validator('confidence')
+    @classmethod
+    def _confidence(cls, value):
+        confidence = _as_number(value)
+        if confidence is not None and not 0 <= confidence <= 100:
+            raise ValueError('confidence must be between 0 and 100')
+        return value
+
+
+class TradingDecision(BaseModel):
+    """{"recommendation": {"action": ..., "confidence": ..., ...}} from the analysis prompts"""
+    model_config = ConfigDict(extra='allow')
+
+    recommendation: Recommendation
+
+
+class CapitalAdvice(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    recommended_size_pct: Optional[Union[float, str]] = None
+
+    @field_validator('recommended_size_pct')
+    @classmethod
+    def _size(cls, value):
+        size = _as_number(value)
+        if size is not None and not 0 <= size <= 100:
+            raise ValueError('recommended_size_pct must be between 0 and 100')
+        return value
+
+
+class CapitalManagementAdvice(BaseModel):
+    """Capital management prompt output; capital_advice is optional"""
+    model_config = ConfigDict(extra='allow')
+
+    capital_advice: Optional[CapitalAdvice] = None
+
+
+def validate(parsed: Dict[str, Any], schema: Optional[Type[BaseModel]]) -> Optional[str]:
+    """Schema error message, None if valid. Normalizes the decision action to upper case."""
+    if schema is None:
+        return None
+    try:
+        model = schema.model_validate(parsed)
+    except ValidationError as e:
+        return '; '.join(f"{'.'.join(str(p) for p in error['loc'])}: {error['msg']}" for error in e.errors())
+    if isinstance(model, TradingDecision):
+        parsed['recommendation']['action'] = model.recommendation.action
+    return None
+
+
+# ======================================================================
+# Incremental extraction
+# ======================================================================
+
+class JSONObjectScanner:
+    """Finds complete top-level JSON objects in text fed chunk by chunk"""
+
+    def __init__(self):
+        self.text = ''
+        self._pos = 0
+        self._start = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Append a chunk, returns the objects completed by it"""
+        self.text += chunk
+        completed = []
+        text = self.text
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+            if self._start is None:
+                if char == '{':
+                    self._start, self._stack = pos, ['}']
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._stack.append('}' if char == '{' else ']')
+            elif char in '}]':
+                if char != self._stack[-1]:
+                    self._start = None  # Not JSON after all, look for the next object
+                    continue
+                self._stack.pop()
+                if not self._stack:
+                    completed.append(text[self._start:pos + 1])
+                    self._start = None
+        self._pos = len(text)
+        return completed
+
+    def partial(self) -> Optional[str]:
+        """Unfinished object closed as far as possible (output cut by max_tokens)"""
+        if self._start is None:
+            return None
+        tail = self.text[self._start:].rstrip()
+        if self._in_string:
+            tail += '"'
+        tail = re.sub(r'[,:]\s*$', '', tail)
+        return tail + ''.join(reversed(self._stack))
+
+
+def _loads(candidate: str) -> Optional[Dict[str, Any]]:
+    for text in (candidate, _TRAILING_COMMA.sub(r'\1', candidate)):
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            continue
+        return parsed if isinstance(parsed, dict) else None
+    return None
+
+
+def parse_json_response(response: str, schema: Optional[Type[BaseModel]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    First JSON object in a complete LLM response that parses (and validates)
+
+    Returns (object, None) or (None, error message).
+    """
+    if '{' not in (response or ''):
+        return None, "No JSON found in response"
+
+    scanner = JSONObjectScanner()
+    candidates = [match.group(1).strip() for match in _FENCE.finditer(response)]
+    candidates += scanner.feed(response)
+    partial = scanner.partial()
+    if partial:
+        candidates.append(partial)
+
+    error = "Parse error: no complete JSON object"
+    for candidate in candidates:
+        parsed = _loads(candidate)
+        if parsed is None:
+            continue
+        schema_error = validate(parsed, schema)
+        if schema_error is None:
+            return parsed, None
+        error = f"Schema validation failed: {schema_error}"
+    return None, error
+
+
+@dataclass
+class StreamResult:
+    text: str
+    parsed: Optional[Dict[str, Any]]
+    error: Optional[str]
+    stopped_early: bool
+
+
+def read_decision_stream(chunks: Iterable[str], schema: Optional[Type[BaseModel]] = None,
+                         close: Optional[Callable[[], None]] = None,
+                         cancelled: Optional[Callable[[], bool]] = None) -> StreamResult:
+    """
+    Consume streamed text until the first object that validates
+
+    The stream is closed right away (the provider stops generating); text
+    after the object is never requested. A stream that ends without a valid
+    object falls back to parse_json_response on everything received.
+    cancelled is polled between chunks (a hedged request that lost the race).
+    """
+    scanner = JSONObjectScanner()
+    iterator = iter(chunks)
+    try:
+        for chunk in iterator:
+            if cancelled and cancelled():
+                return StreamResult(scanner.text, None, "Request cancelled", stopped_early=True)
+            for candidate in scanner.feed(chunk or ''):
+                parsed = _loads(candidate)
+                if parsed is not None and validate(parsed, schema) is None:
+                    return StreamResult(scanner.text, parsed, None, stopped_early=True)
+    finally:
+        try:
+            if close:
+                close()
+            elif hasattr(iterator, 'close'):
+                iterator.close()
+        except Exception as e:
+            logger.debug(f"Closing LLM stream failed: {e}")
+
+    parsed, error = parse_json_response(scanner.text, schema)
+    return StreamResult(scanner.text, parsed, error, stopped_early=False)
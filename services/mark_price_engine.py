@@ -0,0 +1,292 @@
+"""
+Mark-Price TP/SL Engine
+Detects TP/SL crossings from one mark-price stream per symbol instead of
+polling every open position over REST
+
+- Interval index: each open position is the price interval between its lower
+  and upper exit levels (LONG: SL..TP, SHORT: TP..SL). Per symbol the lower and
+  upper bounds are kept in sorted lists, so a tick finds every crossed position
+  with two bisects
+- Feeds push (symbol, price) ticks into the engine: BinanceMarkPriceStream
+  (combined websocket, one markPrice stream per symbol with open positions) or
+  ReplayFeed (recorded ticks, used by tests and for local replays)
+- A crossed position is removed from the index before its handler runs, so a
+  level fires exactly once
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Callable, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+BINANCE_FUTURES_WS = "wss://fstream.binance.com/stream"
+BINANCE_FUTURES_TESTNET_WS = "wss://stream.binancefuture.com/stream"
+
+
+@dataclass
+class PriceTrigger:
+    """A TP/SL level crossed by the mark price"""
+    transaction_id: int
+    symbol: str
+    reason: str  # TP_HIT or SL_HIT
+    price: float
+    level: float
+    timestamp: float
+
+
+@dataclass
+class _Levels:
+    symbol: str
+    position_side: str
+    lower: Optional[float]
+    upper: Optional[float]
+    lower_reason: str
+    upper_reason: str
+
+
+def normalize_symbol(symbol: str) -> str:
+    return (symbol or '').replace('/', '').upper()
+
+
+class MarkPriceEngine:
+    """In-memory TP/SL index fed by mark-price ticks"""
+
+    def __init__(self, on_trigger: Optional[Callable[[PriceTrigger], Any]] = None):
+        self.on_trigger = on_trigger
+        self._positions: Dict[int, _Levels] = {}
+        self._lowers: Dict[str, List[Tuple[float, int]]] = {}
+        self._uppers: Dict[str, List[Tuple[float, int]]] = {}
+        self._lock = threading.Lock()
+        self.last_prices: Dict[str, float] = {}
+        self.stats = {'ticks': 0, 'triggers': 0}
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def add_position(self, transaction_id: int, symbol: str, position_side: str,
+                     take_profit: Optional[float], stop_loss: Optional[float]) -> bool:
+        """
+        Index the exit levels of an open position (replaces previous levels)
+
+        Same semantics as PositionMonitor.check_tp_sl_hit: LONG exits at
+        price >= TP or price <= SL, SHORT at price <= TP or price >= SL.
+        Returns False when the position has neither level.
+        """
+        take_profit = float(take_profit) if take_profit else None
+        stop_loss = float(stop_loss) if stop_loss else None
+        if (position_side or 'LONG') == 'LONG':
+            levels = _Levels(normalize_symbol(symbol), 'LONG', stop_loss, take_profit, 'SL_HIT', 'TP_HIT')
+        else:
+            levels = _Levels(normalize_symbol(symbol), 'SHORT', take_profit, stop_loss, 'TP_HIT', 'SL_HIT')
+
+        with self._lock:
+            self._remove(transaction_id)
+            if levels.lower is None and levels.upper is None:
+                return False
+            self._positions[transaction_id] = levels
+            if levels.lower is not None:
+                insort(self._lowers.setdefault(levels.symbol, []), (levels.lower, transaction_id))
+            if levels.upper is not None:
+                insort(self._uppers.setdefault(levels.symbol, []), (levels.upper, transaction_id))
+        return True
+
+    def add_transaction(self, transaction) -> bool:
+        """Index a models.Transaction"""
+        return self.add_position(
+            transaction.id, transaction.symbol, transaction.position_side or 'LONG',
+            transaction.take_profit, transaction.stop_loss
+        )
+
+    def load_transactions(self, transactions: Iterable[Any]) -> int:
+        """Replace the index with the given open transactions, returns the indexed count"""
+        with self._lock:
+            self._positions.clear()
+            self._lowers.clear()
+            self._uppers.clear()
+        return sum(1 for transaction in transactions if self.add_transaction(transaction))
+
+    def remove_position(self, transaction_id: int):
+        with self._lock:
+            self._remove(transaction_id)
+
+    def _remove(self, transaction_id: int):
+        levels = self._positions.pop(transaction_id, None)
+        if levels is None:
+            return
+        for index, bound in ((self._lowers, levels.lower), (self._uppers, levels.upper)):
+            if bound is None:
+                continue
+            entries = index.get(levels.symbol, [])
+            i = bisect_left(entries, (bound, transaction_id))
+            if i < len(entries) and entries[i] == (bound, transaction_id):
+                del entries[i]
+            if not entries:
+                index.pop(levels.symbol, None)
+
+    def symbols(self) -> List[str]:
+        """Symbols with at least one indexed position"""
+        with self._lock:
+            return sorted({levels.symbol for levels in self._positions.values()})
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    # ------------------------------------------------------------------
+    # Ticks
+    # ------------------------------------------------------------------
+
+    def on_price(self, symbol: str, price: float, timestamp: Optional[float] = None) -> List[PriceTrigger]:
+        """Apply one mark-price tick, fire and return the crossed levels"""
+        symbol = normalize_symbol(symbol)
+        price = float(price)
+        timestamp = time.time() if timestamp is None else timestamp
+        triggers = []
+        with self._lock:
+            self.stats['ticks'] += 1
+            self.last_prices[symbol] = price
+
+            lowers = self._lowers.get(symbol, [])
+            uppers = self._uppers.get(symbol, [])
+            # price <= lower bound: every bound from the first one >= price
+            crossed = [(entry, 'lower') for entry in lowers[bisect_left(lowers, (price, -1)):]]
+            # price >= upper bound: every bound up to the last one <= price
+            crossed += [(entry, 'upper') for entry in uppers[:bisect_right(uppers, (price, float('inf')))]]
+
+            for (level, transaction_id), side in crossed:
+                levels = self._positions.get(transaction_id)
+                if levels is None:
+                    continue  # Already fired through the other bound
+                reason = levels.lower_reason if side == 'lower' else levels.upper_reason
+                triggers.append(PriceTrigger(transaction_id, symbol, reason, price, level, timestamp))
+                self._remove(transaction_id)
+            self.stats['triggers'] += len(triggers)
+
+        for trigger in triggers:
+            if self.on_trigger:
+                try:
+                    self.on_trigger(trigger)
+                except Exception as e:
+                    logger.error(f"TP/SL handler failed for transaction {trigger.transaction_id}: {e}")
+        return triggers
+
+
+# ======================================================================
+# Feeds
+# ======================================================================
+
+class ReplayFeed:
+    """
+    Recorded mark-price ticks replayed into an engine
+
+    Ticks are (timestamp, symbol, price) tuples or dicts with those keys, or a
+    JSONL file of such dicts. `speed` > 0 replays with the recorded spacing
+    divided by `speed`; the default replays as fast as possible.
+    """
+
+    def __init__(self, ticks: Iterable[Any] = None, path: str = None, speed: float = 0.0):
+        self.ticks = ticks
+        self.path = path
+        self.speed = speed
+
+    def _iter_ticks(self):
+        if self.path:
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        else:
+            yield from self.ticks or []
+
+    async def run(self, engine: MarkPriceEngine, stop_event: Optional[asyncio.Event] = None):
+        previous = None
+        for tick in self._iter_ticks():
+            if stop_event and stop_event.is_set():
+                break
+            if isinstance(tick, dict):
+                timestamp, symbol, price = tick['timestamp'], tick['symbol'], tick['price']
+            else:
+                timestamp, symbol, price = tick
+            if self.speed > 0 and previous is not None:
+                await asyncio.sleep(max(timestamp - previous, 0) / self.speed)
+            previous = timestamp
+            engine.on_price(symbol, price, timestamp)
+            await asyncio.sleep(0)
+
+
+class BinanceMarkPriceStream:
+    """
+    Binance USDⓈ-M combined mark-price stream (<symbol>@markPrice@1s)
+
+    Subscribes once per symbol that has indexed positions and follows the
+    engine's symbol set while running (SUBSCRIBE / UNSUBSCRIBE on the open
+    connection). Reconnects with exponential backoff.
+    """
+
+    def __init__(self, testnet: bool = False, resubscribe_interval: float = 5.0, max_backoff: float = 60.0):
+        self.url = BINANCE_FUTURES_TESTNET_WS if testnet else BINANCE_FUTURES_WS
+        self.resubscribe_interval = resubscribe_interval
+        self.max_backoff = max_backoff
+        self.subscribed: set = set()
+        self._request_id = 0
+
+    @staticmethod
+    def stream_name(symbol: str) -> str:
+        return f"{normalize_symbol(symbol).lower()}@markPrice@1s"
+
+    @staticmethod
+    def parse_message(raw: str) -> Optional[Tuple[str, float, float]]:
+        """(symbol, mark price, event time in seconds) of a markPriceUpdate, else None"""
+        message = json.loads(raw)
+        data = message.get('data', message)
+        if not isinstance(data, dict) or data.get('e') != 'markPriceUpdate':
+            return None
+        return data['s'], float(data['p']), data.get('E', time.time() * 1000) / 1000
+
+    async def _sync_subscriptions(self, websocket, engine: MarkPriceEngine):
+        wanted = {self.stream_name(symbol) for symbol in engine.symbols()}
+        for method, streams in (('SUBSCRIBE', wanted - self.subscribed), ('UNSUBSCRIBE', self.subscribed - wanted)):
+            if streams:
+                self._request_id += 1
+                await websocket.send(json.dumps({'method': method, 'params': sorted(streams), 'id': self._request_id}))
+        self.subscribed = wanted
+
+    async def run(self, engine: MarkPriceEngine, stop_event: Optional[asyncio.Event] = None):
+        import websockets
+
+        stop_event = stop_event or asyncio.Event()
+        backoff = 1.0
+        while not stop_event.is_set():
+            try:
+                async with websockets.connect(self.url, ping_interval=20) as websocket:
+                    self.subscribed = set()
+                    await self._sync_subscriptions(websocket, engine)
+                    logger.info(f"📡 Mark-price stream connected ({len(self.subscribed)} symbols)")
+                    backoff = 1.0
+                    next_sync = time.monotonic() + self.resubscribe_interval
+                    while not stop_event.is_set():
+                        try:
+                            raw = await asyncio.wait_for(websocket.recv(), timeout=self.resubscribe_interval)
+                            tick = self.parse_message(raw)
+                            if tick:
+                                engine.on_price(*tick)
+                        except asyncio.TimeoutError:
+                            pass
+                        if time.monotonic() >= next_sync:
+                            await self._sync_subscriptions(websocket, engine)
+                            next_sync = time.monotonic() + self.resubscribe_interval
+            except Exception as e:
+                if stop_event.is_set():
+                    break
+                logger.warning(f"Mark-price stream disconnected: {e}, reconnecting in {backoff:.0f}s")
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=backoff)
+                except asyncio.TimeoutError:
+                    pass
+                backoff = min(backoff * 2, self.max_backoff)
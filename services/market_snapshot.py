@@ -0,0 +1,288 @@
+"""
+Market Snapshot Fan-out
+Groups due subscriptions by market so data crawling and analysis run once per
+market per tick instead of once per subscription
+
+Stage 1 (build_market_snapshot task): one subscription of the group crawls the
+multi-timeframe data and runs the bot's analysis; the result is stored here.
+Stage 2 (run_bot_logic per subscription): the advanced workflow picks the
+snapshot up and only does account checks, risk/capital management and order
+execution.
+
+A market is (bot, exchange, network, symbol, timeframes). The bot is part of
+the key because analysis depends on the bot's indicator configuration. Work
+below the analysis is shared across bots already: raw candle fetches by the
+kline cache, and streamed indicator values (SMA, EMA, RSI, MACD, ATR, ADX,
+Bollinger) by the incremental indicator state, which is keyed per
+(exchange, network, symbol, timeframe, indicator parameters).
+
+Snapshots live in Redis (process-local dict when Redis is unavailable) for
+MARKET_SNAPSHOT_TTL seconds, so a subscription that runs off-tick falls back to
+the normal crawl/analyze path. They are stored as JSON; DataFrames, Series,
+timestamps and numpy values are tagged so they load back with their types.
+
+A build that finds the market locked by another build re-queues its
+subscriptions every MARKET_SNAPSHOT_LOCK_POLL seconds, for at most
+MARKET_SNAPSHOT_LOCK_WAIT seconds, until the other build's snapshot is stored.
+"""
+
+import io
+import os
+import json
+import time
+import logging
+import threading
+from datetime import date, datetime
+from collections import Counter
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TTL = int(os.getenv('MARKET_SNAPSHOT_TTL', 120))
+SNAPSHOT_LOCK_WAIT = float(os.getenv('MARKET_SNAPSHOT_LOCK_WAIT', 60))
+SNAPSHOT_LOCK_POLL = float(os.getenv('MARKET_SNAPSHOT_LOCK_POLL', 5))
+METRICS_KEY = 'market_snapshot:metrics'
+
+_local_snapshots: Dict[str, Tuple[float, str]] = {}
+_local_metrics: Counter = Counter()
+_local_lock = threading.Lock()
+
+
+# ======================================================================
+# Market identity
+# ======================================================================
+
+def market_key(bot_id: int, exchange: str, testnet: bool, trading_pair: str,
+               timeframes: Iterable[str]) -> str:
+    """Stable identifier of the market a subscription trades on"""
+    network = 'testnet' if testnet else 'mainnet'
+    symbol = (trading_pair or '').replace('/', '').upper()
+    return f"{bot_id}:{(exchange or 'BINANCE').upper()}:{network}:{symbol}:{','.join(timeframes)}"
+
+
+def subscription_market(subscription) -> Dict[str, Any]:
+    """
+    Exchange, network, trading pair and timeframes of a subscription
+
+    Mirrors the resolution done in run_bot_logic so the scheduler and the
+    per-subscription task agree on the market key.
+    """
+    bot = subscription.bot
+    exchange_type = getattr(bot, 'exchange_type', None)
+    exchange = getattr(exchange_type, 'value', exchange_type) or 'BINANCE'
+
+    testnet = getattr(subscription, 'is_testnet', True)
+    if getattr(subscription, 'is_trial', False):
+        testnet = True
+
+    trading_pair = subscription.trading_pair or bot.trading_pair or 'BTC/USDT'
+
+    primary_timeframe = bot.timeframe
+    extra_timeframes = bot.timeframes or []
+    if primary_timeframe:
+        timeframes = [primary_timeframe] + [tf for tf in extra_timeframes if tf != primary_timeframe]
+    else:
+        timeframes = extra_timeframes if extra_timeframes else ['1h']
+
+    return {
+        'exchange_type': str(exchange).upper(),
+        'is_testnet': bool(testnet),
+        'trading_pair': trading_pair,
+        'timeframe': primary_timeframe,
+        'timeframes': timeframes
+    }
+
+
+def group_by_market(subscriptions: Iterable[Any]) -> Dict[str, List[int]]:
+    """{market_key: [subscription_id, ...]} preserving scheduling order"""
+    groups: Dict[str, List[int]] = {}
+    for subscription in subscriptions:
+        market = subscription_market(subscription)
+        key = market_key(
+            subscription.bot_id, market['exchange_type'], market['is_testnet'],
+            market['trading_pair'], market['timeframes']
+        )
+        groups.setdefault(key, []).append(subscription.id)
+    return groups
+
+
+# ======================================================================
+# Snapshot storage
+# ======================================================================
+
+def _snapshot_key(key: str) -> str:
+    return f"market_snapshot:{key}"
+
+
+def _encode(value: Any) -> Any:
+    """JSON-ready copy of a snapshot value, typed values tagged for _decode"""
+    if isinstance(value, pd.DataFrame):
+        return {'__dataframe__': value.to_json(orient='table', date_unit='ns'),
+                'dtypes': [str(dtype) for dtype in value.dtypes], 'index_dtype': str(value.index.dtype)}
+    if isinstance(value, pd.Series):
+        return {'__series__': _encode(value.to_frame(name='values')), 'name': _encode(value.name)}
+    if isinstance(value, pd.Timestamp):
+        return {'__timestamp__': value.isoformat()}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, np.ndarray):
+        return {'__ndarray__': _encode(value.tolist()), 'dtype': str(value.dtype)}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: _encode(v) for k, v in value.items()}
+        return {'__items__': [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    """json object_hook reversing _encode's tags"""
+    if '__dataframe__' in obj:
+        frame = pd.read_json(io.StringIO(obj['__dataframe__']), orient='table')
+        if len(frame.columns) == len(obj['dtypes']):
+            # Same dtypes as stored (read_json comes back with microsecond datetimes)
+            frame = frame.astype(dict(zip(frame.columns, obj['dtypes'])))
+        if str(frame.index.dtype) != obj['index_dtype']:
+            frame.index = frame.index.astype(obj['index_dtype'])
+        return frame
+    if '__series__' in obj:
+        return obj['__series__']['values'].rename(obj['name'])
+    if '__timestamp__' in obj:
+        return pd.Timestamp(obj['__timestamp__'])
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    if '__date__' in obj:
+        return date.fromisoformat(obj['__date__'])
+    if '__ndarray__' in obj:
+        return np.array(obj['__ndarray__'], dtype=obj['dtype'])
+    if '__items__' in obj:
+        return {k: v for k, v in obj['__items__']}
+    if '__tuple__' in obj:
+        return tuple(obj['__tuple__'])
+    return obj
+
+
+def store_snapshot(key: str, data: Dict[str, Any], analysis: Dict[str, Any]):
+    """Store crawled data and analysis for one market"""
+    payload = json.dumps(_encode({'data': data, 'analysis': analysis, 'created_at': time.time()}))
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            redis_client.setex(_snapshot_key(key), SNAPSHOT_TTL, payload)
+            return
+        except Exception as e:
+            logger.warning(f"Market snapshot Redis write failed: {e}")
+    with _local_lock:
+        _local_snapshots[key] = (time.time() + SNAPSHOT_TTL, payload)
+
+
+def load_snapshot(key: str) -> Optional[Dict[str, Any]]:
+    """Snapshot {'data', 'analysis', 'created_at'} or None when missing/expired"""
+    payload = None
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            payload = redis_client.get(_snapshot_key(key))
+        except Exception as e:
+            logger.warning(f"Market snapshot Redis read failed: {e}")
+    if payload is None:
+        with _local_lock:
+            entry = _local_snapshots.get(key)
+            if entry and entry[0] > time.time():
+                payload = entry[1]
+            elif entry:
+                del _local_snapshots[key]
+    if payload is None:
+        return None
+    try:
+        return json.loads(payload, object_hook=_decode)
+    except Exception as e:
+        logger.warning(f"Discarding unreadable market snapshot {key}: {e}")
+        return None
+
+
+def clear_local_snapshots():
+    """Drop process-local snapshots and metrics (used by tests)"""
+    with _local_lock:
+        _local_snapshots.clear()
+        _local_metrics.clear()
+
+
+# ======================================================================
+# Metrics
+# ======================================================================
+
+def record_metrics(**counts: int):
+    """Increment fan-out counters (Redis hash shared by all workers)"""
+    counts = {name: value for name, value in counts.items() if value}
+    if not counts:
+        return
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            for name, value in counts.items():
+                pipe.hincrby(METRICS_KEY, name, value)
+            pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"Market snapshot metrics write failed: {e}")
+    with _local_lock:
+        _local_metrics.update(counts)
+
+
+def record_fanout(groups: Dict[str, List[int]]):
+    """Record one scheduler tick: markets vs subscriptions dispatched"""
+    subscriptions = sum(len(ids) for ids in groups.values())
+    record_metrics(
+        ticks=1,
+        markets=len(groups),
+        subscriptions=subscriptions,
+        shared_markets=sum(1 for ids in groups.values() if len(ids) > 1)
+    )
+
+
+def get_fanout_metrics() -> Dict[str, Any]:
+    """
+    Fan-out counters since Redis was last flushed
+
+    Each built snapshot costs one crawl and analysis, so the work avoided is
+    snapshot_hits - snapshots_built. snapshot_misses counts subscriptions in a
+    shared market that still had to crawl (snapshot expired, build failed or a
+    secondary pair was selected).
+    """
+    metrics: Dict[str, int] = {}
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            metrics = {name: int(value) for name, value in redis_client.hgetall(METRICS_KEY).items()}
+        except Exception as e:
+            logger.warning(f"Market snapshot metrics read failed: {e}")
+    if not metrics:
+        with _local_lock:
+            metrics = dict(_local_metrics)
+
+    for name in ('ticks', 'markets', 'subscriptions', 'shared_markets',
+                 'snapshots_built', 'snapshot_failures', 'snapshot_hits', 'snapshot_misses'):
+        metrics.setdefault(name, 0)
+
+    avoided = max(metrics['snapshot_hits'] - metrics['snapshots_built'], 0)
+    metrics['fetches_avoided'] = avoided
+    metrics['analyses_avoided'] = avoided
+    served = metrics['snapshot_hits'] + metrics['snapshot_misses']
+    metrics['snapshot_hit_rate'] = round(metrics['snapshot_hits'] / served, 4) if served else 0.0
+    return metrics
@@ -0,0 +1,246 @@
+"""
+Performance Aggregates
+Running per-bot and per-prompt statistics over closed trades, updated in O(1)
+from each closed trade instead of re-reading the full trade history
+
+Each close is folded into the 'bot' and 'prompt' rows of performance_aggregates
+(counts, P&L sums and sum of squares, drawdown state, exit reasons, RR and
+slippage sums). Transaction.metrics_applied_at marks trades already folded in,
+so a retried task or a close that races a rebuild is never counted twice.
+
+rebuild_aggregate recomputes one row from the trade history and is run
+periodically (rebuild_performance_aggregates task) to correct drift, and
+lazily the first time a scope is seen.
+"""
+
+import math
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from core import models
+
+logger = logging.getLogger(__name__)
+
+BOT = 'bot'
+PROMPT = 'prompt'
+
+_SCOPE_COLUMNS = {
+    BOT: models.Transaction.bot_id,
+    PROMPT: models.Transaction.prompt_id,
+}
+
+_COUNTERS = (
+    'total_trades', 'winning_trades', 'pnl_sum', 'pnl_sq_sum', 'win_pnl_sum', 'loss_pnl_sum',
+    'tp_hits', 'sl_hits', 'manual_exits', 'planned_rr_sum', 'actual_rr_sum',
+    'slippage_trades', 'slippage_sum', 'equity', 'equity_peak', 'max_drawdown',
+)
+
+
+def _scope_ids(transaction) -> Dict[str, int]:
+    return {scope: getattr(transaction, column.key) for scope, column in _SCOPE_COLUMNS.items()
+            if getattr(transaction, column.key)}
+
+
+def _fold(aggregate: models.PerformanceAggregate, transaction):
+    """Add one closed trade to the running aggregates"""
+    pnl = float(transaction.pnl_usd or 0)
+    aggregate.total_trades += 1
+    aggregate.pnl_sum += pnl
+    aggregate.pnl_sq_sum += pnl * pnl
+    if transaction.is_winning:
+        aggregate.winning_trades += 1
+        aggregate.win_pnl_sum += pnl
+    else:
+        aggregate.loss_pnl_sum += pnl
+
+    if transaction.exit_reason == 'TP_HIT':
+        aggregate.tp_hits += 1
+    elif transaction.exit_reason == 'SL_HIT':
+        aggregate.sl_hits += 1
+    elif transaction.exit_reason == 'MANUAL':
+        aggregate.manual_exits += 1
+    aggregate.planned_rr_sum += float(transaction.risk_reward_ratio or 0)
+    aggregate.actual_rr_sum += float(transaction.actual_rr_ratio or 0)
+    if transaction.slippage:
+        aggregate.slippage_trades += 1
+        aggregate.slippage_sum += float(transaction.slippage)
+
+    aggregate.equity += pnl
+    aggregate.equity_peak = max(aggregate.equity_peak, aggregate.equity)
+    aggregate.max_drawdown = max(aggregate.max_drawdown, aggregate.equity_peak - aggregate.equity)
+
+
+def _empty(scope: str, scope_id: int) -> models.PerformanceAggregate:
+    aggregate = models.PerformanceAggregate(scope=scope, scope_id=scope_id)
+    for column in _COUNTERS:
+        setattr(aggregate, column, 0)
+    return aggregate
+
+
+def _locked_aggregate(db: Session, scope: str, scope_id: int) -> Optional[models.PerformanceAggregate]:
+    return db.query(models.PerformanceAggregate).filter(
+        models.PerformanceAggregate.scope == scope,
+        models.PerformanceAggregate.scope_id == scope_id
+    ).with_for_update().first()
+
+
+def apply_closed_trade(db: Session, transaction_id: int) -> bool:
+    """
+    Fold one closed trade into its bot and prompt aggregates
+
+    Returns False when the trade is not closed or was already applied (by an
+    earlier run or a rebuild). Scopes without an aggregate row yet are built
+    from the full history, which already includes this trade.
+    """
+    claimed = db.query(models.Transaction).filter(
+        models.Transaction.id == transaction_id,
+        models.Transaction.status == 'CLOSED',
+        models.Transaction.metrics_applied_at.is_(None)
+    ).update({models.Transaction.metrics_applied_at: datetime.now()}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        return False
+
+    transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).one()
+    for scope, scope_id in _scope_ids(transaction).items():
+        aggregate = _locked_aggregate(db, scope, scope_id)
+        if aggregate is None:
+            rebuild_aggregate(db, scope, scope_id, commit=False)
+        else:
+            _fold(aggregate, transaction)
+    db.commit()
+    return True
+
+
+def rebuild_aggregate(db: Session, scope: str, scope_id: int, commit: bool = True) -> models.PerformanceAggregate:
+    """
+    Recompute one aggregate from the closed-trade history
+
+    Unapplied closed trades are claimed first, then everything claimed is
+    re-aggregated; a trade that closes meanwhile stays unclaimed and is applied
+    by its own close. Counts and sums come from one SQL aggregate, the
+    drawdown state from streaming P&L in close order.
+    """
+    tx = models.Transaction
+    scope_filter = (_SCOPE_COLUMNS[scope] == scope_id, tx.status == 'CLOSED')
+
+    # Claim before locking the aggregate row: same lock order as apply_closed_trade
+    db.query(tx).filter(*scope_filter, tx.metrics_applied_at.is_(None)).update(
+        {tx.metrics_applied_at: datetime.now()}, synchronize_session=False
+    )
+    aggregate = _locked_aggregate(db, scope, scope_id)
+    if aggregate is None:
+        aggregate = _empty(scope, scope_id)
+        db.add(aggregate)
+    applied = (*scope_filter, tx.metrics_applied_at.isnot(None))
+
+    pnl = func.coalesce(tx.pnl_usd, 0)
+    winning = tx.is_winning == True
+    totals = db.query(
+        func.count(tx.id),
+        func.sum(case((winning, 1), else_=0)),
+        func.sum(pnl),
+        func.sum(pnl * pnl),
+        func.sum(case((winning, pnl), else_=0)),
+        func.sum(case((winning, 0), else_=pnl)),
+        func.sum(case((tx.exit_reason == 'TP_HIT', 1), else_=0)),
+        func.sum(case((tx.exit_reason == 'SL_HIT', 1), else_=0)),
+        func.sum(case((tx.exit_reason == 'MANUAL', 1), else_=0)),
+        func.sum(func.coalesce(tx.risk_reward_ratio, 0)),
+        func.sum(func.coalesce(tx.actual_rr_ratio, 0)),
+        func.sum(case((func.coalesce(tx.slippage, 0) != 0, 1), else_=0)),
+        func.sum(func.coalesce(tx.slippage, 0)),
+    ).filter(*applied).one()
+    for column, value in zip(_COUNTERS, totals):
+        setattr(aggregate, column, value or 0)
+
+    equity = peak = drawdown = 0.0
+    for (trade_pnl,) in db.query(tx.pnl_usd).filter(*applied).order_by(tx.exit_time, tx.id).yield_per(10000):
+        equity += float(trade_pnl or 0)
+        peak = max(peak, equity)
+        drawdown = max(drawdown, peak - equity)
+    aggregate.equity, aggregate.equity_peak, aggregate.max_drawdown = equity, peak, drawdown
+    aggregate.rebuilt_at = datetime.now()
+
+    if commit:
+        db.commit()
+    return aggregate
+
+
+def get_aggregate(db: Session, scope: str, scope_id: int) -> Optional[models.PerformanceAggregate]:
+    """Current aggregate of a scope, built from history on first access"""
+    aggregate = db.query(models.PerformanceAggregate).filter(
+        models.PerformanceAggregate.scope == scope,
+        models.PerformanceAggregate.scope_id == scope_id
+    ).first()
+    if aggregate is None:
+        aggregate = rebuild_aggregate(db, scope, scope_id)
+    return aggregate if aggregate.total_trades else None
+
+
+def rebuild_all(db: Session) -> Dict[str, int]:
+    """Rebuild every bot and prompt aggregate that has closed trades"""
+    rebuilt = {}
+    for scope, column in _SCOPE_COLUMNS.items():
+        scope_ids = [row[0] for row in db.query(column).filter(
+            column.isnot(None), models.Transaction.status == 'CLOSED'
+        ).distinct().all()]
+        for scope_id in scope_ids:
+            try:
+                rebuild_aggregate(db, scope, scope_id)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Failed to rebuild {scope} {scope_id} performance aggregate: {e}")
+        rebuilt[scope] = len(scope_ids)
+    return rebuilt
+
+
+# ======================================================================
+# Derived metrics
+# ======================================================================
+
+def trade_metrics(aggregate: models.PerformanceAggregate) -> Dict[str, Any]:
+    """Win rate, P&L averages, profit factor, P&L deviation and drawdown"""
+    total = aggregate.total_trades
+    winning = aggregate.winning_trades
+    losing = total - winning
+    avg_win = aggregate.win_pnl_sum / winning if winning else 0
+    avg_loss = aggregate.loss_pnl_sum / losing if losing else 0
+    mean = aggregate.pnl_sum / total if total else 0
+    variance = max(aggregate.pnl_sq_sum / total - mean * mean, 0) if total else 0
+    return {
+        'total_trades': total,
+        'winning_trades': winning,
+        'losing_trades': losing,
+        'win_rate': round(winning / total * 100, 2) if total else 0,
+        'total_pnl': round(aggregate.pnl_sum, 2),
+        'avg_pnl': round(mean, 2),
+        'avg_win': round(avg_win, 2),
+        'avg_loss': round(avg_loss, 2),
+        'profit_factor': round(abs(aggregate.win_pnl_sum / aggregate.loss_pnl_sum), 2)
+        if losing and avg_loss != 0 else 0,
+        'pnl_stddev': round(math.sqrt(variance), 2),
+        'max_drawdown': round(aggregate.max_drawdown, 2),
+    }
+
+
+def risk_metrics(aggregate: models.PerformanceAggregate) -> Dict[str, Any]:
+    """Exit reason rates, RR achievement and slippage"""
+    total = aggregate.total_trades
+    avg_planned_rr = aggregate.planned_rr_sum / total
+    avg_actual_rr = aggregate.actual_rr_sum / total
+    return {
+        'total_trades': total,
+        'tp_hit_rate': round(aggregate.tp_hits / total * 100, 2),
+        'sl_hit_rate': round(aggregate.sl_hits / total * 100, 2),
+        'manual_exit_rate': round(aggregate.manual_exits / total * 100, 2),
+        'avg_planned_rr': round(avg_planned_rr, 2),
+        'avg_actual_rr': round(avg_actual_rr, 2),
+        'rr_achievement_rate': round(avg_actual_rr / avg_planned_rr * 100, 2) if avg_planned_rr > 0 else 0,
+        'avg_slippage': round(aggregate.slippage_sum / aggregate.slippage_trades, 4)
+        if aggregate.slippage_trades else 0,
+    }
@@ -2,8 +2,15 @@
 """
 Position Monitor Service
 Monitors open positions, checks TP/SL, updates P&L, and triggers close events
+
+TP/SL detection for Binance positions runs on the mark-price stream
+(run_price_monitor, the price-monitor service), which closes positions the
+moment a level is crossed. monitor_open_positions polls every position over
+REST and is kept for periodic reconciliation.
 """
 
+import os
+import asyncio
 import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
@@ -14,6 +21,7 @@ from binance.exceptions import BinanceAPIException
 
 from core import models, crud
 from core.database import get_db
+from services.mark_price_engine import MarkPriceEngine, PriceTrigger, BinanceMarkPriceStream, normalize_symbol
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +44,28 @@ class PositionMonitor:
         
         return query.all()
     
+    def get_stream_transactions(self, testnet: bool = False, bot_id: Optional[int] = None) -> List[models.Transaction]:
+        """
+        Open transactions the Binance mark-price stream may close: positions of
+        Binance bots on the stream's network (testnet or mainnet). Other
+        exchanges and networks are priced and cleaned up by their own clients.
+        """
+        network = models.NetworkType.TESTNET if testnet else models.NetworkType.MAINNET
+        query = self.db.query(models.Transaction).join(
+            models.Subscription, models.Transaction.subscription_id == models.Subscription.id
+        ).join(
+            models.Bot, models.Subscription.bot_id == models.Bot.id
+        ).filter(
+            models.Transaction.status == 'OPEN',
+            models.Bot.exchange_type == models.ExchangeType.BINANCE,
+            models.Subscription.network_type == network
+        )
+        
+        if bot_id:
+            query = query.filter(models.Transaction.bot_id == bot_id)
+        
+        return query.all()
+    
     def check_order_status_from_exchange(self, symbol: str, order_id: str) -> Optional[Dict[str, Any]]:
         """
         Check order status from Binance Futures API
@@ -225,9 +255,94 @@ class PositionMonitor:
         
         self.db.commit()
     
+    def handle_price_trigger(self, trigger: PriceTrigger):
+        """Close a position whose TP/SL level was crossed by the mark price"""
+        transaction = self.db.query(models.Transaction).filter(
+            models.Transaction.id == trigger.transaction_id
+        ).first()
+        if not transaction or transaction.status != 'OPEN':
+            return
+        
+        logger.info(f"🎯 {trigger.reason} for transaction {transaction.id} "
+                    f"({trigger.symbol} mark {trigger.price} crossed {trigger.level})")
+        self.update_transaction_on_close(
+            transaction=transaction,
+            exit_price=trigger.price,
+            exit_reason=trigger.reason,
+            current_time=datetime.now(),
+            exchange_client=self.futures_client
+        )
+        self._trigger_performance_update(transaction.bot_id, transaction.id)
+    
+    def _trigger_performance_update(self, bot_id: Optional[int], transaction_id: Optional[int] = None):
+        try:
+            from core.tasks import update_bot_performance_metrics
+            if bot_id:
+                update_bot_performance_metrics.delay(bot_id, transaction_id)
+        except Exception as e:
+            logger.warning(f"Could not trigger performance update: {e}")
+    
+    def refresh_price_index(self, engine: MarkPriceEngine, bot_id: Optional[int] = None,
+                            testnet: bool = False) -> int:
+        """
+        Reload the stream's open positions into the engine and update their
+        unrealized P&L from the latest streamed mark prices (no REST calls)
+        """
+        self.db.expire_all()  # See positions opened/closed by other workers
+        open_transactions = self.get_stream_transactions(testnet, bot_id)
+        indexed = engine.load_transactions(open_transactions)
+        
+        for transaction in open_transactions:
+            current_price = engine.last_prices.get(normalize_symbol(transaction.symbol))
+            if current_price and current_price > 0:
+                try:
+                    self.update_unrealized_pnl(transaction, current_price)
+                except Exception as e:
+                    logger.error(f"Error updating unrealized P&L for transaction {transaction.id}: {e}")
+                    self.db.rollback()
+        return indexed
+    
+    async def run_price_monitor(self, feed, refresh_interval: float = 60.0, bot_id: Optional[int] = None,
+                                stop_event: Optional[asyncio.Event] = None, testnet: bool = False) -> Dict[str, Any]:
+        """
+        Stream-driven TP/SL monitoring
+        
+        Args:
+            feed: BinanceMarkPriceStream (live) or ReplayFeed (recorded ticks)
+            refresh_interval: Seconds between index reloads / P&L updates
+            stop_event: Set to stop; a finite feed (replay) stops on its own
+            testnet: Network of the feed's prices and of futures_client; only
+                     Binance positions on that network are tracked
+        """
+        engine = MarkPriceEngine(on_trigger=self.handle_price_trigger)
+        indexed = self.refresh_price_index(engine, bot_id, testnet)
+        logger.info(f"📡 Price monitor tracking {indexed} positions on {len(engine.symbols())} symbols")
+        
+        stop_event = stop_event or asyncio.Event()
+        feed_task = asyncio.create_task(feed.run(engine, stop_event))
+        try:
+            while not feed_task.done():
+                done, _ = await asyncio.wait({feed_task}, timeout=refresh_interval)
+                if not done:
+                    self.refresh_price_index(engine, bot_id, testnet)
+            feed_task.result()
+        finally:
+            stop_event.set()
+            if not feed_task.done():
+                feed_task.cancel()
+        
+        # Final P&L update from the last prices seen
+        self.refresh_price_index(engine, bot_id, testnet)
+        return {
+            'ticks': engine.stats['ticks'],
+            'positions_closed': engine.stats['triggers'],
+            'positions_tracked': len(engine)
+        }
+    
     def monitor_open_positions(self, bot_id: Optional[int] = None) -> Dict[str, Any]:
         """
-        Main monitoring function: Check all open positions
+        Main monitoring function: Check all open positions over REST
+        (reconciliation; real-time TP/SL detection is run_price_monitor)
         - Update unrealized P&L
         - Check if TP/SL hit
         - Close positions if needed
@@ -298,7 +413,7 @@ class PositionMonitor:
                         
                         # Trigger performance update (async)
                         from core.tasks import update_bot_performance_metrics
-                        update_bot_performance_metrics.delay(transaction.bot_id)
+                        update_bot_performance_metrics.delay(transaction.bot_id, transaction.id)
                         
                     else:
                         # Update unrealized P&L
@@ -343,3 +458,37 @@ def monitor_all_positions(futures_client: Client) -> Dict[str, Any]:
     finally:
         db.close()
 
+
+def run_mark_price_monitor(futures_client: Client, testnet: bool = False,
+                           refresh_interval: float = 60.0) -> Dict[str, Any]:
+    """
+    Run the stream-driven TP/SL monitor until interrupted
+    One Binance mark-price subscription per symbol with open positions of
+    Binance bots on the `testnet` network; futures_client must be that
+    network's account
+    """
+    db = next(get_db())
+    try:
+        monitor = PositionMonitor(db, futures_client)
+        return asyncio.run(monitor.run_price_monitor(
+            BinanceMarkPriceStream(testnet=testnet), refresh_interval=refresh_interval, testnet=testnet
+        ))
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    # Deployed as the price-monitor service (docker-compose.yml, k8s/price-monitor-deployment.yaml)
+    logging.basicConfig(level=logging.INFO)
+    testnet = os.getenv('PRICE_MONITOR_TESTNET', 'false').lower() == 'true'
+    network = 'TESTNET' if testnet else 'MAINNET'
+    api_key = os.getenv(f'BINANCE_{network}_API_KEY')
+    api_secret = os.getenv(f'BINANCE_{network}_API_SECRET')
+    if not api_key or not api_secret:
+        logger.warning(f"No Binance {network.lower()} credentials, price monitor not started")
+    else:
+        run_mark_price_monitor(
+            Client(api_key, api_secret, testnet=testnet),
+            testnet=testnet,
+            refresh_interval=float(os.getenv('PRICE_MONITOR_REFRESH_INTERVAL', 60))
+        )
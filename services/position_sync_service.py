@@ -8,13 +8,17 @@ Features:
 - Real-time P&L calculation
 - Auto-detect position closures
 - Update transaction records with exchange data
+- Batched sync: one position query per exchange account, accounts fetched
+  concurrently, reconciliation in memory
 """
 
+import os
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_
 
 from core import models
@@ -24,6 +28,9 @@ from services.exchange_integrations.base_futures_exchange import FuturesPosition
 
 logger = logging.getLogger(__name__)
 
+# Exchange accounts queried concurrently by sync_all_open_positions
+SYNC_MAX_WORKERS = int(os.getenv('POSITION_SYNC_MAX_WORKERS', 8))
+
 
 class PositionSyncService:
     """Service for syncing positions from exchanges to database"""
@@ -31,6 +38,7 @@ class PositionSyncService:
     def __init__(self, db: Session):
         self.db = db
         self.exchange_clients = {}  # Cache exchange clients
+        self.exchange_accounts = {}  # Cache resolved (decrypted) credentials
         self.api_key_manager = APIKeyManager()  # For decrypting API keys
         
     def get_exchange_client(self, exchange_type: str, api_key: str, api_secret: str, network: str = "TESTNET", passphrase: str = ""):
@@ -59,6 +67,124 @@ class PositionSyncService:
                 
         return self.exchange_clients[cache_key]
     
+    def resolve_exchange_account(self, subscription: models.Subscription,
+                                 bot: models.Bot) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Resolve and decrypt the exchange credentials used by a subscription
+        
+        Credentials are decrypted once per (owner, exchange, network) and cached
+        on the service.
+        
+        Returns:
+            (account, None) where account holds 'key' (identity of the
+            credentials row + network), 'exchange', 'network', 'api_key',
+            'api_secret' and 'passphrase'; or (None, error message)
+        """
+        # Determine network type
+        network_type = subscription.network_type if subscription.network_type else models.NetworkType.TESTNET
+        is_testnet = (network_type == models.NetworkType.TESTNET)
+        
+        # Case 1: Developer testing their own bot
+        # Check if subscription belongs to bot developer
+        is_developer_testing = (subscription.user_id == bot.developer_id) if subscription.user_id and bot.developer_id else False
+        
+        if is_developer_testing:
+            lookup_key = ('developer', subscription.user_id, bot.exchange_type, network_type)
+        elif subscription.user_principal_id:
+            lookup_key = ('principal', subscription.user_principal_id, bot.exchange_type, network_type)
+        elif subscription.user_id:
+            lookup_key = ('user', subscription.user_id, bot.exchange_type, network_type)
+        else:
+            logger.error(f"Cannot determine credentials source for subscription {subscription.id}")
+            return None, "Invalid subscription configuration"
+        
+        if lookup_key not in self.exchange_accounts:
+            self.exchange_accounts[lookup_key] = self._load_exchange_account(
+                subscription, bot, network_type, is_testnet, is_developer_testing
+            )
+        return self.exchange_accounts[lookup_key]
+    
+    def _load_exchange_account(self, subscription: models.Subscription, bot: models.Bot,
+                               network_type, is_testnet: bool,
+                               is_developer_testing: bool) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Query and decrypt credentials for resolve_exchange_account"""
+        if is_developer_testing:
+            logger.debug(f"Developer {subscription.user_id} testing bot {bot.id}")
+            # Query developer_exchange_credentials
+            credentials = self.db.query(models.DeveloperExchangeCredentials).filter(
+                models.DeveloperExchangeCredentials.user_id == subscription.user_id,
+                models.DeveloperExchangeCredentials.exchange_type == bot.exchange_type,
+                models.DeveloperExchangeCredentials.credential_type == models.CredentialType.FUTURES,
+                models.DeveloperExchangeCredentials.network_type == network_type,
+                models.DeveloperExchangeCredentials.is_active == True
+            ).first()
+            
+            if not credentials:
+                logger.warning(f"No developer credentials found for user {subscription.user_id}, exchange: {bot.exchange_type.value}, network: {network_type.value}")
+                return None, "No developer credentials"
+            
+            encrypted_passphrase = credentials.passphrase
+            source = 'developer'
+            logger.debug(f"Using developer credentials: {credentials.name}")
+        
+        # Case 2: Marketplace user renting bot
+        elif subscription.user_principal_id:
+            logger.debug(f"Marketplace user {subscription.user_principal_id} using bot {bot.id}")
+            # Query exchange_credentials by principal_id
+            credentials = self.db.query(models.ExchangeCredentials).filter(
+                models.ExchangeCredentials.principal_id == subscription.user_principal_id,
+                models.ExchangeCredentials.exchange == bot.exchange_type,
+                models.ExchangeCredentials.is_testnet == is_testnet,
+                models.ExchangeCredentials.is_active == True
+            ).first()
+            
+            if not credentials:
+                logger.warning(f"No marketplace credentials found for principal {subscription.user_principal_id}, exchange: {bot.exchange_type.value}, testnet: {is_testnet}")
+                return None, "No marketplace credentials"
+            
+            encrypted_passphrase = credentials.api_passphrase
+            source = 'exchange'
+            logger.debug(f"Using marketplace credentials for principal: {subscription.user_principal_id}")
+        
+        # Case 3: Regular studio user (legacy - fallback to exchange_credentials by user_id)
+        else:
+            logger.debug(f"Regular user {subscription.user_id} using bot {bot.id}")
+            credentials = self.db.query(models.ExchangeCredentials).filter(
+                models.ExchangeCredentials.user_id == subscription.user_id,
+                models.ExchangeCredentials.exchange == bot.exchange_type,
+                models.ExchangeCredentials.is_testnet == is_testnet,
+                models.ExchangeCredentials.is_active == True
+            ).first()
+            
+            if not credentials:
+                logger.warning(f"No credentials found for user {subscription.user_id}, exchange: {bot.exchange_type.value}, testnet: {is_testnet}")
+                return None, "No user credentials"
+            
+            encrypted_passphrase = credentials.api_passphrase
+            source = 'exchange'
+            logger.debug(f"Using regular user credentials for user: {subscription.user_id}")
+        
+        # Decrypt API keys
+        network = "TESTNET" if is_testnet else "MAINNET"
+        return {
+            'key': (source, credentials.id, bot.exchange_type.value, network),
+            'exchange': bot.exchange_type.value,
+            'network': network,
+            'api_key': self.api_key_manager.decrypt_api_key(credentials.api_key),
+            'api_secret': self.api_key_manager.decrypt_api_key(credentials.api_secret),
+            'passphrase': self.api_key_manager.decrypt_api_key(encrypted_passphrase) if encrypted_passphrase else None
+        }, None
+    
+    def get_account_client(self, account: Dict[str, Any]):
+        """Exchange client for a resolved account"""
+        return self.get_exchange_client(
+            exchange_type=account['exchange'],
+            api_key=account['api_key'],
+            api_secret=account['api_secret'],
+            network=account['network'],
+            passphrase=account['passphrase'] or ""
+        )
+    
     def sync_transaction_with_exchange(self, transaction: models.Transaction) -> Dict[str, Any]:
         """
         Sync a single transaction with exchange API
@@ -82,94 +208,12 @@ class PositionSyncService:
                 logger.warning(f"Subscription {subscription.id} has no bot")
                 return {"status": "error", "message": "No bot found"}
             
-            # Determine network type
-            network_type = subscription.network_type if subscription.network_type else models.NetworkType.TESTNET
-            is_testnet = (network_type == models.NetworkType.TESTNET)
-            
-            # Get exchange credentials based on user type
-            api_key = None
-            api_secret = None
-            api_passphrase = None
-            
-            # Case 1: Developer testing their own bot
-            # Check if subscription belongs to bot developer
-            is_developer_testing = (subscription.user_id == bot.developer_id) if subscription.user_id and bot.developer_id else False
-            
-            if is_developer_testing:
-                logger.debug(f"Developer {subscription.user_id} testing bot {bot.id}")
-                # Query developer_exchange_credentials
-                dev_credentials = self.db.query(models.DeveloperExchangeCredentials).filter(
-                    models.DeveloperExchangeCredentials.user_id == subscription.user_id,
-                    models.DeveloperExchangeCredentials.exchange_type == bot.exchange_type,
-                    models.DeveloperExchangeCredentials.credential_type == models.CredentialType.FUTURES,
-                    models.DeveloperExchangeCredentials.network_type == network_type,
-                    models.DeveloperExchangeCredentials.is_active == True
-                ).first()
-                
-                if dev_credentials:
-                    # Decrypt API keys
-                    api_key = self.api_key_manager.decrypt_api_key(dev_credentials.api_key)
-                    api_secret = self.api_key_manager.decrypt_api_key(dev_credentials.api_secret)
-                    api_passphrase = self.api_key_manager.decrypt_api_key(dev_credentials.passphrase) if dev_credentials.passphrase else None
-                    logger.debug(f"Using developer credentials: {dev_credentials.name}")
-                else:
-                    logger.warning(f"No developer credentials found for user {subscription.user_id}, exchange: {bot.exchange_type.value}, network: {network_type.value}")
-                    return {"status": "error", "message": "No developer credentials"}
-            
-            # Case 2: Marketplace user renting bot
-            elif subscription.user_principal_id:
-                logger.debug(f"Marketplace user {subscription.user_principal_id} using bot {bot.id}")
-                # Query exchange_credentials by principal_id
-                marketplace_credentials = self.db.query(models.ExchangeCredentials).filter(
-                    models.ExchangeCredentials.principal_id == subscription.user_principal_id,
-                    models.ExchangeCredentials.exchange == bot.exchange_type,
-                    models.ExchangeCredentials.is_testnet == is_testnet,
-                    models.ExchangeCredentials.is_active == True
-                ).first()
-                
-                if marketplace_credentials:
-                    # Decrypt API keys
-                    api_key = self.api_key_manager.decrypt_api_key(marketplace_credentials.api_key)
-                    api_secret = self.api_key_manager.decrypt_api_key(marketplace_credentials.api_secret)
-                    api_passphrase = self.api_key_manager.decrypt_api_key(marketplace_credentials.api_passphrase) if marketplace_credentials.api_passphrase else None
-                    logger.debug(f"Using marketplace credentials for principal: {subscription.user_principal_id}")
-                else:
-                    logger.warning(f"No marketplace credentials found for principal {subscription.user_principal_id}, exchange: {bot.exchange_type.value}, testnet: {is_testnet}")
-                    return {"status": "error", "message": "No marketplace credentials"}
-            
-            # Case 3: Regular studio user (legacy - fallback to exchange_credentials by user_id)
-            elif subscription.user_id:
-                logger.debug(f"Regular user {subscription.user_id} using bot {bot.id}")
-                regular_credentials = self.db.query(models.ExchangeCredentials).filter(
-                    models.ExchangeCredentials.user_id == subscription.user_id,
-                    models.ExchangeCredentials.exchange == bot.exchange_type,
-                    models.ExchangeCredentials.is_testnet == is_testnet,
-                    models.ExchangeCredentials.is_active == True
-                ).first()
-                
-                if regular_credentials:
-                    # Decrypt API keys
-                    api_key = self.api_key_manager.decrypt_api_key(regular_credentials.api_key)
-                    api_secret = self.api_key_manager.decrypt_api_key(regular_credentials.api_secret)
-                    api_passphrase = self.api_key_manager.decrypt_api_key(regular_credentials.api_passphrase) if regular_credentials.api_passphrase else None
-                    logger.debug(f"Using regular user credentials for user: {subscription.user_id}")
-                else:
-                    logger.warning(f"No credentials found for user {subscription.user_id}, exchange: {bot.exchange_type.value}, testnet: {is_testnet}")
-                    return {"status": "error", "message": "No user credentials"}
-            else:
-                logger.error(f"Cannot determine credentials source for subscription {subscription.id}")
-                return {"status": "error", "message": "Invalid subscription configuration"}
+            account, error = self.resolve_exchange_account(subscription, bot)
+            if not account:
+                return {"status": "error", "message": error}
             
             # Get exchange client with credentials
-            network_str = "TESTNET" if is_testnet else "MAINNET"
-            exchange_client = self.get_exchange_client(
-                exchange_type=bot.exchange_type.value,
-                api_key=api_key,
-                api_secret=api_secret,
-                network=network_str,
-                passphrase=api_passphrase or ""
-            )
-            
+            exchange_client = self.get_account_client(account)
             if not exchange_client:
                 return {"status": "error", "message": "Failed to create exchange client"}
             
@@ -177,29 +221,44 @@ class PositionSyncService:
             symbol = transaction.symbol.replace('/', '')  # Normalize symbol
             positions = exchange_client.get_position_info(symbol=symbol)
             
-            # Find matching position
-            matching_position = None
-            for position in positions:
-                # Check if position matches our transaction
-                if position.symbol == symbol and float(position.size) != 0:
-                    matching_position = position
-                    break
-            
-            if not matching_position:
-                # Position is closed (no longer exists on exchange)
-                logger.info(f"Position {transaction.id} ({transaction.symbol}) is closed on exchange")
-                return self._handle_closed_position(transaction, exchange_client)
-            
-            # Position still open - update with real-time data
-            return self._update_open_position(transaction, matching_position)
-            
+            return self.reconcile_transaction(transaction, positions, exchange_client)
+        
         except Exception as e:
             logger.error(f"Error syncing transaction {transaction.id}: {e}")
             import traceback
             logger.error(traceback.format_exc())
             return {"status": "error", "message": str(e)}
     
-    def _update_open_position(self, transaction: models.Transaction, position: FuturesPosition) -> Dict[str, Any]:
+    def reconcile_transaction(self, transaction: models.Transaction, positions: List[FuturesPosition],
+                              exchange_client, commit: bool = True) -> Dict[str, Any]:
+        """
+        Match a transaction against the account's open positions and update it
+        
+        Args:
+            positions: Open positions of the transaction's exchange account
+            commit: Commit open-position updates immediately (False when the
+                caller commits a whole account at once)
+        """
+        symbol = transaction.symbol.replace('/', '')  # Normalize symbol
+        
+        # Find matching position
+        matching_position = None
+        for position in positions:
+            # Check if position matches our transaction
+            if position.symbol == symbol and float(position.size) != 0:
+                matching_position = position
+                break
+        
+        if not matching_position:
+            # Position is closed (no longer exists on exchange)
+            logger.info(f"Position {transaction.id} ({transaction.symbol}) is closed on exchange")
+            return self._handle_closed_position(transaction, exchange_client)
+        
+        # Position still open - update with real-time data
+        return self._update_open_position(transaction, matching_position, commit=commit)
+
+    def _update_open_position(self, transaction: models.Transaction, position: FuturesPosition,
+                              commit: bool = True) -> Dict[str, Any]:
         """
         Update transaction with real-time position data from exchange
         """
@@ -252,9 +311,10 @@ class PositionSyncService:
             # Update timestamp
             transaction.updated_at = datetime.utcnow()
             
-            # Commit changes
+            # Commit changes (batched callers commit once per account)
             if updated_fields:
-                self.db.commit()
+                if commit:
+                    self.db.commit()
                 logger.info(f"✅ Updated transaction {transaction.id} ({transaction.symbol}): {', '.join(updated_fields)}")
                 logger.info(f"   Current Price: ${current_price:.2f} | Unrealized P&L: ${unrealized_pnl:.2f} ({unrealized_pnl_pct:+.2f}%)")
             
@@ -269,7 +329,8 @@ class PositionSyncService:
             
         except Exception as e:
             logger.error(f"Error updating open position {transaction.id}: {e}")
-            self.db.rollback()
+            if commit:
+                self.db.rollback()
             return {"status": "error", "message": str(e)}
     
     def _handle_closed_position(self, transaction: models.Transaction, exchange_client) -> Dict[str, Any]:
@@ -372,7 +433,7 @@ class PositionSyncService:
             try:
                 from core.tasks import update_bot_performance_metrics
                 if transaction.bot_id:
-                    update_bot_performance_metrics.delay(transaction.bot_id)
+                    update_bot_performance_metrics.delay(transaction.bot_id, transaction.id)
             except Exception as e:
                 logger.warning(f"Could not trigger performance update: {e}")
             
@@ -397,11 +458,19 @@ class PositionSyncService:
         """
         Sync all open positions across all exchanges
         
+        Open transactions are grouped by exchange account (credentials +
+        exchange + network). Each account's positions are fetched with one
+        get_position_info() call, accounts are queried concurrently (bounded by
+        POSITION_SYNC_MAX_WORKERS) and transactions are reconciled in memory
+        with one commit per account. Database work stays on the calling thread.
+        
         Returns summary statistics
         """
         try:
-            # Get all open transactions
-            open_transactions = self.db.query(models.Transaction).filter(
+            # Get all open transactions (subscription + bot loaded in the same query)
+            open_transactions = self.db.query(models.Transaction).options(
+                joinedload(models.Transaction.subscription).joinedload(models.Subscription.bot)
+            ).filter(
                 models.Transaction.status == 'OPEN'
             ).all()
             
@@ -410,6 +479,7 @@ class PositionSyncService:
                 return {
                     "status": "success",
                     "total": 0,
+                    "accounts": 0,
                     "updated": 0,
                     "closed": 0,
                     "errors": 0
@@ -417,44 +487,67 @@ class PositionSyncService:
             
             logger.info(f"📊 Syncing {len(open_transactions)} open positions...")
             
-            # Sync each transaction
             results = {
                 "total": len(open_transactions),
+                "accounts": 0,
                 "updated": 0,
                 "closed": 0,
                 "errors": 0,
                 "details": []
             }
             
+            # Group transactions by exchange account
+            accounts: Dict[Tuple, Dict[str, Any]] = {}
             for transaction in open_transactions:
-                try:
-                    result = self.sync_transaction_with_exchange(transaction)
-                    
-                    if result["status"] == "success":
-                        results["updated"] += 1
-                    elif result["status"] == "closed":
-                        results["closed"] += 1
-                    else:
-                        results["errors"] += 1
-                    
-                    results["details"].append({
-                        "transaction_id": transaction.id,
-                        "symbol": transaction.symbol,
-                        "result": result
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error syncing transaction {transaction.id}: {e}")
-                    results["errors"] += 1
-                    results["details"].append({
-                        "transaction_id": transaction.id,
-                        "error": str(e)
-                    })
-            
-            logger.info(f"✅ Sync complete: {results['updated']} updated, {results['closed']} closed, {results['errors']} errors")
+                subscription = transaction.subscription
+                if not subscription:
+                    logger.warning(f"Transaction {transaction.id} has no subscription")
+                    self._record_result(results, transaction, {"status": "error", "message": "No subscription found"})
+                    continue
+                if not subscription.bot:
+                    logger.warning(f"Subscription {subscription.id} has no bot")
+                    self._record_result(results, transaction, {"status": "error", "message": "No bot found"})
+                    continue
+                
+                account, error = self.resolve_exchange_account(subscription, subscription.bot)
+                if not account:
+                    self._record_result(results, transaction, {"status": "error", "message": error})
+                    continue
+                group = accounts.setdefault(account['key'], {'account': account, 'transactions': []})
+                group['transactions'].append(transaction)
+            
+            results["accounts"] = len(accounts)
+            
+            # Create clients up front (shared cache), fetch positions concurrently
+            clients = {}
+            for key, group in accounts.items():
+                client = self.get_account_client(group['account'])
+                if client:
+                    clients[key] = client
+                else:
+                    for transaction in group['transactions']:
+                        self._record_result(results, transaction, {"status": "error", "message": "Failed to create exchange client"})
+            
+            if clients:
+                with ThreadPoolExecutor(max_workers=max(1, min(SYNC_MAX_WORKERS, len(clients)))) as executor:
+                    futures = {executor.submit(client.get_position_info): key for key, client in clients.items()}
+                    for future in as_completed(futures):
+                        key = futures[future]
+                        transactions = accounts[key]['transactions']
+                        try:
+                            positions = future.result()
+                        except Exception as e:
+                            logger.error(f"Failed to fetch positions for {key[2]} ({key[3]}) account: {e}")
+                            for transaction in transactions:
+                                self._record_result(results, transaction, {"status": "error", "message": str(e)})
+                            continue
+                        
+                        self._reconcile_account(transactions, positions, clients[key], results)
+            
+            logger.info(f"✅ Sync complete: {results['updated']} updated, {results['closed']} closed, {results['errors']} errors ({results['accounts']} accounts)")
             
             return results
-            
+        
         except Exception as e:
             logger.error(f"Error in sync_all_open_positions: {e}")
             import traceback
@@ -463,4 +556,43 @@ class PositionSyncService:
                 "status": "error",
                 "message": str(e)
             }
-
+    
+    def _reconcile_account(self, transactions: List[models.Transaction], positions: List[FuturesPosition],
+                           exchange_client, results: Dict[str, Any]):
+        """Reconcile one account's transactions against its positions, single commit"""
+        account_results = []
+        for transaction in transactions:
+            try:
+                result = self.reconcile_transaction(transaction, positions, exchange_client, commit=False)
+            except Exception as e:
+                logger.error(f"Error syncing transaction {transaction.id}: {e}")
+                result = {"status": "error", "message": str(e)}
+            account_results.append((transaction, result))
+        
+        try:
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Failed to commit position updates: {e}")
+            self.db.rollback()
+            account_results = [
+                (transaction, result if result["status"] == "closed" else {"status": "error", "message": str(e)})
+                for transaction, result in account_results
+            ]
+        
+        for transaction, result in account_results:
+            self._record_result(results, transaction, result)
+    
+    @staticmethod
+    def _record_result(results: Dict[str, Any], transaction: models.Transaction, result: Dict[str, Any]):
+        if result["status"] == "success":
+            results["updated"] += 1
+        elif result["status"] == "closed":
+            results["closed"] += 1
+        else:
+            results["errors"] += 1
+        
+        results["details"].append({
+            "transaction_id": transaction.id,
+            "symbol": transaction.symbol,
+            "result": result
+        })
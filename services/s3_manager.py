@@ -562,6 +562,51 @@ class S3Manager:
             logger.error(f"Error getting latest version: {e}")
             raise
     
+    def get_code_object_info(self, bot_id: int, file_type: str = "code", version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Locate the code file of a bot version with a single listing
+        
+        Args:
+            bot_id: Bot ID
+            file_type: "code" (.py) or "rpa" (.robot)
+            version: Version to look up (latest if not specified)
+            
+        Returns:
+            Dict with version, key, filename and etag (changes whenever the file is re-uploaded)
+        """
+        if not self.s3_client:
+            raise Exception("S3 service not available")
+        
+        prefix = f"bots/{bot_id}/{file_type}/"
+        if version:
+            prefix += f"{version}/"
+        extension = '.robot' if file_type == "rpa" else '.py'
+        
+        try:
+            response = self.s3_client.list_objects_v2(Bucket=self.bucket_name, Prefix=prefix)
+        except ClientError as e:
+            logger.error(f"Error listing bot code: {e}")
+            raise
+        
+        # bots/{bot_id}/{file_type}/{version}/filename -> first file of the highest version
+        candidates = {}
+        for obj in response.get('Contents', []):
+            key_parts = obj['Key'].split('/')
+            if len(key_parts) == 5 and key_parts[4].endswith(extension):
+                candidates.setdefault(key_parts[3], obj)
+        
+        if not candidates:
+            raise FileNotFoundError(f"No {file_type} files found in {prefix}")
+        
+        latest = version or max(candidates)
+        obj = candidates[latest]
+        return {
+            "version": latest,
+            "key": obj['Key'],
+            "filename": obj['Key'].split('/')[-1],
+            "etag": (obj.get('ETag') or '').strip('"')
+        }
+    
     def list_files(self, bot_id: int, version: str, file_type: str = None) -> List[str]:
         """
         List files for a specific bot version
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: developer dashboard analytics for one hot bot, Python loop over
+every transaction in the period vs grouped SQL aggregates
+
+Uses a temporary SQLite file; pass a size to override the default
+(300k transactions on one bot, all inside the 30 day window).
+
+Usage:
+    python tests/infrastructure/benchmark_bot_analytics.py [transactions]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core import crud, models
+from tests.infrastructure.test_bot_analytics import legacy_summary
+from tests.infrastructure.test_marketplace_metrics import make_session
+from utils.redis_client import reset_redis_client
+
+
+def populate(db, transactions: int, seed: int = 5):
+    rng = random.Random(seed)
+    now = datetime.now()
+    db.add(models.Bot(id=1, name='Hot bot'))
+    db.bulk_insert_mappings(models.Subscription, [
+        {'id': sub_id, 'bot_id': 1, 'is_testnet': bool(sub_id % 2)} for sub_id in range(1, 201)
+    ])
+    db.bulk_insert_mappings(models.Transaction, [{
+        'id': tx_id, 'subscription_id': rng.randint(1, 200), 'bot_id': 1, 'action': 'BUY', 'symbol': 'BTCUSDT',
+        'quantity': 1.0, 'entry_price': 100.0, 'status': 'CLOSED' if tx_id % 4 else 'OPEN',
+        'realized_pnl': round(rng.uniform(-50, 60), 2) if tx_id % 4 else None,
+        'unrealized_pnl': None if tx_id % 4 else round(rng.uniform(-20, 20), 2),
+        'created_at': now - timedelta(seconds=rng.randint(60, 29 * 86400)),
+    } for tx_id in range(1, transactions + 1)])
+    db.commit()
+
+
+def run_benchmark(transactions: int = 300_000):
+    reset_redis_client(None)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_session(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        populate(db, transactions)
+
+        start = time.perf_counter()
+        expected = legacy_summary(db, 1)
+        legacy = time.perf_counter() - start
+
+        crud.BOT_ANALYTICS_CACHE_TTL = 0
+        start = time.perf_counter()
+        result = crud.get_bot_analytics(db, 1)
+        aggregated = time.perf_counter() - start
+
+        start = time.perf_counter()
+        crud.get_bot_analytics(db, 1, cursor=result['pagination']['next_cursor'])
+        next_page = time.perf_counter() - start
+
+        crud.BOT_ANALYTICS_CACHE_TTL = 30
+        crud.get_bot_analytics(db, 1)
+        start = time.perf_counter()
+        crud.get_bot_analytics(db, 1)
+        cached = time.perf_counter() - start
+
+        assert result['summary']['total_transactions'] == expected['total_transactions']
+        assert abs(result['summary']['total_pnl'] - expected['total_pnl']) < 0.05
+
+        print(f"📊 BOT ANALYTICS ({transactions:,} transactions in the period)")
+        print("=" * 70)
+        print(f"{'legacy summary loop only':>28}: {legacy * 1000:>10.1f} ms")
+        print(f"{'SQL aggregates (full view)':>28}: {aggregated * 1000:>10.1f} ms ({legacy / aggregated:.1f}x)")
+        print(f"{'keyset page 2 (full view)':>28}: {next_page * 1000:>10.1f} ms")
+        print(f"{'hot-bot cache hit':>28}: {cached * 1000:>10.3f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:2]]
+    run_benchmark(*sizes)
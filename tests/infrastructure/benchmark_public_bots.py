@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: marketplace listing sorted by performance, per-bot Python
+aggregation vs the materialized bot_marketplace_metrics table
+
+Uses a temporary SQLite file; pass sizes to override the defaults
+(10k bots / 1M transactions).
+
+Usage:
+    python tests/infrastructure/benchmark_public_bots.py [bots] [transactions]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core import crud, models, schemas
+from tests.infrastructure.test_marketplace_metrics import legacy_bot_metrics, make_session, populate
+
+
+def legacy_listing(db, skip: int = 0, limit: int = 50):
+    """Previous flow: load every approved bot, aggregate each one, sort and slice in Python"""
+    bots = db.query(models.Bot).filter(models.Bot.status == schemas.BotStatus.APPROVED).all()
+    scored = [(legacy_bot_metrics(db, bot.id)[0], bot.id) for bot in bots]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored[skip:skip + limit]
+
+
+def run_benchmark(bots: int = 10_000, transactions: int = 1_000_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_session(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+
+        start = time.perf_counter()
+        populate(db, bots=bots, transactions=transactions)
+        print(f"📦 Seeded {bots:,} bots / {transactions:,} transactions in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        crud.refresh_bot_marketplace_metrics(db)
+        rebuild = time.perf_counter() - start
+
+        start = time.perf_counter()
+        crud.refresh_bot_marketplace_metrics(db, [bots // 2])
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        page, _ = crud.get_public_bots(db, skip=0, limit=50, sort_by='performance')
+        materialized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy_page = legacy_listing(db, skip=0, limit=50)
+        legacy = time.perf_counter() - start
+
+        assert [bot['id'] for bot in page][:10] == [bot_id for _, bot_id in legacy_page][:10]
+
+        print("📊 MARKETPLACE LISTING (sort_by=performance, first page of 50)")
+        print("=" * 70)
+        print(f"{'legacy per-bot aggregation':>30}: {legacy * 1000:>10.1f} ms")
+        print(f"{'materialized metrics':>30}: {materialized * 1000:>10.1f} ms ({legacy / materialized:.0f}x)")
+        print(f"{'full rebuild (periodic)':>30}: {rebuild * 1000:>10.1f} ms")
+        print(f"{'single-bot refresh (close)':>30}: {single * 1000:>10.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:3]]
+    run_benchmark(*sizes)
@@ -0,0 +1,120 @@
+"""
+Test SQL-aggregated bot analytics: parity with the Python loop, keyset pagination and hot-bot cache
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from core import crud, models
+from tests.infrastructure.test_marketplace_metrics import make_session
+from utils.redis_client import reset_redis_client
+
+
+def legacy_summary(db, bot_id, days=30, network_filter=None):
+    """Previous get_bot_analytics summary loop over every transaction in the period"""
+    query = db.query(models.Transaction).join(
+        models.Subscription, models.Subscription.id == models.Transaction.subscription_id
+    ).filter(models.Subscription.bot_id == bot_id,
+             models.Transaction.created_at >= datetime.now() - timedelta(days=days))
+    if network_filter == "mainnet":
+        query = query.filter(models.Subscription.is_testnet == False)
+    elif network_filter == "testnet":
+        query = query.filter(models.Subscription.is_testnet == True)
+    transactions = query.all()
+
+    total_pnl = realized = unrealized = 0.0
+    wins = losses = closed = 0
+    for tx in transactions:
+        if tx.status == 'CLOSED':
+            closed += 1
+            pnl = float(tx.realized_pnl or 0)
+            realized += pnl
+            total_pnl += pnl
+            wins += pnl > 0
+            losses += pnl < 0
+        else:
+            unrealized += float(tx.unrealized_pnl or 0)
+            total_pnl += float(tx.unrealized_pnl or 0)
+    return {
+        'total_transactions': len(transactions), 'open_positions': len(transactions) - closed,
+        'closed_positions': closed, 'winning_trades': wins, 'losing_trades': losses,
+        'win_rate': round(wins / closed * 100, 2) if closed else 0, 'total_pnl': round(total_pnl, 2),
+        'realized_pnl': round(realized, 2), 'unrealized_pnl': round(unrealized, 2),
+    }
+
+
+@pytest.fixture
+def db(monkeypatch):
+    reset_redis_client(None)
+    monkeypatch.setattr(crud, '_analytics_cache', {})
+    session = make_session()
+    rng = random.Random(7)
+    now = datetime.now()
+    session.add(models.Bot(id=1, name='Hot bot'))
+    session.bulk_insert_mappings(models.Subscription, [
+        {'id': sub_id, 'bot_id': 1, 'is_testnet': [True, False, None][sub_id % 3],
+         'status': models.SubscriptionStatus.ACTIVE if sub_id % 2 else models.SubscriptionStatus.CANCELLED}
+        for sub_id in range(1, 10)
+    ])
+    rows = []
+    for tx_id in range(1, 601):
+        status = rng.choice(['CLOSED', 'CLOSED', 'OPEN', 'FAILED'])
+        rows.append({
+            'id': tx_id, 'subscription_id': rng.randint(1, 9), 'bot_id': 1, 'action': 'BUY',
+            'symbol': 'BTCUSDT', 'quantity': 1.0, 'entry_price': 100.0, 'status': status,
+            'realized_pnl': rng.choice([None, 0.0, round(rng.uniform(-50, 60), 2)]) if status == 'CLOSED' else None,
+            'unrealized_pnl': rng.choice([None, round(rng.uniform(-20, 20), 2)]) if status != 'CLOSED' else None,
+            # Every fifth row shares a timestamp with its neighbour to exercise the id tie-breaker
+            'created_at': now - timedelta(hours=(tx_id - tx_id % 5) // 2, minutes=1),
+        })
+    session.bulk_insert_mappings(models.Transaction, rows)
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize('network_filter', [None, 'mainnet', 'testnet'])
+def test_summary_matches_legacy_loop(db, network_filter):
+    result = crud.get_bot_analytics(db, 1, days=7, network_filter=network_filter)
+
+    expected = legacy_summary(db, 1, days=7, network_filter=network_filter)
+    summary = {key: result['summary'][key] for key in expected}
+    assert summary == pytest.approx(expected)
+    assert sum(day['transactions'] for day in result['chart_data']) == expected['total_transactions']
+    assert sum(day['winning_trades'] for day in result['chart_data']) == expected['winning_trades']
+    assert sum(net['total_transactions'] for net in result['network_breakdown'].values()) == \
+        expected['total_transactions']
+    if network_filter:
+        assert list(result['network_breakdown']) == [network_filter]
+    else:
+        assert (result['summary']['total_subscriptions'], result['summary']['active_subscriptions']) == (9, 5)
+
+
+def test_keyset_pages_match_offset_pages(db):
+    offset_ids, keyset_ids, cursor = [], [], None
+    for page in range(1, 8):
+        offset_ids += [tx['id'] for tx in crud.get_bot_analytics(db, 1, page=page, limit=100)['recent_transactions']]
+    while True:
+        result = crud.get_bot_analytics(db, 1, limit=100, cursor=cursor)
+        keyset_ids += [tx['id'] for tx in result['recent_transactions']]
+        cursor = result['pagination']['next_cursor']
+        if not result['pagination']['has_next']:
+            break
+
+    assert keyset_ids == offset_ids and len(set(keyset_ids)) == 600
+    with pytest.raises(HTTPException):
+        crud.get_bot_analytics(db, 1, cursor='not-a-cursor')
+
+
+def test_hot_bot_results_are_cached(db, monkeypatch):
+    monkeypatch.setattr(crud, 'BOT_ANALYTICS_CACHE_MIN_TRANSACTIONS', 500)
+    first = crud.get_bot_analytics(db, 1, limit=5)
+    db.query(models.Transaction).delete()
+    db.commit()
+    assert crud.get_bot_analytics(db, 1, limit=5) == first
+
+    monkeypatch.setattr(crud, 'BOT_ANALYTICS_CACHE_TTL', 0)
+    assert crud.get_bot_analytics(db, 1, limit=5)['summary']['total_transactions'] == 0
@@ -0,0 +1,74 @@
+"""
+Test the scheduler due-subscription query (crud.get_due_subscriptions)
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import crud, models
+
+NOW = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    models.Base.metadata.create_all(
+        engine, tables=[models.User.__table__, models.Bot.__table__, models.Subscription.__table__]
+    )
+    session = sessionmaker(bind=engine)()
+    session.add(models.Bot(id=1, name='Universal', bot_type='FUTURES', bot_mode='ACTIVE', timeframe='1h'))
+    yield session
+    session.close()
+
+
+def _add(db, sub_id, **fields):
+    values = dict(
+        id=sub_id, bot_id=1, status=models.SubscriptionStatus.ACTIVE,
+        started_at=NOW - timedelta(days=1), expires_at=NOW + timedelta(days=30),
+        next_run_at=NOW - timedelta(minutes=1)
+    )
+    values.update(fields)
+    db.add(models.Subscription(**values))
+
+
+def test_filters_due_subscriptions_in_sql(db):
+    _add(db, 1)
+    _add(db, 2, next_run_at=None)
+    _add(db, 3, next_run_at=NOW + timedelta(minutes=5))
+    _add(db, 4, expires_at=NOW - timedelta(minutes=1))
+    _add(db, 5, started_at=NOW + timedelta(hours=1))
+    _add(db, 6, status=models.SubscriptionStatus.CANCELLED)
+    _add(db, 7, expires_at=None)
+    db.commit()
+
+    due = crud.get_due_subscriptions(db, now=NOW)
+    assert sorted(s.id for s in due) == [1, 2, 7]
+    assert all(s.bot.bot_type == 'FUTURES' for s in due)
+
+
+def test_shards_partition_subscriptions(db):
+    for sub_id in range(1, 11):
+        _add(db, sub_id)
+    db.commit()
+
+    shards = [
+        {s.id for s in crud.get_due_subscriptions(db, now=NOW, shard_index=i, shard_count=3)}
+        for i in range(3)
+    ]
+    assert set().union(*shards) == set(range(1, 11))
+    assert sum(len(shard) for shard in shards) == 10
+    assert shards[0] == {3, 6, 9}
+
+
+def test_limit_takes_oldest_first(db):
+    _add(db, 1, next_run_at=NOW - timedelta(minutes=1))
+    _add(db, 2, next_run_at=NOW - timedelta(minutes=10))
+    _add(db, 3, next_run_at=NOW - timedelta(minutes=5))
+    db.commit()
+
+    due = crud.get_due_subscriptions(db, now=NOW, limit=2)
+    assert [s.id for s in due] == [2, 3]
@@ -0,0 +1,62 @@
+"""
+Test write-behind execution logging: batched inserts, task-end flush and overload drops
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core import models
+from utils import execution_logger
+from utils.execution_logger import ExecutionLogBuffer, ExecutionLogger
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine, tables=[models.ExecutionLog.__table__])
+    return sessionmaker(bind=engine)
+
+
+def test_logs_are_buffered_and_bulk_inserted(session_factory, monkeypatch):
+    buffer = ExecutionLogBuffer(session_factory, batch_size=50, flush_interval=60)
+    monkeypatch.setattr(execution_logger, '_buffer', buffer)
+
+    log = ExecutionLogger(bot_id=1, subscription_id=2, task_id='task-1')
+    for i in range(120):
+        log.analysis(f"step {i}", {'i': i})
+    log.error('boom')
+    log.flush()
+
+    session = session_factory()
+    rows = session.query(models.ExecutionLog).order_by(models.ExecutionLog.id).all()
+    assert len(rows) == 121
+    assert (rows[0].message, rows[0].data, rows[0].task_id) == ('step 0', {'i': 0}, 'task-1')
+    assert (rows[-1].log_type, rows[-1].level) == ('error', 'error')
+    stats = buffer.get_stats()
+    assert (stats['enqueued'], stats['flushed'], stats['dropped'], stats['pending']) == (121, 121, 0, 0)
+    assert stats['flushes'] >= 3
+    session.close()
+
+
+def test_full_buffer_drops_and_counts(session_factory, monkeypatch):
+    buffer = ExecutionLogBuffer(session_factory, batch_size=100, flush_interval=60, max_queue=5, block_timeout=0)
+    monkeypatch.setattr(buffer, '_ensure_flusher', lambda: None)  # No flusher: the queue can only fill up
+    accepted = [buffer.put({'bot_id': 1, 'log_type': 'system', 'message': str(i), 'level': 'info'}) for i in range(8)]
+
+    assert accepted == [True] * 5 + [False] * 3
+    assert buffer.get_stats()['dropped'] == 3
+    assert buffer.flush() == 5
+
+
+def test_failed_insert_is_counted(monkeypatch):
+    def broken_session():
+        return sessionmaker(bind=create_engine('sqlite://'))()  # No execution_logs table
+
+    buffer = ExecutionLogBuffer(broken_session, batch_size=10, flush_interval=60)
+    monkeypatch.setattr(buffer, '_ensure_flusher', lambda: None)
+    buffer.put({'bot_id': 1, 'log_type': 'system', 'message': 'lost', 'level': 'info'})
+
+    assert buffer.flush() == 0
+    assert buffer.get_stats()['failed'] == 1
@@ -0,0 +1,117 @@
+"""
+Test materialized marketplace metrics: parity with the per-bot Python aggregation
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import crud, models
+
+
+def legacy_bot_metrics(db, bot_id, network_filter=None):
+    """Previous get_public_bots aggregation for one bot"""
+    subscriptions = db.query(models.Subscription).filter(models.Subscription.bot_id == bot_id).all()
+    if network_filter == "mainnet":
+        subscriptions = [sub for sub in subscriptions if not sub.is_testnet]
+    elif network_filter == "testnet":
+        subscriptions = [sub for sub in subscriptions if sub.is_testnet]
+    if not subscriptions:
+        return 0.0, 0.0, 0, 0
+
+    transactions = db.query(models.Transaction).filter(
+        models.Transaction.subscription_id.in_([sub.id for sub in subscriptions])
+    ).all()
+    total_pnl, closed_positions, winning_trades = 0.0, 0, 0
+    for tx in transactions:
+        if tx.status == 'CLOSED' and tx.realized_pnl:
+            total_pnl += float(tx.realized_pnl)
+            closed_positions += 1
+            winning_trades += float(tx.realized_pnl) > 0
+        elif tx.status == 'OPEN' and tx.unrealized_pnl:
+            total_pnl += float(tx.unrealized_pnl)
+    win_rate = (winning_trades / closed_positions * 100) if closed_positions else 0
+    return round(total_pnl, 2), round(win_rate, 2), len(transactions), winning_trades
+
+
+def populate(db, bots: int, transactions: int, seed: int = 3):
+    rng = random.Random(seed)
+    db.bulk_insert_mappings(models.Bot, [
+        {'id': bot_id, 'name': f"Bot {bot_id}", 'description': 'grid' if bot_id % 3 else 'trend',
+         'status': models.BotStatus.APPROVED if bot_id % 5 else models.BotStatus.PENDING,
+         'created_at': datetime(2025, 1, 1) + timedelta(hours=bot_id)}
+        for bot_id in range(1, bots + 1)
+    ])
+    subscriptions = [
+        {'id': sub_id, 'bot_id': rng.randint(1, bots), 'is_testnet': rng.choice([True, False, None])}
+        for sub_id in range(1, bots * 2 + 1)
+    ]
+    db.bulk_insert_mappings(models.Subscription, subscriptions)
+    rows = []
+    for tx_id in range(1, transactions + 1):
+        sub = rng.choice(subscriptions)
+        status = rng.choice(['CLOSED', 'CLOSED', 'OPEN', 'FAILED'])
+        rows.append({
+            'id': tx_id, 'subscription_id': sub['id'], 'bot_id': sub['bot_id'], 'action': 'BUY',
+            'symbol': 'BTCUSDT', 'quantity': 1.0, 'entry_price': 100.0, 'status': status,
+            'realized_pnl': rng.choice([None, 0.0, round(rng.uniform(-50, 60), 2)]) if status == 'CLOSED' else None,
+            'unrealized_pnl': rng.choice([None, round(rng.uniform(-20, 20), 2)]) if status == 'OPEN' else None,
+        })
+    db.bulk_insert_mappings(models.Transaction, rows)
+    db.commit()
+
+
+def make_session(url='sqlite://'):
+    engine = create_engine(url)
+    models.Base.metadata.create_all(engine, tables=[
+        models.User.__table__, models.Bot.__table__, models.Subscription.__table__,
+        models.Transaction.__table__, models.BotMarketplaceMetrics.__table__
+    ])
+    return sessionmaker(bind=engine)()
+
+
+@pytest.fixture
+def db():
+    session = make_session()
+    populate(session, bots=40, transactions=1500)
+    crud.refresh_bot_marketplace_metrics(session)
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize('network_filter', [None, 'mainnet', 'testnet'])
+def test_listing_matches_legacy_aggregation(db, network_filter):
+    bots, total = crud.get_public_bots(db, limit=1000, sort_by='total_pnl', network_filter=network_filter)
+
+    assert total == 32 and len(bots) == 32
+    for bot in bots:
+        expected = legacy_bot_metrics(db, bot['id'], network_filter)
+        assert (bot['total_pnl'], bot['win_rate'], bot['total_trades'], bot['winning_trades']) == \
+            pytest.approx(expected)
+    pnls = [bot['total_pnl'] for bot in bots]
+    assert pnls == sorted(pnls, reverse=True)
+
+
+def test_performance_sort_paginates_in_sql(db):
+    everything, _ = crud.get_public_bots(db, limit=1000, sort_by='performance', order='asc')
+    page, total = crud.get_public_bots(db, skip=10, limit=5, sort_by='performance', order='asc')
+    assert [bot['id'] for bot in page] == [bot['id'] for bot in everything[10:15]]
+    filtered, filtered_total = crud.get_public_bots(db, search='trend', sort_by='performance')
+    assert filtered_total == len(filtered) and all(bot['id'] % 3 == 0 for bot in filtered)
+
+
+def test_refresh_single_bot_after_close(db):
+    bot_id = 2
+    sub = db.query(models.Subscription).filter(models.Subscription.bot_id == bot_id).first()
+    db.add(models.Transaction(subscription_id=sub.id, bot_id=bot_id, action='BUY', symbol='ETHUSDT', quantity=1.0,
+                              entry_price=10.0, status='CLOSED', realized_pnl=1000.0))
+    db.commit()
+
+    assert crud.refresh_bot_marketplace_metrics(db, [bot_id]) == 1
+    bots, _ = crud.get_public_bots(db, limit=1, sort_by='total_pnl')
+    assert bots[0]['id'] == bot_id
+    assert bots[0]['total_pnl'] == legacy_bot_metrics(db, bot_id)[0]
+    assert db.query(models.BotMarketplaceMetrics).count() == 40 * 3
@@ -0,0 +1,116 @@
+"""
+Test running performance aggregates: parity with the full recomputation, idempotent closes and rebuild
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import models
+from services import performance_aggregates as aggregates
+
+
+def legacy_metrics(db, bot_id):
+    """Previous update_bot_performance_metrics / update_risk_management_performance math"""
+    transactions = db.query(models.Transaction).filter(
+        models.Transaction.bot_id == bot_id, models.Transaction.status == 'CLOSED'
+    ).all()
+    total = len(transactions)
+    winning = len([t for t in transactions if t.is_winning])
+    losing = total - winning
+    total_pnl = sum(float(t.pnl_usd or 0) for t in transactions)
+    avg_win = sum(float(t.pnl_usd or 0) for t in transactions if t.is_winning) / winning if winning else 0
+    avg_loss = sum(float(t.pnl_usd or 0) for t in transactions if not t.is_winning) / losing if losing else 0
+    slipped = [t for t in transactions if t.slippage]
+    avg_planned_rr = sum(float(t.risk_reward_ratio or 0) for t in transactions) / total
+    avg_actual_rr = sum(float(t.actual_rr_ratio or 0) for t in transactions) / total
+    return {
+        'total_trades': total, 'winning_trades': winning, 'losing_trades': losing,
+        'win_rate': round(winning / total * 100, 2), 'total_pnl': round(total_pnl, 2),
+        'avg_pnl': round(total_pnl / total, 2), 'avg_win': round(avg_win, 2), 'avg_loss': round(avg_loss, 2),
+        'profit_factor': round(abs(avg_win * winning / (avg_loss * losing)), 2) if losing and avg_loss != 0 else 0,
+        'tp_hit_rate': round(len([t for t in transactions if t.exit_reason == 'TP_HIT']) / total * 100, 2),
+        'sl_hit_rate': round(len([t for t in transactions if t.exit_reason == 'SL_HIT']) / total * 100, 2),
+        'avg_planned_rr': round(avg_planned_rr, 2), 'avg_actual_rr': round(avg_actual_rr, 2),
+        'rr_achievement_rate': round(avg_actual_rr / avg_planned_rr * 100, 2) if avg_planned_rr > 0 else 0,
+        'avg_slippage': round(sum(float(t.slippage) for t in slipped) / len(slipped), 4) if slipped else 0,
+    }
+
+
+def closed_trade(rng, tx_id, exit_time, bot_id=1, prompt_id=7):
+    pnl = rng.choice([None, round(rng.uniform(-40, 50), 2)])
+    return models.Transaction(
+        id=tx_id, bot_id=bot_id, prompt_id=prompt_id, action='BUY', symbol='BTCUSDT', quantity=1.0,
+        entry_price=100.0, status='CLOSED', pnl_usd=pnl, is_winning=None if pnl is None else pnl > 0,
+        exit_reason=rng.choice(['TP_HIT', 'SL_HIT', 'MANUAL', None]), exit_time=exit_time,
+        risk_reward_ratio=rng.choice([None, 2.0, 3.0]), actual_rr_ratio=rng.choice([None, -1.0, 1.5, 3.0]),
+        slippage=rng.choice([None, 0.0, 0.01, 0.03]),
+    )
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    models.Base.metadata.create_all(engine, tables=[
+        models.Transaction.__table__, models.PerformanceAggregate.__table__
+    ])
+    session = sessionmaker(bind=engine)()
+    rng = random.Random(11)
+    start = datetime(2025, 1, 1)
+    session.add_all([closed_trade(rng, tx_id, start + timedelta(hours=tx_id)) for tx_id in range(1, 201)])
+    session.add(models.Transaction(id=500, bot_id=1, action='BUY', symbol='BTCUSDT', quantity=1.0,
+                                   entry_price=100.0, status='OPEN'))
+    session.commit()
+    yield session
+    session.close()
+
+
+def assert_matches_legacy(db, aggregate):
+    expected = legacy_metrics(db, 1)
+    derived = {**aggregates.trade_metrics(aggregate), **aggregates.risk_metrics(aggregate)}
+    assert {key: derived[key] for key in expected} == pytest.approx(expected)
+
+
+def test_incremental_closes_match_full_recomputation(db):
+    assert_matches_legacy(db, aggregates.get_aggregate(db, aggregates.BOT, 1))
+
+    rng = random.Random(5)
+    for tx_id in range(201, 261):
+        db.add(closed_trade(rng, tx_id, datetime(2025, 2, 1) + timedelta(hours=tx_id)))
+        db.commit()
+        assert aggregates.apply_closed_trade(db, tx_id)
+
+    incremental = aggregates.get_aggregate(db, aggregates.BOT, 1)
+    assert_matches_legacy(db, incremental)
+    assert aggregates.get_aggregate(db, aggregates.PROMPT, 7).total_trades == 260
+
+    # Rebuild reproduces the incremental state, drawdown included
+    state = {column: getattr(incremental, column) for column in aggregates._COUNTERS}
+    rebuilt = aggregates.rebuild_aggregate(db, aggregates.BOT, 1)
+    assert {column: getattr(rebuilt, column) for column in aggregates._COUNTERS} == pytest.approx(state)
+    assert rebuilt.max_drawdown > 0
+
+
+def test_close_is_applied_once(db):
+    aggregates.get_aggregate(db, aggregates.BOT, 1)
+    assert not aggregates.apply_closed_trade(db, 200)  # Covered by the initial build
+    assert not aggregates.apply_closed_trade(db, 500)  # Still open
+
+    db.add(closed_trade(random.Random(1), 300, datetime(2025, 3, 1)))
+    db.commit()
+    assert aggregates.apply_closed_trade(db, 300)
+    assert not aggregates.apply_closed_trade(db, 300)
+    assert aggregates.get_aggregate(db, aggregates.BOT, 1).total_trades == 201
+
+
+def test_rebuild_corrects_drift(db):
+    aggregates.get_aggregate(db, aggregates.BOT, 1)
+    db.query(models.Transaction).filter(models.Transaction.id <= 50).delete()
+    db.commit()
+
+    assert aggregates.rebuild_all(db) == {aggregates.BOT: 1, aggregates.PROMPT: 1}
+    assert_matches_legacy(db, aggregates.get_aggregate(db, aggregates.BOT, 1))
+    assert aggregates.get_aggregate(db, aggregates.BOT, 2) is None
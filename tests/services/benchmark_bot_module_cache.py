@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: bot initialization code loading, download + exec_module per
+run vs the per-worker bot module cache
+
+S3 is simulated with a fixed latency per request (the legacy path lists the
+versions, lists the version folder and downloads the file; the cache lists
+once per BOT_MODULE_RECHECK_SECONDS). The bot module is a synthetic file of
+the size of the bundled futures bots.
+
+Usage:
+    python tests/services/benchmark_bot_module_cache.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.bot_module_cache import BotModuleCache
+from tests.services.test_bot_module_cache import BOT_CODE, FakeS3
+
+LATENCY = 0.05  # Simulated S3 round trip (seconds)
+HELPERS = "\n".join(
+    f"def indicator_{i}(values, period={i % 50 + 2}):\n"
+    f"    window = values[-period:]\n"
+    f"    return sum(window) / len(window) if window else 0.0\n"
+    for i in range(1500)
+)
+SOURCE = BOT_CODE.format(version=1) + HELPERS
+
+
+class SlowS3(FakeS3):
+    def get_code_object_info(self, *args, **kwargs):
+        time.sleep(LATENCY)
+        return super().get_code_object_info(*args, **kwargs)
+
+    def download_bot_code(self, *args, **kwargs):
+        time.sleep(LATENCY)
+        return super().download_bot_code(*args, **kwargs)
+
+
+def legacy_load(s3: SlowS3, bot_id: int):
+    """Previous flow: resolve version, download, write a temp file, exec_module"""
+    time.sleep(LATENCY)  # get_latest_version listing
+    time.sleep(LATENCY)  # download_bot_code version folder listing
+    code = s3.download_bot_code(bot_id, '20250101_000000')
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+        f.write(code)
+    try:
+        spec = importlib.util.spec_from_file_location("bot_module", f.name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        os.unlink(f.name)
+
+
+def _timed(func, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - start) / runs
+
+
+def run_benchmark(runs: int = 10):
+    s3 = SlowS3()
+    s3.upload('20250101_000000', 'etag-1', SOURCE)
+    cache = BotModuleCache(recheck_seconds=30)
+
+    legacy = _timed(lambda: legacy_load(s3, 1), runs)
+    cold = _timed(lambda: BotModuleCache().load_s3(s3, 1), 1)
+    cache.load_s3(s3, 1)
+    warm = _timed(lambda: cache.load_s3(s3, 1), runs * 100)
+    rechecking = BotModuleCache(recheck_seconds=0)
+    rechecking.load_s3(s3, 1)
+    recheck = _timed(lambda: rechecking.load_s3(s3, 1), runs)
+
+    print(f"📊 BOT CODE LOADING ({len(SOURCE) / 1024:.0f} KB module, {LATENCY * 1000:.0f} ms simulated S3 RTT)")
+    print("=" * 70)
+    print(f"{'download + exec per run':>30}: {legacy * 1000:>10.2f} ms")
+    print(f"{'module cache, cold':>30}: {cold * 1000:>10.2f} ms")
+    print(f"{'module cache, listing due':>30}: {recheck * 1000:>10.2f} ms")
+    print(f"{'module cache, warm':>30}: {warm * 1000:>10.4f} ms ({legacy / warm:,.0f}x)")
+    cache.clear()
+    rechecking.clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
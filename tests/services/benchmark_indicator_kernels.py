@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: legacy pandas loops vs NumPy kernels for Supertrend and Parabolic SAR
+
+Usage:
+    python tests/services/benchmark_indicator_kernels.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from services.indicator_service import AdvancedIndicators
+from tests.services.test_indicator_kernels import make_ohlcv, legacy_supertrend, legacy_parabolic_sar
+
+
+def _best_of(func, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark():
+    indicators = AdvancedIndicators()
+
+    print("📊 RECURSIVE INDICATOR BENCHMARK (best of 3)")
+    print("=" * 70)
+    print(f"{'candles':>8} {'indicator':>12} {'legacy (ms)':>14} {'numpy (ms)':>12} {'speedup':>10}")
+
+    for n in (250, 1000, 5000):
+        df = make_ohlcv(n=n)
+        high, low, close = df['high'], df['low'], df['close']
+
+        cases = [
+            ('supertrend',
+             lambda: legacy_supertrend(indicators, high, low, close),
+             lambda: indicators.calculate_supertrend(high, low, close)),
+            ('psar',
+             lambda: legacy_parabolic_sar(high, low, close),
+             lambda: indicators.calculate_parabolic_sar(high, low, close)),
+        ]
+
+        for name, legacy, current in cases:
+            legacy_time = _best_of(legacy)
+            current_time = _best_of(current)
+            print(f"{n:>8} {name:>12} {legacy_time * 1000:>14.2f} {current_time * 1000:>12.2f} "
+                  f"{legacy_time / current_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: analysis prompt size and build time, indented JSON market data
+rebuilt on every run vs cached static sections with compact candle tables
+
+Market data has the shape the futures bots send (30m x 48, 1h x 24, 4h x 12
+candles plus indicators). Tokens are estimated at ~4 characters per token.
+Exits non-zero when the compact prompt grows past MAX_COMPACT_RATIO of the
+legacy one, so prompt size regressions show up in CI runs of this script.
+
+Usage:
+    python tests/services/benchmark_prompt_size.py
+"""
+
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from services import llm_integration, llm_prompt_builder
+from services.llm_prompt_builder import PromptSectionCache
+from tests.services.test_llm_prompt_builder import build_prompt, make_market_data, make_service
+
+MAX_COMPACT_RATIO = 0.6  # Whole prompt, compact / legacy tokens
+
+
+def _measure(compact: bool, runs: int):
+    """(token report of the last prompt, average build time)"""
+    llm_integration.LLM_COMPACT_PROMPT = compact
+    service = make_service()
+    market_data = [make_market_data(seed=seed) for seed in range(runs)]
+    start = time.perf_counter()
+    for data in market_data:
+        if not compact:
+            # Legacy path: nothing cached, every section is rebuilt
+            llm_prompt_builder._section_cache = PromptSectionCache()
+        build_prompt(service, data)
+    return service.last_prompt_tokens, (time.perf_counter() - start) / runs
+
+
+def run_benchmark(runs: int = 200) -> bool:
+    logging.disable(logging.WARNING)  # Per-build prompt logs
+    original = (llm_integration.LLM_COMPACT_PROMPT, llm_prompt_builder._section_cache)
+    try:
+        legacy, legacy_time = _measure(False, runs)
+        llm_prompt_builder._section_cache = PromptSectionCache()
+        compact, compact_time = _measure(True, runs)
+    finally:
+        llm_integration.LLM_COMPACT_PROMPT, llm_prompt_builder._section_cache = original
+        logging.disable(logging.NOTSET)
+
+    print(f"📊 ANALYSIS PROMPT SIZE (~tokens, {runs} builds)")
+    print("=" * 70)
+    print(f"{'section':>20} {'legacy':>12} {'compact':>12} {'saved':>10}")
+    for name in legacy:
+        before, after = legacy[name], compact.get(name, 0)
+        print(f"{name:>20} {before:>12,} {after:>12,} {1 - after / before:>9.0%}")
+    print(f"{'build time':>20} {legacy_time * 1000:>10.3f}ms {compact_time * 1000:>10.3f}ms "
+          f"{1 - compact_time / legacy_time:>9.0%}")
+
+    ratio = compact['total'] / legacy['total']
+    ok = ratio <= MAX_COMPACT_RATIO
+    print(f"\n{'✅' if ok else '❌'} compact prompt is {ratio:.0%} of legacy (limit {MAX_COMPACT_RATIO:.0%})")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: order preparation (precision lookup + round_quantity) with a
+per-client exchangeInfo fetch vs the shared symbol registry
+
+A fresh client is created per run, as bots did before clients were pooled,
+and the exchange is simulated with a fixed network latency.
+
+Usage:
+    python tests/services/benchmark_symbol_registry.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from services.exchange_integrations import symbol_registry
+from services.exchange_integrations.binance_futures import BinanceFuturesIntegration
+from services.exchange_integrations.symbol_registry import SymbolRegistry
+from tests.services.test_symbol_registry import binance_exchange_info
+from utils.redis_client import reset_redis_client
+
+LATENCY = 0.03  # Simulated exchangeInfo round trip (seconds)
+EXCHANGE_INFO = binance_exchange_info(*[f"COIN{i}USDT" for i in range(500)], 'BTCUSDT')
+
+
+def _fake_exchange(method, endpoint, params=None, signed=False, **options):
+    time.sleep(LATENCY)
+    return EXCHANGE_INFO
+
+
+def legacy_round_quantity(quantity: float, symbol: str) -> str:
+    """Previous flow: every new client fetched exchangeInfo and scanned it"""
+    response = _fake_exchange("GET", "/fapi/v1/exchangeInfo")
+    for sym_info in response['symbols']:
+        if sym_info['symbol'] == symbol:
+            step = float(next(f['stepSize'] for f in sym_info['filters'] if f['filterType'] == 'LOT_SIZE'))
+            return f"{round(quantity / step) * step:.{sym_info['quantityPrecision']}f}"
+
+
+def registry_round_quantity(quantity: float, symbol: str) -> str:
+    client = BinanceFuturesIntegration('', '', testnet=False)
+    client._make_request = _fake_exchange
+    return client.round_quantity(quantity, symbol)
+
+
+def _timed(func, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        func(0.12345, 'BTCUSDT')
+    return (time.perf_counter() - start) / runs
+
+
+def run_benchmark(runs: int = 20):
+    reset_redis_client(None)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        symbol_registry._registry = SymbolRegistry(cache_dir=cache_dir)
+        assert legacy_round_quantity(0.12345, 'BTCUSDT') == registry_round_quantity(0.12345, 'BTCUSDT')
+
+        legacy = _timed(legacy_round_quantity, runs)
+        warm = _timed(registry_round_quantity, runs)
+
+        print(f"📊 ORDER PREPARATION LATENCY ({len(EXCHANGE_INFO['symbols'])} symbols, "
+              f"{LATENCY * 1000:.0f} ms simulated RTT, {runs} runs)")
+        print("=" * 70)
+        print(f"{'per-client exchangeInfo':>28}: {legacy * 1000:>9.3f} ms/order")
+        print(f"{'shared symbol registry':>28}: {warm * 1000:>9.3f} ms/order")
+        print(f"{'speedup':>28}: {legacy / warm:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
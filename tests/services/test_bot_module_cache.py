@@ -0,0 +1,117 @@
+"""
+Test bot module cache: compile once per code version, cheap change detection and LRU eviction
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+from core import bot_module_cache
+from core.bot_module_cache import BotModuleCache
+
+BOT_CODE = '''
+class GridBot:
+    VERSION = {version}
+
+    def execute_algorithm(self, data, timeframe, config):
+        return self.VERSION
+'''
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}  # version -> (etag, code)
+        self.listings = 0
+        self.downloads = 0
+
+    def upload(self, version, etag, code):
+        self.objects[version] = (etag, code)
+
+    def get_code_object_info(self, bot_id, file_type="code", version=None):
+        self.listings += 1
+        latest = version or max(self.objects)
+        return {'version': latest, 'key': f"bots/{bot_id}/code/{latest}/bot.py", 'filename': 'bot.py',
+                'etag': self.objects[latest][0]}
+
+    def download_bot_code(self, bot_id, version=None, filename=None, file_type="code"):
+        self.downloads += 1
+        return self.objects[version][1]
+
+
+@pytest.fixture
+def cache():
+    cache = BotModuleCache(max_modules=8, max_bytes=10 * 1024 * 1024, recheck_seconds=60)
+    yield cache
+    cache.clear()
+
+
+def test_local_file_compiled_once_until_it_changes(cache, tmp_path):
+    path = tmp_path / 'grid_bot.py'
+    path.write_text(BOT_CODE.format(version=1))
+
+    first = cache.load_file(7, str(path))
+    assert cache.load_file(7, str(path)) is first
+    assert first.GridBot().execute_algorithm(None, '1h', {}) == 1
+    assert first.__name__ in sys.modules
+    assert cache.stats['compiles'] == 1 and cache.stats['hits'] == 1
+
+    path.write_text(BOT_CODE.format(version=22))
+    second = cache.load_file(7, str(path))
+    assert second is not first and second.GridBot.VERSION == 22
+
+    # Touched but identical content: re-read, not recompiled
+    os.utime(path, ns=(1, 1))
+    assert cache.load_file(7, str(path)) is second
+    assert cache.stats['compiles'] == 2 and cache.stats['downloads'] == 3
+
+
+def test_s3_listing_is_reused_and_etag_change_reloads(cache, monkeypatch):
+    s3 = FakeS3()
+    s3.upload('20250101_000000', 'etag-1', BOT_CODE.format(version=1))
+
+    module = cache.load_s3(s3, 3, preamble=lambda: "PREAMBLE = True")
+    assert module.PREAMBLE and module.GridBot.VERSION == 1
+    assert cache.load_s3(s3, 3, preamble=lambda: "PREAMBLE = True") is module
+    assert (s3.listings, s3.downloads) == (1, 1)
+
+    s3.upload('20250102_000000', 'etag-2', BOT_CODE.format(version=2))
+    now = time.time()
+    monkeypatch.setattr(bot_module_cache.time, 'time', lambda: now + 61)
+    assert cache.load_s3(s3, 3).GridBot.VERSION == 2
+    assert (s3.listings, s3.downloads) == (2, 2)
+
+
+def test_failed_compile_is_not_cached(cache, tmp_path):
+    path = tmp_path / 'broken.py'
+    path.write_text("raise RuntimeError('boom')\n")
+    with pytest.raises(RuntimeError):
+        cache.load_file(9, str(path))
+    assert cache.info()['modules'] == 0
+    assert not [name for name in sys.modules if name.startswith('bot_module_9_')]
+
+
+def test_lru_eviction_and_evict_bot(tmp_path):
+    cache = BotModuleCache(max_modules=2, max_bytes=10 * 1024 * 1024)
+    modules = {}
+    for bot_id in (1, 2, 3):
+        path = tmp_path / f"bot_{bot_id}.py"
+        path.write_text(BOT_CODE.format(version=bot_id))
+        modules[bot_id] = cache.load_file(bot_id, str(path))
+        if bot_id == 2:
+            cache.load_file(1, str(tmp_path / 'bot_1.py'))  # Bot 1 becomes most recent
+
+    assert cache.info()['modules'] == 2 and cache.stats['evictions'] == 1
+    assert modules[2].__name__ not in sys.modules
+    assert cache.load_file(1, str(tmp_path / 'bot_1.py')) is modules[1]
+
+    cache.evict_bot(1)
+    assert cache.info()['modules'] == 1 and modules[1].__name__ not in sys.modules
+
+    small = BotModuleCache(max_modules=10, max_bytes=1)
+    small.load_file(1, str(tmp_path / 'bot_1.py'))
+    small.load_file(2, str(tmp_path / 'bot_2.py'))
+    assert small.info()['modules'] == 1  # Over the byte cap only the newest module is kept
+    small.clear()
+    cache.clear()
@@ -0,0 +1,76 @@
+"""
+Test process-wide exchange client pool: reuse, idle eviction and health checks
+"""
+
+import time
+
+from services.exchange_integrations import client_pool
+from services.exchange_integrations.client_pool import ExchangeClientPool
+
+
+class FakeClient:
+    def __init__(self, api_key, healthy=True):
+        self.api_key = api_key
+        self.healthy = healthy
+        self.checks = 0
+        self._time_offset = 0
+
+    def test_connectivity(self):
+        self.checks += 1
+        return self.healthy
+
+
+def fake_factory(created):
+    def create(exchange_name, api_key, api_secret, passphrase, testnet):
+        created.append((exchange_name, api_key, testnet))
+        return FakeClient(api_key)
+    return create
+
+
+def test_clients_are_reused_per_credentials_and_network(monkeypatch):
+    created = []
+    monkeypatch.setattr(client_pool, 'create_futures_exchange', fake_factory(created))
+    pool = ExchangeClientPool(idle_ttl=60, health_interval=60)
+
+    first = pool.get_client('binance', 'key', 'secret', '', True)
+    first._time_offset = -120  # Warm state survives the next run
+    again = pool.get_client('BINANCE', 'key', 'secret', '', True)
+    mainnet = pool.get_client('BINANCE', 'key', 'secret', '', False)
+    other = pool.get_client('BINANCE', 'key', 'other-secret', '', True)
+
+    assert again is first and again._time_offset == -120
+    assert mainnet is not first and other is not first
+    assert len(created) == 3
+    assert pool.get_stats() == {'hits': 1, 'misses': 3, 'evictions': 0, 'health_failures': 0, 'size': 3}
+    assert all('key' not in str(part) for key in pool._clients for part in key[2:])
+
+
+def test_idle_clients_are_evicted_and_size_bounded(monkeypatch):
+    created = []
+    monkeypatch.setattr(client_pool, 'create_futures_exchange', fake_factory(created))
+    pool = ExchangeClientPool(idle_ttl=0.05, health_interval=60, max_size=2)
+
+    pool.get_client('BYBIT', 'a', 's', '', True)
+    time.sleep(0.06)
+    pool.get_client('BYBIT', 'a', 's', '', True)
+    assert len(created) == 2
+
+    pool.get_client('BYBIT', 'b', 's', '', True)
+    pool.get_client('BYBIT', 'c', 's', '', True)
+    assert pool.get_stats()['size'] == 2
+    assert pool.get_stats()['evictions'] == 2
+
+
+def test_unhealthy_client_is_replaced(monkeypatch):
+    created = []
+    monkeypatch.setattr(client_pool, 'create_futures_exchange', fake_factory(created))
+    pool = ExchangeClientPool(idle_ttl=60, health_interval=0)
+
+    first = pool.get_client('OKX', 'k', 's', 'p', True)
+    assert pool.get_client('OKX', 'k', 's', 'p', True) is first
+    assert first.checks == 1
+
+    first.healthy = False
+    replacement = pool.get_client('OKX', 'k', 's', 'p', True)
+    assert replacement is not first
+    assert pool.get_stats()['health_failures'] == 1
@@ -0,0 +1,121 @@
+"""
+Test per-worker decrypted credential cache and its invalidation
+"""
+
+import json
+import queue
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import models, api_key_manager as api_key_manager_module
+from core import credential_cache as credential_cache_module
+from core.api_key_manager import api_key_manager, get_bot_api_keys
+from core.credential_cache import CredentialCache, PRINCIPAL, DEVELOPER
+from utils.redis_client import reset_redis_client
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.subscribed = threading.Event()
+
+    def subscribe(self, channel):
+        self.redis.subscribers.append(self)
+        self.messages = queue.Queue()
+        self.subscribed.set()
+
+    def get_message(self, timeout=0.0):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class FakeRedis:
+    def __init__(self):
+        self.subscribers = []
+        self.published = []
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        self.last_pubsub = FakePubSub(self)
+        return self.last_pubsub
+
+    def publish(self, channel, data):
+        self.published.append((channel, json.loads(data)))
+        for subscriber in self.subscribers:
+            subscriber.messages.put({'type': 'message', 'channel': channel, 'data': data})
+        return len(self.subscribers)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine('sqlite://')
+    models.Base.metadata.create_all(engine, tables=[
+        models.User.__table__, models.Bot.__table__, models.Subscription.__table__,
+        models.ExchangeCredentials.__table__
+    ])
+    session = sessionmaker(bind=engine)()
+    reset_redis_client(None)
+    monkeypatch.setattr(credential_cache_module, 'credential_cache', CredentialCache(ttl=60))
+    monkeypatch.setattr(api_key_manager_module, 'credential_cache', credential_cache_module.credential_cache)
+    monkeypatch.setattr(session, 'close', lambda: None)
+    monkeypatch.setattr(api_key_manager_module, 'get_db', lambda: iter([session]))
+    assert api_key_manager.store_user_exchange_credentials_by_principal_id(
+        session, 'alice', 'BINANCE', 'key-1', 'secret-1', is_testnet=True, credential_type='FUTURES')
+    yield session
+    session.close()
+
+
+def test_bot_keys_are_cached_until_credentials_change(db, monkeypatch):
+    decrypted = []
+    original = api_key_manager.decrypt_api_key
+    monkeypatch.setattr(api_key_manager, 'decrypt_api_key', lambda value: decrypted.append(value) or original(value))
+
+    first = get_bot_api_keys('alice', 'BINANCE', True)
+    assert first['api_key'] == 'key-1'
+    calls = len(decrypted)
+    first['api_key'] = 'mutated'
+    assert get_bot_api_keys('alice', 'BINANCE', True)['api_key'] == 'key-1'
+    assert len(decrypted) == calls  # Served from memory
+
+    api_key_manager.store_user_exchange_credentials_by_principal_id(
+        db, 'alice', 'BINANCE', 'key-2', 'secret-2', is_testnet=True, credential_type='FUTURES')
+    assert get_bot_api_keys('alice', 'BINANCE', True)['api_key'] == 'key-2'
+    assert credential_cache_module.credential_cache.stats['invalidations'] == 1
+
+
+def test_entries_expire_and_invalidate_by_owner():
+    cache = CredentialCache(ttl=0.05)
+    cache.set(('alice', 'BINANCE', True, None), (PRINCIPAL, 'alice'), {'api_key': 'a'})
+    cache.set(('alice', 'BINANCE', True, 7), (DEVELOPER, 3), {'api_key': 'd'})
+    cache.set(('bob', 'BINANCE', True, None), (PRINCIPAL, 'bob'), {'api_key': 'b'})
+
+    assert cache.invalidate_local(DEVELOPER, '3') == 1
+    assert cache.get(('alice', 'BINANCE', True, 7)) is None
+    assert cache.get(('alice', 'BINANCE', True, None)) == {'api_key': 'a'}
+    time.sleep(0.06)
+    assert cache.get(('bob', 'BINANCE', True, None)) is None
+
+
+def test_invalidation_reaches_other_workers():
+    redis = FakeRedis()
+    reset_redis_client(redis)
+    try:
+        worker = CredentialCache(ttl=60)
+        worker.get('warmup')  # Starts the listener
+        assert redis.last_pubsub.subscribed.wait(2)
+        worker.set('k', (PRINCIPAL, 'alice'), {'api_key': 'a'})
+
+        CredentialCache(ttl=60).invalidate(PRINCIPAL, 'alice')
+
+        assert redis.published == [('credentials:invalidate', {'kind': 'principal', 'owner': 'alice'})]
+        deadline = time.monotonic() + 2
+        while worker.stats['invalidations'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert worker.get('k') is None
+    finally:
+        reset_redis_client(None)
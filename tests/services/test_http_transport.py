@@ -0,0 +1,116 @@
+"""
+Test pooled exchange HTTP transport against a local keep-alive server
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+import pytest
+import requests
+
+from services.exchange_integrations.binance_futures import BinanceFuturesIntegration
+from services.exchange_integrations.http_transport import (
+    close_transports, get_transport, get_transport_stats
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/fapi/v1/ping':
+            self._reply(200, {})
+        elif url.path == '/fapi/v1/time':
+            self._reply(200, {'serverTime': 1_700_000_000_000})
+        elif url.path == '/fapi/v1/order':
+            self._reply(400, {'code': -2019, 'msg': 'Margin is insufficient.'})
+        else:
+            self._reply(200, {'path': url.path, 'query': url.query, 'params': dict(parse_qsl(url.query))})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        self._reply(200, {'body': body, 'content_type': self.headers.get('Content-Type')})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    close_transports()
+
+
+def test_sync_requests_reuse_one_connection(server):
+    transport = get_transport('TEST')
+    for i in range(5):
+        response = transport.request('GET', f"{server}/echo", params={'symbol': 'BTCUSDT', 'i': i, 'skip': None})
+        assert response.json()['query'] == f"symbol=BTCUSDT&i={i}"
+
+    posted = transport.request('POST', f"{server}/echo", data={'side': 'BUY', 'qty': 0.5}).json()
+    assert posted == {'body': 'side=BUY&qty=0.5', 'content_type': 'application/x-www-form-urlencoded'}
+
+    stats = transport.get_stats()
+    assert stats['requests'] == 6
+    assert stats['errors'] == 0
+    assert stats['in_flight'] == 0
+    assert stats['connections_opened'] == 1
+    assert stats['latency_max_ms'] >= stats['latency_p50_ms'] > 0
+
+
+def test_async_requests_from_caller_loop(server):
+    transport = get_transport('TEST')
+
+    async def fetch_all():
+        return await asyncio.gather(*[
+            transport.arequest('POST', f"{server}/echo", json={'n': n}) for n in range(10)
+        ])
+
+    responses = asyncio.run(fetch_all())
+    assert sorted(json.loads(r.json()['body'])['n'] for r in responses) == list(range(10))
+    assert transport.get_stats()['requests'] == 10
+
+
+def test_errors_are_requests_compatible(server):
+    transport = get_transport('TEST')
+    response = transport.request('GET', f"{server}/fapi/v1/order")
+    with pytest.raises(requests.exceptions.HTTPError) as info:
+        response.raise_for_status()
+    assert info.value.response.json()['code'] == -2019
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.request('GET', 'http://127.0.0.1:1/unreachable', timeout=2)
+    stats = transport.get_stats()
+    assert stats['http_errors'] == 1
+    assert stats['errors'] == 1
+
+
+def test_exchange_sync_and_async_api_share_transport(server):
+    client = BinanceFuturesIntegration('key', 'secret', testnet=True)
+    client.base_url = server
+
+    assert client.test_connectivity()
+    assert asyncio.run(client._amake_request('GET', '/fapi/v1/ping')) == {}
+    with pytest.raises(Exception, match='Binance API error -2019'):
+        client._make_request('GET', '/fapi/v1/order', {'symbol': 'BTCUSDT'}, signed=True)
+
+    stats = get_transport_stats()['BINANCE']
+    # ping, async ping, server time sync, signed order
+    assert stats['requests'] == 4
+    assert stats['connections_opened'] == 1
@@ -0,0 +1,162 @@
+"""
+Test streaming indicator engine
+Streaming updates must reproduce the AdvancedIndicators batch values
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from services.indicator_service import AdvancedIndicators
+from services.incremental_indicators import IncrementalIndicatorState, load_incremental_state
+from tests.services.test_indicator_kernels import make_ohlcv
+from utils.redis_client import reset_redis_client
+
+HOUR_MS = 3600_000
+
+CONFIG = {
+    'enabled_categories': {'trend': True, 'momentum': True, 'volatility': True, 'volume': True},
+    'enabled_indicators': {
+        'sma': [20, 50], 'ema': [9, 21], 'adx': True, 'rsi': True, 'macd': True,
+        'atr': True, 'bollinger_bands': True, 'obv': True
+    },
+    'indicator_periods': {'rsi_period': 14, 'atr_period': 14, 'bollinger_period': 20}
+}
+
+
+def _frame(n=400, seed=3):
+    df = make_ohlcv(n=n, seed=seed)
+    df['timestamp'] = np.arange(n, dtype='int64') * HOUR_MS
+    return df
+
+
+def _stream(df, state):
+    rows = []
+    for r in df.itertuples():
+        state.update(r.timestamp, r.open, r.high, r.low, r.close, r.volume)
+        rows.append(state.snapshot())
+    return pd.DataFrame(rows)
+
+
+def _assert_close(actual, expected):
+    np.testing.assert_allclose(
+        np.asarray(actual, dtype=float), np.asarray(expected, dtype=float), rtol=1e-9, atol=1e-9
+    )
+
+
+def test_streaming_matches_batch_indicators():
+    df = _frame()
+    ind = AdvancedIndicators()
+    streamed = _stream(df, IncrementalIndicatorState('BTCUSDT', '1h', sma_periods=[20], ema_periods=[21]))
+
+    macd, signal, hist = ind.calculate_macd(df['close'])
+    adx, plus_di, minus_di = ind.calculate_adx(df['high'], df['low'], df['close'])
+    bb_upper, bb_middle, bb_lower = ind.calculate_bollinger_bands(df['close'])
+
+    _assert_close(streamed['sma_20'], ind.calculate_sma(df['close'], 20))
+    _assert_close(streamed['ema_21'], ind.calculate_ema(df['close'], 21))
+    _assert_close(streamed['rsi'], ind.calculate_rsi_wilder(df['close'], 14))
+    _assert_close(streamed['macd'], macd)
+    _assert_close(streamed['macd_signal'], signal)
+    _assert_close(streamed['macd_histogram'], hist)
+    _assert_close(streamed['atr'], ind.calculate_atr(df['high'], df['low'], df['close']))
+    _assert_close(streamed['adx'], adx)
+    _assert_close(streamed['plus_di'], plus_di)
+    _assert_close(streamed['minus_di'], minus_di)
+    _assert_close(streamed['bb_upper'], bb_upper)
+    _assert_close(streamed['bb_lower'], bb_lower)
+
+
+def test_state_survives_serialization():
+    df = _frame()
+    uninterrupted = IncrementalIndicatorState('BTCUSDT', '1h', sma_periods=[20], ema_periods=[9])
+    uninterrupted.update_from_frame(df)
+
+    resumed = IncrementalIndicatorState('BTCUSDT', '1h', sma_periods=[20], ema_periods=[9])
+    resumed.update_from_frame(df.iloc[:250])
+    resumed = IncrementalIndicatorState.from_dict(json.loads(json.dumps(resumed.to_dict())))
+    resumed.update_from_frame(df.iloc[250:])
+
+    expected = uninterrupted.snapshot()
+    actual = resumed.snapshot()
+    for name, value in expected.items():
+        assert np.isclose(actual[name], value, rtol=1e-9, equal_nan=True), name
+
+
+def test_vectorized_rebuild_matches_replay():
+    df = _frame()
+    df = pd.concat([df.iloc[:200], df.iloc[150:160], df.iloc[200:]], ignore_index=True)  # Overlap is skipped
+    for rows in (5, 30, len(df)):  # Still warming up, partly warm, warm
+        replayed = IncrementalIndicatorState('BTCUSDT', '1h', sma_periods=[20, 50], ema_periods=[9, 21])
+        rebuilt = IncrementalIndicatorState('BTCUSDT', '1h', sma_periods=[20, 50], ema_periods=[9, 21])
+        assert rebuilt.rebuild_from_frame(df.iloc[:rows]) == replayed.update_from_frame(df.iloc[:rows])
+
+        assert (rebuilt.count, rebuilt.last_timestamp) == (replayed.count, replayed.last_timestamp)
+        for name, value in replayed.snapshot().items():
+            assert np.isclose(rebuilt.snapshot()[name], value, rtol=1e-9, equal_nan=True), (rows, name)
+
+        # Later updates continue identically
+        tail = _frame(n=420).iloc[400:]
+        tail['timestamp'] += int(df['timestamp'].iloc[rows - 1]) + HOUR_MS - int(tail['timestamp'].iloc[0])
+        replayed.update_from_frame(tail)
+        rebuilt.update_from_frame(tail)
+        for name, value in replayed.snapshot().items():
+            assert np.isclose(rebuilt.snapshot()[name], value, rtol=1e-9, equal_nan=True), (rows, name)
+
+
+def test_old_candles_are_ignored():
+    df = _frame(n=100)
+    state = IncrementalIndicatorState('BTCUSDT', '1h')
+    assert state.update_from_frame(df) == 100
+    assert state.update_from_frame(df) == 0
+    assert state.count == 100
+
+
+def test_load_applies_only_new_candles():
+    reset_redis_client(None)
+    df = _frame(n=300)
+    first = load_incremental_state('BINANCE', True, 'BTCUSDT', '1h', CONFIG, df.iloc[:250])
+    assert first.count == 250
+
+    second = load_incremental_state('BINANCE', True, 'BTCUSDT', '1h', CONFIG, df.iloc[1:251])
+    assert second.count == 251
+    assert second.last_timestamp == int(df['timestamp'].iloc[250])
+
+    # Gap: stored last candle is not inside the new window, so the state is rebuilt
+    rebuilt = load_incremental_state('BINANCE', True, 'BTCUSDT', '1h', CONFIG, df.iloc[260:300])
+    assert rebuilt.count == 40
+
+
+def test_selected_indicators_with_state_match_full_recompute():
+    reset_redis_client(None)
+    df = _frame(n=250, seed=11).set_index(pd.to_datetime(np.arange(250) * HOUR_MS, unit='ms'))
+    ind = AdvancedIndicators()
+    state = load_incremental_state('BYBIT', False, 'ETHUSDT', '4h', CONFIG, df)
+
+    full = ind.calculate_selected_indicators(df, CONFIG)
+    streamed = ind.calculate_selected_indicators(df, CONFIG, state=state)
+
+    for name in ('sma_20', 'sma_50', 'ema_9', 'ema_21'):
+        assert np.isclose(full['trend'][name], streamed['trend'][name]), name
+    assert np.isclose(full['momentum']['rsi']['value'], streamed['momentum']['rsi']['value'])
+    assert np.isclose(full['momentum']['macd']['macd'], streamed['momentum']['macd']['macd'])
+    assert np.isclose(full['volatility']['atr']['value'], streamed['volatility']['atr']['value'])
+    assert np.isclose(full['trend']['adx']['value'], streamed['trend']['adx']['value'])
+    assert np.isclose(full['volatility']['bollinger_bands']['upper'],
+                      streamed['volatility']['bollinger_bands']['upper'])
+    assert full['volume']['obv']['value'] == streamed['volume']['obv']['value']
+
+
+def test_obv_follows_the_window_not_the_state_history():
+    reset_redis_client(None)
+    df = _frame(n=400, seed=5).set_index(pd.to_datetime(np.arange(400) * HOUR_MS, unit='ms'))
+    ind = AdvancedIndicators()
+    load_incremental_state('BINANCE', False, 'BTCUSDT', '1h', CONFIG, df.iloc[:200])
+    window = df.iloc[150:400]  # The state has seen 150 candles before this window
+    state = load_incremental_state('BINANCE', False, 'BTCUSDT', '1h', CONFIG, window)
+    assert state.count == 400 and 'obv' not in state.snapshot()
+
+    streamed = ind.calculate_selected_indicators(window, CONFIG, state=state)
+    expected = ind.calculate_obv(window['close'], window['volume']).iloc[-1]
+    assert streamed['volume']['obv']['value'] == expected
@@ -0,0 +1,147 @@
+"""
+Test array-backed Supertrend and Parabolic SAR
+Compares the NumPy kernels against the original per-bar pandas implementations
+"""
+
+import numpy as np
+import pandas as pd
+
+from services.indicator_service import AdvancedIndicators
+
+
+def make_ohlcv(n: int = 1500, seed: int = 7) -> pd.DataFrame:
+    """Random-walk candles with realistic wicks"""
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 120, n))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) + rng.uniform(0, 80, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 80, n)
+    volume = rng.uniform(10, 500, n)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume})
+
+
+def legacy_supertrend(indicators, high, low, close, period=10, multiplier=3.0):
+    """Original Series-based Supertrend loop"""
+    atr = indicators.calculate_atr(high, low, close, period)
+    hl_avg = (high + low) / 2
+    upper_band = hl_avg + (multiplier * atr)
+    lower_band = hl_avg - (multiplier * atr)
+    final_upper = upper_band.copy()
+    final_lower = lower_band.copy()
+    supertrend = pd.Series(index=close.index, dtype=float)
+    direction = pd.Series(index=close.index, dtype=float)
+
+    for i in range(period, len(close)):
+        if upper_band.iloc[i] < final_upper.iloc[i-1] or close.iloc[i-1] > final_upper.iloc[i-1]:
+            final_upper.iloc[i] = upper_band.iloc[i]
+        else:
+            final_upper.iloc[i] = final_upper.iloc[i-1]
+        if lower_band.iloc[i] > final_lower.iloc[i-1] or close.iloc[i-1] < final_lower.iloc[i-1]:
+            final_lower.iloc[i] = lower_band.iloc[i]
+        else:
+            final_lower.iloc[i] = final_lower.iloc[i-1]
+
+        if i == period:
+            supertrend.iloc[i] = final_upper.iloc[i]
+            direction.iloc[i] = -1
+        else:
+            if supertrend.iloc[i-1] == final_upper.iloc[i-1] and close.iloc[i] <= final_upper.iloc[i]:
+                supertrend.iloc[i] = final_upper.iloc[i]
+                direction.iloc[i] = -1
+            elif supertrend.iloc[i-1] == final_upper.iloc[i-1] and close.iloc[i] > final_upper.iloc[i]:
+                supertrend.iloc[i] = final_lower.iloc[i]
+                direction.iloc[i] = 1
+            elif supertrend.iloc[i-1] == final_lower.iloc[i-1] and close.iloc[i] >= final_lower.iloc[i]:
+                supertrend.iloc[i] = final_lower.iloc[i]
+                direction.iloc[i] = 1
+            elif supertrend.iloc[i-1] == final_lower.iloc[i-1] and close.iloc[i] < final_lower.iloc[i]:
+                supertrend.iloc[i] = final_upper.iloc[i]
+                direction.iloc[i] = -1
+
+    return supertrend, direction
+
+
+def legacy_parabolic_sar(high, low, close, af=0.02, max_af=0.2):
+    """Original Series-based Parabolic SAR loop"""
+    sar = pd.Series(index=close.index, dtype=float)
+    ep = pd.Series(index=close.index, dtype=float)
+    af_series = pd.Series(index=close.index, dtype=float)
+    trend = pd.Series(index=close.index, dtype=float)
+    sar.iloc[0] = low.iloc[0]
+    ep.iloc[0] = high.iloc[0]
+    af_series.iloc[0] = af
+    trend.iloc[0] = 1
+
+    for i in range(1, len(close)):
+        sar.iloc[i] = sar.iloc[i-1] + af_series.iloc[i-1] * (ep.iloc[i-1] - sar.iloc[i-1])
+        if trend.iloc[i-1] == 1:
+            if low.iloc[i] < sar.iloc[i]:
+                trend.iloc[i] = -1
+                sar.iloc[i] = ep.iloc[i-1]
+                ep.iloc[i] = low.iloc[i]
+                af_series.iloc[i] = af
+            else:
+                trend.iloc[i] = 1
+                if high.iloc[i] > ep.iloc[i-1]:
+                    ep.iloc[i] = high.iloc[i]
+                    af_series.iloc[i] = min(af_series.iloc[i-1] + af, max_af)
+                else:
+                    ep.iloc[i] = ep.iloc[i-1]
+                    af_series.iloc[i] = af_series.iloc[i-1]
+        else:
+            if high.iloc[i] > sar.iloc[i]:
+                trend.iloc[i] = 1
+                sar.iloc[i] = ep.iloc[i-1]
+                ep.iloc[i] = high.iloc[i]
+                af_series.iloc[i] = af
+            else:
+                trend.iloc[i] = -1
+                if low.iloc[i] < ep.iloc[i-1]:
+                    ep.iloc[i] = low.iloc[i]
+                    af_series.iloc[i] = min(af_series.iloc[i-1] + af, max_af)
+                else:
+                    ep.iloc[i] = ep.iloc[i-1]
+                    af_series.iloc[i] = af_series.iloc[i-1]
+
+    return sar
+
+
+def test_supertrend_matches_legacy():
+    indicators = AdvancedIndicators()
+    for seed in (1, 7, 42):
+        df = make_ohlcv(seed=seed)
+        for period, multiplier in ((10, 3.0), (7, 2.0)):
+            expected_st, expected_dir = legacy_supertrend(
+                indicators, df['high'], df['low'], df['close'], period, multiplier
+            )
+            st, direction = indicators.calculate_supertrend(
+                df['high'], df['low'], df['close'], period, multiplier
+            )
+            pd.testing.assert_series_equal(st, expected_st, check_names=False)
+            pd.testing.assert_series_equal(direction, expected_dir, check_names=False)
+
+
+def test_parabolic_sar_matches_legacy():
+    indicators = AdvancedIndicators()
+    for seed in (1, 7, 42):
+        df = make_ohlcv(seed=seed)
+        expected = legacy_parabolic_sar(df['high'], df['low'], df['close'])
+        sar = indicators.calculate_parabolic_sar(df['high'], df['low'], df['close'])
+        pd.testing.assert_series_equal(sar, expected, check_names=False)
+
+
+def test_short_input_keeps_warmup_nan():
+    indicators = AdvancedIndicators()
+    df = make_ohlcv(n=8)
+    st, direction = indicators.calculate_supertrend(df['high'], df['low'], df['close'])
+    assert st.isna().all() and direction.isna().all()
+    assert len(indicators.calculate_parabolic_sar(df['high'], df['low'], df['close'])) == 8
+
+
+def test_preserves_index():
+    indicators = AdvancedIndicators()
+    df = make_ohlcv(n=200)
+    df.index = pd.date_range('2024-01-01', periods=200, freq='h')
+    st, _ = indicators.calculate_supertrend(df['high'], df['low'], df['close'])
+    sar = indicators.calculate_parabolic_sar(df['high'], df['low'], df['close'])
+    assert st.index.equals(df.index) and sar.index.equals(df.index)
@@ -0,0 +1,150 @@
+"""
+Test shared kline cache
+Verifies closed candles are fetched once and served to every subscriber
+"""
+
+import time
+
+import pandas as pd
+
+from services.exchange_integrations.kline_cache import KlineCache
+from utils.redis_client import reset_redis_client
+
+HOUR_MS = 60 * 60_000
+
+
+class FakeExchange:
+    """Generates deterministic hourly candles and records every fetch"""
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, symbol, interval, limit, start_time, end_time):
+        self.calls.append((start_time, end_time, limit))
+        first = -(-start_time // HOUR_MS) * HOUR_MS
+        rows = []
+        ts = first
+        while ts <= end_time and len(rows) < limit:
+            price = float(ts // HOUR_MS % 1000)
+            rows.append([ts, price, price + 2, price - 2, price + 1, 10.0])
+            ts += HOUR_MS
+        df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
+
+def _window(now_ms, lookback):
+    last_closed_open = (now_ms // HOUR_MS) * HOUR_MS - HOUR_MS
+    end_time = last_closed_open + HOUR_MS - 1
+    start_time = last_closed_open - (lookback - 1) * HOUR_MS
+    return start_time, end_time
+
+
+def _get(cache, exchange, start_time, end_time, limit, testnet=True):
+    return cache.get_klines(
+        exchange='BINANCE', market='futures', testnet=testnet, symbol='BTCUSDT', interval='1h',
+        limit=limit, start_time=start_time, end_time=end_time, fetch=exchange.fetch
+    )
+
+
+def test_second_subscriber_is_served_from_cache():
+    reset_redis_client(None)
+    cache = KlineCache()
+    exchange = FakeExchange()
+    start_time, end_time = _window(int(time.time() * 1000), 100)
+
+    first = _get(cache, exchange, start_time, end_time, 100)
+    second = _get(cache, exchange, start_time, end_time, 100)
+
+    assert len(exchange.calls) == 1
+    assert len(first) == 100
+    pd.testing.assert_frame_equal(first.reset_index(drop=True), second.reset_index(drop=True))
+    assert pd.api.types.is_datetime64_any_dtype(second['timestamp'])
+    stats = cache.get_stats()
+    assert stats['misses'] == 1 and stats['hits'] == 1
+
+
+def test_new_closed_candle_is_fetched_incrementally(monkeypatch):
+    reset_redis_client(None)
+    cache = KlineCache()
+    exchange = FakeExchange()
+    now_ms = int(time.time() * 1000)
+    start_time, end_time = _window(now_ms, 50)
+    _get(cache, exchange, start_time, end_time, 50)
+
+    later = now_ms + HOUR_MS
+    monkeypatch.setattr(time, 'time', lambda: later / 1000)
+    start_time, end_time = _window(later, 50)
+    df = _get(cache, exchange, start_time, end_time, 50)
+
+    assert len(df) == 50
+    assert exchange.calls[-1][2] == 1
+    assert cache.get_stats()['incremental'] == 1
+
+
+def test_networks_are_cached_separately():
+    reset_redis_client(None)
+    cache = KlineCache()
+    exchange = FakeExchange()
+    start_time, end_time = _window(int(time.time() * 1000), 20)
+
+    _get(cache, exchange, start_time, end_time, 20, testnet=True)
+    _get(cache, exchange, start_time, end_time, 20, testnet=False)
+
+    assert len(exchange.calls) == 2
+
+
+def test_forming_candle_bypasses_cache():
+    reset_redis_client(None)
+    cache = KlineCache()
+    exchange = FakeExchange()
+    now_ms = int(time.time() * 1000)
+
+    _get(cache, exchange, now_ms - 10 * HOUR_MS, now_ms, 20)
+    _get(cache, exchange, now_ms - 10 * HOUR_MS, now_ms, 20)
+
+    assert len(exchange.calls) == 2
+    assert cache.get_stats()['bypass'] == 2
+
+
+class LatestOnlyExchange(FakeExchange):
+    """Ignores start/end like the OKX, Huobi and Kraken fetchers: latest `limit` candles incl. the forming one"""
+
+    def fetch(self, symbol, interval, limit, start_time, end_time):
+        self.calls.append((start_time, end_time, limit))
+        forming_open = (int(time.time() * 1000) // HOUR_MS) * HOUR_MS
+        rows = []
+        for ts in range(forming_open - (limit - 1) * HOUR_MS, forming_open + 1, HOUR_MS):
+            price = float(ts // HOUR_MS % 1000)
+            rows.append([ts, price, price + 2, price - 2, price + 1, 10.0])
+        df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
+
+def test_range_ignoring_exchange_is_never_served_stale(monkeypatch):
+    reset_redis_client(None)
+    cache = KlineCache()
+    complete = FakeExchange()
+    latest_only = LatestOnlyExchange()
+    now_ms = int(time.time() * 1000)
+    start_time, end_time = _window(now_ms, 48)
+    _get(cache, complete, start_time, end_time, 48)  # Series cached, e.g. by another worker
+
+    for tick in range(1, 5):
+        later = now_ms + tick * HOUR_MS
+        monkeypatch.setattr(time, 'time', lambda later=later: later / 1000)
+        start_time, end_time = _window(later, 48)
+        df = _get(cache, latest_only, start_time, end_time, 48)
+
+        last_closed_open = (later // HOUR_MS) * HOUR_MS - HOUR_MS
+        served = df['timestamp'].values.astype('datetime64[ms]').astype('int64')
+        closed = served[(served >= start_time) & (served <= last_closed_open)]
+        assert len(closed) == 48 and closed.max() == last_closed_open
+
+        series = cache._series[('BINANCE', 'futures', 'BTCUSDT', '1h', 'testnet')]
+        cached = series.frame['ts'].values
+        assert (cached[1:] - cached[:-1] == HOUR_MS).all()  # Coverage never spans a gap
+        assert series.covered_to == cached.max()
+
+    assert cache.get_stats()['incomplete'] > 0
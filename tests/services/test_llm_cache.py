@@ -0,0 +1,134 @@
+"""
+Test shared LLM response cache: LRU, candle-close TTL, single-flight and metrics
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.llm_cache import (
+    LLMResponseCache, LLMCacheMixin, candle_open_time, seconds_until_candle_close, market_state_key
+)
+from utils.redis_client import reset_redis_client
+
+
+@pytest.fixture(autouse=True)
+def local_only():
+    reset_redis_client(None)
+
+
+def test_ttl_follows_shortest_candle_close():
+    cache = LLMResponseCache()
+    now = 1_700_000_000 + 600  # 10 minutes into an hour (1_700_000_000 is xx:13:20)
+    hour_open = now // 3600 * 3600
+    assert candle_open_time(['4h', '1h'], now) == hour_open
+    assert seconds_until_candle_close(['4h', '1h'], now) == hour_open + 3600 - now
+    assert cache.ttl_for(['1h'], now) == hour_open + 3600 - now
+    assert cache.ttl_for(None) == cache.default_ttl
+    # Weekly candles open on Monday 00:00 UTC
+    monday = 1_699_833_600  # 2023-11-13 00:00 UTC
+    assert candle_open_time(['1w'], monday + 3 * 86400) == monday
+
+
+def test_lru_eviction_and_expiry():
+    cache = LLMResponseCache(max_entries=2)
+    cache.set('a', {'v': 1}, ttl=60)
+    cache.set('b', {'v': 2}, ttl=60)
+    assert cache.get('a') == {'v': 1}   # 'a' becomes most recent
+    cache.set('c', {'v': 3}, ttl=60)     # evicts 'b'
+    assert cache.get('b') is None
+    assert cache.get('a') == {'v': 1}
+
+    cache.set('d', {'v': 4}, ttl=1)
+    cache._entries['d']['expires_at'] = time.time() - 1
+    assert cache.get('d') is None
+
+
+def test_single_flight_computes_once():
+    cache = LLMResponseCache()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'action': 'BUY'}
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute, ttl=60, cost_of=lambda _: 0.01)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{'action': 'BUY'}] * 5
+    stats = cache.get_stats()
+    assert stats['computes'] == 1
+    assert stats['single_flight_hits'] == 4
+    assert stats['cost_saved_usd'] == pytest.approx(0.04)
+
+
+def test_errors_are_not_cached_async():
+    cache = LLMResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {'error': 'rate limited'}
+
+    async def run():
+        for _ in range(2):
+            await cache.aget_or_compute('k', compute, ttl=60, should_cache=lambda r: 'error' not in r)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_bot_mixin_scopes_by_bot_and_candle():
+    class Bot(LLMCacheMixin):
+        def __init__(self, bot_id):
+            self.bot_id = bot_id
+            self.llm_model = 'openai'
+            self.timeframes = ['1h', '4h']
+
+    first, other = Bot(1), Bot(2)
+    assert first._acquire_llm_lock('BTC/USDT')
+    assert not Bot(1)._acquire_llm_lock('BTCUSDT')    # same key, held
+    assert other._acquire_llm_lock('BTCUSDT')         # other bot, own key
+    first._cache_llm_result('BTC/USDT', first.timeframes, {'action': 'SELL'})
+    first._release_llm_lock('BTC/USDT')
+
+    assert Bot(1)._get_cached_llm_result('BTCUSDT', ['4h', '1h']) == {'action': 'SELL'}
+    assert other._get_cached_llm_result('BTCUSDT', other.timeframes) is None
+
+
+def test_market_state_key_uses_last_closed_candles():
+    hour_ms = 3600_000
+    now = 1_700_000_000 // 3600 * 3600 + 600  # 10 minutes into the forming hour
+    forming_open = (now // 3600) * hour_ms
+
+    def candles(n, close=100.0):
+        start = forming_open - (n - 1) * hour_ms
+        return [{'timestamp': start + i * hour_ms, 'open': 1.0, 'high': 2.0, 'low': 0.5,
+                 'close': close + i, 'volume': 10.0} for i in range(n)]
+
+    full = market_state_key('BTC/USDT', {'1h': candles(500)}, 'openai', bot_id=7, now=now)
+    # Shorter window and a different forming candle describe the same state
+    short = candles(500)[-50:]
+    short[-1] = dict(short[-1], close=1.0)
+    assert market_state_key('BTCUSDT', {'1h': short}, 'openai', bot_id=7, now=now) == full
+    assert f"1h={forming_open - hour_ms}" in full
+
+    assert market_state_key('BTCUSDT', {'1h': candles(500)}, 'claude', bot_id=7, now=now) != full
+    assert market_state_key('BTCUSDT', {'1h': candles(500)}, 'openai', bot_id=8, now=now) != full
+    assert market_state_key('BTCUSDT', {'1h': candles(500)}, 'openai', bot_id=7,
+                            prompt_version='2', now=now) != full
+    # A revised closed candle changes the digest
+    revised = candles(500)
+    revised[-2] = dict(revised[-2], close=0.0)
+    assert market_state_key('BTCUSDT', {'1h': revised}, 'openai', bot_id=7, now=now) != full
@@ -0,0 +1,164 @@
+"""
+Test hedged LLM requests against local fake providers: backup racing, cancellation and latency histograms
+"""
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import models
+from services import llm_integration, llm_provider_selector
+from services.llm_integration import LLMIntegrationService
+from services.llm_provider_selector import LLMProviderSelector, ProviderLatencyTracker
+
+DECISION = {"recommendation": {"action": "BUY", "confidence": 70}, "parsed": True}
+
+
+class FakeProviders:
+    """analyze_with_* stand-ins: a delay and a result per provider"""
+
+    def __init__(self, service, **behaviour):
+        self.calls, self.cancelled = [], []
+        for provider, (delay, result) in behaviour.items():
+            setattr(service, f"analyze_with_{provider}", self._analyze(provider, delay, result))
+            setattr(service, f"{provider}_client", object())
+
+    def _analyze(self, provider, delay, result):
+        def blocking():
+            # Like a streaming read: polls the hedge cancellation flag between chunks
+            cancelled = llm_integration._request_cancelled.get()
+            deadline = time.time() + delay
+            while time.time() < deadline:
+                if cancelled and cancelled.is_set():
+                    self.cancelled.append(provider)
+                    return {"error": "cancelled"}
+                time.sleep(0.005)
+            return dict(result, provider=provider)
+
+        async def analyze(market_data, bot_id=None, historical_transactions=None):
+            self.calls.append(provider)
+            return await asyncio.to_thread(blocking)
+        return analyze
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(llm_provider_selector, '_latency_tracker', ProviderLatencyTracker())
+    monkeypatch.setattr(llm_integration, 'LLM_HEDGE_DEFAULT_DELAY', 0.1)
+    service = LLMIntegrationService.__new__(LLMIntegrationService)
+    service.developer_id = None
+    service.db = None
+    service.hedge_requests = True
+    service.max_retries, service.retry_delay = 1, 0
+    service.openai_client = service.claude_client = service.gemini_client = None
+    service._backup_provider, service._backup_config = 'claude', {'provider': models.LLMProviderType.ANTHROPIC}
+    service.prepare_market_data = lambda symbol, timeframes_data, indicators: {"symbol": symbol}
+    return service
+
+
+def run(service, model='openai'):
+    started = time.time()
+    analysis = asyncio.run(service._run_market_analysis('BTCUSDT', {'1h': []}, None, model, 1, None))
+    return analysis, time.time() - started
+
+
+def test_slow_primary_is_hedged_and_cancelled(service):
+    fakes = FakeProviders(service, openai=(3.0, DECISION), claude=(0.05, DECISION))
+    analysis, elapsed = run(service)
+
+    assert analysis['provider'] == 'claude' and elapsed < 1.0
+    assert fakes.calls == ['openai', 'claude']
+    time.sleep(0.05)
+    assert fakes.cancelled == ['openai']
+
+    stats = llm_provider_selector.get_latency_tracker().stats()
+    assert stats['claude']['samples'] == 1 and stats['openai']['p50'] < 1.0  # Cancelled: lower bound
+
+
+def test_fast_primary_is_not_hedged(service):
+    fakes = FakeProviders(service, openai=(0.01, DECISION), claude=(0.01, DECISION))
+    analysis, _ = run(service)
+    assert analysis['provider'] == 'openai' and fakes.calls == ['openai']
+
+
+def test_failed_primary_hedges_immediately(service, monkeypatch):
+    monkeypatch.setattr(llm_integration, 'LLM_HEDGE_DEFAULT_DELAY', 5.0)
+    service._backup_provider = 'gemini'
+    fakes = FakeProviders(service, openai=(0.01, {"error": "OpenAI analysis failed: 529"}),
+                          gemini=(0.01, DECISION))
+    analysis, elapsed = run(service)
+    assert analysis['provider'] == 'gemini' and elapsed < 1.0
+
+    # Both failing: the primary's error is returned
+    fakes = FakeProviders(service, openai=(0.01, {"error": "down"}), gemini=(0.01, {"error": "also down"}))
+    assert run(service)[0]['error'] == 'down'
+
+
+def test_only_the_selected_backup_is_hedged_with(service):
+    # Gemini has a client (e.g. from GEMINI_API_KEY) but is not the selector's backup
+    fakes = FakeProviders(service, openai=(0.5, DECISION), gemini=(0.01, DECISION))
+    analysis, _ = run(service)
+    assert analysis['provider'] == 'openai' and fakes.calls == ['openai']
+
+    # No backup (free plan, or no developer provider config): never hedged
+    service._backup_provider = None
+    fakes = FakeProviders(service, openai=(0.5, DECISION), claude=(0.01, DECISION))
+    analysis, _ = run(service)
+    assert analysis['provider'] == 'openai' and fakes.calls == ['openai']
+
+
+def test_backup_usage_is_logged_under_the_backup_config(service):
+    logged = []
+    service.developer_id, service.db = 5, object()
+    service.bot_id = service.subscription_id = None
+    service.last_request_cost_usd = 0.0
+    service._provider_config = {'provider': models.LLMProviderType.OPENAI}
+    service._provider_selector = type('Selector', (), {'log_usage': lambda self, **kwargs: logged.append(kwargs)})()
+
+    service._log_llm_usage('CLAUDE', 'claude-3-5-sonnet-20241022', 100, 20)
+    service._log_llm_usage('OPENAI', 'gpt-4o-mini', 100, 20)
+    assert [entry['provider_config'] for entry in logged] == [service._backup_config, service._provider_config]
+
+
+def test_latency_histograms_drive_hedge_delay_and_ranking(service, monkeypatch):
+    tracker = llm_provider_selector.get_latency_tracker()
+    for _ in range(30):
+        tracker.record('openai', 1.5)
+        tracker.record('claude', 4.0)
+        tracker.record('gemini', 0.4, success=False)
+
+    assert 1.0 <= tracker.percentile('openai', 0.5) <= 2.0
+    assert tracker.rank(['gemini', 'claude', 'openai', 'unmeasured']) == ['openai', 'claude', 'gemini', 'unmeasured']
+
+    monkeypatch.setattr(llm_integration, 'LLM_HEDGE_MIN_SAMPLES', 20)
+    assert 1.0 <= service._hedge_delay('openai') <= 2.0
+    assert service._hedge_delay('never-used') == llm_integration.LLM_HEDGE_DEFAULT_DELAY
+
+
+def test_backup_provider_is_fastest_other_platform_provider(monkeypatch):
+    monkeypatch.setattr(llm_provider_selector, '_latency_tracker', ProviderLatencyTracker())
+    engine = create_engine('sqlite://')
+    models.Base.metadata.create_all(engine, tables=[
+        models.User.__table__, models.UserPlan.__table__,
+        models.PlatformLLMProvider.__table__, models.PlatformLLMModel.__table__
+    ])
+    db = sessionmaker(bind=engine)()
+    for provider_id, provider_type in enumerate(models.LLMProviderType, start=1):
+        db.add(models.PlatformLLMProvider(id=provider_id, provider_type=provider_type,
+                                          name=provider_type.value, api_key=f"key-{provider_id}"))
+    db.add(models.UserPlan(user_id=5, plan_name=models.PlanName.PRO))
+    db.add(models.UserPlan(user_id=6, plan_name=models.PlanName.FREE))
+    db.commit()
+
+    tracker = llm_provider_selector.get_latency_tracker()
+    tracker.record('gemini', 0.5)
+    tracker.record('claude', 6.0)
+
+    selector = LLMProviderSelector(db)
+    assert selector.get_backup_provider(5, exclude=['openai'])['provider'] == models.LLMProviderType.GEMINI
+    assert selector.get_backup_provider(5, exclude=['openai', 'gemini'])['provider'] == models.LLMProviderType.ANTHROPIC
+    assert selector.get_backup_provider(6, exclude=['openai']) is None
+    db.close()
@@ -0,0 +1,163 @@
+"""
+Test LLM prompt building: compact candle tables, cached static sections and per-section token reports
+"""
+
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from core import crud
+from core import database
+from services import llm_integration, llm_prompt_builder
+from services.llm_integration import LLMIntegrationService
+from services.llm_prompt_builder import (
+    PromptSectionCache, compact_number, encode_candles, encode_market_data, estimate_tokens
+)
+
+TIMEFRAMES = {'30m': 48, '1h': 24, '4h': 12}
+
+
+def make_market_data(symbol='BTCUSDT', price=64250.0, seed=7):
+    """market_data as prepare_market_data builds it from a futures bot's cleaned candles"""
+    rng = random.Random(seed)
+    end = datetime(2025, 6, 2, tzinfo=timezone.utc)
+    timeframes, indicators = {}, {}
+    for timeframe, count in TIMEFRAMES.items():
+        minutes = int(timeframe[:-1]) * (60 if timeframe.endswith('h') else 1)
+        close = price
+        records = []
+        for i in range(count):
+            open_ = close
+            close = open_ * (1 + rng.uniform(-0.004, 0.004))
+            records.append({
+                'timestamp': (end - timedelta(minutes=minutes * (count - i))).isoformat(),
+                'open': open_, 'high': max(open_, close) * (1 + rng.uniform(0, 0.002)),
+                'low': min(open_, close) * (1 - rng.uniform(0, 0.002)), 'close': close,
+                'volume': rng.uniform(50, 900),
+            })
+        timeframes[timeframe] = records
+        indicators[timeframe] = {
+            'current_price': close, 'rsi': rng.uniform(30, 70), 'macd': rng.uniform(-50, 50),
+            'macd_signal': rng.uniform(-50, 50), 'sma_20': close * 0.99, 'ema_50': close * 0.98,
+            'bb_upper': close * 1.02, 'bb_lower': close * 0.98, 'atr': close * 0.006,
+            'volume_ratio': rng.uniform(0.5, 2.0), 'trend_bullish': close > price,
+        }
+    return {
+        'symbol': symbol,
+        'analysis_timestamp': end.isoformat(),
+        'timeframes': timeframes,
+        'indicators': indicators,
+    }
+
+
+def make_service():
+    service = LLMIntegrationService.__new__(LLMIntegrationService)
+    service.last_prompt_tokens = {}
+    return service
+
+
+def build_prompt(service, market_data, bot_id=None, history=None):
+    timeframes = list(market_data['timeframes'])
+    strategy = service._get_analysis_prompt(bot_id, timeframes, market_data['indicators'], history)
+    return service._format_final_prompt(strategy, market_data, history, bot_id)
+
+
+@pytest.fixture(autouse=True)
+def section_cache(monkeypatch):
+    cache = PromptSectionCache()
+    monkeypatch.setattr(llm_prompt_builder, '_section_cache', cache)
+    return cache
+
+
+@pytest.mark.parametrize('value, expected', [
+    (64251.123456789, '64251.12'), (0.0000123456789, '0.00001234568'), (12345678.9, '12345679'),
+    (1.5, '1.5'), (42.0, '42'), (0.0, '0'), (7, '7'), (float('nan'), 'null'), (-3.14159265, '-3.141593'),
+])
+def test_compact_number(value, expected):
+    assert compact_number(value) == expected
+
+
+def test_candle_table_keeps_values_at_significant_digits():
+    records = make_market_data()['timeframes']['1h']
+    records[0]['trades'] = 1200
+    records[1]['open'] = str(records[1]['open'])  # Exchange strings are numbers too
+
+    table = encode_candles(records).splitlines()
+    assert table[0] == 'time,open,high,low,close,volume,trades'
+    assert len(table) == len(records) + 1
+    assert table[1].startswith('2025-06-01 00:00,')
+
+    for row, record in zip(table[1:], records):
+        for column, cell in zip(('open', 'high', 'low', 'close', 'volume'), row.split(',')[1:]):
+            assert math.isclose(float(cell), float(record[column]), rel_tol=1e-6)
+
+
+def test_compact_market_data_is_a_fraction_of_json():
+    market_data = make_market_data()
+    compact = encode_market_data(market_data)
+    legacy = json.dumps(market_data, indent=2)
+
+    assert estimate_tokens(compact) < estimate_tokens(legacy) * 0.4
+    assert 'data["timeframes"]' in compact and '[4h] 12 candles' in compact
+    indicators = json.loads(compact.splitlines()[-1])
+    assert indicators['1h']['trend_bullish'] in (True, False) and set(indicators) == set(TIMEFRAMES)
+
+
+def test_static_sections_are_built_once(section_cache, monkeypatch):
+    service = make_service()
+    built = []
+    build_guide = service._build_data_structure_guide
+    monkeypatch.setattr(service, '_build_data_structure_guide', lambda *args: built.append(args) or build_guide(*args))
+
+    first = build_prompt(service, make_market_data(seed=1))
+    second = build_prompt(service, make_market_data(seed=2))
+    assert len(built) == 1 and first != second
+    assert '[30m] 48 candles\ntime,open,high,low,close,volume\n' in first
+
+    build_prompt(service, make_market_data(), history=[{'result': 'WIN', 'profit_loss_pct': 1.0, 'side': 'BUY',
+                                                        'symbol': 'BTCUSDT', 'timeframe': '1h',
+                                                        'entry_price': 1.0, 'exit_price': 1.01}])
+    assert len(built) == 2  # History adds a step to the guide
+
+    tokens = service.last_prompt_tokens
+    assert set(tokens) == {'strategy', 'market_data', 'historical', 'instructions', 'total'}
+    assert tokens['total'] == sum(count for name, count in tokens.items() if name != 'total')
+
+
+def test_bot_prompt_is_read_once_per_ttl(section_cache, monkeypatch):
+    reads = []
+    template = SimpleNamespace(id=3, name='Scalper', content='Trade {symbol} on {formatted_timeframes} for bot {bot_id}')
+
+    def get_db():
+        reads.append(True)
+        yield object()
+
+    monkeypatch.setattr(database, 'get_db', get_db)
+    monkeypatch.setattr(crud, 'get_bot_by_id', lambda db, bot_id: SimpleNamespace(bot_type='BotType.SIGNALS_FUTURES'))
+    monkeypatch.setattr(crud, 'get_bot_prompts', lambda db, bot_id: [SimpleNamespace(priority=1, llm_prompt_template=template)])
+
+    service = make_service()
+    prompt = build_prompt(service, make_market_data(), bot_id=9)
+    build_prompt(service, make_market_data(seed=3), bot_id=9)
+    assert len(reads) == 1
+    assert 'Trade {symbol} on 30M, 1H, 4H for bot 9' in prompt
+    assert prompt.count('DATA STRUCTURE GUIDE') == 1 and 'header row (time,open,high,low,close,volume)' in prompt
+    assert '"stop_loss"' in prompt  # SIGNALS_FUTURES output format
+
+    monkeypatch.setattr(llm_integration, 'LLM_PROMPT_CACHE_TTL', 0.0)  # Re-read on every build
+    section_cache.clear()
+    build_prompt(service, make_market_data(), bot_id=9)
+    build_prompt(service, make_market_data(), bot_id=9)
+    assert len(reads) == 5  # Strategy prompt and output format each look the bot up
+
+
+def test_legacy_json_prompt_is_still_available(monkeypatch):
+    monkeypatch.setattr(llm_integration, 'LLM_COMPACT_PROMPT', False)
+    market_data = make_market_data()
+    prompt = build_prompt(make_service(), market_data)
+    assert json.dumps(market_data, indent=2) in prompt
+    assert 'time,open,high,low,close,volume' not in prompt
@@ -0,0 +1,144 @@
+"""
+Test LLM quota ledger: exact reservations under concurrency, batched write-back, rollover and reconciliation
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core import models
+from services.llm_integration import LLMIntegrationService, QuotaExceededException
+from services.llm_quota_ledger import QuotaLedger
+from utils.redis_client import reset_redis_client
+
+
+@pytest.fixture
+def session_factory():
+    reset_redis_client(None)
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine, tables=[models.User.__table__, models.UserPlan.__table__])
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add_all([
+        models.User(id=1, email='dev1@example.com'),
+        models.UserPlan(id=10, user_id=1, plan_name=models.PlanName.PRO, llm_quota_total=600,
+                        llm_quota_used=100, llm_quota_reset_at=datetime.now() + timedelta(days=10)),
+    ])
+    db.commit()
+    db.close()
+    return factory
+
+
+@pytest.fixture
+def ledger(session_factory):
+    ledger = QuotaLedger(session_factory=session_factory, flush_interval=3600)
+    yield ledger
+    ledger.clear()
+
+
+def plan_row(session_factory, user_id=1):
+    db = session_factory()
+    try:
+        return db.query(models.UserPlan).filter(models.UserPlan.user_id == user_id).one()
+    finally:
+        db.close()
+
+
+def test_concurrent_reservations_never_overrun(ledger, session_factory):
+    db = session_factory()
+    ledger.reserve(db, 1)
+    allowed = []
+
+    def worker():
+        for _ in range(50):
+            allowed.append(ledger.reserve(db, 1).allowed)
+
+    threads = [threading.Thread(target=worker) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert allowed.count(True) == 499 and allowed.count(False) == 101
+    assert ledger.stats['syncs'] == 1
+    assert plan_row(session_factory).llm_quota_used == 100  # Nothing written on the call path
+
+    assert ledger.flush() == 1
+    assert plan_row(session_factory).llm_quota_used == 600
+    assert ledger.flush() == 0
+    db.close()
+
+
+def test_release_and_failed_write_keep_counts(ledger, session_factory, monkeypatch):
+    db = session_factory()
+    for _ in range(5):
+        ledger.reserve(db, 1)
+    ledger.release(1)
+    assert ledger.get_usage(1).used == 104
+
+    monkeypatch.setattr(ledger, '_write', lambda taken: False)
+    assert ledger.flush() == 0
+    monkeypatch.undo()
+    assert ledger.flush() == 1
+    assert plan_row(session_factory).llm_quota_used == 104
+    db.close()
+
+
+def test_period_rolls_over_and_is_written_back(ledger, session_factory):
+    db = session_factory()
+    plan = db.query(models.UserPlan).one()
+    plan.llm_quota_used = 600
+    plan.llm_quota_reset_at = datetime.now() - timedelta(minutes=1)
+    db.commit()
+
+    status = ledger.reserve(db, 1)
+    assert status.allowed and status.used == 1
+    assert status.reset_at > datetime.now() + timedelta(days=29)
+
+    ledger.invalidate(1)  # A sync before the flush must not resurrect the old period
+    assert ledger.reserve(db, 1).used == 2
+
+    ledger.flush()
+    plan = plan_row(session_factory)
+    assert plan.llm_quota_used == 2 and plan.llm_quota_reset_at > datetime.now() + timedelta(days=29)
+    db.close()
+
+
+def test_restart_and_top_up_reconcile_from_user_plan(ledger, session_factory):
+    db = session_factory()
+    for _ in range(3):
+        ledger.reserve(db, 1)
+    ledger.flush()
+
+    restarted = QuotaLedger(session_factory=session_factory, flush_interval=3600)
+    assert restarted.reserve(db, 1).used == 104
+
+    db.query(models.UserPlan).one().llm_quota_total += 300
+    db.commit()
+    restarted.invalidate(1)
+    assert restarted.reserve(db, 1).total == 900
+
+    assert not ledger.reserve(db, 2).tracked  # No active plan: not metered
+    db.close()
+
+
+def test_service_reserves_and_blocks_through_ledger(ledger, session_factory, monkeypatch):
+    from services import llm_quota_ledger
+    monkeypatch.setattr(llm_quota_ledger, '_ledger', ledger)
+
+    db = session_factory()
+    db.query(models.UserPlan).one().llm_quota_used = 598
+    db.commit()
+    service = LLMIntegrationService.__new__(LLMIntegrationService)
+    service.db = db
+
+    assert service._check_quota(1)
+    service._release_quota(1)
+    assert service._check_quota(1) and service._check_quota(1)
+    with pytest.raises(QuotaExceededException, match='600/600'):
+        service._check_quota(1)
+    db.close()
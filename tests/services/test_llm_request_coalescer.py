@@ -0,0 +1,148 @@
+"""
+Test LLM request coalescing: deduplication across threads, concurrent dispatch of distinct requests and fan-out
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services import llm_request_coalescer
+from services.llm_cache import LLMResponseCache
+from services.llm_integration import LLMIntegrationService
+from services.llm_request_coalescer import RequestCoalescer, analysis_request_key
+from utils.redis_client import reset_redis_client
+
+CANDLES = {'1h': [{'timestamp': 1700000000000 + i * 3600000, 'open': 1.0, 'high': 2.0, 'low': 0.5,
+                   'close': 1.5 + i, 'volume': 10.0} for i in range(3)]}
+DECISION = {"recommendation": {"action": "BUY", "confidence": 70}}
+
+
+@pytest.fixture
+def coalescer(monkeypatch):
+    reset_redis_client(None)
+    coalescer = RequestCoalescer(window=0.1, max_concurrency=4, timeout=5.0, cache=LLMResponseCache())
+    monkeypatch.setattr(llm_request_coalescer, '_coalescer', coalescer)
+    return coalescer
+
+
+def in_threads(count, submit):
+    """Run submit() in `count` threads, each on its own event loop (as generate_signal does)"""
+    results = [None] * count
+
+    def worker(index):
+        results[index] = asyncio.run(submit(index))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_requests_share_one_call(coalescer):
+    calls = []
+
+    async def compute():
+        calls.append(True)
+        await asyncio.sleep(0.1)
+        return dict(DECISION)
+
+    results = in_threads(20, lambda i: coalescer.submit('same', compute))
+    assert len(calls) == 1
+    assert all(result == DECISION for result in results)
+    assert len({id(result) for result in results}) == 20  # Each waiter gets its own copy
+
+    stats = coalescer.get_stats()
+    assert stats['dispatched'] == 1 and stats['coalesced'] == 19 and stats['inflight'] == 0
+
+
+def test_distinct_requests_are_dispatched_together(coalescer):
+    running, peak = [0], [0]
+
+    def compute_for(index):
+        async def compute():
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.2)
+            running[0] -= 1
+            return {"index": index}
+        return compute
+
+    started = time.time()
+    results = in_threads(8, lambda i: coalescer.submit(f'key-{i}', compute_for(i)))
+    elapsed = time.time() - started
+
+    assert [result['index'] for result in results] == list(range(8))
+    assert peak[0] == 4 and elapsed < 1.0  # Two rounds of max_concurrency, not eight calls in a row
+    assert coalescer.get_stats()['batches'] == 1
+
+
+def test_failures_reach_every_waiter_and_are_not_cached(coalescer):
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError('provider down')
+
+    async def submit(_):
+        try:
+            return await coalescer.submit('boom', failing)
+        except RuntimeError as e:
+            return str(e)
+
+    assert in_threads(3, submit) == ['provider down'] * 3
+
+    calls = []
+
+    async def error_result():
+        calls.append(True)
+        return {"error": "quota_exceeded"}
+
+    should_cache = lambda result: 'error' not in result
+    for _ in range(2):
+        assert asyncio.run(coalescer.submit('err', error_result, should_cache=should_cache)) == {"error": "quota_exceeded"}
+    assert len(calls) == 2
+
+
+def test_request_key_covers_scope_and_inputs():
+    scope = (1, 7, 'PLATFORM', 2, 'gpt-4o-mini', 'claude', 'gemini')
+    indicators = {'1h': {'rsi': 55.0, 'historical_data': [1, 2, 3]}}
+    key = analysis_request_key('BTCUSDT', CANDLES, 'openai', scope, indicators)
+
+    assert key.startswith('request:openai:')
+    assert key == analysis_request_key('BTC/USDT', CANDLES, 'openai', scope, {'1h': {'rsi': 55.0}})
+    assert key != analysis_request_key('BTCUSDT', CANDLES, 'openai', scope, {'1h': {'rsi': 56.0}})
+    assert key != analysis_request_key('BTCUSDT', CANDLES, 'claude', scope, indicators)
+    assert key != analysis_request_key('BTCUSDT', CANDLES, 'openai', scope, indicators, [{'result': 'WIN'}])
+    assert key != analysis_request_key('BTCUSDT', CANDLES, 'openai', (2,) + scope[1:], indicators)
+    assert key != analysis_request_key('BTCUSDT', CANDLES, 'openai', (1, 8) + scope[2:], indicators)
+
+
+def test_requests_are_only_shared_within_one_bot_and_tenant(coalescer):
+    calls = []
+
+    def make_service(bot_id, developer_id, source):
+        service = LLMIntegrationService.__new__(LLMIntegrationService)
+        service.coalesce_requests = True
+        service.last_request_cost_usd = 0.0
+        service.bot_id, service.developer_id = bot_id, developer_id
+        service._provider_config = {'source': source, 'provider_id': 2} if source else None
+        service.openai_model, service.claude_model, service.gemini_model = 'gpt-4o-mini', 'claude', 'gemini'
+
+        async def run(symbol, timeframes_data, indicators, model, bot_id, history):
+            calls.append((bot_id, developer_id, source))
+            await asyncio.sleep(0.1)
+            return dict(DECISION)
+        service._run_market_analysis = run
+        return service
+
+    # Subscriptions of bot 1 share; bot 2 on the same template, another developer
+    # or other credentials each make their own request
+    scopes = [(1, 7, 'PLATFORM'), (1, 7, 'PLATFORM'), (1, 7, 'PLATFORM'),
+              (2, 7, 'PLATFORM'), (1, 8, 'PLATFORM'), (1, 7, 'USER_CONFIGURED'), (1, 7, None)]
+    results = in_threads(len(scopes), lambda i: make_service(*scopes[i])._coalesced_market_analysis(
+        'BTCUSDT', CANDLES, {'1h': {'rsi': 50}}, 'openai', scopes[i][0], None))
+
+    assert all(result == DECISION for result in results)
+    assert sorted(calls, key=str) == sorted(set(scopes), key=str)
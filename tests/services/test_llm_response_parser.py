@@ -0,0 +1,88 @@
+"""
+Test LLM response parsing: incremental object scanning, repair, schema validation and early stream close
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from services.llm_integration import LLMIntegrationService
+from services.llm_response_parser import (
+    JSONObjectScanner, TradingDecision, CapitalManagementAdvice, parse_json_response, read_decision_stream
+)
+
+DECISION = '{"recommendation": {"action": "buy", "confidence": "72%", "reasoning": "Breakout {retest} with \\"volume\\""}}'
+
+
+@pytest.mark.parametrize('response', [
+    DECISION,
+    f"Here is my analysis:\n```json\n{DECISION}\n```\nLet me know if you need more.",
+    f"Example format: {{\"recommendation\": {{\"action\": \"BUY | SELL | HOLD\"}}}}\nAnswer: {DECISION}",
+    DECISION[:-1] + ',}',  # Trailing comma
+])
+def test_decision_is_extracted_and_normalized(response):
+    parsed, error = parse_json_response(response, TradingDecision)
+    assert error is None
+    assert parsed['recommendation']['action'] == 'BUY'
+    assert parsed['recommendation']['reasoning'] == 'Breakout {retest} with "volume"'
+
+
+def test_truncated_and_invalid_responses():
+    parsed, _ = parse_json_response('{"recommendation": {"action": "SELL", "confidence": 80, "reasoning": "Rejected at', TradingDecision)
+    assert parsed['recommendation'] == {'action': 'SELL', 'confidence': 80, 'reasoning': 'Rejected at'}
+
+    assert parse_json_response('HOLD, no setup', TradingDecision) == (None, "No JSON found in response")
+    parsed, error = parse_json_response('{"recommendation": {"action": "WAIT", "confidence": 150}}', TradingDecision)
+    assert parsed is None and 'action' in error and 'confidence' in error
+
+    parsed, error = parse_json_response('{"capital_advice": {"recommended_size_pct": "2.5%"}}', CapitalManagementAdvice)
+    assert error is None and parsed['capital_advice']['recommended_size_pct'] == '2.5%'
+
+
+def test_scanner_yields_objects_as_chunks_complete():
+    scanner = JSONObjectScanner()
+    pieces = [DECISION[i:i + 7] for i in range(0, len(DECISION), 7)]
+    completed = [scanner.feed(piece) for piece in pieces]
+    assert completed[:-1] == [[]] * (len(pieces) - 1)
+    assert completed[-1] == [DECISION]
+
+
+def test_stream_stops_at_first_valid_decision():
+    consumed = []
+
+    def chunks():
+        for chunk in ['Analysis: {"recommendation": ', '{"action": "HOLD", "confidence": 40}}',
+                      '\n\nExplanation: volume is', ' below average...']:
+            consumed.append(chunk)
+            yield chunk
+
+    closed = []
+    result = read_decision_stream(chunks(), TradingDecision, close=lambda: closed.append(True))
+    assert result.parsed['recommendation']['action'] == 'HOLD'
+    assert result.stopped_early and closed and len(consumed) == 2
+
+    result = read_decision_stream(iter(['{"recommendation": {"action": "LONG"}}']), TradingDecision)
+    assert result.parsed is None and not result.stopped_early and 'action' in result.error
+
+
+def test_openai_stream_is_closed_after_decision():
+    class FakeStream:
+        closed = False
+
+        def __iter__(self):
+            for text in [DECISION[:30], DECISION[30:], ' Reasoning continues for many tokens']:
+                yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+            raise AssertionError('read past the decision')
+
+        def close(self):
+            self.closed = True
+
+    stream = FakeStream()
+    service = LLMIntegrationService.__new__(LLMIntegrationService)
+    service.openai_model = 'gpt-4o-mini'
+    service.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: stream)))
+
+    analysis, input_tokens, output_tokens = service._stream_decision('OPENAI', 'x' * 400, 'system')
+    assert analysis['parsed'] and analysis['recommendation']['action'] == 'BUY'
+    assert stream.closed and (input_tokens, output_tokens) == (100, len(DECISION) // 4)
@@ -0,0 +1,147 @@
+"""
+Test mark-price TP/SL engine: interval index, replay feed and monitor integration
+"""
+
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import models
+from services.mark_price_engine import MarkPriceEngine, ReplayFeed, BinanceMarkPriceStream
+from services.position_monitor import PositionMonitor
+
+
+def test_index_fires_each_level_once():
+    fired = []
+    engine = MarkPriceEngine(on_trigger=fired.append)
+    engine.add_position(1, 'BTC/USDT', 'LONG', take_profit=110, stop_loss=95)
+    engine.add_position(2, 'BTCUSDT', 'SHORT', take_profit=90, stop_loss=105)
+    engine.add_position(3, 'BTCUSDT', 'LONG', take_profit=None, stop_loss=99)
+    engine.add_position(4, 'ETHUSDT', 'LONG', take_profit=2000, stop_loss=1500)
+    assert not engine.add_position(5, 'BTCUSDT', 'LONG', take_profit=None, stop_loss=None)
+    assert engine.symbols() == ['BTCUSDT', 'ETHUSDT']
+
+    assert engine.on_price('BTCUSDT', 100) == []
+    assert [(t.transaction_id, t.reason) for t in engine.on_price('BTCUSDT', 98.5)] == [(3, 'SL_HIT')]
+    assert engine.on_price('BTCUSDT', 97) == []
+    # Gap through several levels at once
+    hits = engine.on_price('BTCUSDT', 120)
+    assert sorted((t.transaction_id, t.reason) for t in hits) == [(1, 'TP_HIT'), (2, 'SL_HIT')]
+    assert engine.on_price('BTCUSDT', 80) == []
+    assert [t.transaction_id for t in fired][0] == 3 and len(fired) == 3
+    assert len(engine) == 1
+
+
+def test_index_matches_check_tp_sl_hit():
+    rng = random.Random(7)
+    positions = {}
+    engine = MarkPriceEngine()
+    for tx_id in range(1, 200):
+        side = rng.choice(['LONG', 'SHORT'])
+        tp = rng.choice([None, rng.uniform(90, 110)])
+        sl = rng.choice([None, rng.uniform(90, 110)])
+        if side == 'LONG' and tp and sl and tp <= sl:
+            tp, sl = sl, tp
+        if side == 'SHORT' and tp and sl and tp >= sl:
+            tp, sl = sl, tp
+        positions[tx_id] = models.Transaction(id=tx_id, symbol='BTCUSDT', position_side=side,
+                                              take_profit=tp, stop_loss=sl)
+        engine.add_transaction(positions[tx_id])
+
+    monitor = PositionMonitor(db=None, futures_client=None)
+    price = 100.0
+    for _ in range(300):
+        price += rng.uniform(-1.5, 1.5)
+        expected = {tx_id: monitor.check_tp_sl_hit(tx, price) for tx_id, tx in positions.items()}
+        expected = {tx_id: reason for tx_id, reason in expected.items() if reason}
+        hits = {t.transaction_id: t.reason for t in engine.on_price('BTCUSDT', price)}
+        assert hits == expected
+        for tx_id in hits:
+            del positions[tx_id]
+
+
+def test_binance_stream_message_parsing():
+    raw = json.dumps({'stream': 'btcusdt@markPrice@1s',
+                      'data': {'e': 'markPriceUpdate', 'E': 1_700_000_000_000, 's': 'BTCUSDT', 'p': '37000.5'}})
+    assert BinanceMarkPriceStream.parse_message(raw) == ('BTCUSDT', 37000.5, 1_700_000_000.0)
+    assert BinanceMarkPriceStream.parse_message(json.dumps({'result': None, 'id': 1})) is None
+    assert BinanceMarkPriceStream.stream_name('BTC/USDT') == 'btcusdt@markPrice@1s'
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    models.Base.metadata.create_all(engine, tables=[
+        models.User.__table__, models.Bot.__table__, models.Subscription.__table__, models.Transaction.__table__
+    ])
+    session = sessionmaker(bind=engine)()
+    # Binance mainnet (the stream's account), Bybit mainnet and Binance testnet
+    accounts = [(1, models.ExchangeType.BINANCE, models.NetworkType.MAINNET),
+                (2, models.ExchangeType.BYBIT, models.NetworkType.MAINNET),
+                (3, models.ExchangeType.BINANCE, models.NetworkType.TESTNET)]
+    for account_id, exchange, network in accounts:
+        session.add(models.Bot(id=account_id, name=f'bot-{account_id}', exchange_type=exchange))
+        session.add(models.Subscription(id=account_id, bot_id=account_id, network_type=network))
+    entry = datetime.now() - timedelta(hours=1)
+    rows = [(1, 'BTCUSDT', 'LONG', 110.0, 95.0, 1), (2, 'BTCUSDT', 'SHORT', 90.0, 105.0, 1),
+            (3, 'ETHUSDT', 'LONG', 2100.0, 1900.0, 1), (4, 'BTCUSDT', 'LONG', 110.0, 95.0, 2),
+            (5, 'BTCUSDT', 'SHORT', 90.0, 105.0, 3)]
+    for tx_id, symbol, side, tp, sl, account_id in rows:
+        session.add(models.Transaction(id=tx_id, action='BUY', symbol=symbol, position_side=side, quantity=1.0,
+                                       entry_price=100.0 if symbol == 'BTCUSDT' else 2000.0, leverage=1,
+                                       take_profit=tp, stop_loss=sl, status='OPEN', entry_time=entry,
+                                       bot_id=account_id, subscription_id=account_id))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_replay_closes_positions_on_crossing(db, tmp_path, monkeypatch):
+    ticks = [
+        {'timestamp': 1.0, 'symbol': 'BTCUSDT', 'price': 101.0},
+        {'timestamp': 2.0, 'symbol': 'ETHUSDT', 'price': 2050.0},
+        {'timestamp': 3.0, 'symbol': 'BTCUSDT', 'price': 106.0},
+        {'timestamp': 4.0, 'symbol': 'BTCUSDT', 'price': 111.0},
+    ]
+    path = tmp_path / 'ticks.jsonl'
+    path.write_text('\n'.join(json.dumps(tick) for tick in ticks))
+
+    monitor = PositionMonitor(db, futures_client=None)
+    performance_updates = []
+    monkeypatch.setattr(monitor, '_trigger_performance_update',
+                        lambda bot_id, transaction_id=None: performance_updates.append(transaction_id))
+
+    stats = asyncio.run(monitor.run_price_monitor(ReplayFeed(path=str(path))))
+
+    assert stats == {'ticks': 4, 'positions_closed': 2, 'positions_tracked': 1}
+    short, long_, eth = (db.get(models.Transaction, tx_id) for tx_id in (2, 1, 3))
+    assert (short.status, short.exit_reason, short.exit_price) == ('CLOSED', 'SL_HIT', 106.0)
+    assert (long_.status, long_.exit_reason, long_.exit_price) == ('CLOSED', 'TP_HIT', 111.0)
+    assert eth.status == 'OPEN'
+    assert eth.unrealized_pnl == 50.0
+    assert sorted(performance_updates) == [1, 2]
+
+
+def test_other_exchanges_and_networks_are_left_alone(db, monkeypatch):
+    monitor = PositionMonitor(db, futures_client=object())
+    closed, cleanups = [], []
+    monkeypatch.setattr(monitor, '_trigger_performance_update', lambda bot_id, transaction_id=None: closed.append(transaction_id))
+    monkeypatch.setattr('services.order_cleanup_service.OrderCleanupService.cancel_position_orders',
+                        lambda self, transaction, **kwargs: cleanups.append(transaction.id) or {'success': True, 'cancelled_count': 0})
+
+    # Binance mainnet prices cross every BTCUSDT level
+    ticks = [{'timestamp': 1.0, 'symbol': 'BTCUSDT', 'price': 111.0}, {'timestamp': 2.0, 'symbol': 'BTCUSDT', 'price': 80.0}]
+    asyncio.run(monitor.run_price_monitor(ReplayFeed(ticks=ticks)))
+
+    assert sorted(closed) == sorted(cleanups) == [1, 2]
+    bybit, binance_testnet = db.get(models.Transaction, 4), db.get(models.Transaction, 5)
+    assert bybit.status == binance_testnet.status == 'OPEN'
+    assert bybit.unrealized_pnl is None and binance_testnet.unrealized_pnl is None
+
+    # The testnet stream only tracks the testnet position
+    assert [tx.id for tx in monitor.get_stream_transactions(testnet=True)] == [5]
@@ -0,0 +1,155 @@
+"""
+Test market snapshot grouping, storage and fan-out metrics
+"""
+
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services import market_snapshot
+from utils.redis_client import reset_redis_client
+
+
+def _subscription(sub_id, bot_id=1, pair='BTC/USDT', testnet=True, timeframe='1h',
+                  timeframes=None, exchange='BINANCE', trial=False):
+    bot = SimpleNamespace(
+        exchange_type=SimpleNamespace(value=exchange), trading_pair='ETH/USDT',
+        timeframe=timeframe, timeframes=timeframes or []
+    )
+    return SimpleNamespace(
+        id=sub_id, bot_id=bot_id, bot=bot, trading_pair=pair,
+        is_testnet=testnet, is_trial=trial
+    )
+
+
+@pytest.fixture(autouse=True)
+def local_only():
+    reset_redis_client(None)
+    market_snapshot.clear_local_snapshots()
+    yield
+    market_snapshot.clear_local_snapshots()
+
+
+def test_groups_subscriptions_by_market():
+    subscriptions = [
+        _subscription(1),
+        _subscription(2, pair='BTCUSDT'),                # same symbol, other notation
+        _subscription(3, testnet=False),                 # mainnet
+        _subscription(4, testnet=False, trial=True),     # trial forces testnet
+        _subscription(5, bot_id=2),                      # other bot
+        _subscription(6, timeframes=['4h', '1h']),       # extra timeframe
+        _subscription(7, pair=None),                     # falls back to bot pair
+    ]
+    groups = market_snapshot.group_by_market(subscriptions)
+
+    assert groups['1:BINANCE:testnet:BTCUSDT:1h'] == [1, 2, 4]
+    assert groups['1:BINANCE:mainnet:BTCUSDT:1h'] == [3]
+    assert groups['2:BINANCE:testnet:BTCUSDT:1h'] == [5]
+    assert groups['1:BINANCE:testnet:BTCUSDT:1h,4h'] == [6]
+    assert groups['1:BINANCE:testnet:ETHUSDT:1h'] == [7]
+
+
+def test_snapshot_roundtrip_and_expiry(monkeypatch):
+    key = market_snapshot.market_key(1, 'BINANCE', True, 'BTC/USDT', ['1h'])
+    data = {'timeframes': {'1h': [{'timestamp': 1, 'close': 100.0}]}, 'symbol': 'BTCUSDT'}
+    analysis = {'primary_timeframe': '1h', 'frame': pd.DataFrame({'close': [1.0, 2.0]})}
+
+    assert market_snapshot.load_snapshot(key) is None
+    market_snapshot.store_snapshot(key, data, analysis)
+    snapshot = market_snapshot.load_snapshot(key)
+    assert snapshot['data'] == data
+    pd.testing.assert_frame_equal(snapshot['analysis']['frame'], analysis['frame'])
+
+    monkeypatch.setattr(market_snapshot, 'SNAPSHOT_TTL', -1)
+    market_snapshot.store_snapshot(key, data, analysis)
+    assert market_snapshot.load_snapshot(key) is None
+
+
+def test_fanout_metrics():
+    groups = {'a': [1, 2, 3], 'b': [4]}
+    market_snapshot.record_fanout(groups)
+    market_snapshot.record_metrics(snapshots_built=1)
+    market_snapshot.record_metrics(snapshot_hits=3)
+
+    metrics = market_snapshot.get_fanout_metrics()
+    assert metrics['subscriptions'] == 4
+    assert metrics['markets'] == 2
+    assert metrics['shared_markets'] == 1
+    assert metrics['fetches_avoided'] == 2
+    assert metrics['analyses_avoided'] == 2
+    assert metrics['snapshot_hit_rate'] == 1.0
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return False
+        self.values[key] = value
+        return True
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+def test_snapshot_is_stored_as_json():
+    redis_client = FakeRedis()
+    reset_redis_client(redis_client)
+    key = market_snapshot.market_key(1, 'BINANCE', True, 'BTC/USDT', ['1h'])
+    frame = pd.DataFrame({'close': [1.5, np.nan], 'volume': [10, 20], 'bullish': [True, False]},
+                         index=pd.date_range('2025-01-01', periods=2, freq='h', tz='UTC'))
+    analysis = {
+        'frame': frame, 'rsi': frame['close'].rename('rsi'), 'at': pd.Timestamp('2025-01-01 01:00', tz='UTC'),
+        'generated': datetime(2025, 1, 1, 1, 5), 'score': np.float64(0.7), 'levels': (1.0, 2.0), 'by_period': {14: 55.0},
+    }
+    market_snapshot.store_snapshot(key, {'symbol': 'BTCUSDT'}, analysis)
+
+    stored = json.loads(redis_client.values[f"market_snapshot:{key}"])  # Plain JSON, no pickle
+    assert stored['data'] == {'symbol': 'BTCUSDT'}
+
+    loaded = market_snapshot.load_snapshot(key)['analysis']
+    pd.testing.assert_frame_equal(loaded['frame'], frame, check_freq=False)
+    pd.testing.assert_series_equal(loaded['rsi'], analysis['rsi'], check_freq=False)
+    assert loaded['at'] == analysis['at'] and loaded['generated'] == analysis['generated']
+    assert loaded['score'] == 0.7 and loaded['levels'] == (1.0, 2.0) and loaded['by_period'] == {14: 55.0}
+
+
+def test_locked_market_waits_for_the_other_build(monkeypatch):
+    from core import tasks
+
+    reset_redis_client(FakeRedis())
+    key = market_snapshot.market_key(1, 'BINANCE', True, 'BTC/USDT', ['1h'])
+    requeued, dispatched = [], []
+    monkeypatch.setattr(tasks.build_market_snapshot, 'apply_async', lambda args, kwargs, countdown: requeued.append(kwargs))
+    monkeypatch.setattr(tasks.run_bot_logic, 'delay', lambda subscription_id, market_key=None: dispatched.append((subscription_id, market_key)))
+    monkeypatch.setattr(tasks, 'initialize_bot', lambda subscription: pytest.fail('locked market must not be built twice'))
+
+    market_snapshot.get_redis_client().set(f"market_snapshot_lock:{key}", 'locked')
+    assert tasks.build_market_snapshot(key, [1, 2])['status'] == 'requeued'
+    assert dispatched == [] and requeued[0]['waiting_since'] <= time.time()
+
+    # The lock holder stores its snapshot: the re-queued subscriptions share it
+    market_snapshot.store_snapshot(key, {'symbol': 'BTCUSDT'}, {'signal': 'BUY'})
+    assert tasks.build_market_snapshot(key, [1, 2], **requeued[0])['snapshot'] == 'shared'
+    assert dispatched == [(1, key), (2, key)]
+
+    # Still locked after MARKET_SNAPSHOT_LOCK_WAIT: crawl individually instead of waiting forever
+    dispatched.clear()
+    other = market_snapshot.market_key(1, 'BINANCE', True, 'ETH/USDT', ['1h'])
+    market_snapshot.get_redis_client().set(f"market_snapshot_lock:{other}", 'locked')
+    monkeypatch.setattr(market_snapshot, 'SNAPSHOT_LOCK_WAIT', 0)
+    assert tasks.build_market_snapshot(other, [3], waiting_since=time.time() - 1)['status'] == 'fallback'
+    assert dispatched == [(3, None)]
@@ -0,0 +1,138 @@
+"""
+Test batched position sync: one position query per exchange account
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import models
+from services import position_sync_service
+from services.exchange_integrations.base_futures_exchange import FuturesPosition
+from services.position_sync_service import PositionSyncService
+
+
+class FakeClient:
+    def __init__(self, api_key, positions):
+        self.api_key = api_key
+        self.positions = positions
+        self.calls = []
+
+    def get_position_info(self, symbol=None):
+        self.calls.append((symbol, threading.current_thread().name))
+        return self.positions
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    models.Base.metadata.create_all(engine, tables=[
+        models.User.__table__, models.Bot.__table__, models.Subscription.__table__,
+        models.Transaction.__table__, models.ExchangeCredentials.__table__
+    ])
+    session = sessionmaker(bind=engine)()
+    session.add(models.Bot(id=1, name='Universal', bot_type='FUTURES', exchange_type=models.ExchangeType.BINANCE))
+    for principal in ('alice', 'bob'):
+        session.add(models.ExchangeCredentials(principal_id=principal, exchange=models.ExchangeType.BINANCE,
+                                               api_key=f"{principal}-key", api_secret='secret', is_testnet=True))
+    for principal, sub_id in (('alice', 1), ('alice', 2), ('bob', 3)):
+        session.add(models.Subscription(id=sub_id, bot_id=1, user_principal_id=principal,
+                                        network_type=models.NetworkType.TESTNET))
+    rows = [(1, 1, 'BTCUSDT'), (2, 1, 'ETHUSDT'), (3, 2, 'SOLUSDT'), (4, 3, 'BTCUSDT')]
+    for tx_id, sub_id, symbol in rows:
+        session.add(models.Transaction(id=tx_id, subscription_id=sub_id, bot_id=1, action='BUY', position_side='LONG',
+                                       symbol=symbol, quantity=1.0, entry_price=100.0, leverage=1, status='OPEN'))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_sync_groups_transactions_per_account(db, monkeypatch):
+    positions = {
+        'alice-key': [FuturesPosition('BTCUSDT', 'LONG', '1', '100', '110', '10', '10'),
+                      FuturesPosition('SOLUSDT', 'LONG', '1', '100', '90', '-10', '-10')],
+        'bob-key': [FuturesPosition('BTCUSDT', 'LONG', '1', '100', '120', '20', '20')],
+    }
+    clients = []
+
+    def create_client(exchange_name, api_key, api_secret, passphrase, testnet):
+        clients.append(FakeClient(api_key, positions[api_key]))
+        return clients[-1]
+
+    monkeypatch.setattr(position_sync_service, 'create_futures_exchange', create_client)
+    service = PositionSyncService(db)
+    decrypted = []
+    monkeypatch.setattr(service.api_key_manager, 'decrypt_api_key', lambda value: decrypted.append(value) or value)
+    closed = []
+    monkeypatch.setattr(service, '_handle_closed_position',
+                        lambda transaction, client: closed.append(transaction.id) or {'status': 'closed'})
+
+    results = service.sync_all_open_positions()
+
+    assert results['total'] == 4
+    assert results['accounts'] == 2
+    assert (results['updated'], results['closed'], results['errors']) == (3, 1, 0)
+    # One unfiltered position query per account, decrypted once per credentials row
+    assert sorted(client.api_key for client in clients) == ['alice-key', 'bob-key']
+    assert all(len(client.calls) == 1 and client.calls[0][0] is None for client in clients)
+    assert decrypted.count('alice-key') == 1
+    assert closed == [2]
+
+    prices = {tx.id: tx.last_updated_price for tx in db.query(models.Transaction).all()}
+    assert prices[1] == 110.0
+    assert prices[3] == 90.0
+    assert prices[4] == 120.0
+
+
+def test_account_fetch_failure_marks_its_transactions(db, monkeypatch):
+    class FailingClient(FakeClient):
+        def get_position_info(self, symbol=None):
+            raise RuntimeError('exchange down')
+
+    def create_client(exchange_name, api_key, api_secret, passphrase, testnet):
+        if api_key == 'bob-key':
+            return FailingClient(api_key, [])
+        return FakeClient(api_key, [FuturesPosition('BTCUSDT', 'LONG', '1', '100', '110', '10', '10'),
+                                    FuturesPosition('ETHUSDT', 'LONG', '1', '100', '105', '5', '5'),
+                                    FuturesPosition('SOLUSDT', 'LONG', '1', '100', '95', '-5', '-5')])
+
+    monkeypatch.setattr(position_sync_service, 'create_futures_exchange', create_client)
+    service = PositionSyncService(db)
+    monkeypatch.setattr(service.api_key_manager, 'decrypt_api_key', lambda value: value)
+
+    results = service.sync_all_open_positions()
+
+    assert (results['updated'], results['closed'], results['errors']) == (3, 0, 1)
+    failed = [d for d in results['details'] if d['result']['status'] == 'error']
+    assert failed[0]['transaction_id'] == 4
+    assert failed[0]['result']['message'] == 'exchange down'
+
+
+def test_bybit_position_list_follows_every_page(monkeypatch):
+    from services.exchange_integrations.bybit_futures import BybitFuturesIntegration
+
+    def row(index):
+        return {'symbol': f"COIN{index}USDT", 'side': 'Buy', 'size': '1', 'avgPrice': '100', 'markPrice': '101',
+                'unrealisedPnl': '1', 'positionValue': '100'}
+
+    pages = {None: ([row(i) for i in range(200)], 'page-2'), 'page-2': ([row(200), row(201)], '')}
+    requests = []
+
+    def make_request(method, endpoint, params=None, signed=False, **options):
+        requests.append(dict(params))
+        page_rows, next_cursor = pages[params.get('cursor')]
+        return {'list': page_rows, 'nextPageCursor': next_cursor}
+
+    client = BybitFuturesIntegration('key', 'secret', testnet=True)
+    monkeypatch.setattr(client, '_make_request', make_request)
+
+    positions = client.get_position_info()
+    assert len(positions) == 202 and positions[-1].symbol == 'COIN201USDT'
+    assert [r.get('cursor') for r in requests] == [None, 'page-2'] and requests[0]['limit'] == 200
+
+    # A cursor that never advances is an incomplete listing: raise, so nothing is marked closed
+    pages['page-2'] = ([row(200)], 'page-2')
+    with pytest.raises(Exception, match='repeated cursor'):
+        client.get_position_info()
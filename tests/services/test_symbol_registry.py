@@ -0,0 +1,122 @@
+"""
+Test shared symbol metadata registry: bulk load, disk tier, expiry and failures
+"""
+
+import pytest
+
+from services.exchange_integrations import symbol_registry
+from services.exchange_integrations.binance_futures import BinanceFuturesIntegration
+from services.exchange_integrations.bybit_futures import BybitFuturesIntegration
+from services.exchange_integrations.symbol_registry import SymbolRegistry
+from utils.redis_client import reset_redis_client
+
+
+def binance_exchange_info(*symbols):
+    return {'symbols': [{
+        'symbol': symbol,
+        'quantityPrecision': 3,
+        'pricePrecision': 1,
+        'filters': [
+            {'filterType': 'PRICE_FILTER', 'tickSize': '0.10'},
+            {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '500'},
+            {'filterType': 'MIN_NOTIONAL', 'notional': '100'},
+        ]
+    } for symbol in symbols]}
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    reset_redis_client(None)
+    registry = SymbolRegistry(ttl=3600, cache_dir=str(tmp_path))
+    monkeypatch.setattr(symbol_registry, '_registry', registry)
+    return registry
+
+
+def binance_client(monkeypatch, calls, response):
+    client = BinanceFuturesIntegration('', '', testnet=True)
+
+    def make_request(method, endpoint, params=None, signed=False, **options):
+        calls.append(endpoint)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(client, '_make_request', make_request)
+    return client
+
+
+def test_one_bulk_load_serves_every_symbol_and_client(registry, tmp_path, monkeypatch):
+    calls = []
+    info = binance_exchange_info('BTCUSDT', 'ETHUSDT')
+    first = binance_client(monkeypatch, calls, info)
+    second = binance_client(monkeypatch, calls, info)
+
+    btc = first.get_symbol_precision('BTCUSDT')
+    assert (btc['stepSize'], btc['tickSize'], btc['minQty'], btc['maxQty'], btc['minNotional']) == \
+        ('0.001', '0.10', 0.001, 500.0, 100.0)
+    assert first.round_quantity(0.12345, 'ETHUSDT') == '0.123'
+    assert second.get_symbol_precision('ETHUSDT')['minNotional'] == 100.0
+    assert calls == ['/fapi/v1/exchangeInfo']
+    assert (tmp_path / 'binance_testnet.json').exists()
+
+    # Another worker process reads the persisted table instead of the exchange
+    other_worker = SymbolRegistry(ttl=3600, cache_dir=str(tmp_path))
+    monkeypatch.setattr(symbol_registry, '_registry', other_worker)
+    assert binance_client(monkeypatch, calls, info).get_symbol_precision('BTCUSDT') == btc
+    assert calls == ['/fapi/v1/exchangeInfo']
+    assert other_worker.stats['shared_loads'] == 1
+
+
+def test_unknown_symbol_and_failed_load_fall_back_to_defaults(registry, monkeypatch):
+    calls = []
+    client = binance_client(monkeypatch, calls, RuntimeError('exchange down'))
+    defaults = client.get_symbol_precision('BTCUSDT')
+    assert defaults['stepSize'] == '0.001' and defaults['minNotional'] == 5
+    client.get_symbol_precision('BTCUSDT')
+    assert len(calls) == 1  # Failed load is not retried on every lookup
+    assert registry.stats['failed_loads'] == 1
+
+    registry.clear()
+    client = binance_client(monkeypatch, calls, binance_exchange_info('BTCUSDT'))
+    assert client.get_symbol_precision('DOGEUSDT')['quantityPrecision'] == 3
+    assert client.get_symbol_precision('BTCUSDT')['tickSize'] == '0.10'
+
+
+def test_expired_table_is_reloaded(tmp_path, monkeypatch):
+    reset_redis_client(None)
+    registry = SymbolRegistry(ttl=0, cache_dir=str(tmp_path))
+    loads = []
+    loader = lambda: loads.append(1) or {'BTCUSDT': {'stepSize': '0.001'}}
+    registry.get('BINANCE', True, 'BTCUSDT', loader)
+    registry.get('BINANCE', True, 'BTCUSDT', loader)
+    assert len(loads) == 2
+
+
+def test_bybit_loader_follows_pagination(registry, monkeypatch):
+    client = BybitFuturesIntegration('', '', testnet=True)
+    pages = {
+        None: {'list': [{'symbol': 'BTCUSDT', 'lotSizeFilter': {'qtyStep': '0.001', 'minOrderQty': '0.001'},
+                         'priceFilter': {'tickSize': '0.10'}}], 'nextPageCursor': 'page2'},
+        'page2': {'list': [{'symbol': 'ETHUSDT', 'lotSizeFilter': {'qtyStep': '0.01', 'minOrderQty': '0.01'},
+                            'priceFilter': {'tickSize': '0.01'}}], 'nextPageCursor': ''},
+    }
+    monkeypatch.setattr(client, '_make_request', lambda method, endpoint, params=None, **kw: pages[params.get('cursor')])
+
+    assert client.get_symbol_precision('ETHUSDT')['stepSize'] == '0.01'
+    assert client.round_quantity(1.234, 'BTCUSDT') == '1.234'
+    assert registry.stats['loads'] == 1
+
+
+def test_exchanges_without_bulk_loader_are_skipped(registry, monkeypatch):
+    loads = []
+    no_loader = lambda: loads.append(1)
+    assert registry.get('HUOBI', False, 'BTCUSDT', no_loader) is None
+    assert registry.get('HUOBI', False, 'ETHUSDT', no_loader) is None
+    assert len(loads) == 1 and registry.stats['failed_loads'] == 0
+
+    refreshed = []
+    monkeypatch.setattr(BinanceFuturesIntegration, '_load_symbol_precisions',
+                        lambda self: refreshed.append(self.testnet) or {'BTCUSDT': {'stepSize': '0.001'}})
+    results = symbol_registry.refresh_exchange_symbols(exchanges=['BINANCE', 'HUOBI', 'HTX'])
+    assert results == {'BINANCE:mainnet': 1, 'BINANCE:testnet': 1}
+    assert refreshed == [False, True]
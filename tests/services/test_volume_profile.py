@@ -0,0 +1,114 @@
+"""
+Test histogram-based volume profile
+"""
+
+import numpy as np
+import pandas as pd
+
+from services.indicator_service import AdvancedIndicators
+from tests.services.test_indicator_kernels import make_ohlcv
+
+
+def reference_volume_profile(close, volume, num_bins=20):
+    """Per-candle bin scan (original algorithm, max price counted in the last bin)"""
+    price_min, price_max = min(close), max(close)
+    bin_size = (price_max - price_min) / num_bins
+    bins = [price_min + i * bin_size for i in range(num_bins + 1)]
+    volumes = [0.0] * num_bins
+    for price, vol in zip(close, volume):
+        for j in range(num_bins):
+            if bins[j] <= price < bins[j + 1] or (j == num_bins - 1 and price == price_max):
+                volumes[j] += vol
+                break
+
+    poc_index = volumes.index(max(volumes))
+    ranked = sorted(range(num_bins), key=lambda j: volumes[j], reverse=True)
+    total, running, area = sum(volumes), 0.0, []
+    for j in ranked:
+        area.append(j)
+        running += volumes[j]
+        if running >= total * 0.7:
+            break
+    return {
+        'poc': (bins[poc_index] + bins[poc_index + 1]) / 2,
+        'vah': bins[max(area) + 1],
+        'val': bins[min(area)],
+        'bin_volumes': volumes
+    }
+
+
+def test_matches_reference_scan():
+    ind = AdvancedIndicators()
+    for seed in (1, 5, 9):
+        df = make_ohlcv(n=500, seed=seed)
+        for num_bins in (10, 20, 50):
+            expected = reference_volume_profile(df['close'].tolist(), df['volume'].tolist(), num_bins)
+            profile = ind.calculate_volume_profile(df['close'], df['volume'], num_bins=num_bins)
+
+            assert np.isclose(profile['poc'], expected['poc'])
+            assert np.isclose(profile['vah'], expected['vah'])
+            assert np.isclose(profile['val'], expected['val'])
+            np.testing.assert_allclose(profile['bin_volumes'], expected['bin_volumes'])
+            assert len(profile['bin_edges']) == num_bins + 1
+            assert all(isinstance(edge, float) for edge in profile['bin_edges'])
+
+
+def test_rolling_window_by_count_and_time():
+    ind = AdvancedIndicators()
+    df = make_ohlcv(n=300)
+    df.index = pd.date_range('2024-01-01', periods=300, freq='h')
+
+    by_count = ind.calculate_volume_profile(df['close'], df['volume'], window=24)
+    by_time = ind.calculate_volume_profile(df['close'], df['volume'], window='24h')
+    last_day = ind.calculate_volume_profile(df['close'].iloc[-24:], df['volume'].iloc[-24:])
+
+    assert by_count == last_day
+    assert by_time == last_day
+
+
+def test_flat_prices():
+    ind = AdvancedIndicators()
+    close = pd.Series([100.0] * 30)
+    volume = pd.Series([2.0] * 30)
+    profile = ind.calculate_volume_profile(close, volume)
+    assert profile['poc'] == profile['vah'] == profile['val'] == 100.0
+    assert sum(profile['bin_volumes']) == 60.0
+
+
+def test_cache_per_key_and_last_candle():
+    ind = AdvancedIndicators()
+    df = make_ohlcv(n=200)
+    df.index = pd.date_range('2024-01-01', periods=200, freq='h')
+    first = ind.calculate_volume_profile(df['close'], df['volume'], cache_key='BTCUSDT:1h')
+    again = ind.calculate_volume_profile(df['close'], df['volume'], cache_key='BTCUSDT:1h')
+    assert again == first and again is not first
+
+    again['bin_volumes'][0] = -1.0  # A caller modifying its result leaves the cache intact
+    first['poc'] = None
+    assert ind.calculate_volume_profile(df['close'], df['volume'], cache_key='BTCUSDT:1h') == \
+        ind.calculate_volume_profile(df['close'], df['volume'])
+
+    newer = make_ohlcv(n=201)
+    newer.index = pd.date_range('2024-01-01', periods=201, freq='h')
+    updated = ind.calculate_volume_profile(newer['close'], newer['volume'], cache_key='BTCUSDT:1h')
+    assert updated is not first
+    assert len(ind._volume_profile_cache) == 1
+
+
+def test_cache_keys_on_candle_time_not_position():
+    ind = AdvancedIndicators()
+    df = make_ohlcv(n=300)
+    df['timestamp'] = pd.date_range('2024-01-01', periods=300, freq='h')
+    current, next_tick = df.iloc[:200].reset_index(drop=True), df.iloc[1:201].reset_index(drop=True)
+
+    # Same length and RangeIndex labels, one candle later
+    first = ind.calculate_volume_profile(current['close'], current['volume'], cache_key='BTCUSDT:1h',
+                                         last_timestamp=current['timestamp'].iloc[-1])
+    later = ind.calculate_volume_profile(next_tick['close'], next_tick['volume'], cache_key='BTCUSDT:1h',
+                                         last_timestamp=next_tick['timestamp'].iloc[-1])
+    assert later == ind.calculate_volume_profile(next_tick['close'], next_tick['volume']) != first
+
+    # Without a candle time nothing is cached
+    uncached = AdvancedIndicators()
+    uncached.calculate_volume_profile(current['close'], current['volume'], cache_key='BTCUSDT:1h')
+    assert uncached._volume_profile_cache == {}
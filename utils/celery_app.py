@@ -38,10 +38,13 @@ app.conf.update(
     task_routes={
         'core.tasks.run_bot_logic': {'queue': 'bot_execution'},
         'core.tasks.run_bot_rpa_logic': {'queue': 'bot_execution'},
+        'core.tasks.build_market_snapshot': {'queue': 'bot_execution'},
         'core.tasks.run_bot_signal_logic': {'queue': 'bot_execution_signal'},
         'core.tasks.run_futures_bot_trading': {'queue': 'futures_trading'},
         'core.tasks.schedule_futures_bot_trading': {'queue': 'futures_trading'},
         'core.tasks.cleanup_old_logs': {'queue': 'maintenance'},
+        'core.tasks.refresh_symbol_registry': {'queue': 'maintenance'},
+        'core.tasks.flush_llm_quota_ledger': {'queue': 'maintenance'},
         'core.tasks.send_email_notification': {'queue': 'notifications'},
         'core.tasks.send_telegram_notification': {'queue': 'notifications'},
         'core.tasks.send_telegram_beauty_notification': {'queue': 'notifications'},
@@ -49,6 +52,8 @@ app.conf.update(
         'core.tasks.monitor_open_positions_task': {'queue': 'monitoring'},
         'core.tasks.sync_open_positions_realtime': {'queue': 'monitoring'},
         'core.tasks.update_bot_performance_metrics': {'queue': 'analytics'},
+        'core.tasks.rebuild_marketplace_metrics': {'queue': 'analytics'},
+        'core.tasks.rebuild_performance_aggregates': {'queue': 'analytics'},
         'core.tasks.update_prompt_performance_metrics': {'queue': 'analytics'},
         'core.tasks.update_risk_management_performance': {'queue': 'analytics'},
         'core.tasks.test_task': {'queue': 'default'},
@@ -69,21 +74,49 @@ app.conf.update(
             'task': 'core.tasks.cleanup_old_logs',
             'schedule': 300.0,  # Run every 5 minutes
         },
-        'schedule-active-bots': {
-            'task': 'core.tasks.schedule_active_bots',
-            'schedule': 60.0,  # Run every 1 minute to check for bot executions
-        },
         'monitor-open-positions': {
             'task': 'core.tasks.monitor_open_positions_task',
-            'schedule': 180.0,  # Run every 3 minutes to check TP/SL and update P&L
+            'schedule': 180.0,  # REST reconciliation every 3 minutes (real-time TP/SL: price-monitor service)
         },
         'sync-open-positions-realtime': {
             'task': 'core.tasks.sync_open_positions_realtime',
             'schedule': 300.0,  # Run every 5 minutes for position sync
         },
+        'refresh-symbol-registry': {
+            'task': 'core.tasks.refresh_symbol_registry',
+            'schedule': 3 * 3600.0,  # Reload exchange instrument lists (registry TTL is 6h)
+        },
+        'rebuild-marketplace-metrics': {
+            'task': 'core.tasks.rebuild_marketplace_metrics',
+            'schedule': 600.0,  # Full rebuild every 10 minutes (closes refresh their bot immediately)
+        },
+        'rebuild-performance-aggregates': {
+            'task': 'core.tasks.rebuild_performance_aggregates',
+            'schedule': 6 * 3600.0,  # Drift correction (closes update the aggregates incrementally)
+        },
+        'flush-llm-quota-ledger': {
+            'task': 'core.tasks.flush_llm_quota_ledger',
+            'schedule': 60.0,  # Workers also write back every LLM_QUOTA_FLUSH_INTERVAL seconds
+        },
     },
 )
 
+# Bot scheduler: one beat entry per shard, each handling subscription ids where
+# id % SCHEDULER_SHARDS == shard_index
+SCHEDULER_SHARDS = max(int(os.getenv('SCHEDULER_SHARDS', 1)), 1)
+if SCHEDULER_SHARDS == 1:
+    app.conf.beat_schedule['schedule-active-bots'] = {
+        'task': 'core.tasks.schedule_active_bots',
+        'schedule': 60.0,  # Run every 1 minute to check for bot executions
+    }
+else:
+    for shard_index in range(SCHEDULER_SHARDS):
+        app.conf.beat_schedule[f'schedule-active-bots-shard-{shard_index}'] = {
+            'task': 'core.tasks.schedule_active_bots',
+            'schedule': 60.0,
+            'kwargs': {'shard_index': shard_index, 'shard_count': SCHEDULER_SHARDS},
+        }
+
 # Auto-discover tasks
 app.autodiscover_tasks(['core.tasks'])
 
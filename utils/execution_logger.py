@@ -2,78 +2,224 @@
 """
 Execution Logger for Bot Trading Activities
 Captures and stores logs from Celery tasks
+
+Records are written behind: log() queues them in a process-wide buffer and a
+background thread bulk-inserts them when EXECUTION_LOG_BATCH_SIZE records are
+pending or every EXECUTION_LOG_FLUSH_INTERVAL seconds. The buffer is flushed at
+the end of every Celery task and at worker shutdown. When the buffer is full,
+log() waits up to EXECUTION_LOG_BLOCK_TIMEOUT seconds for the flusher
+(backpressure), then drops the record and counts it.
 """
 
+import os
+import atexit
 import logging
+import threading
+from collections import deque
 from datetime import datetime
-from typing import Optional, Dict, Any
-from core.database import get_db
+from typing import Optional, Dict, Any, List, Callable
+from sqlalchemy import insert
+from core.database import SessionLocal
 from core import models
 
+BATCH_SIZE = int(os.getenv('EXECUTION_LOG_BATCH_SIZE', 100))
+FLUSH_INTERVAL = float(os.getenv('EXECUTION_LOG_FLUSH_INTERVAL', 2.0))
+MAX_QUEUE = int(os.getenv('EXECUTION_LOG_MAX_QUEUE', 10000))
+BLOCK_TIMEOUT = float(os.getenv('EXECUTION_LOG_BLOCK_TIMEOUT', 0.5))
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionLogBuffer:
+    """Bounded in-process queue of ExecutionLog rows with a background bulk-insert flusher"""
+
+    def __init__(self, session_factory: Callable = SessionLocal, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, max_queue: int = MAX_QUEUE,
+                 block_timeout: float = BLOCK_TIMEOUT):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.block_timeout = block_timeout
+
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()  # One bulk insert at a time
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self.counters = {'enqueued': 0, 'flushed': 0, 'dropped': 0, 'failed': 0, 'flushes': 0, 'blocked': 0}
+
+    def put(self, row: Dict[str, Any]) -> bool:
+        """Queue one row; False if it was dropped because the buffer stayed full"""
+        self._ensure_flusher()
+        with self._not_full:
+            if len(self._queue) >= self.max_queue:
+                self.counters['blocked'] += 1
+                self._wakeup.set()
+                self._not_full.wait_for(lambda: len(self._queue) < self.max_queue, timeout=self.block_timeout)
+                if len(self._queue) >= self.max_queue:
+                    self.counters['dropped'] += 1
+                    return False
+            self._queue.append(row)
+            self.counters['enqueued'] += 1
+            pending = len(self._queue)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self) -> int:
+        """Insert everything queued so far, returns the number of rows written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._not_full:
+                    if not self._queue:
+                        break
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                    self._not_full.notify_all()
+                written += self._insert(batch)
+        return written
+
+    def _insert(self, batch: List[Dict[str, Any]]) -> int:
+        db = self.session_factory()
+        try:
+            db.execute(insert(models.ExecutionLog), batch)
+            db.commit()
+            with self._lock:
+                self.counters['flushed'] += len(batch)
+                self.counters['flushes'] += 1
+            return len(batch)
+        except Exception as e:
+            db.rollback()
+            with self._lock:
+                self.counters['failed'] += len(batch)
+            logger.warning(f"Failed to write {len(batch)} execution logs: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _ensure_flusher(self):
+        # Started lazily and again after fork (Celery prefork workers)
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='execution-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Execution log flusher error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending'] = len(self._queue)
+        return stats
+
+
+_buffer = ExecutionLogBuffer()
+
+
+def get_execution_log_buffer() -> ExecutionLogBuffer:
+    return _buffer
+
+
+def flush_execution_logs() -> int:
+    """Write all queued execution logs now"""
+    return _buffer.flush()
+
+
+def get_execution_log_stats() -> Dict[str, Any]:
+    """Enqueued / flushed / dropped / failed counters of this process"""
+    return _buffer.get_stats()
+
+
+atexit.register(flush_execution_logs)
+
+try:
+    from celery.signals import task_postrun, worker_process_shutdown
+
+    @task_postrun.connect(weak=False)
+    def _flush_after_task(*args, **kwargs):
+        flush_execution_logs()
+
+    @worker_process_shutdown.connect(weak=False)
+    def _flush_on_shutdown(*args, **kwargs):
+        flush_execution_logs()
+except ImportError:
+    pass
+
+
 class ExecutionLogger:
     """Logger that stores execution logs in database"""
-    
+
     def __init__(self, bot_id: int, subscription_id: Optional[int] = None, task_id: Optional[str] = None):
         self.bot_id = bot_id
         self.subscription_id = subscription_id
         self.task_id = task_id
         self.logger = logging.getLogger(f"bot_{bot_id}")
-        
+
     def log(self, log_type: str, message: str, level: str = 'info', data: Optional[Dict[str, Any]] = None):
-        """Log a message to database"""
+        """Queue a message for the database (written by the background flusher)"""
         try:
-            db = next(get_db())
-            
-            execution_log = models.ExecutionLog(
-                bot_id=self.bot_id,
-                subscription_id=self.subscription_id,
-                task_id=self.task_id,
-                log_type=log_type,
-                message=message,
-                level=level,
-                data=data,
-                created_at=datetime.now()
-            )
-            
-            db.add(execution_log)
-            db.commit()
-            
-            # Also log to console
-            self.logger.info(f"[{log_type.upper()}] {message}")
-            
+            _buffer.put({
+                'bot_id': self.bot_id,
+                'subscription_id': self.subscription_id,
+                'task_id': self.task_id,
+                'log_type': log_type,
+                'message': message,
+                'level': level,
+                'data': data,
+                'created_at': datetime.now()
+            })
         except Exception as e:
-            print(f"Failed to log to database: {e}")
-            # Fallback to console logging
-            self.logger.info(f"[{log_type.upper()}] {message}")
-    
+            print(f"Failed to queue log for database: {e}")
+
+        # Also log to console
+        self.logger.info(f"[{log_type.upper()}] {message}")
+
+    def flush(self) -> int:
+        """Write queued logs now (Celery tasks are flushed automatically when they end)"""
+        return flush_execution_logs()
+
     def system(self, message: str, data: Optional[Dict[str, Any]] = None):
         """Log system message"""
         self.log('system', message, 'info', data)
-    
+
     def analysis(self, message: str, data: Optional[Dict[str, Any]] = None):
         """Log analysis message"""
         self.log('analysis', message, 'info', data)
-    
+
     def llm(self, message: str, data: Optional[Dict[str, Any]] = None):
         """Log LLM analysis message"""
         self.log('llm', message, 'info', data)
-    
+
     def transaction(self, message: str, data: Optional[Dict[str, Any]] = None):
         """Log transaction message"""
         self.log('transaction', message, 'info', data)
-    
+
     def position(self, message: str, data: Optional[Dict[str, Any]] = None):
         """Log position message"""
         self.log('position', message, 'info', data)
-    
+
     def order(self, message: str, data: Optional[Dict[str, Any]] = None):
         """Log order message"""
         self.log('order', message, 'info', data)
-    
+
     def error(self, message: str, data: Optional[Dict[str, Any]] = None):
         """Log error message"""
         self.log('error', message, 'error', data)
-    
+
     def warning(self, message: str, data: Optional[Dict[str, Any]] = None):
         """Log warning message"""
         self.log('warning', message, 'warning', data)
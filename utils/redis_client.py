@@ -0,0 +1,59 @@
+"""
+Shared Redis connection for worker-level caches
+One lazily created client per process, None when Redis is unreachable
+"""
+
+import os
+import logging
+import threading
+from typing import Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+_redis_checked = False
+_redis_lock = threading.Lock()
+
+
+def get_redis_client() -> Optional[redis.Redis]:
+    """
+    Get the process-wide Redis client (decode_responses=True)
+
+    Returns None if Redis is unavailable so callers can fall back to
+    process-local state. The connection is only attempted once per process.
+    """
+    global _redis_client, _redis_checked
+
+    if _redis_checked:
+        return _redis_client
+
+    with _redis_lock:
+        if _redis_checked:
+            return _redis_client
+        try:
+            redis_url = os.getenv('REDIS_URL', 'redis://redis_db:6379/0')
+            client = redis.from_url(
+                redis_url,
+                decode_responses=True,
+                socket_connect_timeout=2,
+                socket_timeout=2
+            )
+            client.ping()
+            _redis_client = client
+            logger.info("✅ Shared Redis connection established")
+        except Exception as e:
+            logger.warning(f"⚠️ Redis unavailable, using process-local caches only: {e}")
+            _redis_client = None
+        _redis_checked = True
+
+    return _redis_client
+
+
+def reset_redis_client(client: Optional[redis.Redis] = None):
+    """Replace the shared client, None disables Redis for this process (used by tests)"""
+    global _redis_client, _redis_checked
+    with _redis_lock:
+        _redis_client = client
+        _redis_checked = True